@@ -301,6 +301,14 @@ try:
 except Exception as e:
     print(f"無法匯入 CoreRecorder: {e}")
 
+# 輸入注入後端（Windows API；其他平台為只記錄不注入的後端）
+try:
+    from input_backend import default_backend
+    _INPUT_BACKEND = default_backend()
+except Exception as e:
+    print(f"無法匯入輸入注入後端，改用直接呼叫 Windows API: {e}")
+    _INPUT_BACKEND = None
+
 #  使用文字指令式腳本編輯器（已移除舊版圖形化編輯器）
 try:
     from text_script_editor import TextCommandEditor as VisualScriptEditor
@@ -364,6 +372,62 @@ except Exception as _e:
             except Exception as ex:
                 print(f"sio_save_script_settings fallback failed: {ex}")
 
+# 大型腳本延遲載入（逐塊解碼，不一次載入全部事件）
+try:
+    from script_io import load_script_lazy as sio_load_script_lazy, LAZY_LOAD_BYTES
+except Exception as e:
+    print(f"無法匯入延遲載入函式: {e}")
+    sio_load_script_lazy = None
+    LAZY_LOAD_BYTES = 50 * 1024 * 1024
+
+# 腳本目錄中繼資料索引（只重新讀取有變動的腳本）
+try:
+    from script_index import ScriptIndex
+except Exception as e:
+    print(f"無法匯入 ScriptIndex: {e}")
+    ScriptIndex = None
+
+# 錄製預寫日誌（當機復原）
+try:
+    from record_journal import journal_path as record_journal_path, find_journals, recover_journal
+except Exception as e:
+    print(f"無法匯入錄製日誌模組: {e}")
+    record_journal_path = None
+    find_journals = None
+    recover_journal = None
+
+# 背景存檔服務（合併同路徑寫入，不阻塞 Tk 主執行緒）
+try:
+    from save_service import SaveService
+    from script_io import next_auto_save_name as sio_next_auto_save_name
+except Exception as e:
+    print(f"無法匯入背景存檔服務: {e}")
+    SaveService = None
+    sio_next_auto_save_name = None
+
+# 編譯腳本快取（內容未變的腳本重複執行時不重新解析）
+try:
+    from script_cache import ScriptCache, cache_dir_for as script_cache_dir
+except Exception as e:
+    print(f"無法匯入編譯腳本快取: {e}")
+    ScriptCache = None
+    script_cache_dir = None
+
+# 播放佇列日誌式存檔（延遲合併、只附加變更、原子壓縮）
+try:
+    from playlist_store import PlaylistStore
+except Exception as e:
+    print(f"無法匯入播放佇列存檔模組: {e}")
+    PlaylistStore = None
+
+# 串流腳本合併（逐筆讀寫，記憶體用量固定）
+try:
+    from script_merge import merge_scripts_stream, MergeCancelled
+except Exception as e:
+    print(f"無法匯入串流腳本合併: {e}")
+    merge_scripts_stream = None
+    MergeCancelled = None
+
 # 新增：匯入 about 模組
 try:
     import about
@@ -448,44 +512,25 @@ def client_to_screen(hwnd, rel_x, rel_y, window_name=""):
 
 # ====== 滑鼠控制函式放在這裡 ======
 def move_mouse_abs(x, y):
-    ctypes.windll.user32.SetCursorPos(int(x), int(y))
+    if _INPUT_BACKEND is None:
+        ctypes.windll.user32.SetCursorPos(int(x), int(y))
+        return
+    _INPUT_BACKEND.move(int(x), int(y))
 
 def mouse_event_win(event, x=0, y=0, button='left', delta=0):
-    user32 = ctypes.windll.user32
     if not button:
         button = 'left'
     if event == 'down' or event == 'up':
-        flags = {'left': (0x0002, 0x0004), 'right': (0x0008, 0x0010), 'middle': (0x0020, 0x0040)}
-        flag = flags.get(button, (0x0002, 0x0004))[0 if event == 'down' else 1]
-        class MOUSEINPUT(ctypes.Structure):
-            _fields_ = [("dx", ctypes.c_long),
-                        ("dy", ctypes.c_long),
-                        ("mouseData", ctypes.c_ulong),
-                        ("dwFlags", ctypes.c_ulong),
-                        ("time", ctypes.c_ulong),
-                        ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))]
-        class INPUT(ctypes.Structure):
-            _fields_ = [("type", ctypes.c_ulong),
-                        ("mi", MOUSEINPUT)]
-        inp = INPUT()
-        inp.type = 0
-        inp.mi = MOUSEINPUT(0, 0, 0, flag, 0, None)
-        user32.SendInput(1, ctypes.byref(inp), ctypes.sizeof(inp))
+        if _INPUT_BACKEND is None:
+            flags = {'left': (0x0002, 0x0004), 'right': (0x0008, 0x0010), 'middle': (0x0020, 0x0040)}
+            win32api.mouse_event(flags.get(button, (0x0002, 0x0004))[0 if event == 'down' else 1], 0, 0, 0, 0)
+            return
+        _INPUT_BACKEND.button(button, event == 'down')
     elif event == 'wheel':
-        class MOUSEINPUT(ctypes.Structure):
-            _fields_ = [("dx", ctypes.c_long),
-                        ("dy", ctypes.c_long),
-                        ("mouseData", ctypes.c_ulong),
-                        ("dwFlags", ctypes.c_ulong),
-                        ("time", ctypes.c_ulong),
-                        ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))]
-        class INPUT(ctypes.Structure):
-            _fields_ = [("type", ctypes.c_ulong),
-                        ("mi", MOUSEINPUT)]
-        inp = INPUT()
-        inp.type = 0
-        inp.mi = MOUSEINPUT(0, 0, int(delta * 120), 0x0800, 0, None)
-        user32.SendInput(1, ctypes.byref(inp), ctypes.sizeof(inp))
+        if _INPUT_BACKEND is None:
+            win32api.mouse_event(0x0800, 0, 0, int(delta * 120), 0)
+            return
+        _INPUT_BACKEND.wheel(delta)
 
 
 # ====== 排程管理器 ======
@@ -884,9 +929,10 @@ class UIStateMachine:
       Error 狀態  -> 執行關閉廣告/彈窗腳本
     """
 
-    def __init__(self, vde, logger=None):
+    def __init__(self, vde, logger=None, input_backend=None):
         self.vde = vde               # VisualDetectionEngine 實例
         self.logger = logger or print
+        self.input = input_backend or _INPUT_BACKEND  # 輸入注入後端（None 時直接呼叫 Windows API）
         self.states = {}             # {state_name: config_dict}
         self.error_handlers = []     # [{template_path, close_x, close_y, threshold}]
         self.current_state = "unknown"
@@ -957,19 +1003,17 @@ class UIStateMachine:
             if hits:
                 cx, cy = handler['close_x'], handler['close_y']
                 self.logger(f"[SM] 偵測到異常元素，點擊關閉: ({cx},{cy})")
-                ctypes.windll.user32.SetCursorPos(int(cx), int(cy))
+                if self.input is not None:
+                    self.input.move(int(cx), int(cy))
+                else:
+                    move_mouse_abs(cx, cy)
                 time.sleep(0.1)
                 # 模擬左鍵 down + up
-                class _MI(ctypes.Structure):
-                    _fields_ = [("dx",ctypes.c_long),("dy",ctypes.c_long),
-                                ("mouseData",ctypes.c_ulong),("dwFlags",ctypes.c_ulong),
-                                ("time",ctypes.c_ulong),("dwExtraInfo",ctypes.POINTER(ctypes.c_ulong))]
-                class _IN(ctypes.Structure):
-                    _fields_ = [("type",ctypes.c_ulong),("mi",_MI)]
-                for flag in [0x0002, 0x0004]:
-                    inp = _IN(); inp.type = 0
-                    inp.mi = _MI(0,0,0,flag,0,None)
-                    ctypes.windll.user32.SendInput(1, ctypes.byref(inp), ctypes.sizeof(inp))
+                for down in (True, False):
+                    if self.input is not None:
+                        self.input.button('left', down)
+                    else:
+                        mouse_event_win('down' if down else 'up')
                     time.sleep(0.05)
                 return True
         return False
@@ -1107,6 +1151,9 @@ class RecorderApp(tb.Window):
         self.log_queue = queue.Queue()
         self.after(100, self._process_log_queue_loop)
         
+        # 背景存檔服務：完成通知透過 after 回到 Tk 主執行緒
+        self.save_service = SaveService(dispatch=lambda fn: self.after(0, fn)) if SaveService else None
+        
         # 如果不是管理員，顯示警告對話視窗
         if not is_admin():
             self.after(1000, self._show_admin_warning)
@@ -1311,6 +1358,16 @@ class RecorderApp(tb.Window):
         )
         self.save_script_btn.grid(row=0, column=10, padx=(8, 0))
 
+        # ====== 執行起點（事件索引或標籤，播放中按 Enter 立即跳轉） ======
+        self.start_at_var = tk.StringVar(value="")
+        self.start_at_label = tb.Label(frm_bottom, text="起點", style="My.TLabel")
+        self.start_at_label.grid(row=0, column=11, padx=(10, 2))
+        entry_start_at = tb.Entry(frm_bottom, textvariable=self.start_at_var, width=8, style="My.TEntry", justify="center")
+        entry_start_at.grid(row=0, column=12, padx=2)
+        self.start_at_tooltip = Tooltip(self.start_at_label, "從指定位置開始執行\n輸入事件編號（從 0 起算）或 #標籤\n留空從頭執行；執行中按 Enter 立即跳轉\n右鍵點擊輸入框可清除")
+        entry_start_at.bind("<Return>", lambda e: self._seek_playback())
+        entry_start_at.bind("<Button-3>", lambda e: self.start_at_var.set(""))
+
         # ====== 時間輸入驗證 ======
         def validate_time_input(P):
             return re.fullmatch(r"[\d:]*", P) is not None
@@ -1900,7 +1957,8 @@ class RecorderApp(tb.Window):
         # 3. 初始化視覺偵測引擎 (VDE)
         try:
             self.vde = VisualDetectionEngine(logger=self.log)
-            self.ui_state_machine = UIStateMachine(self.vde, logger=self.log)
+            self.ui_state_machine = UIStateMachine(self.vde, logger=self.log,
+                                                   input_backend=getattr(self.core_recorder, 'input', None))
             self.log("[Beta] 視覺偵測引擎已初始化")
         except Exception as _vde_err:
             self.vde = None
@@ -1910,6 +1968,7 @@ class RecorderApp(tb.Window):
         self.after(50, self._force_focus)
         self.after(200, self._force_focus)
         self.after(300, self._register_hotkeys)
+        self.after(350, self._recover_recording_journal)
         self.after(400, self._register_script_hotkeys)
         self.after(30000, self._check_hotkey_health)
         self.after(500, self.refresh_script_list)
@@ -1918,6 +1977,35 @@ class RecorderApp(tb.Window):
         self.after(800, self._init_background_mode)
         self.after(900, self._load_all_schedules)
 
+    def _recover_recording_journal(self):
+        """啟動時檢查是否有上次異常中斷的錄製日誌，若有則重建為腳本"""
+        if not (find_journals and recover_journal):
+            return
+        paths = find_journals(self.script_dir)
+        if not paths:
+            return
+        for path in paths:
+            self._recover_journal_file(path)
+        self.refresh_script_list()
+        self.refresh_script_listbox()
+
+    def _recover_journal_file(self, path):
+        """將一個殘留的錄製日誌重建為腳本並刪除日誌"""
+        try:
+            recovered = recover_journal(path)
+            if recovered:
+                # 過濾掉快捷鍵事件 (F9, F10, F11, F12)，與正常停止錄製時一致
+                events = [
+                    e for e in recovered["events"]
+                    if not (e.get('type') == 'keyboard' and e.get('name') in ('f9', 'f10', 'f11', 'f12'))
+                ]
+                filename = sio_auto_save_script(self.script_dir, events, {})
+                note = "（最後一筆寫入不完整已略過）" if recovered.get("truncated") else ""
+                self.log(f"[錄製復原] 偵測到上次未完成的錄製，已復原 {len(events)} 筆事件至：{filename}{note}")
+            os.remove(path)
+        except Exception as e:
+            self.log(f"[錄製復原] 復原錄製日誌失敗: {e}")
+
     def _force_focus(self):
         """主動獲得焦點，確保鍵盤鉤子正常工作"""
         try:
@@ -2730,6 +2818,7 @@ class RecorderApp(tb.Window):
                     self.update_time_label(0)
                     self.update_countdown_label(0)
                     self.update_total_time_label(0)
+                    self._notify_schedule_jobs()
                 # MiniMode倒數歸零
                 if hasattr(self, 'mini_window') and self.mini_window and self.mini_window.winfo_exists():
                     if hasattr(self, "mini_countdown_label"):
@@ -2915,6 +3004,17 @@ class RecorderApp(tb.Window):
         
         #  修正：直接調用 core_recorder.start_record() 以確保完整初始化
         if hasattr(self, 'core_recorder'):
+            # 錄製中事件同步寫入預寫日誌，當機後下次啟動可復原
+            if record_journal_path and hasattr(self.core_recorder, 'set_journal_path'):
+                self.core_recorder.set_journal_path(record_journal_path(self.script_dir))
+            # 錄製中即時簡化滑鼠軌跡（config：simplify_trajectory / trajectory_tolerance 像素）
+            self.core_recorder.simplify_trajectory = bool(self.user_config.get("simplify_trajectory", False))
+            try:
+                self.core_recorder.trajectory_tolerance = max(0.5, float(self.user_config.get("trajectory_tolerance", 3.0)))
+            except (TypeError, ValueError):
+                pass
+            # 輸入擷取方式（config：capture_mode = "thread" / "process"）
+            self.core_recorder.capture_mode = self.user_config.get("capture_mode", "thread")
             self._record_start_time = self.core_recorder.start_record()
             if self._record_start_time is None:
                 self._record_start_time = time.time()
@@ -3054,6 +3154,7 @@ class RecorderApp(tb.Window):
             self.update_countdown_label(0)
             self.update_total_time_label(0)
             self._release_all_modifiers()
+            self._notify_schedule_jobs()
             return False
             
         self._current_pl_index = found_idx
@@ -3066,13 +3167,19 @@ class RecorderApp(tb.Window):
         self._current_pl_repeat_count = 1
         
         try:
-            # 載入腳本
-            data = sio_load_script(path)
+            # 載入腳本：優先使用背景預先載入的結果，否則經編譯快取載入
+            data = self._take_playlist_prefetch(path)
+            if data is not None:
+                self._compiled_labels = (data.get("events"), data["labels"]) if "labels" in data else None
+            else:
+                data = self._load_script_for_play(path)
             self.events = data.get("events", [])
             
             # 直接執行，延遲移至 _update_play_time 處理 (腳本結束後)
             self.log(f"[{format_time(time.time())}] 佇列開始執行: {os.path.basename(path)}")
             self._do_play_loaded_script(path)
+            # 目前項目執行期間預先載入下一個項目
+            self._start_playlist_prefetch(found_idx)
             return True
         except Exception as e:
             self.log(f"佇列腳本載入失敗: {e}，跳過此腳本。")
@@ -3354,10 +3461,9 @@ class RecorderApp(tb.Window):
         has_scale_ratio = hasattr(self, '_scale_ratio') and self._scale_ratio
         
         # 轉換事件座標
-        adjusted_events = []
-        scaled_count = 0  # 記錄縮放事件數量
+        scale_ratio = dict(self._scale_ratio) if has_scale_ratio else None
         
-        for event in self.events:
+        def _adjust_event(event):
             event_copy = event.copy()
             
             # 處理滑鼠事件的座標
@@ -3369,11 +3475,10 @@ class RecorderApp(tb.Window):
                     rel_y = event['y']
                     
                     # 如果有智能縮放，應用縮放比例
-                    if has_scale_ratio:
+                    if scale_ratio:
                         # 應用視窗大小縮放
-                        rel_x = int(rel_x * self._scale_ratio['x'])
-                        rel_y = int(rel_y * self._scale_ratio['y'])
-                        scaled_count += 1
+                        rel_x = int(rel_x * scale_ratio['x'])
+                        rel_y = int(rel_y * scale_ratio['y'])
                     
                     # 轉換為當前螢幕絕對座標
                     event_copy['x'] = rel_x + current_window_x
@@ -3382,16 +3487,35 @@ class RecorderApp(tb.Window):
                     # 螢幕絕對座標，不做轉換
                     pass
             
-            adjusted_events.append(event_copy)
+            return event_copy
         
-        # 顯示縮放資訊（僅顯示一次）
-        if has_scale_ratio and scaled_count > 0:
-            self.log(f"[智能適配] 已縮放 {scaled_count} 個座標事件")
-            # 清除縮放比例（避免影響下次執行）
-            del self._scale_ratio
+        if hasattr(self.events, 'map'):
+            # 延遲載入的大型腳本：播放時才逐筆轉換，不複製整個事件列表
+            adjusted_events = self.events.map(_adjust_event)
+            if has_scale_ratio:
+                self.log("[智能適配] 已套用座標縮放（延遲載入腳本，播放時逐筆轉換）")
+                del self._scale_ratio
+        else:
+            adjusted_events = [_adjust_event(event) for event in self.events]
+            scaled_count = sum(
+                1 for e in self.events
+                if e.get('type') == 'mouse' and e.get('x') is not None and e.get('y') is not None
+                and e.get('relative_to_window', False)
+            ) if has_scale_ratio else 0
+            
+            # 顯示縮放資訊（僅顯示一次）
+            if has_scale_ratio and scaled_count > 0:
+                self.log(f"[智能適配] 已縮放 {scaled_count} 個座標事件")
+                # 清除縮放比例（避免影響下次執行）
+                del self._scale_ratio
         
         # 設定 core_recorder 的事件
         self.core_recorder.events = adjusted_events
+        # 事件與編譯快取載入時相同（座標轉換為一對一），直接沿用標籤表
+        if hasattr(self.core_recorder, 'set_label_table'):
+            compiled = getattr(self, '_compiled_labels', None)
+            self.core_recorder.set_label_table(
+                compiled[1] if compiled and compiled[0] is self.events else None)
         
         # 設定滑鼠模式
         if hasattr(self.core_recorder, 'set_mouse_mode'):
@@ -3402,7 +3526,7 @@ class RecorderApp(tb.Window):
             else:
                 self.log("執行模式：後台模式（智能自動適應）")
         
-        if self.target_hwnd and any(e.get('relative_to_window', False) for e in self.events):
+        if self.target_hwnd and not hasattr(self.events, 'map') and any(e.get('relative_to_window', False) for e in self.events):
             relative_count = sum(1 for e in self.events if e.get('relative_to_window', False))
             self.log(f"[座標轉換] {relative_count} 個視窗相對座標 → 當前螢幕座標")
 
@@ -3513,6 +3637,16 @@ class RecorderApp(tb.Window):
             except:
                 pass
 
+        # 執行起點（事件索引或標籤）
+        start_at = self._parse_start_at()
+        if start_at is not None:
+            try:
+                index = self.core_recorder.resolve_event_index(start_at)
+            except (KeyError, IndexError) as e:
+                self.log(f"[跳轉] 無法設定起點: {e}")
+                return
+            self.log(f"[跳轉] 從第 {index} 筆事件開始執行")
+
         # ── Beta: 播放前注入視覺錨點 Hook ──
         self._vde_attach_hook()
 
@@ -3521,7 +3655,8 @@ class RecorderApp(tb.Window):
             repeat=repeat,
             repeat_time_limit=self._repeat_time_limit,
             repeat_interval=repeat_interval_sec,
-            on_event=on_event
+            on_event=on_event,
+            start_at=start_at
         )
 
         if success:
@@ -3531,6 +3666,28 @@ class RecorderApp(tb.Window):
         else:
             self.log("沒有可執行的事件，請先錄製或載入腳本。")
 
+    def _parse_start_at(self):
+        """讀取「起點」欄位：空白回傳 None，數字為事件索引，其他為標籤名稱"""
+        text = self.start_at_var.get().strip() if hasattr(self, 'start_at_var') else ""
+        if not text:
+            return None
+        try:
+            return int(text)
+        except ValueError:
+            return text
+
+    def _seek_playback(self):
+        """執行中依「起點」欄位立即跳轉（CoreRecorder.seek 以標籤目錄 / 索引定位）"""
+        target = self._parse_start_at()
+        if target is None or not getattr(self.core_recorder, 'playing', False):
+            return
+        try:
+            index = self.core_recorder.seek(target)
+        except (KeyError, IndexError) as e:
+            self.log(f"[跳轉] 無法跳轉: {e}")
+            return
+        self.log(f"[跳轉] 跳至第 {index} 筆事件")
+
     def stop_all(self):
         """停止所有動作（全新實作 - 更穩健的處理）"""
         stopped = False
@@ -3594,6 +3751,8 @@ class RecorderApp(tb.Window):
                 self._release_all_modifiers()
             except Exception as e:
                 self.log(f"[警告] 釋放修飾鍵時發生錯誤: {e}")
+
+            self._notify_schedule_jobs(stopped=True)
         
         if not stopped:
             self.log(f"[{format_time(time.time())}] 無進行中動作可停止。")
@@ -4116,6 +4275,10 @@ class RecorderApp(tb.Window):
                     self.core_recorder.stop_play()
                 except:
                     pass
+
+            # 停止排程背景執行緒
+            if getattr(self, 'schedule_manager', None):
+                self.schedule_manager.stop()
         except Exception as e:
             try:
                 self.log(f"[警告] 停止動作錯誤: {e}")
@@ -4153,6 +4316,18 @@ class RecorderApp(tb.Window):
         except Exception:
             pass
 
+        #  步驟4：寫完背景存檔佇列（os._exit 不會等待背景執行緒）
+        try:
+            if getattr(self, 'save_service', None):
+                self.save_service.stop(timeout=3.0)
+        except Exception:
+            pass
+        try:
+            if getattr(self, '_playlist_store', None):
+                self._playlist_store.close(timeout=2.0)
+        except Exception:
+            pass
+
         # 嘗試關閉視窗與退出
         try:
             self.log("[系統] 即將結束程式")
@@ -4189,7 +4364,10 @@ class RecorderApp(tb.Window):
 
             for k in keys_to_release:
                 try:
-                    keyboard.release(k)
+                    if _INPUT_BACKEND is not None:
+                        _INPUT_BACKEND.key_name(k, False)
+                    else:
+                        keyboard.release(k)
                 except:
                     pass
 
@@ -4202,6 +4380,9 @@ class RecorderApp(tb.Window):
                     'win': [win32con.VK_LWIN, win32con.VK_RWIN]
                 }
                 for name, vks in vk_map.items():
+                    if _INPUT_BACKEND is not None:
+                        _INPUT_BACKEND.release_modifiers(vks)
+                        continue
                     for vk in vks:
                         # 0x0002 是 KEYEVENTF_KEYUP
                         win32api.keybd_event(vk, 0, 0x0002, 0)
@@ -4228,6 +4409,9 @@ class RecorderApp(tb.Window):
         # 如果 core_recorder 已完成，從 core_recorder 取回 events 並存檔
         try:
             self.events = getattr(self.core_recorder, "events", []) or []
+            if hasattr(self.events, 'to_list'):
+                # 錄製結果以欄位式緩衝保存，存檔與編輯前轉成事件列表
+                self.events = self.events.to_list()
             
             # 若使用者選定了目標視窗，處理視窗相對座標
             if getattr(self, "target_hwnd", None):
@@ -4319,7 +4503,7 @@ class RecorderApp(tb.Window):
         if self.state() == "normal":
             self.user_config["main_geometry"] = self.geometry()
             
-        save_user_config(self.user_config)
+        save_user_config(self.user_config, self.save_service)
         self.log("【整體設定已更新】")  # 新增：日誌顯示
 
     def auto_save_script(self):
@@ -4337,10 +4521,46 @@ class RecorderApp(tb.Window):
                 settings["window_info"] = self.recorded_window_info
                 self.log(f"[儲存] 視窗資訊已包含在腳本中")
             
+            # 這段錄製的預寫日誌：存檔完成後刪除（不影響之後開始的錄製）
+            journal = None
+            if hasattr(self, 'core_recorder') and hasattr(self.core_recorder, 'take_finished_journal'):
+                journal = self.core_recorder.take_finished_journal()
+            
+            if self.save_service and sio_next_auto_save_name:
+                # 背景存檔：先保留檔名，序列化與 fsync 在存檔執行緒進行
+                filename = sio_next_auto_save_name(self.script_dir, taken=self.save_service.is_pending)
+                events = list(self.events)
+                script_dir = self.script_dir
+
+                def _save():
+                    sio_auto_save_script(script_dir, events, settings, filename=filename)
+
+                self.save_service.submit_call(
+                    os.path.join(script_dir, filename),
+                    _save,
+                    callback=lambda error: self._on_script_auto_saved(filename, len(events), error, journal),
+                    delay=0)
+                return
             filename = sio_auto_save_script(self.script_dir, self.events, settings)
+            self._on_script_auto_saved(filename, len(self.events), None, journal)
+        except Exception as ex:
+            self.log(f"[{format_time(time.time())}] 存檔失敗: {ex}")
+
+    def _on_script_auto_saved(self, filename, event_count, error, journal=None):
+        """自動存檔完成後更新介面（error 不為 None 表示背景存檔失敗）
+
+        journal 為這次存檔對應的錄製預寫日誌；存檔失敗時保留，下次啟動可復原
+        """
+        if error is not None:
+            self.log(f"[{format_time(time.time())}] 存檔失敗: {error}")
+            return
+        try:
+            # 已存成正式腳本，刪除這段錄製的預寫日誌
+            if journal is not None:
+                journal.discard()
             # 去除 .json 副檔名以顯示在 UI
             display_name = os.path.splitext(filename)[0] if filename.endswith('.json') else filename
-            self.log(f"[{format_time(time.time())}] 自動存檔：{filename}，事件數：{len(self.events)}")
+            self.log(f"[{format_time(time.time())}] 自動存檔：{filename}，事件數：{event_count}")
             self.refresh_script_list()
             self.refresh_script_listbox()  # 同時更新腳本列表
             self.script_var.set(display_name)  # 使用去除副檔名的名稱
@@ -4428,26 +4648,38 @@ class RecorderApp(tb.Window):
             except:
                 settings["random_interval"] = False
             
-            # 使用 script_io 儲存
+            # 使用 script_io 儲存（有背景存檔服務時不阻塞介面，連續調整只寫入最後一次）
+            if self.save_service:
+                self.save_service.submit_call(
+                    path, lambda: sio_save_script_settings(path, settings),
+                    callback=lambda error: self._on_script_settings_saved(script, settings, error))
+                return
             sio_save_script_settings(path, settings)
+            self._on_script_settings_saved(script, settings, None)
             
+        except Exception as ex:
+            self._on_script_settings_saved(script, settings, ex)
+    
+    def _on_script_settings_saved(self, script, settings, error):
+        """腳本設定存檔完成後的回饋（error 不為 None 表示失敗）"""
+        if error is None:
             # 成功回饋
             self.log(f"設定已儲存到腳本: {script}")
             self.log(f"   速度: {settings['speed']}, 重複: {settings['repeat']}, " +
                     f"時間: {settings.get('repeat_time', '00:00:00')}, " +
                     f"間隔: {settings.get('repeat_interval', '00:00:00')}")
             self.log("提示: 使用快捷鍵執行時將套用這些參數")
-            
-        except Exception as ex:
-            # 詳細錯誤報告
-            error_msg = str(ex)
-            self.log(f"儲存腳本設定失敗: {error_msg}")
-            
-            detailed_error = traceback.format_exc()
-            self.log(f"錯誤詳情:\n{detailed_error}")
-            
-            messagebox.showerror("儲存失敗", 
-                               f"無法儲存腳本設定:\n\n{error_msg}\n\n請查看日誌獲取詳細資訊")
+            return
+        
+        # 詳細錯誤報告
+        error_msg = str(error)
+        self.log(f"儲存腳本設定失敗: {error_msg}")
+        
+        detailed_error = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+        self.log(f"錯誤詳情:\n{detailed_error}")
+        
+        messagebox.showerror("儲存失敗", 
+                           f"無法儲存腳本設定:\n\n{error_msg}\n\n請查看日誌獲取詳細資訊")
     
     def _validate_time_format(self, time_str):
         """驗證時間格式 HH:MM:SS"""
@@ -4498,16 +4730,21 @@ class RecorderApp(tb.Window):
                 self.log(f"載入失敗: 腳本檔案為空 '{script_file}'")
                 messagebox.showerror("錯誤", f"腳本檔案已損壞或為空:\n{script_file}")
                 return
-            elif file_size > 50 * 1024 * 1024:  # 50MB
+            elif file_size > LAZY_LOAD_BYTES and not sio_load_script_lazy:
                 self.log(f"警告: 腳本檔案過大 ({file_size / 1024 / 1024:.1f} MB)")
                 if not messagebox.askyesno("確認", f"腳本檔案較大 ({file_size / 1024 / 1024:.1f} MB)\n確定要載入嗎?"):
                     return
         except Exception as e:
             self.log(f"警告: 檢查檔案時發生錯誤: {e}")
+            file_size = 0
         
         try:
-            # 載入腳本資料
-            data = sio_load_script(path)
+            # 載入腳本資料（大型腳本改用延遲載入，事件依需求分塊解碼）
+            if sio_load_script_lazy and file_size > LAZY_LOAD_BYTES:
+                self.log(f"大型腳本 ({file_size / 1024 / 1024:.1f} MB)，使用延遲載入")
+                data = sio_load_script_lazy(path)
+            else:
+                data = self._load_script_for_play(path)
             
             if data.get("is_group", False):
                 self.log(f"[{format_time(time.time())}] 載入群組播放佇列：{script_file}")
@@ -4954,6 +5191,14 @@ class RecorderApp(tb.Window):
         
         bottom_frame.columnconfigure(1, weight=1)
         
+        # 合併進度
+        merge_progress_var = tk.DoubleVar(value=0)
+        merge_status_var = tk.StringVar(value="")
+        tb.Progressbar(bottom_frame, variable=merge_progress_var, maximum=100).grid(
+            row=1, column=0, columnspan=2, sticky="ew", pady=(10, 0))
+        tb.Label(bottom_frame, textvariable=merge_status_var,
+                font=("微軟正黑體", 9)).grid(row=1, column=2, sticky="w", padx=(20, 0), pady=(10, 0))
+        
         def do_merge():
             """執行腳本合併"""
             script_names_display = list(merge_list.get(0, tk.END))
@@ -4984,83 +5229,61 @@ class RecorderApp(tb.Window):
                 if not messagebox.askyesno("確認", f"腳本 {new_name} 已存在，是否覆蓋？"):
                     return
             
-            try:
-                merged_events = []
-                time_offset = 0.0
-                first_script_settings = None
-                
-                for i, script_data in enumerate(self.merge_data_list):
-                    script_name = script_data["name"]
-                    script_path = os.path.join(self.script_dir, script_name + '.json')
-                    if not os.path.exists(script_path):
-                        self.log(f"[警告] 找不到腳本：{script_name}")
-                        continue
-                    
-                    data = sio_load_script(script_path)
-                    events = data.get("events", [])
-                    
-                    if i == 0:
-                        first_script_settings = data.get("settings", {}).copy()
-                        self.log(f" 使用腳本A的參數設定：{script_name}")
-                    
-                    if not events:
-                        continue
-                    
-                    script_base_time = events[0]['time'] if events else 0
-                    
-                    for event in events:
-                        new_event = event.copy()
-                        new_event['time'] = (event['time'] - script_base_time) + time_offset
-                        merged_events.append(new_event)
-                    
-                    #  從 merge_data_list 獲取延遲時間
-                    if merged_events:
-                        script_duration = events[-1]['time'] - script_base_time
-                        individual_delay = script_data["delay"]
-                        time_offset = merged_events[-1]['time'] + individual_delay
-                        if individual_delay > 0:
-                            self.log(f" 腳本 {script_name} (#{i+1}) 設定延遲 {individual_delay} 秒")
-                
-                # 儲存合併後的腳本
-                merged_data = {
-                    "events": merged_events,
-                    "settings": first_script_settings or {}
-                }
-                
-                with open(new_path, "w", encoding="utf-8") as f:
-                    json.dump(merged_data, f, ensure_ascii=False, indent=2)
-                
-                self.log(f" 合併完成：{new_name}，共 {len(merged_events)} 筆事件")
-                messagebox.showinfo("成功", f"已合併 {len(script_names)} 個腳本為\n{new_name}")
-                
+            sources = []
+            for script_data in self.merge_data_list:
+                script_path = os.path.join(self.script_dir, script_data["name"] + '.json')
+                sources.append((script_path, script_data["delay"]))
+                if script_data["delay"] > 0:
+                    self.log(f" 腳本 {script_data['name']} 設定延遲 {script_data['delay']} 秒")
+            
+            if merge_scripts_stream is None:
+                messagebox.showerror("錯誤", "合併模組無法載入")
+                return
+            
+            # 背景執行緒串流合併，介面只更新進度
+            merge_execute_btn.config(state="disabled")
+            merge_progress_var.set(0)
+            merge_status_var.set("合併中...")
+            cancel_flag = {"cancel": False}
+            merge_win.protocol("WM_DELETE_WINDOW", lambda: cancel_flag.update(cancel=True))
+            
+            def on_progress(fraction, count):
+                self.after(0, lambda: (merge_progress_var.set(fraction * 100),
+                                       merge_status_var.set(f"合併中... {count:,} 筆事件")))
+            
+            def on_done(result, error):
+                if not merge_win.winfo_exists():
+                    return
+                if error is not None:
+                    merge_execute_btn.config(state="normal")
+                    merge_status_var.set("")
+                    merge_win.protocol("WM_DELETE_WINDOW", merge_win.destroy)
+                    if MergeCancelled and isinstance(error, MergeCancelled):
+                        self.log("合併已取消")
+                        merge_win.destroy()
+                        return
+                    self.log(f"合併失敗: {error}")
+                    messagebox.showerror("錯誤", f"合併失敗：\n{error}")
+                    return
+                for missing in result["missing"]:
+                    self.log(f"[警告] 找不到腳本：{os.path.splitext(os.path.basename(missing))[0]}")
+                self.log(f" 使用腳本A的參數設定：{script_names[0]}")
+                self.log(f" 合併完成：{new_name}，共 {result['events']} 筆事件")
+                messagebox.showinfo("成功", f"已合併 {len(result['merged'])} 個腳本為\n{new_name}")
                 self.refresh_script_list()
                 self.script_var.set(os.path.splitext(new_name)[0])
                 merge_win.destroy()
-                
-            except Exception as e:
-                self.log(f"合併失敗: {e}")
-                messagebox.showerror("錯誤", f"合併失敗：\n{e}")
-                traceback.print_exc()
-                
-                # 重新整理腳本列表
-                self.refresh_script_list()
-                self.refresh_script_listbox()
-                
-                # 關閉對話視窗
-                merge_win.destroy()
-                
-                # 詢問是否載入新腳本
-                if messagebox.askyesno("提示", "是否載入新合併的腳本？"):
-                    # 載入新腳本
-                    self.events = merged_events
-                    self.script_settings = first_script_settings
-                    self.script_var.set(os.path.splitext(new_name)[0])
-                    with open(LAST_SCRIPT_FILE, "w", encoding="utf-8") as f:
-                        f.write(new_name)
-                
-            except Exception as e:
-                messagebox.showerror("錯誤", f"合併失敗：{e}")
-                self.log(f"合併錯誤詳情: {traceback.format_exc()}")
+            
+            def worker():
+                try:
+                    result = merge_scripts_stream(sources, new_path, progress=on_progress,
+                                                  cancelled=lambda: cancel_flag["cancel"])
+                    self.after(0, lambda: on_done(result, None))
+                except Exception as e:
+                    traceback.print_exc()
+                    self.after(0, lambda e=e: on_done(None, e))
+            
+            threading.Thread(target=worker, daemon=True).start()
         
         merge_execute_btn = tb.Button(
             button_frame, 
@@ -5530,27 +5753,20 @@ class RecorderApp(tb.Window):
                 pass
         self._script_hotkey_handlers.clear()
 
-        # 掃描所有腳本並註冊快捷鍵
+        # 掃描所有腳本並註冊快捷鍵（快捷鍵設定來自腳本索引）
         if not os.path.exists(self.script_dir):
             return
         
-        scripts = [f for f in os.listdir(self.script_dir) if f.endswith('.json')]
         registered_scripts = 0
         failed_scripts = 0
         
-        for script in scripts:
-            path = os.path.join(self.script_dir, script)
+        for entry in self._script_entries():
+            script = entry["file"]
             try:
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                
-                # 嘗試從 settings 讀取，如果沒有則從根讀取（兼容舊格式）
-                hotkey = ""
-                if "settings" in data and "script_hotkey" in data["settings"]:
-                    hotkey = data["settings"]["script_hotkey"]
-                elif "script_hotkey" in data:
-                    hotkey = data["script_hotkey"]
+                if entry.get("error"):
+                    raise ValueError(entry["error"])
                 
+                hotkey = entry.get("hotkey", "")
                 
                 if hotkey:
                     # 安全檢查：禁止註冊單一修飾鍵
@@ -5652,8 +5868,8 @@ class RecorderApp(tb.Window):
             return
         
         try:
-            # 載入腳本及其設定
-            data = sio_load_script(path)
+            # 載入腳本及其設定（使用編譯快取）
+            data = self._load_script_for_play(path)
             self.events = data.get("events", [])
             settings = data.get("settings", {})
             
@@ -5788,11 +6004,131 @@ class RecorderApp(tb.Window):
         """當點擊腳本下拉選單時，即時重新整理列表"""
         self.refresh_script_list()
 
-    def refresh_script_list(self):
-        """重新整理腳本下拉選單內容（去除副檔名顯示）"""
+    def _load_script_for_play(self, path):
+        """載入要執行的腳本：優先使用編譯快取（附帶標籤表），失敗時改用 sio_load_script"""
+        data = self._read_script_for_play(path)
+        self._compiled_labels = (data.get("events"), data["labels"]) if "labels" in data else None
+        return data
+
+    def _read_script_for_play(self, path):
+        """讀取並正規化腳本（不修改播放狀態，可在背景執行緒呼叫）"""
+        if ScriptCache is None:
+            return sio_load_script(path)
+        cache_dir = script_cache_dir(self.script_dir)
+        cache = getattr(self, '_script_cache', None)
+        if cache is None or cache.cache_dir != cache_dir:
+            cache = self._script_cache = ScriptCache(cache_dir)
+        try:
+            return cache.load(path)
+        except Exception as e:
+            self.log(f"[編譯快取] 讀取失敗，改為直接載入: {e}")
+            return sio_load_script(path)
+
+    # --- 群組播放預先載入 ---
+    def _next_enabled_pl_index(self, after_idx):
+        """下一個啟用的佇列項目索引；本輪已結束但還有主迴圈時從頭找起，沒有則回傳 -1"""
+        for i in range(after_idx + 1, len(self.playlist_data)):
+            if self.playlist_data[i].get('enabled', True):
+                return i
+        repeats = getattr(self, '_global_pl_repeats', 1)
+        if repeats == -1 or getattr(self, '_global_pl_repeat_count', 1) < repeats:
+            for i in range(0, len(self.playlist_data)):
+                if self.playlist_data[i].get('enabled', True):
+                    return i
+        return -1
+
+    def _start_playlist_prefetch(self, current_idx):
+        """目前項目開始執行後，於背景預先載入下一個項目（解析腳本、解碼圖片、初始化 OCR）"""
+        next_idx = self._next_enabled_pl_index(current_idx)
+        if next_idx == -1:
+            return
+        path = self.playlist_data[next_idx]['path']
+        current = getattr(self, '_pl_prefetch', None)
+        if current and current["path"] == path:
+            return
+        entry = {"path": path, "stamp": None, "data": None, "ready": threading.Event()}
+        self._pl_prefetch = entry
+
+        def worker():
+            try:
+                st = os.stat(path)
+                data = self._read_script_for_play(path)
+                entry["stamp"] = (st.st_mtime_ns, st.st_size)
+                entry["data"] = data
+                # 腳本已可使用；圖片與 OCR 繼續在背景準備，不讓切換項目等待
+                entry["ready"].set()
+                if hasattr(self, 'core_recorder') and hasattr(self.core_recorder, 'prefetch_resources'):
+                    # 取消條件：佇列已停止或預先載入目標已換掉
+                    stats = self.core_recorder.prefetch_resources(
+                        data.get("events", []),
+                        cancelled=lambda: self._pl_prefetch is not entry or not getattr(self, '_is_playlist_playing', False))
+                    if stats['images'] or stats['ocr']:
+                        self.log(f"[預先載入] {os.path.basename(path)}：圖片 {stats['images']} 張"
+                                 f"{'，OCR 已就緒' if stats['ocr'] else ''}")
+            except Exception as e:
+                print(f"預先載入佇列腳本失敗: {e}")
+            finally:
+                entry["ready"].set()
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _take_playlist_prefetch(self, path):
+        """取出已預先載入的腳本資料；路徑不符、檔案已變動或尚未完成時回傳 None"""
+        entry = getattr(self, '_pl_prefetch', None)
+        self._pl_prefetch = None
+        if not entry or entry["path"] != path:
+            return None
+        # 仍在解析中就等它完成（仍比重新載入快），避免重複解析
+        entry["ready"].wait(5.0)
+        if entry["data"] is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if entry["stamp"] != (st.st_mtime_ns, st.st_size):
+            return None
+        return entry["data"]
+
+    def _script_entries(self):
+        """取得 scripts 目錄中所有 .json 腳本的中繼資料（透過索引，只重讀有變動的檔案）
+        
+        Returns:
+            list of dict: file / name / hotkey / schedule_time / schedule_policy / schedule_window /
+                          threshold / event_count / is_group
+        """
         if not os.path.exists(self.script_dir):
             os.makedirs(self.script_dir)
-        scripts = [f for f in os.listdir(self.script_dir) if f.endswith('.json')]
+        if ScriptIndex is not None:
+            index = getattr(self, '_script_index', None)
+            if index is None or index.script_dir != self.script_dir:
+                index = self._script_index = ScriptIndex(self.script_dir)
+            return index.entries(".json")
+        # 索引模組不可用時回退為完整讀取
+        entries = []
+        for f in sorted(os.listdir(self.script_dir)):
+            if not f.endswith('.json'):
+                continue
+            entry = {"file": f, "name": os.path.splitext(f)[0], "hotkey": "", "schedule_time": "",
+                     "schedule_policy": "", "schedule_window": "", "threshold": None, "event_count": 0, "is_group": False}
+            try:
+                with open(os.path.join(self.script_dir, f), "r", encoding="utf-8") as fp:
+                    data = json.load(fp)
+                settings = data.get("settings", {}) if isinstance(data, dict) else {}
+                entry["hotkey"] = settings.get("script_hotkey", "") or (data.get("script_hotkey", "") if isinstance(data, dict) else "")
+                entry["schedule_time"] = settings.get("schedule_time", "")
+                entry["schedule_policy"] = settings.get("schedule_policy", "")
+                entry["schedule_window"] = settings.get("schedule_window", "")
+                entry["threshold"] = settings.get("image_recognition_threshold")
+                entry["is_group"] = bool(isinstance(data, dict) and data.get("is_group"))
+            except Exception as ex:
+                entry["error"] = str(ex)
+            entries.append(entry)
+        return entries
+
+    def refresh_script_list(self):
+        """重新整理腳本下拉選單內容（去除副檔名顯示）"""
+        scripts = [e["file"] for e in self._script_entries()]
         # 顯示時去除副檔名，但實際儲存時仍使用完整檔名
         display_scripts = ["[ 群組播放佇列 ]"] + [os.path.splitext(f)[0] for f in scripts]
         self.script_combo['values'] = display_scripts
@@ -5818,44 +6154,28 @@ class RecorderApp(tb.Window):
             for item in self.script_treeview.get_children():
                 self.script_treeview.delete(item)
             
-            if not os.path.exists(self.script_dir):
-                os.makedirs(self.script_dir)
-            
-            scripts = sorted([f for f in os.listdir(self.script_dir) if f.endswith('.json')])
-            
-            # 建立顯示列表
-            for script_file in scripts:
+            # 建立顯示列表（中繼資料來自索引，不需完整讀取腳本）
+            for entry in self._script_entries():
                 # 去除副檔名
-                script_name = os.path.splitext(script_file)[0]
+                script_name = entry["name"]
                 
                 # 讀取快捷鍵和定時
-                hotkey = ""
-                schedule_time = ""
+                hotkey = entry.get("hotkey", "")
+                schedule_time = entry.get("schedule_time", "")
                 threshold = ""
-                try:
-                    path = os.path.join(self.script_dir, script_file)
-                    with open(path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        if "settings" in data:
-                            if "script_hotkey" in data["settings"]:
-                                hotkey = data["settings"]["script_hotkey"]
-                            if "schedule_time" in data["settings"]:
-                                schedule_time = data["settings"]["schedule_time"]
-                            if "image_recognition_threshold" in data["settings"]:
-                                th_val = data["settings"]["image_recognition_threshold"]
-                                # 找對應文字
-                                thresholds = [
-                                    "0.6 (極度寬鬆)", "0.65", "0.7 (預設較寬鬆)", "0.75", 
-                                    "0.8 (建議值)", "0.85", "0.9 (嚴格)", "0.95 (極為嚴格)"
-                                ]
-                                for opt in thresholds:
-                                    if opt.startswith(str(th_val)):
-                                        threshold = opt
-                                        break
-                                if not threshold:
-                                    threshold = str(th_val)
-                except Exception:
-                    pass
+                th_val = entry.get("threshold")
+                if th_val is not None:
+                    # 找對應文字
+                    thresholds = [
+                        "0.6 (極度寬鬆)", "0.65", "0.7 (預設較寬鬆)", "0.75", 
+                        "0.8 (建議值)", "0.85", "0.9 (嚴格)", "0.95 (極為嚴格)"
+                    ]
+                    for opt in thresholds:
+                        if opt.startswith(str(th_val)):
+                            threshold = opt
+                            break
+                    if not threshold:
+                        threshold = str(th_val)
                 
                 # 插入到 Treeview（四欄：名稱、快捷鍵、定時、容錯率）
                 self.script_treeview.insert("", "end", values=(
@@ -6313,11 +6633,15 @@ class RecorderApp(tb.Window):
         
         # 讀取現有排程
         current_schedule = ""
+        current_policy = "queue"
+        current_window = ""
         try:
             with open(script_path, "r", encoding="utf-8") as f:
                 data = json.load(f)
                 if "settings" in data and "schedule_time" in data["settings"]:
                     current_schedule = data["settings"]["schedule_time"]
+                current_policy = data.get("settings", {}).get("schedule_policy") or "queue"
+                current_window = data.get("settings", {}).get("schedule_window", "")
         except Exception as e:
             self.log(f"讀取腳本失敗：{e}")
             return
@@ -6325,9 +6649,9 @@ class RecorderApp(tb.Window):
         # 創建排程設定視窗
         schedule_win = tk.Toplevel(self)
         schedule_win.title(f"設定排程 - {script_name}")
-        schedule_win.geometry("500x350")  # 增加尺寸避免按鈕被遮住
+        schedule_win.geometry("500x430")  # 增加尺寸避免按鈕被遮住
         schedule_win.resizable(True, True)  # 允許調整大小
-        schedule_win.minsize(450, 320)  # 設定最小尺寸
+        schedule_win.minsize(450, 400)  # 設定最小尺寸
         schedule_win.grab_set()
         schedule_win.transient(self)
         set_window_icon(schedule_win)  # 設定視窗圖示
@@ -6384,6 +6708,28 @@ class RecorderApp(tb.Window):
             hour_var.set("09")
             minute_var.set("00")
         
+        # 衝突處理方式
+        policy_labels = {
+            "queue": "排隊等待目前腳本結束",
+            "skip": "已有腳本執行時略過",
+            "preempt": "停止目前腳本後執行",
+            "parallel": "在指定視窗平行執行",
+        }
+        policy_frame = tb.Frame(schedule_win)
+        policy_frame.pack(fill="x", padx=20, pady=5)
+        tb.Label(policy_frame, text="衝突時：",
+                font=("Microsoft JhengHei", 11)).pack(side="left", padx=5)
+        policy_var = tk.StringVar(value=policy_labels.get(current_policy, policy_labels["queue"]))
+        tb.Combobox(policy_frame, textvariable=policy_var, values=list(policy_labels.values()),
+                    width=22, state="readonly").pack(side="left", padx=5)
+
+        window_frame = tb.Frame(schedule_win)
+        window_frame.pack(fill="x", padx=20, pady=5)
+        tb.Label(window_frame, text="平行視窗標題：",
+                font=("Microsoft JhengHei", 11)).pack(side="left", padx=5)
+        window_var = tk.StringVar(value=current_window)
+        tb.Entry(window_frame, textvariable=window_var, width=24).pack(side="left", padx=5)
+
         # 說明文字
         info_frame = tb.Frame(schedule_win)
         info_frame.pack(fill="x", padx=20, pady=10)
@@ -6405,6 +6751,8 @@ class RecorderApp(tb.Window):
                 return
             
             schedule_time = f"{hour}:{minute}"
+            policy = next((k for k, v in policy_labels.items() if v == policy_var.get()), "queue")
+            window_title = window_var.get().strip()
             
             # 儲存到腳本
             try:
@@ -6415,6 +6763,8 @@ class RecorderApp(tb.Window):
                     data["settings"] = {}
                 
                 data["settings"]["schedule_time"] = schedule_time
+                data["settings"]["schedule_policy"] = policy
+                data["settings"]["schedule_window"] = window_title
                 
                 with open(script_path, "w", encoding="utf-8") as f:
                     json.dump(data, f, ensure_ascii=False, indent=2)
@@ -6428,6 +6778,8 @@ class RecorderApp(tb.Window):
                         'time': f"{hour}:{minute}:00",
                         'script': script_file,
                         'enabled': True,
+                        'policy': policy,
+                        'window': window_title,
                         'callback': self._execute_scheduled_script
                     })
                     self.log(f" 已設定排程：{script_name} 每天 {schedule_time}")
@@ -6447,6 +6799,8 @@ class RecorderApp(tb.Window):
                 
                 if "settings" in data and "schedule_time" in data["settings"]:
                     del data["settings"]["schedule_time"]
+                for key in ("schedule_policy", "schedule_window"):
+                    data.get("settings", {}).pop(key, None)
                 
                 with open(script_path, "w", encoding="utf-8") as f:
                     json.dump(data, f, ensure_ascii=False, indent=2)
@@ -6480,18 +6834,14 @@ class RecorderApp(tb.Window):
             if not os.path.exists(self.script_dir):
                 return
             
-            scripts = [f for f in os.listdir(self.script_dir) if f.endswith('.json')]
             loaded_count = 0
             
-            for script_file in scripts:
-                script_path = os.path.join(self.script_dir, script_file)
+            for entry in self._script_entries():
+                script_file = entry["file"]
                 try:
-                    with open(script_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    
-                    if "settings" in data and "schedule_time" in data["settings"]:
-                        schedule_time = data["settings"]["schedule_time"]
-                        script_name = os.path.splitext(script_file)[0]
+                    schedule_time = entry.get("schedule_time", "")
+                    if schedule_time:
+                        script_name = entry["name"]
                         schedule_id = f"script_{script_name}"
                         
                         self.schedule_manager.add_schedule(schedule_id, {
@@ -6500,6 +6850,8 @@ class RecorderApp(tb.Window):
                             'time': f"{schedule_time}:00",
                             'script': script_file,
                             'enabled': True,
+                            'policy': entry.get("schedule_policy") or "queue",
+                            'window': entry.get("schedule_window", ""),
                             'callback': self._execute_scheduled_script
                         })
                         loaded_count += 1
@@ -6512,21 +6864,21 @@ class RecorderApp(tb.Window):
             else:
                 print("ℹ️ [排程系統] 未發現任何設定排程的腳本")
         except Exception as e:
-            # 儲存到設定記憶體
-            self._last_sync_repeats = str(repeats) if var_sync_repeats.get() else getattr(self, '_last_sync_repeats', "1")
-            self._last_sync_interval = str(interval) if var_sync_interval.get() else getattr(self, '_last_sync_interval', "0")
-            self._last_sync_delay = str(delay_after) if var_sync_delay.get() else getattr(self, '_last_sync_delay', "0")
-
-            for item in self.playlist_data:
-                if var_sync_repeats.get():
-                    item['repeats'] = repeats
-                if var_sync_interval.get():
-                    item['repeat_interval'] = interval
-                if var_sync_delay.get():
-                    item['delay_after'] = delay_after
-                    item['delay'] = delay_after
             self.log(f"載入排程失敗: {e}")
     
+    def _notify_schedule_jobs(self, stopped=False):
+        """通知排程工作佇列：主程式的執行已結束（stopped=True 表示被停止）"""
+        manager = getattr(self, 'schedule_manager', None)
+        if manager is None:
+            return
+        try:
+            if stopped:
+                manager.jobs.on_stopped()
+            else:
+                manager.jobs.on_idle()
+        except Exception as e:
+            self.log(f"排程佇列更新失敗：{e}")
+
     def _execute_scheduled_script(self, script_file):
         """執行排程腳本的回調函數"""
         try:
@@ -6769,17 +7121,45 @@ class RecorderApp(tb.Window):
     # 群組播放佇列 (Playlist) 相關邏輯
     # ==========================================
     
+    def _get_playlist_store(self):
+        """取得播放佇列存檔（依 scripts 目錄建立；模組不可用時回傳 None）"""
+        if PlaylistStore is None:
+            return None
+        path = os.path.join(self.script_dir, "_autosave_playlist.json")
+        store = getattr(self, '_playlist_store', None)
+        if store is None or store.path != path:
+            if store is not None:
+                store.close()
+            store = self._playlist_store = PlaylistStore(path)
+        return store
+
     def _autosave_playlist(self):
         try:
+            store = self._get_playlist_store()
+            if store is not None:
+                # 只做快照，背景合併連續變更後附加到日誌
+                store.record(self.playlist_data)
+                return
             path = os.path.join(self.script_dir, "_autosave_playlist.json")
             if not self.playlist_data:
-                if os.path.exists(path):
-                    os.remove(path)
+                def _remove():
+                    if os.path.exists(path):
+                        os.remove(path)
+                if self.save_service:
+                    # 一併取代尚未寫入的佇列存檔
+                    self.save_service.submit_call(path, _remove)
+                else:
+                    _remove()
                 return
             group_data = {
                 "is_group": True,
                 "playlist": self.playlist_data
             }
+            if self.save_service:
+                # 連續調整佇列時只寫入最後一次（先序列化，避免背景寫入時佇列又被修改）
+                snapshot = json.dumps(group_data, ensure_ascii=False, indent=2)
+                self.save_service.submit(path, lambda f: f.write(snapshot))
+                return
             with open(path, 'w', encoding='utf-8') as f:
                 json.dump(group_data, f, ensure_ascii=False, indent=2)
         except Exception:
@@ -6787,6 +7167,14 @@ class RecorderApp(tb.Window):
 
     def _load_autosaved_playlist(self):
         try:
+            store = self._get_playlist_store()
+            if store is not None:
+                playlist = store.load()
+                if playlist:
+                    self.playlist_data = playlist
+                    self._update_playlist_ui()
+                    self.log("已自動載入上次未完成的播放佇列")
+                return
             path = os.path.join(self.script_dir, "_autosave_playlist.json")
             if os.path.exists(path):
                 with open(path, 'r', encoding='utf-8') as f:
@@ -7245,6 +7633,15 @@ class RecorderApp(tb.Window):
                 self._is_playlist_modified = True
                 self._update_playlist_ui()
                 self.log("已同步設定至所有佇列腳本")
+                
+                # 透過腳本索引檢查佇列中的腳本是否仍存在（不需讀取腳本內容）
+                indexed = {e["file"] for e in self._script_entries()}
+                missing = [
+                    item.get('name', '') for item in self.playlist_data
+                    if item.get('name') not in indexed and not os.path.exists(item.get('path', ''))
+                ]
+                if missing:
+                    self.log(f"[警告] 佇列中有 {len(missing)} 個腳本已不存在: {', '.join(missing)}")
                 dialog.destroy()
             except ValueError:
                 self.log("格式錯誤，請輸入整數")
@@ -7291,7 +7688,16 @@ def load_user_config():
         "language": "繁體中文"
     }
 
-def save_user_config(config):
+def save_user_config(config, service=None):
+    """儲存整體設定；提供 service（SaveService）時於背景原子寫入"""
+    if service is not None:
+        try:
+            # 在呼叫端執行緒先序列化，避免背景寫入時設定又被修改
+            snapshot = json.dumps(config, ensure_ascii=False, indent=2)
+            service.submit(CONFIG_FILE, lambda f: f.write(snapshot))
+            return
+        except Exception:
+            pass
     try:
         with open(CONFIG_FILE, "w", encoding="utf-8") as f:
             json.dump(config, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,331 @@
+import collections
+import os
+import threading
+import time
+
+try:
+    import win32gui
+except ImportError:
+    win32gui = None
+
+
+# 排程衝突時的處理方式
+POLICIES = ("queue", "skip", "preempt", "parallel")
+DEFAULT_POLICY = "queue"
+
+# 每個執行槽最多排隊的工作數
+DEFAULT_MAX_QUEUE = 5
+
+# 工作啟動後多久仍未開始執行即視為失敗（毫秒）
+START_GRACE_MS = 3000
+
+# 等待上一個執行緒結束時的重新檢查間隔（毫秒）
+DRAIN_RETRY_MS = 20
+
+
+class _Slot:
+    """一個執行槽：主程式本身，或某個目標視窗的平行執行"""
+
+    def __init__(self, hwnd=None):
+        self.hwnd = hwnd
+        self.running = None  # 執行中的工作
+        self.queue = collections.deque()
+        self.recorder = None  # 平行執行用的 CoreRecorder
+
+
+class JobQueue:
+    """
+    排程工作佇列 - 依每個排程的 policy 處理執行衝突
+
+    policy（排程設定的 'policy'）：
+    - 'queue'（預設）：等目前的執行結束後依序執行
+    - 'skip'：已有腳本在執行就略過這次觸發
+    - 'preempt'：停止目前的腳本，停止完成後立即執行（舊版行為，不再阻塞 UI 0.5 秒）
+    - 'parallel'：在排程設定的 'window'（視窗標題）以後台模式平行執行；
+      找不到視窗或與主程式目標視窗相同時改為排隊
+
+    每個執行槽的佇列有上限（'max_queue'），同一排程已在佇列中時不重複加入；
+    'max_wait' 秒內未開始的工作會被捨棄。stats() 提供每個排程的觸發、等待與執行時間統計。
+
+    所有方法都在 Tk 主執行緒呼叫（ScheduleManager 經由 app.after 提交）。
+    """
+
+    def __init__(self, app, max_queue=DEFAULT_MAX_QUEUE):
+        self.app = app
+        self.max_queue = max_queue
+        self._main = _Slot()
+        self._parallel = {}  # {hwnd: _Slot}
+        self._preempting = False
+        self._stats = {}
+
+    # ─── 統計 ──────────────────────────────────────────────
+    def _stat(self, job_id):
+        stat = self._stats.get(job_id)
+        if stat is None:
+            stat = self._stats[job_id] = {
+                'triggered': 0, 'started': 0, 'completed': 0, 'failed': 0,
+                'skipped': 0, 'coalesced': 0, 'dropped': 0, 'expired': 0,
+                'preempted': 0, 'stopped': 0,
+                'wait_total': 0.0, 'wait_max': 0.0, 'run_total': 0.0, 'run_max': 0.0,
+            }
+        return stat
+
+    def stats(self):
+        """回傳 {排程ID: 統計}；另含 wait_avg / run_avg（秒）"""
+        result = {}
+        for job_id, stat in self._stats.items():
+            item = dict(stat)
+            item['wait_avg'] = stat['wait_total'] / stat['started'] if stat['started'] else 0.0
+            finished = stat['completed'] + stat['preempted'] + stat['stopped']
+            item['run_avg'] = stat['run_total'] / finished if finished else 0.0
+            result[job_id] = item
+        return result
+
+    def format_stats(self):
+        """統計摘要（每個排程一行）"""
+        lines = []
+        for job_id, s in sorted(self.stats().items()):
+            lines.append(
+                f"{job_id}: 觸發 {s['triggered']} / 完成 {s['completed']} / 略過 {s['skipped']} / "
+                f"捨棄 {s['dropped'] + s['expired']} / 被中斷 {s['preempted']} / 失敗 {s['failed']}，"
+                f"平均等待 {s['wait_avg']:.1f}s（最長 {s['wait_max']:.1f}s），"
+                f"平均執行 {s['run_avg']:.1f}s（最長 {s['run_max']:.1f}s）")
+        return lines
+
+    def pending(self):
+        """目前排隊中的工作數"""
+        return len(self._main.queue) + sum(len(slot.queue) for slot in self._parallel.values())
+
+    # ─── 提交 ──────────────────────────────────────────────
+    def submit(self, job_id, config):
+        """提交一次排程觸發"""
+        stat = self._stat(job_id)
+        stat['triggered'] += 1
+        job = {'id': job_id, 'config': config, 'submitted': time.monotonic(), 'started': None}
+        policy = config.get('policy', DEFAULT_POLICY)
+        if policy not in POLICIES:
+            policy = DEFAULT_POLICY
+
+        if policy == 'parallel':
+            hwnd = self._find_window(config.get('window'))
+            if hwnd and hwnd != getattr(self.app, 'target_hwnd', None):
+                slot = self._parallel.get(hwnd)
+                if slot is None:
+                    slot = self._parallel[hwnd] = _Slot(hwnd)
+                self._enqueue(slot, job)
+                self._drain(slot)
+                return
+            self._log(f"[排程] 找不到可平行執行的視窗「{config.get('window', '')}」，改為排隊: {job_id}")
+            policy = 'queue'
+
+        slot = self._main
+        if not self._busy(slot):
+            slot.queue.appendleft(job)
+            self._drain(slot)
+        elif policy == 'skip':
+            stat['skipped'] += 1
+            self._log(f"[排程] 已有腳本執行中，略過: {job_id}")
+        elif policy == 'preempt':
+            slot.queue.appendleft(job)
+            self._log(f"[WARN] 排程衝突：停止目前腳本，執行新排程 {job_id}")
+            self._preempting = True
+            try:
+                self.app.stop_all()
+            finally:
+                self._preempting = False
+            self._drain(slot)
+        else:
+            self._enqueue(slot, job)
+
+    def _enqueue(self, slot, job):
+        stat = self._stat(job['id'])
+        if any(queued['id'] == job['id'] for queued in slot.queue):
+            # 同一排程已在排隊，合併為一次
+            stat['coalesced'] += 1
+            return
+        limit = job['config'].get('max_queue', self.max_queue)
+        if len(slot.queue) >= limit:
+            stat['dropped'] += 1
+            self._log(f"[排程] 佇列已滿（{limit}），捨棄: {job['id']}")
+            return
+        slot.queue.append(job)
+        if self._busy(slot):
+            self._log(f"[排程] 已有腳本執行中，排隊等待（第 {len(slot.queue)} 位）: {job['id']}")
+
+    # ─── 執行 ──────────────────────────────────────────────
+    def _busy(self, slot):
+        if slot.running is not None:
+            return True
+        if slot is self._main:
+            return bool(getattr(self.app, 'playing', False) or getattr(self.app, 'recording', False))
+        return False
+
+    def _drain(self, slot):
+        """執行槽空閒時啟動下一個工作"""
+        if self._busy(slot):
+            return
+        if slot is self._main:
+            # 被中斷的執行緒可能還在處理最後一筆事件，等它結束再開始
+            thread = getattr(getattr(self.app, 'core_recorder', None), '_play_thread', None)
+            if slot.queue and thread is not None and thread.is_alive():
+                self.app.after(DRAIN_RETRY_MS, lambda: self._drain(slot))
+                return
+        while slot.queue:
+            job = slot.queue.popleft()
+            max_wait = job['config'].get('max_wait')
+            waited = time.monotonic() - job['submitted']
+            if max_wait is not None and waited > max_wait:
+                self._stat(job['id'])['expired'] += 1
+                self._log(f"[排程] 等待超過 {max_wait} 秒，捨棄: {job['id']}")
+                continue
+            self._start(slot, job, waited)
+            return
+        if slot is not self._main and slot.running is None:
+            self._parallel.pop(slot.hwnd, None)
+
+    def _start(self, slot, job, waited):
+        stat = self._stat(job['id'])
+        stat['started'] += 1
+        stat['wait_total'] += waited
+        stat['wait_max'] = max(stat['wait_max'], waited)
+        job['started'] = time.monotonic()
+        slot.running = job
+        config = job['config']
+        script_file = config.get('script')
+        print(f"[CLOCK] 觸發排程: {script_file}")
+        self._log(f"[CLOCK] 排程觸發: {script_file}")
+        try:
+            if slot is self._main:
+                callback = config.get('callback')
+                if not (callback and script_file):
+                    raise ValueError("排程缺少 script 或 callback")
+                callback(script_file)
+                self.app.after(START_GRACE_MS, lambda: self._check_started(job))
+            else:
+                self._start_parallel(slot, script_file)
+        except Exception as e:
+            print(f"觸發排程失敗: {e}")
+            self._log(f" 觸發排程失敗: {e}")
+            self._finish(slot, 'failed')
+
+    def _check_started(self, job):
+        """工作啟動一段時間後仍未開始執行（例如腳本不存在）時釋放執行槽"""
+        if self._main.running is job and not getattr(self.app, 'playing', False):
+            self._finish(self._main, 'failed')
+
+    def _start_parallel(self, slot, script_file):
+        """以獨立的 CoreRecorder 在目標視窗後台執行腳本"""
+        app = self.app
+        data = app._load_script_for_play(os.path.join(app.script_dir, script_file))
+        events = data.get("events", [])
+        if not events:
+            raise ValueError(f"腳本沒有事件: {script_file}")
+        settings = data.get("settings", {}) or {}
+        recorder = type(app.core_recorder)(logger=app.log, app=app)
+        recorder.events = events
+        recorder.set_target_window(slot.hwnd)
+        recorder.set_background_mode("postmessage")
+        recorder.set_mouse_mode(False)
+        try:
+            speed = min(1000, max(1, int(settings.get("speed", 100)))) / 100.0
+        except (TypeError, ValueError):
+            speed = 1.0
+        try:
+            repeat = max(1, int(settings.get("repeat", 1)))
+        except (TypeError, ValueError):
+            repeat = 1
+        if not recorder.play(speed=speed, repeat=repeat):
+            raise RuntimeError(f"無法開始平行執行: {script_file}")
+        slot.recorder = recorder
+        self._log(f"[排程] 平行執行於視窗 hwnd={slot.hwnd}: {script_file}")
+        thread = recorder._play_thread
+
+        def _wait_done():
+            thread.join()
+            app.after(0, lambda: self._parallel_done(slot, recorder))
+        threading.Thread(target=_wait_done, daemon=True).start()
+
+    def _parallel_done(self, slot, recorder):
+        if slot.recorder is recorder:
+            slot.recorder = None
+            self._finish(slot, 'completed')
+
+    def _finish(self, slot, outcome):
+        job, slot.running = slot.running, None
+        if job is not None:
+            stat = self._stat(job['id'])
+            stat[outcome] += 1
+            if job['started'] is not None and outcome != 'failed':
+                run = time.monotonic() - job['started']
+                stat['run_total'] += run
+                stat['run_max'] = max(stat['run_max'], run)
+        self._drain(slot)
+
+    # ─── 主程式通知 ────────────────────────────────────────
+    def on_idle(self):
+        """主程式的執行自然結束（單一腳本或群組佇列完成）"""
+        if self._main.running is not None:
+            self._finish(self._main, 'completed')
+        else:
+            self._drain(self._main)
+
+    def on_stopped(self):
+        """主程式的執行被停止：排程中斷時接著執行新工作；使用者手動停止時清除所有排程工作"""
+        if self._preempting:
+            if self._main.running is not None:
+                job, self._main.running = self._main.running, None
+                stat = self._stat(job['id'])
+                stat['preempted'] += 1
+                run = time.monotonic() - job['started']
+                stat['run_total'] += run
+                stat['run_max'] = max(stat['run_max'], run)
+            return
+        self.stop()
+
+    def stop(self):
+        """停止平行執行並清除所有排隊中的工作"""
+        cleared = self.pending()
+        if self._main.running is not None:
+            job, self._main.running = self._main.running, None
+            self._stat(job['id'])['stopped'] += 1
+        self._main.queue.clear()
+        for slot in list(self._parallel.values()):
+            if slot.recorder is not None:
+                try:
+                    slot.recorder.stop_play()
+                except Exception:
+                    pass
+            if slot.running is not None:
+                self._stat(slot.running['id'])['stopped'] += 1
+            slot.running = slot.recorder = None
+            slot.queue.clear()
+        self._parallel.clear()
+        if cleared:
+            self._log(f"[排程] 已清除 {cleared} 個排隊中的排程")
+
+    # ─── 工具 ──────────────────────────────────────────────
+    @staticmethod
+    def _find_window(title):
+        """依視窗標題尋找可見視窗"""
+        if not title or win32gui is None:
+            return None
+        found = []
+
+        def _callback(hwnd, _param):
+            try:
+                if win32gui.IsWindowVisible(hwnd) and win32gui.GetWindowText(hwnd) == title:
+                    found.append(hwnd)
+                    return False
+            except Exception:
+                pass
+            return True
+        try:
+            win32gui.EnumWindows(_callback, None)
+        except Exception:
+            # 回呼回傳 False 中止列舉時 pywin32 會拋出例外
+            pass
+        return found[0] if found else None
+
+    def _log(self, msg):
+        if hasattr(self.app, 'log'):
+            self.app.log(msg)
@@ -1,6 +1,14 @@
 import json
 import os
 
+try:
+    from modules.playlist_store import PlaylistStore
+except ImportError:
+    try:
+        from playlist_store import PlaylistStore
+    except ImportError:
+        PlaylistStore = None
+
 class PlaylistManager:
     """
     管理群組播放佇列的核心邏輯
@@ -11,7 +19,10 @@ class PlaylistManager:
         self.playlist_items = []  # List of dict: {'script': path, 'repeat': int, 'delay': int}
         self.current_index = 0
         self.is_playing = False
-        self.autosave_file = os.path.join(self.app.app_dir, "autosaved_playlist.json")
+        # 主程式沒有 app_dir 屬性，改存放在腳本目錄
+        base_dir = getattr(self.app, "app_dir", None) or getattr(self.app, "script_dir", None) or os.getcwd()
+        self.autosave_file = os.path.join(base_dir, "autosaved_playlist.json")
+        self._store = PlaylistStore(self.autosave_file, group=False) if PlaylistStore else None
 
     def get_items(self):
         return self.playlist_items
@@ -39,13 +50,30 @@ class PlaylistManager:
         self.autosave()
 
     def autosave(self):
+        if self._store is not None:
+            # 延遲合併連續變更，只把差異附加到日誌
+            self._store.record(self.playlist_items)
+            return
         try:
-            with open(self.autosave_file, 'w', encoding='utf-8') as f:
-                json.dump(self.playlist_items, f, ensure_ascii=False, indent=2)
+            # 先序列化目前內容，交由背景存檔服務合併寫入（沒有服務時同步寫入）
+            snapshot = json.dumps(self.playlist_items, ensure_ascii=False, indent=2)
+            service = getattr(self.app, "save_service", None)
+            if service is not None:
+                service.submit(self.autosave_file, lambda f: f.write(snapshot))
+                return
+            temp_path = self.autosave_file + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.autosave_file)
         except Exception as e:
             print(f"Autosave playlist error: {e}")
 
     def load_autosaved(self):
+        if self._store is not None:
+            self.playlist_items = self._store.load()
+            return self.playlist_items
         if os.path.exists(self.autosave_file):
             try:
                 with open(self.autosave_file, 'r', encoding='utf-8') as f:
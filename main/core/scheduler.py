@@ -1,91 +1,384 @@
+import heapq
 import threading
 import time
 import datetime
 
+try:
+    from core.job_queue import JobQueue
+except ImportError:
+    from job_queue import JobQueue
+
+
+# 等待上限（秒）：Condition.wait 以單調時鐘計時，系統睡眠 / 休眠或使用者調整時鐘時
+# 牆上時間可能跳動，最多這麼久就重新以牆上時間核對一次
+MAX_WAIT = 30.0
+
+# 補執行：錯過的觸發超過這個秒數才視為「錯過」（一般喚醒延遲不算）
+MISFIRE_SLACK = 2.0
+
+# catch_up="all" 時單一排程最多補執行的次數
+MAX_CATCH_UP = 100
+
+# 過期堆積項目超過有效排程數的倍數時重建堆積
+_STALE_FACTOR = 2
+
+
+class CronSpec:
+    """
+    cron 樣式的重複規則（支援秒）
+
+    欄位：[秒] 分 時 日 月 星期
+      - 5 欄位時秒固定為 0；6 欄位時第一欄為秒
+      - 每欄支援 *、數字、a-b 範圍、a,b 列表與 /n 間隔（例如 */15、10-40/5）
+      - 星期 0 與 7 皆為星期日
+      - 日與星期都有限制時，符合其中一個即可（與標準 cron 相同）
+    """
+
+    _RANGES = [(0, 59), (0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expr):
+        parts = expr.split()
+        if len(parts) == 5:
+            parts = ["0"] + parts
+        if len(parts) != 6:
+            raise ValueError(f"cron 需要 5 或 6 個欄位：{expr!r}")
+        self.expr = expr
+        fields = [self._parse(p, lo, hi) for p, (lo, hi) in zip(parts, self._RANGES)]
+        self.seconds, self.minutes, self.hours, self.days, self.months, weekdays = fields
+        # cron 星期：0/7=日；Python weekday()：0=一 ... 6=日
+        self.weekdays = {(d - 1) % 7 for d in weekdays}
+        self._any_day = parts[3] == "*"
+        self._any_weekday = parts[5] == "*"
+        self._sorted = [sorted(self.seconds), sorted(self.minutes), sorted(self.hours)]
+
+    @staticmethod
+    def _parse(field, lo, hi):
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_text = part.split("/", 1)
+                step = int(step_text)
+                if step <= 0:
+                    raise ValueError(f"cron 間隔必須為正數：{field!r}")
+            if part in ("*", ""):
+                start, end = lo, hi
+            elif "-" in part:
+                start_text, end_text = part.split("-", 1)
+                start, end = int(start_text), int(end_text)
+            else:
+                start = int(part)
+                end = hi if step > 1 else start
+            if start < lo or end > hi or start > end:
+                raise ValueError(f"cron 欄位超出範圍 {lo}-{hi}：{field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, d):
+        day_ok = d.day in self.days
+        weekday_ok = d.weekday() in self.weekdays
+        if self._any_day:
+            return weekday_ok
+        if self._any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    @staticmethod
+    def _first_at_least(values, v):
+        for x in values:
+            if x >= v:
+                return x
+        return None
+
+    def next_after(self, after):
+        """回傳嚴格晚於 after（datetime）的下一個符合時間；找不到時回傳 None"""
+        t = after.replace(microsecond=0) + datetime.timedelta(seconds=1)
+        secs, mins, hours = self._sorted
+        limit = t.year + 8  # 涵蓋 2/29 等罕見規則
+        while t.year <= limit:
+            if t.month not in self.months:
+                year, month = (t.year + 1, 1) if t.month == 12 else (t.year, t.month + 1)
+                t = datetime.datetime(year, month, 1)
+                continue
+            if not self._day_matches(t):
+                t = datetime.datetime(t.year, t.month, t.day) + datetime.timedelta(days=1)
+                continue
+            # 日期符合：在當天內依序找時、分、秒
+            h = self._first_at_least(hours, t.hour)
+            if h is None:
+                t = datetime.datetime(t.year, t.month, t.day) + datetime.timedelta(days=1)
+                continue
+            if h != t.hour:
+                t = t.replace(hour=h, minute=0, second=0)
+            m = self._first_at_least(mins, t.minute)
+            if m is None:
+                t = t.replace(minute=0, second=0) + datetime.timedelta(hours=1)
+                continue
+            if m != t.minute:
+                t = t.replace(minute=m, second=0)
+            s = self._first_at_least(secs, t.second)
+            if s is None:
+                t = t.replace(second=0) + datetime.timedelta(minutes=1)
+                continue
+            return t.replace(second=s)
+        return None
+
+
+def _parse_clock(text):
+    """'HH:MM' 或 'HH:MM:SS' -> (時, 分, 秒)"""
+    parts = [int(p) for p in str(text).strip().split(":")]
+    while len(parts) < 3:
+        parts.append(0)
+    hour, minute, second = parts[:3]
+    if not (0 <= hour < 24 and 0 <= minute < 60 and 0 <= second < 60):
+        raise ValueError(f"時間格式錯誤：{text!r}")
+    return hour, minute, second
+
+
+def build_rule(config):
+    """
+    依排程設定建立重複規則，回傳 next(after_datetime) -> datetime | None
+
+    支援的 type：
+      - 'daily'（預設）：'time' 為 HH:MM[:SS]，每天觸發
+      - 'weekly'：'time' 加上 'weekdays'（0=一 ... 6=日）
+      - 'cron'：'cron' 為 cron 表達式（見 CronSpec）
+      - 'interval'：每 'interval' 秒觸發，可用 'start'（ISO 時間）對齊起點
+      - 'once'：'datetime'（ISO 時間，如 2026-01-31 08:00:00）觸發一次
+    """
+    kind = config.get('type', 'daily') or 'daily'
+    if kind == 'cron':
+        return CronSpec(config['cron']).next_after
+    if kind in ('daily', 'weekly'):
+        hour, minute, second = _parse_clock(config.get('time', ''))
+        weekdays = "*"
+        if kind == 'weekly':
+            # Python 0=一 -> cron 1=一
+            weekdays = ",".join(str((int(d) + 1) % 7) for d in config.get('weekdays', [])) or "*"
+        return CronSpec(f"{second} {minute} {hour} * * {weekdays}").next_after
+    if kind == 'interval':
+        interval = float(config['interval'])
+        if interval <= 0:
+            raise ValueError("interval 必須大於 0")
+        start = config.get('start')
+        origin = datetime.datetime.fromisoformat(start) if start else datetime.datetime.now()
+
+        def _next_interval(after):
+            if after < origin:
+                return origin
+            steps = int((after - origin).total_seconds() // interval) + 1
+            return origin + datetime.timedelta(seconds=steps * interval)
+        return _next_interval
+    if kind == 'once':
+        when = datetime.datetime.fromisoformat(str(config['datetime']))
+        return lambda after: when if when > after else None
+    raise ValueError(f"不支援的排程類型：{kind}")
+
+
 class ScheduleManager:
     """
-    排程管理器 - 背景持續檢查時間並觸發排程腳本
-    
+    排程管理器 - 依下一次觸發時間排序的事件驅動排程
+
     功能：
-    - 主程式開著時自動檢查時間
-    - 到達排程時間自動執行對應腳本
-    - 衝突處理：若有腳本執行中，停止舊的、執行新的
+    - 以最小堆積保存每個排程的下一次觸發時間，背景執行緒只睡到最近一個到期的排程
+    - 新增 / 移除排程會喚醒背景執行緒重新計算（O(log n)）
+    - 秒級精度；支援每日、每週、cron、固定間隔與單次排程
+    - 電腦睡眠 / 休眠後醒來，錯過的觸發依 catch_up 設定補執行
+      （'once' 補一次（預設）、'all' 每次都補、'skip' 略過）
+    - 衝突處理交由 JobQueue，依每個排程的 policy 排隊、略過、中斷或平行執行
     """
-    
+
     def __init__(self, app):
         self.app = app
         self.schedules = {}  # {schedule_id: config}
         self.running = True
-        self.last_trigger = {}  # 避免同一分鐘重複觸發 {schedule_id: "HH:MM"}
+        self.last_trigger = {}  # 最近一次觸發 {schedule_id: "YYYY-MM-DD_HH:MM:SS"}
+        self._rules = {}  # {schedule_id: next(after) -> datetime}
+        self._next_due = {}  # {schedule_id: 下一次觸發的 epoch 秒}
+        self._heap = []  # [(epoch 秒, 序號, schedule_id)]；移除 / 更新的舊項目延遲清除
+        self._seq = 0
+        self._cond = threading.Condition()
+        self.jobs = JobQueue(app)
         self._thread = threading.Thread(target=self._check_loop, daemon=True)
+        self._thread.start()
         print("[OK] 排程管理器已啟動")
-        # Note: Thread is started by ChroLens_Mimic.py originally? Let's check.
-    
+
     def add_schedule(self, schedule_id, config):
         """
-        新增排程
+        新增排程（相同 ID 會覆蓋）
         """
-        self.schedules[schedule_id] = config
-        print(f"[OK] 已新增排程: {schedule_id} @ {config.get('time', '')}")
-    
+        try:
+            rule = build_rule(config)
+        except (KeyError, ValueError) as e:
+            print(f"排程設定錯誤 ({schedule_id}): {e}")
+            return
+        with self._cond:
+            self.schedules[schedule_id] = config
+            self._rules[schedule_id] = rule
+            self._next_due.pop(schedule_id, None)
+            self._push(schedule_id, datetime.datetime.now())
+            self._cond.notify()
+        print(f"[OK] 已新增排程: {schedule_id} @ {config.get('time', '') or config.get('cron', '')}")
+
     def remove_schedule(self, schedule_id):
         """移除排程"""
-        if schedule_id in self.schedules:
-            del self.schedules[schedule_id]
-            print(f"[OK] 已移除排程: {schedule_id}")
-    
-    def _check_loop(self):
-        """背景執行緒 - 每 5 秒檢查一次排程時間（確保準時觸發）"""
-        while self.running:
-            try:
-                now = datetime.datetime.now()
-                current_time = now.strftime("%H:%M")
-                current_date = now.strftime("%Y-%m-%d")
-                
-                for sid, config in list(self.schedules.items()):
-                    if not config.get('enabled', True):
-                        continue
-                    
-                    # 取得排程時間 (只取 HH:MM)
-                    schedule_time = config.get('time', '')
-                    if ':' in schedule_time:
-                        schedule_time = schedule_time[:5]  # "15:30:00" -> "15:30"
-                    
-                    if schedule_time == current_time:
-                        # 使用日期+時間作為 key，避免同一分鐘重複觸發
-                        trigger_key = f"{current_date}_{current_time}"
-                        if self.last_trigger.get(sid) == trigger_key:
-                            continue
-                        self.last_trigger[sid] = trigger_key
-                        
-                        # 在主執行緒觸發腳本
-                        script_file = config.get('script')
-                        callback = config.get('callback')
-                        
-                        if callback and script_file:
-                            self.app.after(0, lambda s=script_file, c=callback: self._trigger_script(s, c))
-                        
-            except Exception as e:
-                print(f"排程檢查錯誤: {e}")
-            
-            time.sleep(5)  # 每 5 秒檢查一次（確保最多延遲 5 秒）
-    
-    def _trigger_script(self, script_file, callback):
-        """觸發排程腳本 - 若有衝突則停止舊的"""
+        with self._cond:
+            if schedule_id in self.schedules:
+                del self.schedules[schedule_id]
+                self._rules.pop(schedule_id, None)
+                # 堆積中的項目留到到期或重建時再清除
+                self._next_due.pop(schedule_id, None)
+                self._cond.notify()
+                print(f"[OK] 已移除排程: {schedule_id}")
+
+    def next_run(self, schedule_id):
+        """回傳排程下一次觸發時間（datetime），沒有時回傳 None"""
+        with self._cond:
+            due = self._next_due.get(schedule_id)
+        return datetime.datetime.fromtimestamp(due) if due is not None else None
+
+    def upcoming(self, limit=10):
+        """回傳最近的 limit 個觸發 [(datetime, schedule_id), ...]"""
+        with self._cond:
+            items = heapq.nsmallest(limit, ((due, sid) for sid, due in self._next_due.items()))
+        return [(datetime.datetime.fromtimestamp(due), sid) for due, sid in items]
+
+    def stop(self):
+        """停止背景執行緒"""
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+
+    def _push(self, schedule_id, after):
+        """計算 after 之後的下一次觸發並放入堆積（呼叫端持有鎖）"""
         try:
-            # 檢查是否有腳本正在執行
-            if hasattr(self.app, 'playing') and self.app.playing:
-                print(f"[WARN] 偵測到衝突：停止目前執行中的腳本")
-                self.app.log(f"[WARN] 排程衝突：停止目前腳本，執行新排程")
-                self.app.stop_all()
-                time.sleep(0.5)  # 等待停止完成
-            
-            # 執行排程腳本
-            print(f"[CLOCK] 觸發排程: {script_file}")
-            self.app.log(f"[CLOCK] 排程觸發: {script_file}")
-            callback(script_file)
-            
+            when = self._rules[schedule_id](after)
         except Exception as e:
-            print(f"觸發排程失敗: {e}")
-            if hasattr(self.app, 'log'):
-                self.app.log(f" 觸發排程失敗: {e}")
+            print(f"排程時間計算錯誤 ({schedule_id}): {e}")
+            when = None
+        if when is None:
+            return
+        due = when.timestamp()
+        self._next_due[schedule_id] = due
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, schedule_id))
+        if len(self._heap) > _STALE_FACTOR * len(self._next_due) + 64:
+            self._heap = [(d, n, s) for d, n, s in self._heap if self._next_due.get(s) == d]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now):
+        """取出所有已到期的排程 [(schedule_id, 觸發 epoch 秒)]（呼叫端持有鎖）"""
+        fired = []
+        while self._heap and self._heap[0][0] <= now:
+            due, _seq, sid = heapq.heappop(self._heap)
+            if self._next_due.get(sid) != due:
+                continue  # 已移除或已重新排程
+            del self._next_due[sid]
+            config = self.schedules[sid]
+            catch_up = config.get('catch_up', 'once')
+            missed = now - due > MISFIRE_SLACK
+            runs = [due]
+            if missed and catch_up == 'all':
+                # 補上睡眠期間的每一次觸發
+                t = datetime.datetime.fromtimestamp(due)
+                while len(runs) < MAX_CATCH_UP:
+                    t = self._rules[sid](t)
+                    if t is None or t.timestamp() > now:
+                        break
+                    runs.append(t.timestamp())
+            elif missed and catch_up == 'skip':
+                runs = []
+            # 下一次觸發從現在之後算起，錯過的其他觸發不再重複
+            self._push(sid, datetime.datetime.fromtimestamp(now))
+            if config.get('enabled', True):
+                fired.extend((sid, run) for run in runs)
+        return fired
+
+    def _check_loop(self):
+        """背景執行緒 - 睡到最近一個排程到期（新增 / 移除排程時立即喚醒）"""
+        while True:
+            with self._cond:
+                if not self.running:
+                    return
+                now = time.time()
+                fired = self._pop_due(now)
+                if not fired:
+                    timeout = MAX_WAIT
+                    if self._heap:
+                        timeout = min(MAX_WAIT, max(0.0, self._heap[0][0] - now))
+                    self._cond.wait(timeout)
+                    continue
+            for sid, due in fired:
+                try:
+                    config = self.schedules.get(sid, {})
+                    self.last_trigger[sid] = datetime.datetime.fromtimestamp(due).strftime("%Y-%m-%d_%H:%M:%S")
+                    late = time.time() - due
+                    if late > MISFIRE_SLACK:
+                        print(f"[CLOCK] 補執行錯過的排程: {sid}（延遲 {late:.0f} 秒）")
+
+                    # 在主執行緒交給工作佇列處理
+                    if config.get('callback') and config.get('script'):
+                        self.app.after(0, lambda s=sid, c=config: self.jobs.submit(s, c))
+                except Exception as e:
+                    print(f"排程檢查錯誤: {e}")
+
+
+def benchmark(count=5000, fire=20):
+    """排程效能測試：大量排程的新增 / 移除耗時，以及實際觸發的延遲"""
+    class _App:
+        playing = False
+
+        def __init__(self):
+            self.fired = []
+
+        def after(self, _ms, func):
+            func()
+
+        def log(self, _msg):
+            pass
+
+    app = _App()
+    manager = ScheduleManager(app)
+    start = time.perf_counter()
+    for i in range(count):
+        manager.add_schedule(f"bulk_{i}", {'type': 'cron', 'cron': f"{i % 60} {i % 60} {i % 24} * * *",
+                                           'script': "x", 'callback': lambda s: None})
+    add_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for i in range(0, count, 2):
+        manager.remove_schedule(f"bulk_{i}")
+    remove_ms = (time.perf_counter() - start) * 1000
+
+    # 觸發精度：每個排程在接下來的整秒觸發，記錄回呼時與預定時間的差距
+    lateness = []
+    done = threading.Event()
+    base = int(time.time()) + 2
+    for i in range(fire):
+        when = datetime.datetime.fromtimestamp(base + i % 3)
+
+        def _callback(_script, due=when.timestamp()):
+            lateness.append(time.time() - due)
+            if len(lateness) >= fire:
+                done.set()
+        manager.add_schedule(f"fire_{i}", {'type': 'once', 'datetime': when.isoformat(),
+                                           'script': "x", 'callback': _callback})
+    done.wait(10)
+    manager.stop()
+    lateness.sort()
+    return {
+        'schedules': count,
+        'add_us_per_op': add_ms * 1000 / count,
+        'remove_us_per_op': remove_ms * 1000 / (count // 2),
+        'fired': len(lateness),
+        'late_mean_ms': sum(lateness) * 1000 / len(lateness) if lateness else None,
+        'late_max_ms': lateness[-1] * 1000 if lateness else None,
+    }
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    with contextlib.redirect_stdout(io.StringIO()):  # 不輸出每個排程的訊息
+        result = benchmark()
+    for key, value in result.items():
+        print(f"{key}: {value}")
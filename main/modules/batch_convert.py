@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 腳本庫批次轉換工具 (batch_convert.py)
+====================================================
+舊格式轉換、JSON ↔ 文字指令、軌跡壓縮與格式升級原本只能在編輯器裡一個檔案一個檔案處理。
+本工具以多行程並行處理整個目錄，不需要開啟介面：
+
+  python batch_convert.py <腳本目錄> <操作> [-j 行程數] [--out 輸出目錄] [--force]
+
+操作：
+  upgrade      重新寫成目前的 JSON 格式（合併修補日誌、設定檔頭）
+  binary       JSON 轉欄位式二進位（.cmsb）
+  json         欄位式二進位轉回 JSON
+  compact      壓縮滑鼠軌跡（誤差有界，保留拖曳與點擊；沒有 numpy 時改用編輯器的「過濾軌跡」）
+  to-text      JSON 轉文字指令（.txt）
+  to-json      文字指令轉 JSON（舊格式 T= 會先自動轉換）
+  old-format   文字指令的舊格式（T=）就地轉為新格式
+
+每完成一個檔案即輸出進度、耗時與大小變化。處理狀態記錄在 <輸出目錄>/.compiled/batch_<操作>.json：
+來源與輸出檔都未變動的項目下次直接略過，中斷後重新執行即從未完成處繼續（冪等、可續傳）。
+就地覆寫 JSON 腳本前會先記錄到版本快照庫，可從編輯器的版本記錄還原。
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from script_io import load_script, save_script, convert_script
+    from script_binary import BINARY_EXT
+    from script_stream import CACHE_DIRNAME
+except ImportError:
+    from modules.script_io import load_script, save_script, convert_script
+    from modules.script_binary import BINARY_EXT
+    from modules.script_stream import CACHE_DIRNAME
+
+try:
+    from snapshot_store import SnapshotStore, snapshot_dir_for
+except ImportError:
+    try:
+        from modules.snapshot_store import SnapshotStore, snapshot_dir_for
+    except ImportError:
+        SnapshotStore = None
+        snapshot_dir_for = None
+
+STATE_VERSION = 1
+
+# 操作 -> (來源副檔名, 輸出副檔名)；輸出副檔名與來源相同表示就地轉換
+OPERATIONS: Dict[str, Tuple[str, str]] = {
+    "upgrade": (".json", ".json"),
+    "binary": (".json", BINARY_EXT),
+    "json": (BINARY_EXT, ".json"),
+    "compact": (".json", ".json"),
+    "to-text": (".json", ".txt"),
+    "to-json": (".txt", ".json"),
+    "old-format": (".txt", ".txt"),
+}
+
+
+class SkipFile(Exception):
+    """檔案不適用此操作（群組腳本、非腳本 JSON 等），不視為失敗"""
+
+
+# ─── 單檔轉換（在工作行程中執行）────────────────────────
+_parser = None
+
+
+def _get_parser(images_dir: str):
+    """建立不開視窗的編輯器實例，只使用其文字指令轉換方法（每個行程建立一次）"""
+    global _parser
+    if _parser is None:
+        try:
+            from text_script_editor import TextCommandEditor
+        except ImportError:
+            from modules.text_script_editor import TextCommandEditor
+        _parser = TextCommandEditor.__new__(TextCommandEditor)
+        _parser.script_path = None
+    _parser.images_dir = images_dir
+    _parser.original_settings = {}
+    return _parser
+
+
+def _filter_trajectory(events) -> Tuple[List[Dict[str, Any]], str]:
+    """壓縮軌跡，回傳 (事件, 統計摘要)"""
+    try:
+        from trajectory_compact import compact_trajectory, format_stats, NUMPY_AVAILABLE
+    except ImportError:
+        from modules.trajectory_compact import compact_trajectory, format_stats, NUMPY_AVAILABLE
+    if NUMPY_AVAILABLE:
+        events, stats = compact_trajectory(events)
+        return events, format_stats(stats)
+    try:
+        from text_script_editor import filter_mouse_trajectory
+    except ImportError:
+        from modules.text_script_editor import filter_mouse_trajectory
+    return filter_mouse_trajectory(events), ""
+
+
+def _convert_old_format(text: str):
+    try:
+        from text_script_editor import convert_old_format_to_new
+    except ImportError:
+        from modules.text_script_editor import convert_old_format_to_new
+    return convert_old_format_to_new(text)
+
+
+def _load_events_script(src: str) -> Dict[str, Any]:
+    try:
+        data = load_script(src)
+    except ValueError as e:
+        raise SkipFile(f"無法解析: {e}")
+    if data.get("is_group"):
+        raise SkipFile("群組腳本")
+    if not isinstance(data.get("events"), list) or not data["events"]:
+        raise SkipFile("不是錄製腳本")
+    return data
+
+
+def _write_text(path: str, text: str) -> None:
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _snapshot_before_overwrite(path: str) -> None:
+    """就地覆寫 JSON 腳本前記錄目前版本（失敗不影響轉換）"""
+    if SnapshotStore is None or not path.lower().endswith(".json") or not os.path.exists(path):
+        return
+    try:
+        data = load_script(path)
+        if isinstance(data.get("events"), list) and not data.get("is_group"):
+            store = SnapshotStore(snapshot_dir_for(os.path.dirname(path)))
+            store.snapshot(os.path.basename(path), data["events"], data.get("settings"), source="批次轉換前")
+            # 多個工作行程共用快照庫：這裡只刪除舊版本，區段由主行程在全部完成後回收
+            store.prune(os.path.basename(path))
+    except Exception as e:
+        print(f"寫入版本快照失敗: {e}")
+
+
+def _collect_snapshots(script_dir: str) -> None:
+    """全部工作行程結束後回收快照庫中不再引用的區段（工作行程只 prune 版本）"""
+    if SnapshotStore is None or not os.path.isdir(snapshot_dir_for(script_dir)):
+        return
+    try:
+        SnapshotStore(snapshot_dir_for(script_dir)).gc()
+    except Exception as e:
+        print(f"回收版本快照失敗: {e}")
+
+
+def convert_file(op: str, src: str, dst: str, snapshot: bool = True) -> Dict[str, Any]:
+    """轉換單一檔案，回傳結果（供行程池呼叫，不會拋出例外）
+
+    Returns:
+        {'src', 'dst', 'status': 'done' | 'skipped' | 'error', 'message',
+         'seconds', 'size_before', 'size_after', 'events_before', 'events_after'}
+    """
+    result: Dict[str, Any] = {"src": src, "dst": dst, "status": "done", "message": "",
+                              "size_before": os.path.getsize(src), "size_after": 0,
+                              "events_before": None, "events_after": None}
+    t0 = time.perf_counter()
+    try:
+        if snapshot and os.path.abspath(src) == os.path.abspath(dst):
+            _snapshot_before_overwrite(dst)
+        if op in ("upgrade", "binary", "json"):
+            data = _load_events_script(src) if op != "json" else load_script(src)
+            result["events_before"] = result["events_after"] = len(data.get("events") or [])
+            convert_script(src, dst, binary=(op == "binary"))
+        elif op == "compact":
+            data = _load_events_script(src)
+            events, result["message"] = _filter_trajectory(data["events"])
+            result["events_before"], result["events_after"] = len(data["events"]), len(events)
+            save_script(dst, events, data.get("settings") or {}, binary=False)
+        elif op == "to-text":
+            data = _load_events_script(src)
+            parser = _get_parser(os.path.join(os.path.dirname(src), "images"))
+            parser.original_settings = dict(data.get("settings") or {})
+            result["events_before"] = len(data["events"])
+            _write_text(dst, parser._json_to_text(data))
+        elif op == "to-json":
+            with open(src, "r", encoding="utf-8") as f:
+                text, _converted = _convert_old_format(f.read())
+            parser = _get_parser(os.path.join(os.path.dirname(src), "images"))
+            data = parser._text_to_json(text)
+            if not data.get("events"):
+                raise SkipFile("沒有可轉換的指令")
+            result["events_after"] = len(data["events"])
+            save_script(dst, data["events"], data.get("settings") or {}, binary=False)
+        elif op == "old-format":
+            with open(src, "r", encoding="utf-8") as f:
+                text, converted = _convert_old_format(f.read())
+            if converted or os.path.abspath(src) != os.path.abspath(dst):
+                _write_text(dst, text)
+            else:
+                result["message"] = "已是新格式"
+        else:
+            raise ValueError(f"未知的操作: {op}")
+        result["size_after"] = os.path.getsize(dst)
+    except SkipFile as e:
+        result["status"] = "skipped"
+        result["message"] = str(e)
+    except Exception as e:
+        result["status"] = "error"
+        result["message"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+
+# ─── 處理狀態（冪等 / 續傳）─────────────────────────────
+def _stamp(path: str) -> Optional[List[int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def state_path_for(out_dir: str, op: str) -> str:
+    return os.path.join(out_dir, CACHE_DIRNAME, f"batch_{op}.json")
+
+
+def _load_state(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") == STATE_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return {"version": STATE_VERSION, "files": {}}
+
+
+def _save_state(path: str, state: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def plan(src_dir: str, op: str, out_dir: Optional[str] = None,
+         state: Optional[Dict[str, Any]] = None) -> Tuple[List[Tuple[str, str]], int]:
+    """列出需要處理的 (來源, 輸出) 配對，回傳 (待處理列表, 已完成而略過的數量)"""
+    src_ext, dst_ext = OPERATIONS[op]
+    out_dir = out_dir or src_dir
+    files = (state or {}).get("files", {})
+    todo: List[Tuple[str, str]] = []
+    done = 0
+    for name in sorted(os.listdir(src_dir)):
+        src = os.path.join(src_dir, name)
+        if not name.lower().endswith(src_ext) or not os.path.isfile(src):
+            continue
+        dst = os.path.join(out_dir, os.path.splitext(name)[0] + dst_ext)
+        record = files.get(name)
+        if record and record.get("src") == _stamp(src) and record.get("dst") == _stamp(dst):
+            done += 1
+            continue
+        todo.append((src, dst))
+    return todo, done
+
+
+def run_batch(src_dir: str, op: str, out_dir: Optional[str] = None, jobs: Optional[int] = None,
+              force: bool = False, snapshot: bool = True) -> Iterator[Dict[str, Any]]:
+    """批次轉換目錄，每完成一個檔案 yield 一筆結果（另含 'index' / 'total'）
+
+    Args:
+        jobs:     工作行程數；None 為 CPU 核心數，1 表示在目前行程依序處理
+        force:    忽略處理狀態，全部重新轉換
+        snapshot: 就地覆寫前是否記錄版本快照
+    """
+    if op not in OPERATIONS:
+        raise ValueError(f"未知的操作: {op}（可用: {', '.join(OPERATIONS)}）")
+    out_dir = out_dir or src_dir
+    os.makedirs(out_dir, exist_ok=True)
+    state_path = state_path_for(out_dir, op)
+    state = {"version": STATE_VERSION, "files": {}} if force else _load_state(state_path)
+    todo, _done = plan(src_dir, op, out_dir, state)
+    total = len(todo)
+    if not todo:
+        return
+    jobs = jobs or os.cpu_count() or 1
+
+    def _record(result: Dict[str, Any], index: int) -> Dict[str, Any]:
+        # 只有成功或不適用的檔案才記錄；失敗的下次重試
+        if result["status"] != "error":
+            state["files"][os.path.basename(result["src"])] = {
+                "src": _stamp(result["src"]), "dst": _stamp(result["dst"]), "status": result["status"]}
+            _save_state(state_path, state)
+        result["index"], result["total"] = index, total
+        return result
+
+    if jobs <= 1 or total == 1:
+        for index, (src, dst) in enumerate(todo, 1):
+            yield _record(convert_file(op, src, dst, snapshot), index)
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, total)) as pool:
+            futures = [pool.submit(convert_file, op, src, dst, snapshot) for src, dst in todo]
+            for index, future in enumerate(as_completed(futures), 1):
+                yield _record(future.result(), index)
+    if snapshot and os.path.abspath(out_dir) == os.path.abspath(src_dir):
+        _collect_snapshots(src_dir)
+
+
+def _format_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / 1024 / 1024:.1f}MB"
+    if size >= 1024:
+        return f"{size / 1024:.1f}KB"
+    return f"{size}B"
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    """單一結果的進度行"""
+    head = f"[{result['index']:>{len(str(result['total']))}}/{result['total']}] {os.path.basename(result['src'])}"
+    if result["status"] != "done":
+        label = "略過" if result["status"] == "skipped" else "失敗"
+        return f"{head}  {label}: {result['message']}"
+    before, after = result["size_before"], result["size_after"]
+    delta = (after - before) / before * 100 if before else 0.0
+    line = (f"{head}  {result['seconds'] * 1000:.0f} ms  "
+            f"{_format_size(before)} -> {_format_size(after)} ({delta:+.0f}%)")
+    if result["events_before"] is not None and result["events_after"] not in (None, result["events_before"]):
+        line += f"  事件 {result['events_before']} -> {result['events_after']}"
+    if result["message"]:
+        line += f"  {result['message']}"
+    return line
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ChroLens Mimic 腳本庫批次轉換")
+    parser.add_argument("src_dir", help="腳本目錄")
+    parser.add_argument("op", choices=list(OPERATIONS), help="轉換操作")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="工作行程數（預設為 CPU 核心數）")
+    parser.add_argument("--out", default=None, help="輸出目錄（預設與來源相同）")
+    parser.add_argument("--force", action="store_true", help="忽略處理狀態，全部重新轉換")
+    parser.add_argument("--no-snapshot", action="store_true", help="就地覆寫前不記錄版本快照")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    counts = {"done": 0, "skipped": 0, "error": 0}
+    size_before = size_after = 0
+    for result in run_batch(args.src_dir, args.op, args.out, args.jobs, args.force, not args.no_snapshot):
+        print(format_result(result), flush=True)
+        counts[result["status"]] += 1
+        if result["status"] == "done":
+            size_before += result["size_before"]
+            size_after += result["size_after"]
+    elapsed = time.perf_counter() - t0
+    if not any(counts.values()):
+        print("沒有需要處理的檔案（皆已完成）")
+        return 0
+    print(f"完成 {counts['done']}，略過 {counts['skipped']}，失敗 {counts['error']}，"
+          f"共 {elapsed:.2f} 秒；大小 {_format_size(size_before)} -> {_format_size(size_after)}")
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
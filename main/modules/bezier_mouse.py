@@ -31,14 +31,18 @@ class BezierMouseMover:
     3. 速度變化（Ease-in/Ease-out）
     """
     
-    def __init__(self, move_function: Optional[Callable[[int, int], None]] = None):
+    def __init__(self, move_function: Optional[Callable[[int, int], None]] = None,
+                 position_function: Optional[Callable[[], Tuple[int, int]]] = None):
         """初始化移動器
         
         Args:
             move_function: 滑鼠移動函式，預設使用 Windows API
                            簽名: move_function(x: int, y: int) -> None
+            position_function: 取得目前滑鼠位置的函式，預設使用 Windows API
+                               簽名: position_function() -> (x, y)
         """
         self.move_function = move_function or self._default_move
+        self.position_function = position_function
     
     def _default_move(self, x: int, y: int) -> None:
         """預設滑鼠移動（使用 Windows API）"""
@@ -46,6 +50,8 @@ class BezierMouseMover:
     
     def get_current_position(self) -> Tuple[int, int]:
         """取得當前滑鼠位置"""
+        if self.position_function is not None:
+            return self.position_function()
         point = ctypes.wintypes.POINT()
         ctypes.windll.user32.GetCursorPos(ctypes.byref(point))
         return point.x, point.y
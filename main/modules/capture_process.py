@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 獨立行程輸入擷取 (capture_process.py)
+====================================================
+錄製時 pynput 監聽器與 keyboard hook 和 Tk、日誌佇列、背景載入共用同一個直譯器，
+GIL 被佔用時回呼延遲執行，time.time() 取得的時間戳記因此偏移。
+
+CaptureProcess 在子行程中執行輸入 hook，事件寫入共用記憶體環形緩衝（SharedRing），
+錄製端定期取出：
+  - 每筆事件為固定 48 bytes 的記錄：擷取時間、來源時間、裝置、事件碼、x、y、arg、名稱（16 bytes）
+  - 單一寫入端 / 單一讀取端：子行程只更新寫入位置與計數，錄製端只更新讀取位置，不需要鎖
+  - 緩衝已滿時捨棄新事件並累加 dropped（不會阻塞 hook）
+  - stats() 提供遺失數、取出延遲（取出時間 - 擷取時間）與時間戳記偏移
+    （擷取時間 - 來源時間；合成來源的來源時間為預定送出時間）及時間倒退次數
+
+source='synthetic' 以固定頻率產生移動、點擊、滾輪與按鍵，不需要桌面環境即可測試與評估：
+    python modules/capture_process.py
+"""
+
+import random
+import struct
+import sys
+import threading
+import time
+from array import array
+from multiprocessing import get_context
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from event_buffer import MOVE, DOWN, UP, WHEEL
+except ImportError:
+    from modules.event_buffer import MOVE, DOWN, UP, WHEEL
+
+DEFAULT_CAPACITY = 65536
+DRAIN_INTERVAL = 0.01
+
+# 裝置
+MOUSE = 0
+KEYBOARD = 1
+DEVICE_NAMES = ("mouse", "keyboard")
+
+# 記錄：擷取時間、來源時間、裝置、事件碼、x、y、arg（滾輪 delta）、名稱（按鍵 / 按鈕，UTF-8）
+RECORD = struct.Struct("<ddBBxxiii16s")
+# 標頭：寫入序號、讀取序號、捨棄數、產生數、容量、子行程狀態
+HEADER = struct.Struct("<6Q")
+_WRITE, _READ, _DROPPED, _PRODUCED, _CAPACITY, _STATE = range(6)
+
+STATE_STARTING = 0
+STATE_RUNNING = 1
+STATE_FAILED = 2
+
+# 一筆記錄的欄位順序（drain() 回傳的 tuple）
+Record = Tuple[float, float, int, int, int, int, int, str]
+
+
+class SharedRing:
+    """共用記憶體上的固定大小記錄環形緩衝（單一寫入端 / 單一讀取端）"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, name: Optional[str] = None):
+        """name 為 None 時建立新的共用記憶體，否則連接既有的"""
+        if name is None:
+            size = HEADER.size + capacity * RECORD.size
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+            self._shm.buf[:HEADER.size] = HEADER.pack(0, 0, 0, 0, capacity, STATE_STARTING)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+        self._header = self._shm.buf[:HEADER.size].cast("Q")
+        self.capacity = self._header[_CAPACITY]
+        self._records = self._shm.buf[HEADER.size:]
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def _get(self, field: int) -> int:
+        return self._header[field]
+
+    def _set(self, field: int, value: int) -> None:
+        self._header[field] = value
+
+    @property
+    def dropped(self) -> int:
+        return self._header[_DROPPED]
+
+    @property
+    def produced(self) -> int:
+        return self._header[_PRODUCED]
+
+    @property
+    def state(self) -> int:
+        return self._header[_STATE]
+
+    def push(self, t: float, device: int, code: int, x: int = 0, y: int = 0, arg: int = 0,
+             name: str = "", t_source: float = 0.0) -> bool:
+        """寫入一筆記錄；緩衝已滿時捨棄並回傳 False（只能由寫入端呼叫）"""
+        header = self._header
+        write = header[_WRITE]
+        header[_PRODUCED] += 1
+        if write - header[_READ] >= self.capacity:
+            header[_DROPPED] += 1
+            return False
+        RECORD.pack_into(self._records, (write % self.capacity) * RECORD.size,
+                         t, t_source, device, code, x, y, arg, name.encode("utf-8")[:16])
+        # 記錄寫完才前進寫入序號，讀取端不會讀到寫到一半的記錄
+        header[_WRITE] = write + 1
+        return True
+
+    def drain(self, limit: Optional[int] = None) -> List[Record]:
+        """取出所有（或最多 limit 筆）尚未讀取的記錄（只能由讀取端呼叫）"""
+        header = self._header
+        read = header[_READ]
+        write = header[_WRITE]
+        if limit is not None:
+            write = min(write, read + limit)
+        out: List[Record] = []
+        records = self._records
+        capacity = self.capacity
+        unpack = RECORD.unpack_from
+        for seq in range(read, write):
+            t, t_source, device, code, x, y, arg, raw = unpack(records, (seq % capacity) * RECORD.size)
+            out.append((t, t_source, device, code, x, y, arg,
+                        raw.rstrip(b"\0").decode("utf-8", "replace") if raw[0] else ""))
+        header[_READ] = write
+        return out
+
+    def close(self) -> None:
+        self._header.release()
+        self._records.release()
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+# ─── 事件來源（在子行程執行）────────────────────────────
+
+def _key_name(key) -> str:
+    """與錄製端相同的按鍵命名：字元鍵用字元，其餘為 Key.xxx 去掉前綴，全部小寫"""
+    if getattr(key, "char", None):
+        return key.char.lower()
+    return str(key).replace("Key.", "").lower()
+
+
+def _run_pynput(ring: SharedRing, stop_event) -> None:
+    from pynput import keyboard as pynput_keyboard
+    from pynput import mouse as pynput_mouse
+
+    clock = time.time
+
+    def on_move(x, y):
+        ring.push(clock(), MOUSE, MOVE, x, y)
+
+    def on_click(x, y, button, pressed):
+        ring.push(clock(), MOUSE, DOWN if pressed else UP, x, y,
+                  name=str(button).replace("Button.", ""))
+
+    def on_scroll(x, y, dx, dy):
+        ring.push(clock(), MOUSE, WHEEL, x, y, arg=int(dy))
+
+    def on_press(key):
+        ring.push(clock(), KEYBOARD, DOWN, name=_key_name(key))
+
+    def on_release(key):
+        ring.push(clock(), KEYBOARD, UP, name=_key_name(key))
+
+    mouse_listener = pynput_mouse.Listener(on_move=on_move, on_click=on_click, on_scroll=on_scroll)
+    key_listener = pynput_keyboard.Listener(on_press=on_press, on_release=on_release)
+    mouse_listener.start()
+    key_listener.start()
+    ring._set(_STATE, STATE_RUNNING)
+    try:
+        stop_event.wait()
+    finally:
+        mouse_listener.stop()
+        key_listener.stop()
+
+
+def run_synthetic(ring: SharedRing, stop_event, rate: float = 1000.0, duration: Optional[float] = None,
+                  seed: int = 1) -> None:
+    """以固定頻率產生合成輸入：大多為移動，間隔插入點擊、滾輪與按鍵
+
+    每筆記錄的來源時間為預定送出時間，擷取時間為實際寫入時間。
+    """
+    rng = random.Random(seed)
+    interval = 1.0 / rate
+    start = time.time()
+    end = start + duration if duration is not None else None
+    x, y = 500, 500
+    i = 0
+    ring._set(_STATE, STATE_RUNNING)
+    while not stop_event.is_set():
+        due = start + i * interval
+        if end is not None and due >= end:
+            break
+        delay = due - time.time()
+        if delay > 0.002:
+            stop_event.wait(delay - 0.001)
+            continue
+        while time.time() < due:
+            pass
+        step = i % 200
+        if step == 100:
+            ring.push(time.time(), MOUSE, DOWN, x, y, name="left", t_source=due)
+        elif step == 101:
+            ring.push(time.time(), MOUSE, UP, x, y, name="left", t_source=due)
+        elif step == 150:
+            ring.push(time.time(), MOUSE, WHEEL, x, y, arg=rng.choice((-1, 1)), t_source=due)
+        elif step in (50, 51):
+            ring.push(time.time(), KEYBOARD, DOWN if step == 50 else UP, name="a", t_source=due)
+        else:
+            x += rng.randint(-3, 3)
+            y += rng.randint(-3, 3)
+            ring.push(time.time(), MOUSE, MOVE, x, y, t_source=due)
+        i += 1
+
+
+def _child_main(ring_name: str, source: str, options: Dict[str, Any], stop_event) -> None:
+    ring = SharedRing(name=ring_name)
+    try:
+        if source == "synthetic":
+            run_synthetic(ring, stop_event, **options)
+        else:
+            _run_pynput(ring, stop_event)
+    except Exception as e:
+        ring._set(_STATE, STATE_FAILED)
+        print(f"[擷取行程] 錯誤: {e}")
+    finally:
+        ring.close()
+
+
+# ─── 統計 ──────────────────────────────────────────────
+
+class _Metric:
+    """數值統計：平均、最大值，p95 以固定大小的蓄水池抽樣估計"""
+
+    RESERVOIR = 4096
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._sample = array("d")
+        self._rng = random.Random(0)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if len(self._sample) < self.RESERVOIR:
+            self._sample.append(value)
+        else:
+            j = self._rng.randrange(self.count)
+            if j < self.RESERVOIR:
+                self._sample[j] = value
+
+    def summary(self, scale: float = 1000.0) -> Dict[str, float]:
+        """{mean, p95, max}（預設換算為毫秒）"""
+        if not self.count:
+            return {"mean": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(self._sample)
+        return {"mean": self.total / self.count * scale,
+                "p95": ordered[int(0.95 * (len(ordered) - 1))] * scale,
+                "max": self.max * scale}
+
+
+# ─── 錄製端 ─────────────────────────────────────────────
+
+class CaptureProcess:
+    """在子行程擷取輸入，錄製端以 drain() 取出事件"""
+
+    def __init__(self, source: str = "pynput", capacity: int = DEFAULT_CAPACITY, **options):
+        """
+        Args:
+            source:   'pynput'（實際輸入）或 'synthetic'（合成事件，options 傳給 run_synthetic）
+            capacity: 環形緩衝可容納的記錄數
+        """
+        self.source = source
+        self.capacity = capacity
+        self.options = options
+        self.received = 0
+        self.out_of_order = 0
+        self.latency = _Metric()
+        self.skew = _Metric()
+        self._last_t = 0.0
+        self._ring: Optional[SharedRing] = None
+        self._process = None
+        self._stop_event = None
+
+    def start(self, timeout: float = 5.0) -> None:
+        """啟動子行程並等待 hook 就緒；失敗時拋出 RuntimeError"""
+        ctx = get_context("spawn")
+        self._ring = SharedRing(self.capacity)
+        self._stop_event = ctx.Event()
+        self._process = ctx.Process(target=_child_main, name="ChroLensCapture", daemon=True,
+                                    args=(self._ring.name, self.source, self.options, self._stop_event))
+        self._process.start()
+        deadline = time.monotonic() + timeout
+        while self._ring.state == STATE_STARTING:
+            if not self._process.is_alive() or time.monotonic() > deadline:
+                break
+            time.sleep(0.005)
+        if self._ring.state != STATE_RUNNING:
+            self.stop()
+            raise RuntimeError("擷取行程無法啟動")
+
+    def drain(self) -> List[Record]:
+        """取出目前所有事件：(擷取時間, 來源時間, 裝置, 事件碼, x, y, arg, 名稱)"""
+        if self._ring is None:
+            return []
+        records = self._ring.drain()
+        if not records:
+            return records
+        now = time.time()
+        last_t = self._last_t
+        for record in records:
+            t = record[0]
+            self.latency.add(now - t)
+            if record[1]:
+                self.skew.add(t - record[1])
+            if t < last_t:
+                self.out_of_order += 1
+            last_t = t
+        self._last_t = last_t
+        self.received += len(records)
+        return records
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def stop(self, timeout: float = 2.0) -> List[Record]:
+        """停止子行程，回傳尚未取出的事件並釋放共用記憶體"""
+        records: List[Record] = []
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._process is not None:
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join(timeout)
+        if self._ring is not None:
+            records = self.drain()
+            self._dropped = self._ring.dropped
+            self._produced = self._ring.produced
+            self._ring.close()
+            self._ring = None
+        self._process = None
+        return records
+
+    def stats(self) -> Dict[str, Any]:
+        """received / dropped / produced / out_of_order，latency_ms 與 skew_ms 為 {mean, p95, max}"""
+        if self._ring is not None:
+            dropped, produced = self._ring.dropped, self._ring.produced
+        else:
+            dropped, produced = getattr(self, "_dropped", 0), getattr(self, "_produced", 0)
+        return {
+            "received": self.received,
+            "dropped": dropped,
+            "produced": produced,
+            "out_of_order": self.out_of_order,
+            "latency_ms": self.latency.summary(),
+            "skew_ms": self.skew.summary(),
+        }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        lat, skew = s["latency_ms"], s["skew_ms"]
+        line = (f"取出 {s['received']} 筆，遺失 {s['dropped']} 筆，時間倒退 {s['out_of_order']} 次，"
+                f"取出延遲 平均 {lat['mean']:.1f} / p95 {lat['p95']:.1f} / 最大 {lat['max']:.1f} ms")
+        if self.skew.count:
+            line += (f"，時間戳記偏移 平均 {skew['mean']:.2f} / p95 {skew['p95']:.2f}"
+                     f" / 最大 {skew['max']:.2f} ms")
+        return line
+
+
+# ─── 效能測試 ──────────────────────────────────────────────
+
+def _gil_load(stop: threading.Event) -> None:
+    """模擬主行程的 Python 工作（Tk 事件、日誌、背景載入）長時間佔用 GIL"""
+    while not stop.is_set():
+        sum(i * i for i in range(200000))
+
+
+def benchmark(rate: float = 2000.0, duration: float = 2.0, load: bool = True) -> Dict[str, Dict[str, Any]]:
+    """比較合成輸入在子行程與同行程執行緒產生時的遺失、延遲與時間戳記偏移
+
+    load=True 時主行程另有執行緒持續佔用 GIL，模擬錄製時的介面負載。
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    for mode in ("process", "thread"):
+        stop_load = threading.Event()
+        loader = threading.Thread(target=_gil_load, args=(stop_load,), daemon=True)
+        if mode == "process":
+            capture = CaptureProcess("synthetic", rate=rate, duration=duration)
+            capture.start()
+            producer = None
+        else:
+            # 同一行程：以執行緒寫入同樣的環形緩衝
+            capture = CaptureProcess("synthetic")
+            capture._ring = SharedRing(capture.capacity)
+            stop_event = threading.Event()
+            producer = threading.Thread(target=run_synthetic, daemon=True,
+                                        args=(capture._ring, stop_event, rate, duration))
+            producer.start()
+        if load:
+            loader.start()
+        end = time.time() + duration
+        while time.time() < end:
+            time.sleep(DRAIN_INTERVAL)
+            capture.drain()
+        if producer is not None:
+            producer.join()
+            capture.drain()
+            capture._dropped, capture._produced = capture._ring.dropped, capture._ring.produced
+            capture._ring.close()
+            capture._ring = None
+        else:
+            capture.stop()
+        stop_load.set()
+        if load:
+            loader.join()
+        results[mode] = capture.stats()
+        results[mode]["summary"] = capture.format_stats()
+    return results
+
+
+if __name__ == "__main__":
+    for mode, result in benchmark().items():
+        print(f"{mode}: {result['summary']}")
+    sys.exit(0)
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 欄位式錄製事件緩衝 (event_buffer.py)
+===================================================
+錄製時每筆取樣原本都是一個含 type / event / x / y / time / in_target 的 dict，
+分別累積在滑鼠與鍵盤列表，停止時再合併後整體 sorted()；長時間錄製佔用數百 MB。
+
+EventColumns 以固定寬度的 array 欄位保存單一事件流：
+  time(float64) / code(uint8，move/down/up/wheel) / x, y(int32) / arg(int32) / flag(int8)
+arg 依事件而定：按鍵與滑鼠按鈕為字串表索引，滾輪為 delta。
+字串（按鍵名稱、滑鼠按鈕）經 StringTable 共用，每筆事件約 22 bytes（dict 約 400+ bytes）。
+欄位預先配置容量，不足時加倍。
+
+停止錄製時 merge_streams() 對各自依時間排序的事件流做線性 k 路合併，
+只產生 (事件流, 索引) 的順序陣列；RecordedEvents 是唯讀序列，
+存取某筆事件時才轉成 dict（並快取，修改會保留），to_list() 一次轉成完整列表。
+"""
+
+from array import array
+from collections.abc import Sequence
+from typing import Any, Callable, Dict, List, Optional
+
+EVENT_NAMES = ("move", "down", "up", "wheel")
+EVENT_CODES = {name: i for i, name in enumerate(EVENT_NAMES)}
+MOVE, DOWN, UP, WHEEL = range(4)
+
+DEFAULT_CAPACITY = 4096
+
+
+class StringTable:
+    """字串駐留表：相同字串只存一次，以整數索引引用"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+
+    def intern(self, text: str) -> int:
+        i = self._ids.get(text)
+        if i is None:
+            i = self._ids[text] = len(self._names)
+            self._names.append(text)
+        return i
+
+    def name(self, i: int) -> str:
+        return self._names[i]
+
+    def id_of(self, text: str) -> Optional[int]:
+        return self._ids.get(text)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+class EventColumns:
+    """單一事件流（滑鼠或鍵盤）的欄位式緩衝；只允許單一執行緒寫入"""
+
+    def __init__(self, kind: str, strings: StringTable, capacity: int = DEFAULT_CAPACITY):
+        self.kind = kind
+        self.strings = strings
+        self.time = array("d")
+        self.code = array("B")
+        self.x = array("i")
+        self.y = array("i")
+        self.arg = array("i")
+        self.flag = array("b")
+        self._columns = (self.time, self.code, self.x, self.y, self.arg, self.flag)
+        self._n = 0
+        self._capacity = 0
+        self.ordered = True  # 時間是否非遞減（時鐘回撥時為 False，合併前另行排序）
+        self._grow(max(1, capacity))
+
+    def _grow(self, extra: int) -> None:
+        for column in self._columns:
+            column.frombytes(bytes(extra * column.itemsize))
+        self._capacity += extra
+
+    def __len__(self) -> int:
+        return self._n
+
+    def append(self, code: int, t: float, x: int = 0, y: int = 0, arg: int = 0, flag: int = 1) -> None:
+        n = self._n
+        if n == self._capacity:
+            self._grow(self._capacity)
+        if n and t < self.time[n - 1]:
+            self.ordered = False
+        self.time[n] = t
+        self.code[n] = code
+        self.x[n] = x
+        self.y[n] = y
+        self.arg[n] = arg
+        self.flag[n] = flag
+        self._n = n + 1
+
+    def append_mouse(self, event: str, x, y, t: float, in_target: bool = True,
+                     button: Optional[str] = None, delta: int = 0) -> None:
+        code = EVENT_CODES[event]
+        if code == WHEEL:
+            arg = int(delta)
+        elif button is not None:
+            arg = self.strings.intern(button)
+        else:
+            arg = 0
+        self.append(code, t, int(x), int(y), arg, 1 if in_target else 0)
+
+    def append_key(self, event: str, name: str, t: float) -> None:
+        self.append(EVENT_CODES[event], t, arg=self.strings.intern(name))
+
+    def event(self, i: int) -> Dict[str, Any]:
+        """將第 i 筆轉回錄製事件 dict（欄位與原本的錄製格式相同）"""
+        code = self.code[i]
+        if self.kind == "keyboard":
+            return {'type': 'keyboard', 'event': EVENT_NAMES[code],
+                    'name': self.strings.name(self.arg[i]), 'time': self.time[i]}
+        ev: Dict[str, Any] = {'type': 'mouse', 'event': EVENT_NAMES[code]}
+        if code == WHEEL:
+            ev['delta'] = self.arg[i]
+        elif code != MOVE:
+            ev['button'] = self.strings.name(self.arg[i])
+        ev['x'] = self.x[i]
+        ev['y'] = self.y[i]
+        ev['time'] = self.time[i]
+        ev['in_target'] = bool(self.flag[i])
+        return ev
+
+    def time_order(self) -> Sequence:
+        """依時間排序的索引（已排序時直接回傳 range）"""
+        if self.ordered:
+            return range(self._n)
+        time_col = self.time
+        return array("I", sorted(range(self._n), key=time_col.__getitem__))
+
+    def count_flag(self) -> int:
+        """flag 為 1（在目標視窗內）的事件數"""
+        return sum(self.flag[:self._n])
+
+    def nbytes(self) -> int:
+        return sum(column.itemsize * self._n for column in self._columns)
+
+
+def merge_streams(streams: List[EventColumns],
+                  keep: Optional[List[Optional[Callable[[int], bool]]]] = None) -> "RecordedEvents":
+    """線性 k 路合併多個事件流（時間相同時以 streams 中較前者優先）
+
+    Args:
+        keep: 與 streams 對應的篩選函式 keep(索引) -> bool；None 表示全部保留
+    """
+    orders = []
+    for k, stream in enumerate(streams):
+        order = stream.time_order()
+        predicate = keep[k] if keep else None
+        if predicate is not None:
+            order = array("I", (i for i in order if predicate(i)))
+        orders.append(order)
+
+    total = sum(len(order) for order in orders)
+    out_stream = array("B", bytes(total))
+    out_index = array("I", bytes(total * array("I").itemsize))
+    times = [s.time for s in streams]
+    heads = [0] * len(streams)
+    active = [k for k, order in enumerate(orders) if len(order)]
+    pos = 0
+    while active:
+        if len(active) == 1:
+            # 只剩一個事件流時整段複製
+            k = active[0]
+            rest = orders[k][heads[k]:]
+            out_stream[pos:] = array("B", bytes([k])) * len(rest)
+            out_index[pos:] = array("I", rest)
+            break
+        heads_at = [(times[k][orders[k][heads[k]]], k) for k in active]
+        best_t, best = min(heads_at)
+        bound_t, bound_k = min(item for item in heads_at if item[1] != best)
+        # 從最早的事件流連續取出，直到輪到其他事件流
+        order = orders[best]
+        time_col = times[best]
+        h = heads[best]
+        end = len(order)
+        while h < end:
+            i = order[h]
+            t = time_col[i]
+            if t > bound_t or (t == bound_t and best > bound_k):
+                break
+            out_stream[pos] = best
+            out_index[pos] = i
+            pos += 1
+            h += 1
+        heads[best] = h
+        if h == end:
+            active.remove(best)
+    return RecordedEvents(streams, out_stream, out_index)
+
+
+class RecordedEvents(Sequence):
+    """合併後的錄製事件唯讀序列：存取時才轉成 dict（快取，之後取得同一物件）"""
+
+    def __init__(self, streams: List[EventColumns], order_stream: array, order_index: array):
+        self._streams = streams
+        self._order_stream = order_stream
+        self._order_index = order_index
+        self._dicts: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._order_index)
+
+    def __bool__(self) -> bool:
+        return len(self._order_index) > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        n = len(self._order_index)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("事件索引超出範圍")
+        ev = self._dicts.get(index)
+        if ev is None:
+            built = self._streams[self._order_stream[index]].event(self._order_index[index])
+            ev = self._dicts.setdefault(index, built)
+        return ev
+
+    def __iter__(self):
+        for i in range(len(self._order_index)):
+            yield self[i]
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """轉成完整的事件 dict 列表（已取用過的事件沿用同一物件）"""
+        return [self[i] for i in range(len(self._order_index))]
+
+    def nbytes(self) -> int:
+        """欄位與順序陣列佔用的位元組（不含已轉換的 dict）"""
+        return (sum(s.nbytes() for s in self._streams)
+                + self._order_stream.itemsize * len(self._order_stream)
+                + self._order_index.itemsize * len(self._order_index))
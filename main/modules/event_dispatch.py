@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 事件處理函式登錄與預編譯 (event_dispatch.py)
+==========================================================
+CoreRecorder._execute_event 原本是約 45 個事件類型的 if/elif 串：
+每執行一筆滑鼠移動都要先比對十幾次字串，分支內每次都重新讀取 dict 欄位與預設值。
+
+HandlerRegistry 讓每個事件類型登錄自己的處理函式：
+  - @registry.handles('mouse')      處理函式 handler(owner, *args)
+  - @registry.args('mouse')         （選用）參數擷取 args(owner, event) -> tuple；
+                                     沒有登錄時參數為 (event,)
+  - compile(owner, event)           -> (handler, args)，未登錄的類型為不做事的處理函式
+
+CompiledEvents 依事件索引快取編譯結果（事件列表換掉後重建）：
+同一份腳本重複執行、跳轉或迴圈時，每筆事件只編譯一次，分派成本為一次索引與一次函式呼叫。
+延遲載入的大型腳本只在事件第一次執行時編譯，不會一次解碼整份腳本。
+
+benchmark() 依事件類型比較 if/elif 串與預編譯的每筆事件成本：
+    python modules/event_dispatch.py
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+Compiled = Tuple[Callable[..., Any], tuple]
+
+
+def _ignore(owner, event):
+    """未登錄的事件類型（標籤、註解等）不做任何事"""
+    return None
+
+
+class HandlerRegistry:
+    """事件類型 -> 處理函式 / 參數擷取函式"""
+
+    def __init__(self):
+        self.handlers: Dict[str, Callable[..., Any]] = {}
+        self.extractors: Dict[str, Callable[[Any, Dict[str, Any]], tuple]] = {}
+
+    def handles(self, *types: str):
+        """登錄處理函式的裝飾器"""
+        def register(func):
+            for event_type in types:
+                self.handlers[event_type] = func
+            return func
+        return register
+
+    def args(self, *types: str):
+        """登錄參數擷取函式的裝飾器（編譯時呼叫一次）"""
+        def register(func):
+            for event_type in types:
+                self.extractors[event_type] = func
+            return func
+        return register
+
+    def compile(self, owner, event: Dict[str, Any]) -> Compiled:
+        event_type = event.get('type')
+        handler = self.handlers.get(event_type)
+        if handler is None:
+            return _ignore, (event,)
+        extractor = self.extractors.get(event_type)
+        if extractor is None:
+            return handler, (event,)
+        return handler, extractor(owner, event)
+
+
+class CompiledEvents:
+    """以事件索引快取編譯結果；事件列表或該位置的事件物件換掉時重新編譯"""
+
+    def __init__(self, registry: HandlerRegistry):
+        self.registry = registry
+        self._events: Optional[Sequence] = None
+        self._entries: List[Optional[Tuple[Any, Callable[..., Any], tuple]]] = []
+        self.compiled = 0
+
+    def reset(self) -> None:
+        self._events = None
+        self._entries = []
+
+    def lookup(self, owner, events: Sequence, index: int, event: Dict[str, Any]) -> Compiled:
+        """取得 events[index]（即 event）的 (處理函式, 參數)；event 不是該位置的事件時只編譯不快取"""
+        entries = self._entries
+        if self._events is events and 0 <= index < len(entries):
+            entry = entries[index]
+            if entry is not None and entry[0] is event:
+                return entry[1], entry[2]
+        elif self._events is not events or len(entries) != len(events):
+            self._events = events
+            entries = self._entries = [None] * len(events)
+        if 0 <= index < len(entries):
+            if events[index] is event:
+                handler, args = self.registry.compile(owner, event)
+                entries[index] = (event, handler, args)
+                self.compiled += 1
+                return handler, args
+        return self.registry.compile(owner, event)
+
+
+# ─── 效能測試 ──────────────────────────────────────────────
+
+# CoreRecorder 原本 if/elif 串的類型順序
+_CHAIN_TYPES = (
+    'region_end', 'keyboard', 'mouse', 'recognize_image', 'move_to_image', 'click_image',
+    'if_image_exists', 'if_text_exists', 'wait_text', 'wait_image', 'click_text',
+    'ocr_relative_input', 'click_image_anchor', 'ocr_auto_input', 'ocr_input', 'recognize_any',
+    'set_variable', 'variable_operation', 'if_variable', 'if_all_images_exist',
+    'if_any_image_exists', 'loop_start', 'loop_end', 'random_delay', 'random_branch',
+    'random_jump', 'try_action', 'counter_trigger', 'timer_trigger', 'reset_counter',
+    'reset_timer', 'delayed_start', 'delayed_end', 'interval_trigger', 'condition_trigger',
+    'priority_trigger', 'parallel_block', 'state_machine', 'yolo_detect', 'set_bezier',
+)
+
+
+def _name_to_vk(key_name: str) -> int:
+    """與 CoreRecorder._name_to_vk 相同的成本：每次呼叫都重建對照表"""
+    key_name = key_name.lower()
+    key_map = {name: 0x08 + n for n, name in enumerate((
+        'enter', 'space', 'tab', 'backspace', 'delete', 'esc', 'shift', 'shift_l', 'shift_r',
+        'ctrl', 'ctrl_l', 'ctrl_r', 'alt', 'alt_l', 'alt_r', 'left', 'right', 'up', 'down',
+        'caps_lock', 'num_lock', 'scroll_lock', 'insert', 'home', 'end', 'page_up', 'page_down',
+        'cmd', 'win'))}
+    for i in range(1, 25):
+        key_map[f'f{i}'] = 0x70 + i - 1
+    if len(key_name) == 1 and ('a' <= key_name <= 'z' or '0' <= key_name <= '9'):
+        return ord(key_name.upper())
+    return key_map.get(key_name, 0)
+
+
+def benchmark(count: int = 100000) -> Dict[str, Dict[str, float]]:
+    """每種事件類型的分派成本（奈秒 / 筆）：if/elif 串 vs 預編譯
+
+    兩種方式的處理函式做同樣的事（取出參數後交給 sink），只比較分派、讀取欄位與按鍵碼轉換。
+    if/elif 串的成本隨類型在串中的位置增加；預編譯與類型無關。
+    """
+    sink: List[Any] = []
+
+    # 1. if/elif 串：依序比對字串，分支內讀取欄位與預設值
+    chain_src = ["def chain(owner, event):"]
+    for n, event_type in enumerate(_CHAIN_TYPES):
+        keyword = "if" if n == 0 else "elif"
+        chain_src.append(f"    {keyword} event['type'] == {event_type!r}:")
+        if event_type == 'keyboard':
+            chain_src.append("        sink.append((event['event'], name_to_vk(event['name'])))")
+        elif event_type == 'mouse':
+            chain_src.append("        sink.append((event['event'], int(event.get('x')), int(event.get('y')),"
+                             " event.get('button', 'left'), event.get('delta', 0), event.get('duration', 0.2)))")
+        else:
+            chain_src.append("        sink.append((event.get('name', ''), event.get('value', 0)))")
+    namespace: Dict[str, Any] = {'sink': sink, 'name_to_vk': _name_to_vk}
+    exec("\n".join(chain_src), namespace)
+    chain = namespace['chain']
+
+    # 2. 預編譯：處理函式 + 預先取出的參數（按鍵碼已轉換）
+    registry = HandlerRegistry()
+
+    @registry.handles('keyboard')
+    def _key(owner, kind, vk):
+        sink.append((kind, vk))
+
+    @registry.args('keyboard')
+    def _key_args(owner, event):
+        return event['event'], _name_to_vk(event['name'])
+
+    @registry.handles('mouse')
+    def _mouse(owner, kind, x, y, button, delta, duration):
+        sink.append((kind, x, y, button, delta, duration))
+
+    @registry.args('mouse')
+    def _mouse_args(owner, event):
+        return (event['event'], int(event.get('x')), int(event.get('y')),
+                event.get('button', 'left'), event.get('delta', 0), event.get('duration', 0.2))
+
+    def _other(owner, event):
+        sink.append((event.get('name', ''), event.get('value', 0)))
+
+    for event_type in _CHAIN_TYPES:
+        if event_type not in registry.handlers:
+            registry.handles(event_type)(_other)
+
+    samples = {
+        'mouse': {'type': 'mouse', 'event': 'move', 'x': 100, 'y': 200, 'time': 0.0, 'in_target': True},
+        'keyboard': {'type': 'keyboard', 'event': 'down', 'name': 'enter', 'time': 0.0},
+        'set_variable': {'type': 'set_variable', 'name': 'n', 'value': 1, 'time': 0.0},
+        'set_bezier': {'type': 'set_bezier', 'enabled': True, 'time': 0.0},
+    }
+    results: Dict[str, Dict[str, float]] = {}
+    for label, sample in samples.items():
+        events = [dict(sample, time=i * 0.001) for i in range(count)]
+        compiled = CompiledEvents(registry)
+        for index, event in enumerate(events):
+            compiled.lookup(None, events, index, event)
+
+        sink.clear()
+        start = time.perf_counter()
+        for event in events:
+            chain(None, event)
+        chain_ns = (time.perf_counter() - start) / count * 1e9
+
+        sink.clear()
+        start = time.perf_counter()
+        for index, event in enumerate(events):
+            handler, args = compiled.lookup(None, events, index, event)
+            handler(None, *args)
+        compiled_ns = (time.perf_counter() - start) / count * 1e9
+        results[label] = {'position': _CHAIN_TYPES.index(label) + 1,
+                          'if_elif_ns': chain_ns, 'compiled_ns': compiled_ns}
+    return results
+
+
+if __name__ == "__main__":
+    for event_type, result in benchmark().items():
+        print(f"{event_type}（串中第 {result['position']} 個）: if/elif {result['if_elif_ns']:.0f} ns，"
+              f"預編譯 {result['compiled_ns']:.0f} ns")
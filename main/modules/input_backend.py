@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 輸入注入後端 (input_backend.py)
+==============================================
+輸入注入原本直接呼叫 ctypes.windll.user32（SetCursorPos / keybd_event / SendInput）、
+win32api 與 keyboard 模組，分散在 CoreRecorder、TriggerManager、BezierMouseMover 與 UIStateMachine，
+離開 Windows 桌面就無法執行或量測。
+
+InputBackend 定義注入介面（座標為螢幕座標，按鈕為 'left' / 'right' / 'middle'）：
+  - move(x, y) / position() / screen_bounds()
+  - button(按鈕, down) / wheel(格數)
+  - key(虛擬鍵碼, down)            SendInput 掃描碼（DirectInput 遊戲相容）
+  - key_name(名稱, down) / tap(名稱) / write(文字)   keyboard 模組的按鍵名稱與文字輸入
+  - release_modifiers(虛擬鍵碼...)  強制放開修飾鍵
+  - send_batch(動作列表)           [('move', x, y) / ('key', 虛擬鍵碼, down)] 一次注入；
+                                   播放時截止時間相差在 DEFAULT_BATCH_TOLERANCE 秒內的連續移動與按鍵合併送出
+
+實作：
+  - Win32InputBackend       原本的 Windows API 呼叫（INPUT 結構在模組載入時定義一次）
+  - RecordingInputBackend   不注入任何輸入，記錄每個動作與時間（perf_counter）；
+                            record=False 時只計數（null 後端）。用於 Linux / 無桌面環境的整份腳本播放量測
+
+default_backend() 在 Windows 回傳 Win32InputBackend，其他平台回傳 RecordingInputBackend。
+
+    python modules/input_backend.py <腳本.json> [--speed 倍率] [--no-batch]   以記錄後端播放腳本並輸出統計
+"""
+
+import ctypes
+import sys
+from abc import ABC, abstractmethod
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+DEFAULT_BATCH_TOLERANCE = 0.004  # 秒
+
+MODIFIER_VKS = (0x10, 0x11, 0x12)  # Shift, Ctrl, Alt
+ALL_MODIFIER_VKS = (0x10, 0x11, 0x12, 0x5B, 0x5C)  # 加上左右 Win 鍵
+
+# 需要 KEYEVENTF_EXTENDEDKEY 的虛擬鍵碼（方向鍵、Insert/Delete、Home/End、PageUp/PageDown 等）
+EXTENDED_VKS = frozenset((0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2C, 0x2D, 0x2E,
+                          0x5B, 0x5C, 0xA3, 0xA5))
+
+_BUTTON_FLAGS = {
+    'left': (0x0002, 0x0004),    # MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP
+    'right': (0x0008, 0x0010),   # MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP
+    'middle': (0x0020, 0x0040),  # MOUSEEVENTF_MIDDLEDOWN, MOUSEEVENTF_MIDDLEUP
+}
+MOUSEEVENTF_MOVE = 0x0001
+MOUSEEVENTF_WHEEL = 0x0800
+MOUSEEVENTF_VIRTUALDESK = 0x4000
+MOUSEEVENTF_ABSOLUTE = 0x8000
+KEYEVENTF_EXTENDEDKEY = 0x0001
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_SCANCODE = 0x0008
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+
+
+# 100% 規格相容的 Win32 INPUT 結構定義 (防止 64 位元對齊錯誤)
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [
+        ("dx", ctypes.c_long),
+        ("dy", ctypes.c_long),
+        ("mouseData", ctypes.c_ulong),
+        ("dwFlags", ctypes.c_ulong),
+        ("time", ctypes.c_ulong),
+        ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))
+    ]
+
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [
+        ("wVk", ctypes.c_ushort),
+        ("wScan", ctypes.c_ushort),
+        ("dwFlags", ctypes.c_ulong),
+        ("time", ctypes.c_ulong),
+        ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))
+    ]
+
+
+class HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [
+        ("uMsg", ctypes.c_ulong),
+        ("wParamL", ctypes.c_ushort),
+        ("wParamH", ctypes.c_ushort)
+    ]
+
+
+class INPUT_UNION(ctypes.Union):
+    _fields_ = [
+        ("mi", MOUSEINPUT),
+        ("ki", KEYBDINPUT),
+        ("hi", HARDWAREINPUT)
+    ]
+
+
+class INPUT(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_ulong),
+        ("u", INPUT_UNION)
+    ]
+
+
+class POINT(ctypes.Structure):
+    _fields_ = [("x", ctypes.c_long), ("y", ctypes.c_long)]
+
+
+class InputBackend(ABC):
+    """輸入注入介面（子類別須實作所有抽象方法，缺少時建立實例即失敗）"""
+
+    name = "base"
+
+    @abstractmethod
+    def move(self, x: int, y: int) -> None:
+        """移動游標到螢幕座標 (x, y)"""
+
+    @abstractmethod
+    def position(self) -> Tuple[int, int]:
+        """目前游標位置 (x, y)"""
+
+    @abstractmethod
+    def screen_bounds(self) -> Tuple[int, int, int, int]:
+        """虛擬螢幕範圍 (left, top, right, bottom)，支援多螢幕與負座標"""
+
+    @abstractmethod
+    def button(self, button: str, down: bool) -> bool:
+        """按下 / 放開滑鼠按鈕，回傳是否成功送出"""
+
+    @abstractmethod
+    def wheel(self, delta: float) -> bool:
+        """滾輪（格數，正值向上）"""
+
+    @abstractmethod
+    def key(self, vk: int, down: bool) -> bool:
+        """以虛擬鍵碼按下 / 放開按鍵"""
+
+    @abstractmethod
+    def key_name(self, name: str, down: bool) -> None:
+        """以 keyboard 模組的按鍵名稱按下 / 放開（沒有虛擬鍵碼的按鍵、組合鍵）"""
+
+    @abstractmethod
+    def tap(self, name: str) -> None:
+        """按下並放開（可為組合鍵，如 'ctrl+v'）"""
+
+    @abstractmethod
+    def write(self, text: str, delay: float = 0.0) -> None:
+        """輸入文字（delay 為每個字元之間的間隔秒數）"""
+
+    @abstractmethod
+    def release_modifiers(self, vks: Sequence[int] = MODIFIER_VKS) -> None:
+        """強制放開修飾鍵（不論目前是否按下）"""
+
+    def send_batch(self, actions: Sequence[tuple]) -> int:
+        """依序注入 [('move', x, y) / ('key', 虛擬鍵碼, down)]，回傳送出的數量（預設逐一呼叫）"""
+        for action in actions:
+            if action[0] == 'move':
+                self.move(action[1], action[2])
+            else:
+                self.key(action[1], action[2])
+        return len(actions)
+
+
+class Win32InputBackend(InputBackend):
+    """Windows API 注入：SetCursorPos、SendInput、keybd_event 與 keyboard 模組"""
+
+    name = "win32"
+
+    def __init__(self):
+        self.user32 = ctypes.windll.user32
+        self._input_size = ctypes.sizeof(INPUT)
+        self._keyboard = None
+
+    def _keyboard_module(self):
+        if self._keyboard is None:
+            import keyboard
+            self._keyboard = keyboard
+        return self._keyboard
+
+    def _send(self, inp: INPUT) -> bool:
+        # 使用 SendInput 發送輸入（硬體級別）
+        return self.user32.SendInput(1, ctypes.byref(inp), self._input_size) != 0
+
+    def move(self, x, y):
+        self.user32.SetCursorPos(int(x), int(y))
+
+    def position(self):
+        point = POINT()
+        self.user32.GetCursorPos(ctypes.byref(point))
+        return point.x, point.y
+
+    def screen_bounds(self):
+        # SM_XVIRTUALSCREEN / SM_YVIRTUALSCREEN / SM_CXVIRTUALSCREEN / SM_CYVIRTUALSCREEN
+        metrics = self.user32.GetSystemMetrics
+        left, top = metrics(76), metrics(77)
+        return left, top, left + metrics(78), top + metrics(79)
+
+    def button(self, button, down):
+        flag = _BUTTON_FLAGS.get(button, _BUTTON_FLAGS['left'])[0 if down else 1]
+        inp = INPUT()
+        inp.type = INPUT_MOUSE
+        inp.u.mi = MOUSEINPUT(0, 0, 0, flag, 0, None)
+        return self._send(inp)
+
+    def wheel(self, delta):
+        inp = INPUT()
+        inp.type = INPUT_MOUSE
+        inp.u.mi = MOUSEINPUT(0, 0, int(delta * 120), MOUSEEVENTF_WHEEL, 0, None)
+        return self._send(inp)
+
+    def _fill_key(self, inp: INPUT, vk: int, down: bool) -> None:
+        flags = 0 if down else KEYEVENTF_KEYUP
+        # 智慧型映射虛擬鍵碼至掃描碼，100% 相容 DirectX/DirectInput 遊戲與各類輸入框
+        scan_code = self.user32.MapVirtualKeyW(vk, 0)
+        if scan_code:
+            flags |= KEYEVENTF_SCANCODE
+            if vk in EXTENDED_VKS:
+                flags |= KEYEVENTF_EXTENDEDKEY
+        inp.type = INPUT_KEYBOARD
+        inp.u.ki = KEYBDINPUT(vk, scan_code, flags, 0, None)
+
+    def key(self, vk, down):
+        inp = INPUT()
+        self._fill_key(inp, vk, down)
+        return self._send(inp)
+
+    def send_batch(self, actions):
+        """單次 SendInput 送出整批動作；移動以虛擬螢幕正規化絕對座標表示"""
+        count = len(actions)
+        if not count:
+            return 0
+        inputs = (INPUT * count)()
+        left, top, right, bottom = self.screen_bounds()
+        scale_x = 65535 / max(1, right - left - 1)
+        scale_y = 65535 / max(1, bottom - top - 1)
+        move_flags = MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_VIRTUALDESK
+        last_move = None
+        for inp, action in zip(inputs, actions):
+            if action[0] == 'move':
+                inp.type = INPUT_MOUSE
+                mi = inp.u.mi
+                mi.dx = int(round((action[1] - left) * scale_x))
+                mi.dy = int(round((action[2] - top) * scale_y))
+                mi.dwFlags = move_flags
+                last_move = action
+            else:
+                self._fill_key(inp, action[1], action[2])
+        sent = self.user32.SendInput(count, inputs, self._input_size)
+        if last_move is not None:
+            # 正規化座標換算可能有 1 像素誤差：以 SetCursorPos 校正最終位置
+            self.user32.SetCursorPos(int(last_move[1]), int(last_move[2]))
+        return sent
+
+    def key_name(self, name, down):
+        keyboard = self._keyboard_module()
+        if down:
+            keyboard.press(name)
+        else:
+            keyboard.release(name)
+
+    def tap(self, name):
+        self._keyboard_module().press_and_release(name)
+
+    def write(self, text, delay=0.0):
+        self._keyboard_module().write(text, delay=delay)
+
+    def release_modifiers(self, vks=MODIFIER_VKS):
+        for vk in vks:
+            self.user32.keybd_event(vk, 0, KEYEVENTF_KEYUP, 0)
+
+
+class RecordingInputBackend(InputBackend):
+    """不注入輸入，記錄每個動作 (時間, 動作, 參數)；record=False 時只計數"""
+
+    name = "recording"
+
+    def __init__(self, record: bool = True, bounds: Tuple[int, int, int, int] = (0, 0, 1920, 1080)):
+        self.record = record
+        self.bounds = bounds
+        self.clock = time.perf_counter
+        self.cursor = ((bounds[0] + bounds[2]) // 2, (bounds[1] + bounds[3]) // 2)
+        self.actions: List[Tuple[float, str, tuple]] = []
+        self.counts: Dict[str, int] = {}
+        self.started = self.clock()
+
+    def _log(self, action: str, *args) -> bool:
+        self.counts[action] = self.counts.get(action, 0) + 1
+        if self.record:
+            self.actions.append((self.clock(), action, args))
+        return True
+
+    def clear(self) -> None:
+        self.actions = []
+        self.counts = {}
+        self.started = self.clock()
+
+    def move(self, x, y):
+        self.cursor = (int(x), int(y))
+        self._log('move', int(x), int(y))
+
+    def position(self):
+        return self.cursor
+
+    def screen_bounds(self):
+        return self.bounds
+
+    def button(self, button, down):
+        return self._log('down' if down else 'up', button, self.cursor)
+
+    def wheel(self, delta):
+        return self._log('wheel', delta, self.cursor)
+
+    def key(self, vk, down):
+        return self._log('key_down' if down else 'key_up', vk)
+
+    def key_name(self, name, down):
+        self._log('key_down' if down else 'key_up', name)
+
+    def tap(self, name):
+        self._log('tap', name)
+
+    def write(self, text, delay=0.0):
+        self._log('write', text)
+
+    def release_modifiers(self, vks=MODIFIER_VKS):
+        self._log('release_modifiers', tuple(vks))
+
+    def send_batch(self, actions):
+        self._log('batch', len(actions))
+        counts = self.counts
+        now = self.clock()
+        for action in actions:
+            if action[0] == 'move':
+                kind, args = 'move', (action[1], action[2])
+                self.cursor = args
+            else:
+                kind, args = ('key_down' if action[2] else 'key_up'), (action[1],)
+            counts[kind] = counts.get(kind, 0) + 1
+            if self.record:
+                self.actions.append((now, kind, args))
+        return len(actions)
+
+    def summary(self) -> Dict[str, Any]:
+        """{actions, seconds, per_second, counts}；seconds 為第一個到最後一個動作（只計數時為建立至今），
+        counts['batch'] 為批次注入呼叫次數（不計入 actions）"""
+        total = sum(v for k, v in self.counts.items() if k != 'batch')
+        if self.actions:
+            seconds = self.actions[-1][0] - self.actions[0][0]
+        else:
+            seconds = self.clock() - self.started
+        return {"actions": total, "seconds": seconds,
+                "per_second": total / seconds if seconds > 0 else 0.0,
+                "counts": dict(self.counts)}
+
+
+def create_backend(name: str = "auto") -> InputBackend:
+    """依名稱建立後端：'auto'、'win32'、'recording'、'null'"""
+    if name == "auto":
+        name = "win32" if sys.platform == "win32" else "recording"
+    if name == "win32":
+        return Win32InputBackend()
+    if name == "recording":
+        return RecordingInputBackend()
+    if name == "null":
+        return RecordingInputBackend(record=False)
+    raise ValueError(f"未知的輸入後端: {name}")
+
+
+def default_backend() -> InputBackend:
+    return create_backend("auto")
+
+
+def main(argv=None) -> int:
+    """以記錄後端播放整份腳本（不注入任何輸入），輸出注入動作與時間精準度統計"""
+    import argparse
+
+    try:
+        from script_io import load_script
+        from recorder import CoreRecorder
+    except ImportError:
+        from modules.script_io import load_script
+        from modules.recorder import CoreRecorder
+
+    parser = argparse.ArgumentParser(description="ChroLens Mimic 無桌面播放量測")
+    parser.add_argument("script", help="腳本檔")
+    parser.add_argument("--speed", type=float, default=1.0, help="播放速度倍率")
+    parser.add_argument("--null", action="store_true", help="只計數不記錄每個動作")
+    parser.add_argument("--no-batch", action="store_true", help="停用批次注入（逐筆執行）")
+    args = parser.parse_args(argv)
+
+    events = load_script(args.script).get("events") or []
+    if not events:
+        print(f"{args.script}: 沒有事件")
+        return 1
+    backend = RecordingInputBackend(record=not args.null)
+    recorder = CoreRecorder(logger=lambda s: None)
+    recorder.set_input_backend(backend)
+    recorder.events = events
+    if args.no_batch:
+        recorder.batch_tolerance = 0
+    start = time.perf_counter()
+    cpu = time.process_time()
+    if not recorder.play(speed=args.speed):
+        print(f"{args.script}: 無法開始播放")
+        return 1
+    recorder._play_thread.join()
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    summary = backend.summary()
+    counts = "，".join(f"{k} {v:,}" for k, v in sorted(summary["counts"].items()))
+    print(f"{args.script}: 事件 {len(events):,} 筆，耗時 {elapsed:.2f}s，"
+          f"CPU {cpu:.2f}s（每筆事件 {cpu / len(events) * 1e6:.0f} µs），"
+          f"注入動作 {summary['actions']:,} 個（{counts}）")
+    if recorder.play_timer is not None:
+        print(f"  時間精準度: {recorder.play_timer.format_stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 事件驅動滑鼠移動擷取 (mouse_capture.py)
+======================================================
+錄製原本以 10ms 輪詢 MouseController().position：滑鼠靜止時仍每秒喚醒 100 次，
+快速移動時兩次取樣之間的軌跡被略過，每次取樣都建立一個 dict。
+
+MoveSampler 搭配 pynput.mouse.Listener 的 on_move 回呼使用：
+  - 只在系統回報移動時處理，滑鼠靜止時完全不耗 CPU
+  - 與上一筆保留的位置距離小於 min_distance（像素）或間隔小於 min_interval（秒）的移動
+    先暫存不輸出；下一次點擊、滾輪或停止錄製前以 flush() 補上最後位置，
+    停下的位置與點擊前的位置因此永遠準確
+  - 只有保留下來的取樣才需要建立事件 dict 與判斷是否在目標視窗內
+
+TrajectorySimplifier 在錄製中即時簡化移動軌跡（誤差有界的折線簡化，Zhao-Saalfeld 扇形法）：
+  - 從上一個保留點（錨點）出發，每個新點將可行方向收窄為 ±asin(容許誤差/距離) 的扇形，
+    新點方向落在扇形外（或往回走超過容許誤差）時才保留前一點並以它為新錨點
+  - 扇形建立後點離錨點的距離變近（往回走或回到錨點附近）即結束線段，
+    被捨棄的點與保留線段的距離因此不超過 tolerance 像素；每點 O(1) 時間、O(1) 記憶體
+  - 停頓超過 max_gap 秒的位置一定保留，播放時的停留時間不變
+  - 拖曳期間與點擊前後由錄製端略過簡化 / flush()，拖曳路徑與點擊位置保持原樣
+  - 啟用簡化時錄製端將原始 on_move 位置直接交給簡化器（不經 MoveSampler），
+    tolerance 因此是相對實際軌跡的誤差上限；MoveSampler 只用於拖曳與未簡化的錄製
+
+benchmark() 以合成輸入比較輪詢與事件驅動兩種擷取方式的 CPU 用量、事件數與軌跡誤差，
+check_simplify_tolerance() 以會往回走的隨機漫步與高斯抖動軌跡檢查簡化誤差上限：
+    python modules/mouse_capture.py
+"""
+
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_MIN_DISTANCE = 2.0
+DEFAULT_MIN_INTERVAL = 0.008
+
+DEFAULT_TOLERANCE = 3.0
+DEFAULT_MAX_GAP = 0.1
+
+Sample = Tuple[int, int, float]
+
+
+class MoveSampler:
+    """依最小距離 / 最小間隔篩選滑鼠移動（單一執行緒使用：pynput 監聽執行緒）"""
+
+    def __init__(self, min_distance: float = DEFAULT_MIN_DISTANCE,
+                 min_interval: float = DEFAULT_MIN_INTERVAL):
+        self.min_distance = min_distance
+        self.min_interval = min_interval
+        self._min_dist_sq = min_distance * min_distance
+        self._last: Optional[Sample] = None
+        self._pending: Optional[Sample] = None
+        self.received = 0
+        self.emitted = 0
+
+    def reset(self, x: int, y: int, t: float) -> None:
+        """以已輸出的位置作為起點（錄製開始時的初始位置）"""
+        self._last = (x, y, t)
+        self._pending = None
+
+    def offer(self, x: int, y: int, t: float) -> Optional[Sample]:
+        """處理一次移動；需要輸出時回傳 (x, y, t)，否則暫存並回傳 None"""
+        self.received += 1
+        last = self._last
+        if last is not None:
+            dx = x - last[0]
+            dy = y - last[1]
+            if dx * dx + dy * dy < self._min_dist_sq or t - last[2] < self.min_interval:
+                self._pending = (x, y, t)
+                return None
+        self._pending = None
+        self._last = (x, y, t)
+        self.emitted += 1
+        return self._last
+
+    def flush(self) -> Optional[Sample]:
+        """回傳尚未輸出的最後位置（與上一筆輸出位置不同時），並清除暫存"""
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return None
+        last = self._last
+        if last is not None and pending[0] == last[0] and pending[1] == last[1]:
+            return None
+        self._last = pending
+        self.emitted += 1
+        return pending
+
+
+class TrajectorySimplifier:
+    """串流式、誤差有界的滑鼠軌跡簡化（單一執行緒使用）"""
+
+    def __init__(self, tolerance: float = DEFAULT_TOLERANCE, max_gap: float = DEFAULT_MAX_GAP):
+        """
+        Args:
+            tolerance: 捨棄的點與保留線段之間的最大距離（像素）
+            max_gap:   兩次移動間隔超過此秒數時，停頓前的位置一定保留
+        """
+        self.tolerance = tolerance
+        self.max_gap = max_gap
+        self.received = 0
+        self.emitted = 0
+        self._anchor: Optional[Sample] = None
+        self._last: Optional[Sample] = None  # 最後一個尚未輸出的點
+        self._base = 0.0  # 扇形的基準方向
+        self._lo: Optional[float] = None  # 扇形範圍（相對基準方向的弧度）
+        self._hi = 0.0
+        self._far = 0.0  # 目前線段離錨點最遠的距離
+
+    def reset(self, x: int, y: int, t: float) -> None:
+        """以已輸出的位置作為新錨點（點擊、放開或錄製開始時），捨棄未輸出的點"""
+        self._anchor = (x, y, t)
+        self._last = None
+        self._lo = None
+        self._far = 0.0
+
+    def _emit_last(self) -> Optional[Sample]:
+        last = self._last
+        if last is None:
+            return None
+        self.emitted += 1
+        self.reset(*last)
+        return last
+
+    def push(self, x: int, y: int, t: float) -> List[Sample]:
+        """加入一個點，回傳需要輸出的點（通常為空或一個）"""
+        self.received += 1
+        out: List[Sample] = []
+        if self._anchor is None:
+            self._anchor = (x, y, t)
+            self.emitted += 1
+            return [(x, y, t)]
+        if self._last is not None and t - self._last[2] > self.max_gap:
+            # 停頓：保留停頓前的位置
+            out.append(self._emit_last())
+        if not self._fits(x, y):
+            emitted = self._emit_last()
+            if emitted is not None:
+                out.append(emitted)
+            self._fits(x, y)  # 以新錨點重新建立扇形
+        self._last = (x, y, t)
+        return out
+
+    def _fits(self, x: int, y: int) -> bool:
+        """檢查點是否仍在目前線段的容許範圍內，是則收窄扇形"""
+        ax, ay, _at = self._anchor
+        dx = x - ax
+        dy = y - ay
+        d = math.hypot(dx, dy)
+        tol = self.tolerance
+        if self._lo is None:
+            if d <= tol:
+                return True  # 尚未離開錨點的容許範圍，方向未定
+        elif d < self._far:
+            # 扇形已建立後離錨點變近（回到錨點附近或往回走）：之前較遠的點會超出線段終點
+            return False
+        theta = math.atan2(dy, dx)
+        half = math.asin(tol / d)
+        if self._lo is None:
+            self._base = theta
+            self._lo, self._hi = -half, half
+            self._far = d
+            return True
+        rel = (theta - self._base + math.pi) % (2 * math.pi) - math.pi
+        if rel < self._lo or rel > self._hi:
+            return False
+        self._lo = max(self._lo, rel - half)
+        self._hi = min(self._hi, rel + half)
+        self._far = max(self._far, d)
+        return True
+
+    def flush(self) -> Optional[Sample]:
+        """輸出最後一個尚未輸出的點（軌跡終點），並以它為新錨點"""
+        return self._emit_last()
+
+
+def simplify_moves(samples: List[Sample], tolerance: float = DEFAULT_TOLERANCE,
+                   max_gap: float = DEFAULT_MAX_GAP) -> List[Sample]:
+    """一次簡化整段移動（測試與離線使用）"""
+    simplifier = TrajectorySimplifier(tolerance, max_gap)
+    out: List[Sample] = []
+    for x, y, t in samples:
+        out.extend(simplifier.push(x, y, t))
+    last = simplifier.flush()
+    if last is not None:
+        out.append(last)
+    return out
+
+
+def _max_deviation(samples: List[Sample], kept: List[Sample]) -> float:
+    """每個原始點與簡化後對應線段的最大距離（像素）"""
+    worst = 0.0
+    j = 0
+    for x, y, t in samples:
+        while j + 1 < len(kept) and kept[j + 1][2] < t:
+            j += 1
+        if j + 1 >= len(kept):
+            x0, y0, _ = kept[j]
+            worst = max(worst, math.hypot(x - x0, y - y0))
+            continue
+        (x0, y0, _), (x1, y1, _) = kept[j], kept[j + 1]
+        vx, vy = x1 - x0, y1 - y0
+        length_sq = vx * vx + vy * vy
+        f = 0.0 if length_sq == 0 else max(0.0, min(1.0, ((x - x0) * vx + (y - y0) * vy) / length_sq))
+        worst = max(worst, math.hypot(x - (x0 + f * vx), y - (y0 + f * vy)))
+    return worst
+
+
+# ─── 效能測試 ──────────────────────────────────────────────
+
+def _synthetic_position(t: float) -> Tuple[int, int]:
+    """合成軌跡：每 1 秒為一段，前 0.4 秒快速畫弧，其餘時間靜止"""
+    cycle, phase = divmod(t, 1.0)
+    base_x = 400 + 50 * (int(cycle) % 5)
+    if phase < 0.4:
+        a = phase / 0.4 * math.pi
+        return int(base_x + 600 * (1 - math.cos(a)) / 2), int(300 + 250 * math.sin(a))
+    return base_x + 600, 300
+
+
+def _path_error(truth: List[Sample], recorded: List[Sample]) -> float:
+    """每個真實位置與當時已錄製的折線（線性內插）之間的最大距離（像素）"""
+    if not recorded:
+        return float("inf")
+    worst = 0.0
+    j = 0
+    for x, y, t in truth:
+        while j + 1 < len(recorded) and recorded[j + 1][2] <= t:
+            j += 1
+        x0, y0, t0 = recorded[j]
+        if j + 1 < len(recorded) and t >= t0:
+            x1, y1, t1 = recorded[j + 1]
+            f = (t - t0) / (t1 - t0) if t1 > t0 else 0.0
+            px, py = x0 + (x1 - x0) * f, y0 + (y1 - y0) * f
+        else:
+            px, py = x0, y0
+        worst = max(worst, math.hypot(x - px, y - py))
+    return worst
+
+
+def _run_polling(duration: float, make_event: Callable[[int, int, float], Dict]) -> Dict:
+    """重現原本的 10ms 輪詢迴圈"""
+    events: List[Dict] = []
+    result: Dict = {}
+
+    def _loop():
+        cpu0 = time.thread_time()
+        start = time.perf_counter()
+        last_pos = None
+        while True:
+            now = time.perf_counter() - start
+            if now >= duration:
+                break
+            pos = _synthetic_position(now)
+            if pos != last_pos:
+                events.append(make_event(pos[0], pos[1], now))
+                last_pos = pos
+            time.sleep(0.01)  # 10ms sampling
+        result["cpu"] = time.thread_time() - cpu0
+
+    thread = threading.Thread(target=_loop)
+    thread.start()
+    thread.join()
+    result["events"] = events
+    return result
+
+
+def _run_event_driven(duration: float, rate: float, sampler: MoveSampler,
+                      make_event: Callable[[int, int, float], Dict]) -> Dict:
+    """以固定頻率產生移動回呼（滑鼠靜止時不產生），只計算回呼本身的 CPU 時間"""
+    events: List[Dict] = []
+    truth: List[Sample] = []
+    cpu = 0.0
+    step = 1.0 / rate
+    start = time.perf_counter()
+    last_pos = None
+    next_t = 0.0
+    while next_t < duration:
+        delay = next_t - (time.perf_counter() - start)
+        if delay > 0:
+            time.sleep(delay)
+        pos = _synthetic_position(next_t)
+        if pos != last_pos:
+            last_pos = pos
+            truth.append((pos[0], pos[1], next_t))
+            c0 = time.thread_time()
+            sample = sampler.offer(pos[0], pos[1], next_t)
+            if sample is not None:
+                events.append(make_event(*sample))
+            cpu += time.thread_time() - c0
+        next_t += step
+    c0 = time.thread_time()
+    sample = sampler.flush()
+    if sample is not None:
+        events.append(make_event(*sample))
+    cpu += time.thread_time() - c0
+    return {"events": events, "cpu": cpu, "truth": truth}
+
+
+def benchmark(duration: float = 3.0, rate: float = 500.0,
+              min_distance: float = DEFAULT_MIN_DISTANCE,
+              min_interval: float = DEFAULT_MIN_INTERVAL) -> Dict[str, Dict[str, float]]:
+    """比較輪詢與事件驅動擷取（rate 為合成滑鼠回報頻率，Hz）"""
+    def make_event(x, y, t):
+        return {'type': 'mouse', 'event': 'move', 'x': x, 'y': y, 'time': t, 'in_target': True}
+
+    polled = _run_polling(duration, make_event)
+    driven = _run_event_driven(duration, rate, MoveSampler(min_distance, min_interval), make_event)
+    truth = driven["truth"]
+    report = {}
+    for name, run in (("polling", polled), ("event", driven)):
+        samples = [(e['x'], e['y'], e['time']) for e in run["events"]]
+        report[name] = {
+            "events": len(samples),
+            "events_per_sec": len(samples) / duration,
+            "cpu_ms": run["cpu"] * 1000,
+            "cpu_percent": run["cpu"] / duration * 100,
+            "max_path_error_px": _path_error(truth, samples),
+        }
+    return report
+
+
+def benchmark_simplify(duration: float = 10.0, rate: float = 1000.0,
+                       tolerance: float = DEFAULT_TOLERANCE) -> Dict[str, float]:
+    """以合成軌跡（1000Hz 回報率的快速弧線 + 微小抖動）測試即時簡化的保留比例與最大誤差"""
+    import random
+    rng = random.Random(1)
+    samples: List[Sample] = []
+    last = None
+    for i in range(int(duration * rate)):
+        t = i / rate
+        x, y = _synthetic_position(t)
+        pos = (x + rng.randint(-1, 1), y + rng.randint(-1, 1)) if (t % 1.0) < 0.4 else (x, y)
+        if pos != last:
+            samples.append((pos[0], pos[1], t))
+            last = pos
+    start = time.perf_counter()
+    kept = simplify_moves(samples, tolerance)
+    elapsed = time.perf_counter() - start
+    return {
+        "moves": len(samples),
+        "kept": len(kept),
+        "ratio": len(samples) / max(1, len(kept)),
+        "max_deviation_px": _max_deviation(samples, kept),
+        "us_per_point": elapsed / max(1, len(samples)) * 1e6,
+    }
+
+
+def check_simplify_tolerance(seeds: int = 20, points: int = 3000,
+                             tolerances: Tuple[float, ...] = (1.0, DEFAULT_TOLERANCE, 5.0)) -> float:
+    """以隨機漫步（會往回走）與高斯抖動軌跡檢查簡化誤差不超過 tolerance，回傳最大誤差 / tolerance
+
+    Raises:
+        AssertionError: 任一軌跡的最大誤差超過 tolerance
+    """
+    import random
+    worst_ratio = 0.0
+    for seed in range(seeds):
+        rng = random.Random(seed)
+        x = y = 500
+        walk: List[Sample] = []
+        jitter: List[Sample] = []
+        for i in range(points):
+            t = i * 0.001
+            x += rng.randint(-4, 4)
+            y += rng.randint(-4, 4)
+            walk.append((x, y, t))
+            jitter.append((int(round(500 + i * 0.3 + rng.gauss(0, 2))), int(round(400 + rng.gauss(0, 2))), t))
+        for samples in (walk, jitter):
+            for tolerance in tolerances:
+                deviation = _max_deviation(samples, simplify_moves(samples, tolerance))
+                assert deviation <= tolerance + 1e-6, \
+                    f"簡化誤差 {deviation:.2f}px 超過容許值 {tolerance:g}px（seed={seed}）"
+                worst_ratio = max(worst_ratio, deviation / tolerance)
+    return worst_ratio
+
+
+if __name__ == "__main__":
+    for mode, stats in benchmark().items():
+        print(mode + ": " + ", ".join(f"{k}={v:.2f}" for k, v in stats.items()))
+    print("simplify: " + ", ".join(f"{k}={v:.2f}" for k, v in benchmark_simplify().items()))
+    print(f"simplify check: 最大誤差 / 容許值 = {check_simplify_tolerance():.3f}")
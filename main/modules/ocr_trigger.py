@@ -8,6 +8,7 @@ import cv2
 import numpy as np
 import time
 import os
+import threading
 
 # 嘗試匯入 OCR 庫
 import importlib.util
@@ -97,12 +98,14 @@ class OCRTrigger:
             return cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
         return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-    def recognize(self, img, is_captcha=True):
+    def recognize(self, img, is_captcha=True, logger=None):
         """
         辨識圖片中的文字
         img: numpy BGR 陣列 或 PIL Image
         is_captcha: 是否為驗證碼模式
+        logger: 本次呼叫的日誌函式（None 時使用建立實例時的 logger）
         """
+        log = logger or self.logger
         if not self.is_available() or img is None:
             return ""
 
@@ -189,18 +192,20 @@ class OCRTrigger:
                 return result.strip()
                 
         except Exception as e:
-            self.logger(f"[OCR] 辨識過程中發生錯誤: {e}")
+            log(f"[OCR] 辨識過程中發生錯誤: {e}")
             return ""
         
         return ""
 
-    def find_text_position(self, snapshot, target_text, match_mode="contains", region=None):
+    def find_text_position(self, snapshot, target_text, match_mode="contains", region=None, logger=None):
         """
         在截圖中尋找特定文字的位置
         snapshot: numpy BGR 陣列
         target_text: 目標文字
         region: 搜尋區域 (x, y, w, h)
+        logger: 本次呼叫的日誌函式（None 時使用建立實例時的 logger）
         """
+        log = logger or self.logger
         if not self.is_available() or snapshot is None:
             return None
 
@@ -320,11 +325,11 @@ class OCRTrigger:
                                 res_y += region[1]
                             return (res_x, res_y)
                 except Exception as det_e:
-                    self.logger(f"[OCR] ddddocr 偵測失敗: {det_e}")
+                    log(f"[OCR] ddddocr 偵測失敗: {det_e}")
                     pass
                 
         except Exception as e:
-            self.logger(f"[OCR] 尋找文字位置失敗: {e}")
+            log(f"[OCR] 尋找文字位置失敗: {e}")
             
         return None
 
@@ -342,11 +347,12 @@ class OCRTrigger:
         except:
             return 0
 
-    def find_captcha_on_screen(self, snapshot):
+    def find_captcha_on_screen(self, snapshot, logger=None):
         """
         [AI 主動搜尋] 在全螢幕中自動尋找看起來像驗證碼的區塊
         回傳: (x, y, w, h, text, crop) 或 None
         """
+        log = logger or self.logger
         if not self.is_available() or snapshot is None:
             return None
             
@@ -376,7 +382,7 @@ class OCRTrigger:
                         continue
                         
                     # 辨識內容
-                    text = self.recognize(crop, is_captcha=True).strip()
+                    text = self.recognize(crop, is_captcha=True, logger=log).strip()
                     
                     # 如果辨識出 3-7 個字元，且包含英數，則視為潛在驗證碼
                     if 3 <= len(text) <= 7:
@@ -394,10 +400,11 @@ class OCRTrigger:
             return (best[0], best[1], best[2], best[3], best[4], best[5])
             
         except Exception as e:
-            self.logger(f"[OCR] 自動搜尋驗證碼失敗: {e}")
+            log(f"[OCR] 自動搜尋驗證碼失敗: {e}")
             return None
 
-    def wait_for_text(self, target_text, capture_func, timeout=10.0, match_mode="contains", interval=0.5):
+    def wait_for_text(self, target_text, capture_func, timeout=10.0, match_mode="contains", interval=0.5,
+                      logger=None):
         """
         循環檢查文字是否出現
         capture_func: 用於獲取截圖的函數
@@ -409,7 +416,7 @@ class OCRTrigger:
                 # 如果 snapshot 是 PIL Image，轉換為 numpy 並確保為 BGR
                 snapshot = self._ensure_bgr(snapshot)
                 
-                text = self.recognize(snapshot, is_captcha=False)
+                text = self.recognize(snapshot, is_captcha=False, logger=logger)
                 
                 is_match = False
                 if match_mode == "exact":
@@ -422,3 +429,24 @@ class OCRTrigger:
             
             time.sleep(interval)
         return False
+
+
+# 共用實例：OCR 模型載入需要數秒，每個 OCR 事件都重新建立會拖慢執行
+_shared_triggers = {}
+_shared_lock = threading.Lock()
+
+
+def get_ocr_trigger(ocr_engine="auto", logger=None):
+    """取得共用的 OCRTrigger（每種引擎只初始化一次，群組播放可事先在背景初始化）
+
+    logger 只用於本次建立實例時的初始化訊息；共用實例的日誌請在各方法呼叫時以 logger= 傳入，
+    平行播放的其他錄製器不會改到彼此的日誌輸出。初始化失敗（沒有可用引擎）的實例不快取，
+    下一個 OCR 事件會重新嘗試初始化。
+    """
+    with _shared_lock:
+        trigger = _shared_triggers.get(ocr_engine)
+        if trigger is None:
+            trigger = OCRTrigger(ocr_engine=ocr_engine, logger=logger)
+            if trigger.is_available():
+                _shared_triggers[ocr_engine] = trigger
+    return trigger
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 播放控制與可中斷等待 (play_control.py)
+=====================================================
+播放相關的等待原本都是輪詢旗標：重複間隔每 0.1 秒、暫停每 0.05 秒、
+等待圖片每個步長、觸發器每 0.1 ~ 0.3 秒檢查一次 playing，
+停止 / 暫停要等到下一次醒來才生效，閒置的執行緒也持續被喚醒。
+
+PlaybackControl 以一個 threading.Condition 保護播放狀態：
+  - set_playing / set_paused / request_jump / request_seek 改變狀態後 notify_all，
+    所有等待中的執行緒立即醒來
+  - sleep(秒)            停止時立即返回 False
+  - wait_interrupted(秒) 停止、暫停或有跳轉請求時立即返回 True（PlaybackTimer 的 sleep）
+  - wait_resumed()       暫停中等待繼續、停止或跳轉請求（不逾時、不輪詢）
+  - wait_for(條件, 秒)   其他執行緒（觸發器等）等待自訂條件；外部旗標改變後呼叫 notify()
+
+benchmark() 比較原本的輪詢等待與 PlaybackControl 從 stop() 到等待返回的延遲：
+    python modules/play_control.py
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class PlaybackControl:
+    """播放狀態（執行中 / 暫停 / 跳轉請求）與可被狀態改變喚醒的等待"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._playing = False
+        self._paused = False
+        self._jump: Optional[str] = None
+        self._seek: Optional[int] = None
+
+    # 狀態讀取不需要鎖（單一屬性讀取）
+    @property
+    def playing(self) -> bool:
+        return self._playing
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    def set_playing(self, value: bool) -> None:
+        with self._cond:
+            self._playing = bool(value)
+            self._cond.notify_all()
+
+    def set_paused(self, value: bool) -> None:
+        with self._cond:
+            self._paused = bool(value)
+            self._cond.notify_all()
+
+    def request_jump(self, label: str) -> None:
+        """請求跳轉至標籤（由播放執行緒以 take_jump() 取出）"""
+        with self._cond:
+            self._jump = label
+            self._cond.notify_all()
+
+    def request_seek(self, index: int) -> None:
+        """請求跳至事件索引（由播放執行緒以 take_seek() 取出）"""
+        with self._cond:
+            self._seek = index
+            self._cond.notify_all()
+
+    def take_jump(self) -> Optional[str]:
+        with self._cond:
+            label, self._jump = self._jump, None
+            return label
+
+    def take_seek(self) -> Optional[int]:
+        with self._cond:
+            index, self._seek = self._seek, None
+            return index
+
+    def clear_requests(self) -> None:
+        with self._cond:
+            self._jump = None
+            self._seek = None
+
+    def notify(self) -> None:
+        """喚醒所有等待中的執行緒（外部旗標改變後呼叫，讓 wait_for 重新檢查條件）"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def interrupted(self) -> bool:
+        """播放執行緒是否應中斷目前的等待：已停止、暫停或有跳轉請求"""
+        return (not self._playing or self._paused
+                or self._jump is not None or self._seek is not None)
+
+    def wait_for(self, predicate: Callable[[], bool], timeout: Optional[float] = None) -> bool:
+        """等待 predicate() 成立或逾時，回傳 predicate() 的最後結果"""
+        with self._cond:
+            return self._cond.wait_for(predicate, timeout)
+
+    def sleep(self, seconds: float) -> bool:
+        """可被停止中斷的 sleep；完整等待回傳 True，停止時立即回傳 False"""
+        if seconds <= 0:
+            return self._playing
+        return not self.wait_for(lambda: not self._playing, seconds)
+
+    def wait_interrupted(self, seconds: float) -> bool:
+        """等待最多 seconds 秒，停止 / 暫停 / 跳轉請求時立即回傳 True"""
+        return self.wait_for(self.interrupted, seconds)
+
+    def wait_resumed(self) -> None:
+        """暫停中等待繼續；停止或有跳轉請求時也會返回"""
+        self.wait_for(lambda: not self._paused or not self._playing
+                      or self._jump is not None or self._seek is not None)
+
+
+# ─── 效能測試 ──────────────────────────────────────────────
+
+class _Flags:
+    playing = True
+    paused = False
+
+
+def _legacy_interval_wait(flags: _Flags, seconds: float) -> None:
+    """原本的重複間隔等待：每 0.1 秒檢查一次 playing"""
+    start = time.time()
+    while time.time() - start < seconds:
+        if not flags.playing:
+            break
+        time.sleep(0.1)
+
+
+def _legacy_pause_wait(flags: _Flags) -> None:
+    """原本的暫停等待：每 0.05 秒檢查一次"""
+    while flags.paused and flags.playing:
+        time.sleep(0.05)
+
+
+def _measure(wait: Callable[[], None], signal: Callable[[], None], reset: Callable[[], None],
+             trials: int, rng: random.Random) -> Dict[str, float]:
+    """在等待中的隨機時間點呼叫 signal()，量測到 wait() 返回的延遲（毫秒）"""
+    latencies: List[float] = []
+    for _ in range(trials):
+        reset()
+        returned: List[float] = []
+        worker = threading.Thread(target=lambda: (wait(), returned.append(time.perf_counter())))
+        worker.start()
+        time.sleep(rng.uniform(0.005, 0.03))
+        signalled = time.perf_counter()
+        signal()
+        worker.join()
+        latencies.append((returned[0] - signalled) * 1000)
+    latencies.sort()
+    return {"mean": sum(latencies) / len(latencies),
+            "p95": latencies[int(0.95 * (len(latencies) - 1))],
+            "max": latencies[-1]}
+
+
+def benchmark(trials: int = 50, seed: int = 3) -> Dict[str, Dict[str, float]]:
+    """停止 / 繼續的生效延遲：原本的輪詢 vs PlaybackControl"""
+    try:
+        from play_timer import PlaybackTimer
+    except ImportError:
+        from modules.play_timer import PlaybackTimer
+
+    rng = random.Random(seed)
+    flags = _Flags()
+    control = PlaybackControl()
+    results: Dict[str, Dict[str, float]] = {}
+
+    def reset_flags(paused=False):
+        flags.playing, flags.paused = True, paused
+
+    def reset_control(paused=False):
+        control.set_playing(True)
+        control.set_paused(paused)
+
+    results["interval_stop_legacy"] = _measure(
+        lambda: _legacy_interval_wait(flags, 5.0), lambda: setattr(flags, "playing", False),
+        reset_flags, trials, rng)
+    results["interval_stop_control"] = _measure(
+        lambda: control.sleep(5.0), lambda: control.set_playing(False),
+        reset_control, trials, rng)
+    # 播放中等待下一筆事件（間隔 5 秒）時停止：原本 PlaybackTimer 每 MAX_SLEEP_CHUNK 檢查一次
+    chunked = PlaybackTimer()
+    results["event_stop_chunked"] = _measure(
+        lambda: chunked.wait_until(chunked.clock() + 5.0, lambda: not flags.playing),
+        lambda: setattr(flags, "playing", False), reset_flags, trials, rng)
+    signalled = PlaybackTimer(max_chunk=5.0, sleep=control.wait_interrupted)
+    results["event_stop_control"] = _measure(
+        lambda: signalled.wait_until(signalled.clock() + 5.0, control.interrupted),
+        lambda: control.set_playing(False), reset_control, trials, rng)
+    results["resume_legacy"] = _measure(
+        lambda: _legacy_pause_wait(flags), lambda: setattr(flags, "paused", False),
+        lambda: reset_flags(paused=True), trials, rng)
+    results["resume_control"] = _measure(
+        control.wait_resumed, lambda: control.set_paused(False),
+        lambda: reset_control(paused=True), trials, rng)
+    return results
+
+
+if __name__ == "__main__":
+    for name, result in benchmark().items():
+        print(f"{name}: 平均 {result['mean']:.2f} / p95 {result['p95']:.2f} / 最大 {result['max']:.2f} ms")
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 高精度播放計時 (play_timer.py)
+==============================================
+播放原本以 time.sleep(min(0.001, 剩餘時間)) 迴圈等待每筆事件：
+等待期間每秒喚醒約 1000 次，使用會被校時調整的 time.time()，
+且最後一次 sleep 受系統排程精度影響而超時。
+
+PlaybackTimer 以單調時鐘（time.perf_counter）計時：
+  - 距離目標時間較遠時一次 sleep 到目標前的安全距離（長等待每 MAX_SLEEP_CHUNK 秒檢查一次停止 / 暫停）；
+    sleep 可換成 PlaybackControl.wait_interrupted，停止 / 暫停時立即醒來
+  - 安全距離 = 忙等待時間 + 實測的 sleep 超時量（近期峰值、逐次衰減，上限 MAX_MARGIN），
+    最後一小段以 sleep(0) 讓出 GIL 的忙等待對齊目標時間
+  - 每筆事件記錄延遲（實際執行時間 - 目標時間）：lateness 為計時器實際等待過的事件，
+    drift 為到達時已經落後（前一筆事件執行過久）的累積偏移
+  - stats() 回傳平均、p95、最大值（毫秒）與目前 / 最大累積偏移
+
+benchmark() 比較原本的等待迴圈與 PlaybackTimer 的延遲與 CPU 用量：
+    python modules/play_timer.py
+"""
+
+import random
+import time
+from array import array
+from typing import Any, Callable, Dict, Optional
+
+SPIN_WINDOW = 0.0015
+MAX_SLEEP_CHUNK = 0.02
+MAX_MARGIN = 0.02
+INITIAL_OVERSHOOT = 0.001
+MIN_OVERSHOOT = 0.0002
+OVERSHOOT_DECAY = 0.9
+
+
+class LatenessStats:
+    """延遲統計：平均、最大值，p95 以固定大小的蓄水池抽樣估計"""
+
+    RESERVOIR = 4096
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._sample = array("d")
+        self._rng = random.Random(0)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if len(self._sample) < self.RESERVOIR:
+            self._sample.append(value)
+        else:
+            j = self._rng.randrange(self.count)
+            if j < self.RESERVOIR:
+                self._sample[j] = value
+
+    def summary(self) -> Dict[str, float]:
+        """{count, mean, p95, max}（毫秒）"""
+        if not self.count:
+            return {"count": 0, "mean": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(self._sample)
+        return {"count": self.count,
+                "mean": self.total / self.count * 1000,
+                "p95": ordered[int(0.95 * (len(ordered) - 1))] * 1000,
+                "max": self.max * 1000}
+
+
+class PlaybackTimer:
+    """播放用的混合 sleep / 忙等待計時器（單一播放執行緒使用）"""
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, spin_window: float = SPIN_WINDOW, max_chunk: float = MAX_SLEEP_CHUNK,
+                 sleep: Optional[Callable[[float], Any]] = None):
+        self.spin_window = spin_window
+        self.max_chunk = max_chunk
+        self._sleep = sleep or time.sleep
+        self._overshoot = INITIAL_OVERSHOOT
+        self.lateness = LatenessStats()
+        self.drift = 0.0
+        self.max_drift = 0.0
+        self.sleeps = 0
+
+    def wait_until(self, deadline: float, interrupted: Optional[Callable[[], bool]] = None) -> bool:
+        """等待到 deadline（clock() 時間）；interrupted() 為 True 時提前回傳 False"""
+        clock = self.clock
+        now = clock()
+        if now >= deadline:
+            # 已經落後：不等待，記錄累積偏移
+            self.drift = now - deadline
+            if self.drift > self.max_drift:
+                self.max_drift = self.drift
+            return not (interrupted and interrupted())
+        while True:
+            margin = min(self.spin_window + self._overshoot, MAX_MARGIN)
+            remaining = deadline - now
+            if remaining <= margin:
+                break
+            if interrupted and interrupted():
+                return False
+            request = min(remaining - margin, self.max_chunk)
+            self._sleep(request)
+            self.sleeps += 1
+            after = clock()
+            # 追蹤 sleep 的超時量（最近的峰值，逐次衰減），決定下次提早醒來的距離；
+            # 被提前喚醒時差值為負，不影響峰值
+            self._overshoot = max(after - now - request, self._overshoot * OVERSHOOT_DECAY, MIN_OVERSHOOT)
+            now = after
+        if interrupted and interrupted():
+            return False
+        while now < deadline:
+            time.sleep(0)
+            now = clock()
+        self.drift = 0.0
+        self.lateness.add(now - deadline)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        result = self.lateness.summary()
+        result["drift"] = self.drift * 1000
+        result["max_drift"] = self.max_drift * 1000
+        result["sleeps"] = self.sleeps
+        return result
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"等待 {s['count']} 筆，延遲 平均 {s['mean']:.2f} / p95 {s['p95']:.2f} / 最大 {s['max']:.2f} ms，"
+                f"累積偏移 最大 {s['max_drift']:.1f} ms")
+
+
+# ─── 效能測試 ──────────────────────────────────────────────
+
+def _legacy_wait(target_time: float) -> int:
+    """原本的等待迴圈（time.time + sleep(min(0.001, 剩餘))），回傳喚醒次數"""
+    wakeups = 0
+    while time.time() < target_time:
+        sleep_time = min(0.001, target_time - time.time())
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+            wakeups += 1
+        else:
+            break
+    return wakeups
+
+
+def benchmark(events: int = 200, min_gap: float = 0.002, max_gap: float = 0.03) -> Dict[str, Dict[str, float]]:
+    """以隨機間隔的事件排程比較兩種等待方式：延遲（毫秒）、CPU 時間與喚醒次數"""
+    rng = random.Random(7)
+    gaps = [rng.uniform(min_gap, max_gap) for _ in range(events)]
+    results: Dict[str, Dict[str, float]] = {}
+
+    stats = LatenessStats()
+    wakeups = 0
+    cpu = time.process_time()
+    start = time.time()
+    offset = 0.0
+    for gap in gaps:
+        offset += gap
+        target = start + offset
+        wakeups += _legacy_wait(target)
+        stats.add(max(0.0, time.time() - target))
+    legacy = stats.summary()
+    legacy["cpu_ms"] = (time.process_time() - cpu) * 1000
+    legacy["wakeups"] = wakeups
+    results["legacy"] = legacy
+
+    timer = PlaybackTimer()
+    cpu = time.process_time()
+    start = timer.clock()
+    offset = 0.0
+    for gap in gaps:
+        offset += gap
+        timer.wait_until(start + offset)
+    hybrid = timer.lateness.summary()
+    hybrid["cpu_ms"] = (time.process_time() - cpu) * 1000
+    hybrid["wakeups"] = timer.sleeps
+    results["hybrid"] = hybrid
+    return results
+
+
+if __name__ == "__main__":
+    for mode, result in benchmark().items():
+        print(f"{mode}: 延遲 平均 {result['mean']:.3f} / p95 {result['p95']:.3f} / 最大 {result['max']:.3f} ms，"
+              f"CPU {result['cpu_ms']:.1f} ms，喚醒 {result['wakeups']} 次")
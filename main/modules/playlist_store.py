@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 播放佇列日誌式存檔 (playlist_store.py)
+======================================================
+播放佇列每次新增、刪除、調整設定或拖曳排序都會把整個佇列重新寫入一次；
+拖曳長佇列時一次滑動就觸發數十次完整重寫。
+
+PlaylistStore 改為「主檔 + 變更日誌」：
+  - record(items) 只做淺層快照（不序列化、不寫檔），背景執行緒在延遲時間後處理最新快照；
+    連續的拖曳動作會合併成一次變更
+  - 以項目物件的身分（identity）比對上次存檔的狀態，產生 move / splice / set 操作，
+    以 JSON Lines 附加到 <主檔>.log 並 fsync
+  - 日誌累積過多操作時壓縮：主檔以臨時檔 + fsync + os.replace 原子替換後重設日誌
+  - 日誌第一行記錄主檔的大小與 CRC，壓縮途中當機時舊日誌與新主檔不符會被忽略；
+    最後一行寫到一半也會被略過，因此任何時刻當機都能讀回完整的佇列
+主檔格式與原本相同（群組格式 {"is_group": true, "playlist": [...]} 或純列表）。
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+LOG_SUFFIX = ".log"
+LOG_VERSION = 1
+
+DEFAULT_DELAY = 0.3
+COMPACT_OPS = 200
+
+
+def _signature(path: str) -> Optional[List[int]]:
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    return [len(data), zlib.crc32(data)]
+
+
+def apply_ops(items: List[Dict[str, Any]], ops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """依序套用佇列操作（就地修改並回傳 items）"""
+    for op in ops:
+        kind = op.get("op")
+        if kind == "move":
+            items.insert(op["to"], items.pop(op["from"]))
+        elif kind == "splice":
+            items[op["start"]:op["end"]] = op.get("items", [])
+        elif kind == "set":
+            items[op["i"]] = op["item"]
+    return items
+
+
+def diff_items(old: List[Tuple[Any, Dict[str, Any]]],
+               new: List[Tuple[Any, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """比對兩份 (項目物件, 內容複本) 快照，產生把 old 變成 new 的操作"""
+    ops: List[Dict[str, Any]] = []
+    work = list(old)
+    old_ids = [id(ref) for ref, _copy in work]
+    new_ids = [id(ref) for ref, _copy in new]
+    if old_ids != new_ids:
+        limit = min(len(old_ids), len(new_ids))
+        start = 0
+        while start < limit and old_ids[start] == new_ids[start]:
+            start += 1
+        tail = 0
+        while tail < limit - start and old_ids[-1 - tail] == new_ids[-1 - tail]:
+            tail += 1
+        o_mid = old_ids[start:len(old_ids) - tail]
+        n_mid = new_ids[start:len(new_ids) - tail]
+        end = start + len(o_mid) - 1
+        if len(o_mid) == len(n_mid) > 1 and n_mid == o_mid[1:] + o_mid[:1]:
+            # 單一項目往後拖曳
+            ops.append({"op": "move", "from": start, "to": end})
+            work.insert(end, work.pop(start))
+        elif len(o_mid) == len(n_mid) > 1 and n_mid == o_mid[-1:] + o_mid[:-1]:
+            # 單一項目往前拖曳
+            ops.append({"op": "move", "from": end, "to": start})
+            work.insert(start, work.pop(end))
+        else:
+            replacement = new[start:len(new) - tail]
+            ops.append({"op": "splice", "start": start, "end": start + len(o_mid),
+                        "items": [copy for _ref, copy in replacement]})
+            work[start:start + len(o_mid)] = replacement
+    for i, ((_ref, old_copy), (_nref, new_copy)) in enumerate(zip(work, new)):
+        if old_copy != new_copy:
+            ops.append({"op": "set", "i": i, "item": new_copy})
+    return ops
+
+
+class PlaylistStore:
+    """播放佇列的延遲、日誌式原子存檔（背景執行緒寫入）"""
+
+    def __init__(self, path: str, group: bool = True, delay: float = DEFAULT_DELAY,
+                 compact_ops: int = COMPACT_OPS):
+        """
+        Args:
+            path:        主檔路徑
+            group:       True 時主檔為群組格式 {"is_group": true, "playlist": [...]}，否則為純列表
+            delay:       最後一次 record 後多久寫入（秒）
+            compact_ops: 日誌累積多少筆操作後壓縮回主檔
+        """
+        self.path = path
+        self.log_path = path + LOG_SUFFIX
+        self.group = group
+        self.delay = delay
+        self.compact_ops = compact_ops
+        self.appended = 0
+        self.compactions = 0
+        self._persisted: List[Tuple[Any, Dict[str, Any]]] = []
+        self._log_ops = 0
+        self._pending: Optional[List[Tuple[Any, Dict[str, Any]]]] = None
+        self._due = 0.0
+        self._busy = False
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    # ─── 讀取 ──────────────────────────────────────────────
+    def _read_base(self) -> List[Dict[str, Any]]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("playlist", [])
+        return data if isinstance(data, list) else []
+
+    def _read_log(self) -> List[Dict[str, Any]]:
+        ops: List[Dict[str, Any]] = []
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                if header.get("log") != LOG_VERSION or header.get("base") != _signature(self.path):
+                    # 壓縮途中當機：主檔已包含日誌內容
+                    return []
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        # 當機時最後一行可能只寫了一半
+                        break
+                    if isinstance(op, dict):
+                        ops.append(op)
+        except (OSError, ValueError):
+            return []
+        return ops
+
+    def load(self) -> List[Dict[str, Any]]:
+        """讀取佇列（主檔 + 日誌），並以回傳的項目作為之後比對的基準"""
+        self.flush()
+        items: List[Dict[str, Any]] = []
+        if os.path.exists(self.path):
+            try:
+                items = self._read_base()
+            except (OSError, ValueError) as e:
+                print(f"讀取佇列存檔失敗: {e}")
+                items = []
+        ops = self._read_log()
+        try:
+            apply_ops(items, ops)
+        except (IndexError, KeyError, TypeError) as e:
+            print(f"佇列日誌無法套用，已忽略: {e}")
+            items = self._read_base() if os.path.exists(self.path) else []
+            ops = []
+        with self._cond:
+            self._persisted = [(item, dict(item)) for item in items]
+            self._log_ops = len(ops)
+        return items
+
+    # ─── 記錄 ──────────────────────────────────────────────
+    def record(self, items: List[Dict[str, Any]]) -> None:
+        """記錄佇列目前狀態（只做淺層快照，寫入在背景延遲進行）"""
+        snapshot = [(item, dict(item)) for item in items]
+        with self._cond:
+            self._pending = snapshot
+            self._due = time.monotonic() + self.delay
+            self._cond.notify()
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending is None:
+                        if self._stopped:
+                            return
+                        self._cond.wait()
+                        continue
+                    remaining = self._due - time.monotonic()
+                    if remaining <= 0 or self._stopped:
+                        break
+                    self._cond.wait(remaining)
+                snapshot, self._pending = self._pending, None
+                self._busy = True
+            try:
+                self._persist(snapshot)
+            except Exception as e:
+                print(f"佇列存檔失敗: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _persist(self, snapshot: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        if not snapshot:
+            # 佇列清空：移除存檔
+            for path in (self.log_path, self.path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._persisted, self._log_ops = [], 0
+            return
+        ops = diff_items(self._persisted, snapshot)
+        if not ops and os.path.exists(self.path):
+            return
+        if not os.path.exists(self.path) or self._log_ops + len(ops) > self.compact_ops:
+            self._compact(snapshot)
+        else:
+            self._append(ops)
+        self._persisted = snapshot
+
+    def _append(self, ops: List[Dict[str, Any]]) -> None:
+        fresh = not os.path.exists(self.log_path)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            if fresh:
+                f.write(json.dumps({"log": LOG_VERSION, "base": _signature(self.path)}) + "\n")
+            for op in ops:
+                f.write(json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_ops += len(ops)
+        self.appended += len(ops)
+
+    def _compact(self, snapshot: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        """將目前狀態原子寫入主檔並重設日誌"""
+        items = [copy for _ref, copy in snapshot]
+        data: Any = {"is_group": True, "playlist": items} if self.group else items
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        # 舊日誌的檔頭已與新主檔不符，即使下面刪除前當機也不會被套用
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self._log_ops = 0
+        self.compactions += 1
+
+    # ─── 同步 / 結束 ───────────────────────────────────────
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """立即寫入尚未處理的快照並等待完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._due = 0.0
+            self._cond.notify_all()
+            while self._pending is not None or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0) -> bool:
+        """寫完後壓縮日誌並停止背景執行緒"""
+        done = self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        if self._log_ops and self._persisted:
+            try:
+                self._compact(self._persisted)
+            except Exception as e:
+                print(f"佇列存檔壓縮失敗: {e}")
+        return done
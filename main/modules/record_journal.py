@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 錄製預寫日誌 (record_journal.py)
+================================================
+錄製中的事件原本只存在記憶體，直到停止錄製才一次寫成完整腳本；
+程式當機或斷電時整段錄製都會遺失。
+
+RecordingJournal 在錄製期間以背景執行緒將事件分批附加（append-only）到日誌檔：
+  - 第一行為檔頭 {"journal": 版本, "start_time": ..., "meta": {...}}
+  - 其後每行一筆事件（JSON Lines），每批寫入後 flush + fsync
+停止錄製並存成正式腳本後即刪除日誌；若程式異常結束，下次啟動時可用
+find_journals() 找出殘留日誌、recover_journal() 重建事件（最後一行寫到一半會被忽略）。
+每次錄製使用各自的日誌檔（session_journal_path），上一段錄製在背景存檔完成前
+就開始新錄製時，刪除舊日誌不會動到新錄製的日誌。
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+JOURNAL_VERSION = 1
+JOURNAL_FILENAME = ".recording.journal"
+
+
+class RecordingJournal:
+    """錄製事件的 append-only 日誌（執行緒安全）"""
+
+    def __init__(self, path: str, flush_interval: float = 0.25, batch_size: int = 256, fsync: bool = True):
+        """
+        Args:
+            path:           日誌檔路徑
+            flush_interval: 最長寫入間隔（秒）
+            batch_size:     累積多少筆事件時提前寫入
+            fsync:          每批寫入後是否 fsync
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.written = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+
+    def open(self, meta: Optional[Dict[str, Any]] = None) -> None:
+        """建立（覆寫）日誌檔並啟動背景寫入執行緒"""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        header = {"journal": JOURNAL_VERSION, "start_time": time.time(), "meta": meta or {}}
+        self._file.write(json.dumps(header, ensure_ascii=False) + "\n")
+        self._sync()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    @property
+    def is_open(self) -> bool:
+        return self._file is not None
+
+    def append(self, event: Dict[str, Any]) -> None:
+        """加入一筆事件（由錄製監聽器呼叫，不做任何磁碟 I/O）"""
+        with self._lock:
+            self._pending.append(event)
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+
+    def _writer_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"寫入錄製日誌失敗: {e}")
+
+    def _sync(self) -> None:
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def flush(self) -> int:
+        """將暫存事件寫入日誌，回傳本次寫入筆數"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        lines = "".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in batch)
+        with self._io_lock:
+            if self._file is None:
+                return 0
+            self._file.write(lines)
+            self._sync()
+        self.written += len(batch)
+        return len(batch)
+
+    def close(self) -> None:
+        """停止背景執行緒並寫入剩餘事件（保留日誌檔，待腳本存檔後再 discard）"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._file is not None:
+            try:
+                self.flush()
+            finally:
+                with self._io_lock:
+                    if self._file is not None:
+                        self._file.close()
+                        self._file = None
+
+    def discard(self) -> None:
+        """關閉並刪除日誌檔（錄製已成功存成正式腳本）"""
+        self.close()
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        except Exception as e:
+            print(f"刪除錄製日誌失敗: {e}")
+
+
+def journal_path(script_dir: str) -> str:
+    """回傳 scripts 目錄下的錄製日誌路徑"""
+    return os.path.join(script_dir, JOURNAL_FILENAME)
+
+
+def session_journal_path(base: str) -> str:
+    """回傳一次錄製專用的日誌路徑（base 加上時間戳記）"""
+    return f"{base}.{time.time_ns()}"
+
+
+def find_journals(script_dir: str) -> List[str]:
+    """列出 scripts 目錄下殘留的錄製日誌（依建立順序）"""
+    if not os.path.isdir(script_dir):
+        return []
+    return sorted(os.path.join(script_dir, name) for name in os.listdir(script_dir)
+                  if name == JOURNAL_FILENAME or name.startswith(JOURNAL_FILENAME + "."))
+
+
+def recover_journal(path: str) -> Optional[Dict[str, Any]]:
+    """從（可能不完整的）日誌重建錄製內容
+
+    Returns:
+        {'events': [...依時間排序], 'meta': {...}, 'start_time': float, 'truncated': bool}；
+        檔案不存在或沒有任何事件時回傳 None
+    """
+    if not os.path.exists(path):
+        return None
+    header: Dict[str, Any] = {}
+    events: List[Dict[str, Any]] = []
+    truncated = False
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for lineno, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                # 當機時最後一行可能只寫了一半
+                truncated = True
+                continue
+            if lineno == 0 and isinstance(obj, dict) and "journal" in obj:
+                header = obj
+            elif isinstance(obj, dict):
+                events.append(obj)
+    if not events:
+        return None
+    # 滑鼠與鍵盤監聽器各自寫入，依時間合併排序
+    events.sort(key=lambda e: e.get("time", 0))
+    return {
+        "events": events,
+        "meta": header.get("meta", {}),
+        "start_time": header.get("start_time"),
+        "truncated": truncated,
+    }
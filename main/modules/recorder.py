@@ -2,12 +2,19 @@ import time
 import threading
 import ctypes
 import ctypes.wintypes
-import pynput
-from pynput.mouse import Controller as MouseController, Listener as MouseListener
-from pynput.keyboard import Controller as KeyboardController, Listener as KeyboardListener, Key
-import win32gui
-import win32api
-import win32con
+# Windows 專用模組：其他平台（以記錄後端播放量測）時為 None
+try:
+    import pynput
+    from pynput.mouse import Controller as MouseController, Listener as MouseListener
+    from pynput.keyboard import Controller as KeyboardController, Listener as KeyboardListener, Key
+except ImportError:
+    pynput = MouseController = MouseListener = KeyboardController = KeyboardListener = Key = None
+try:
+    import win32gui
+    import win32api
+    import win32con
+except ImportError:
+    win32gui = win32api = win32con = None
 import os
 import cv2
 import numpy as np
@@ -40,6 +47,68 @@ except ImportError:
     get_detector = None
     print("️ YOLO 模組未載入，物件偵測功能不可用")
 
+# 錄製預寫日誌（錄製中分批寫入磁碟，當機後可復原）
+try:
+    from record_journal import RecordingJournal, session_journal_path
+except ImportError:
+    try:
+        from modules.record_journal import RecordingJournal, session_journal_path
+    except ImportError:
+        RecordingJournal = None
+
+# 欄位式錄製事件緩衝（固定寬度欄位 + 字串駐留，停止時線性合併）
+try:
+    from event_buffer import StringTable, EventColumns, merge_streams, EVENT_NAMES, MOVE, DOWN, WHEEL
+except ImportError:
+    from modules.event_buffer import StringTable, EventColumns, merge_streams, EVENT_NAMES, MOVE, DOWN, WHEEL
+
+# 獨立行程輸入擷取（子行程執行 hook，事件經共用記憶體環形緩衝傳回）
+try:
+    from capture_process import CaptureProcess, KEYBOARD as CAPTURE_KEYBOARD, DRAIN_INTERVAL as CAPTURE_DRAIN_INTERVAL
+except ImportError:
+    try:
+        from modules.capture_process import CaptureProcess, KEYBOARD as CAPTURE_KEYBOARD, DRAIN_INTERVAL as CAPTURE_DRAIN_INTERVAL
+    except ImportError:
+        CaptureProcess = None
+
+# 事件驅動滑鼠移動擷取（最小距離 / 最小間隔取樣）
+try:
+    from mouse_capture import (MoveSampler, TrajectorySimplifier, DEFAULT_MIN_DISTANCE,
+                               DEFAULT_MIN_INTERVAL, DEFAULT_TOLERANCE)
+except ImportError:
+    from modules.mouse_capture import (MoveSampler, TrajectorySimplifier, DEFAULT_MIN_DISTANCE,
+                                       DEFAULT_MIN_INTERVAL, DEFAULT_TOLERANCE)
+
+# 事件處理函式登錄（每個事件類型一個處理函式，參數在第一次執行時預先取出）
+try:
+    from event_dispatch import HandlerRegistry, CompiledEvents
+except ImportError:
+    from modules.event_dispatch import HandlerRegistry, CompiledEvents
+
+_EVENT_REGISTRY = HandlerRegistry()
+
+# 播放計時（單調時鐘、sleep 後以短暫忙等待對齊目標時間）
+try:
+    from play_timer import PlaybackTimer
+except ImportError:
+    from modules.play_timer import PlaybackTimer
+
+# 輸入注入後端（Windows API / 不注入只記錄的量測用後端）
+try:
+    from input_backend import default_backend, ALL_MODIFIER_VKS, DEFAULT_BATCH_TOLERANCE
+except ImportError:
+    from modules.input_backend import default_backend, ALL_MODIFIER_VKS, DEFAULT_BATCH_TOLERANCE
+
+# 播放控制（停止 / 暫停 / 跳轉立即喚醒所有等待中的執行緒）
+try:
+    from play_control import PlaybackControl
+except ImportError:
+    from modules.play_control import PlaybackControl
+
+# 放開後需要短暫等待的修飾鍵
+_MODIFIER_KEY_NAMES = frozenset(('alt', 'ctrl', 'shift', 'windows', 'left alt', 'right alt',
+                                 'left ctrl', 'right ctrl', 'left shift', 'right shift'))
+
 #  v2.9.0: 匯入強化圖片辨識模組
 try:
     from modules.image_matcher import get_matcher, HybridMatcher
@@ -139,18 +208,27 @@ class TriggerManager:
     def stop(self):
         """停止所有觸發器"""
         self._running = False
+        self.recorder.control.notify()
         # 等待所有執行緒結束
         for t in self._threads:
             t.join(timeout=1.0)
         self._threads.clear()
     
+    def _active(self):
+        return self._running and self.recorder.playing
+
+    def _idle(self, seconds):
+        """等待 seconds 秒；觸發器或播放停止時立即返回 False"""
+        self.recorder.control.wait_for(lambda: not self._active(), seconds)
+        return self._active()
+
     def _run_interval_trigger(self, trigger):
         """執行定時觸發器"""
         interval_ms = trigger.get('interval_ms', 30000)
         actions = trigger.get('actions', [])
         interval_sec = interval_ms / 1000.0
         
-        while self._running and self.recorder.playing:
+        while self._active():
             # 執行動作
             with self._lock:
                 for action in actions:
@@ -159,11 +237,8 @@ class TriggerManager:
                     self._execute_action_text(action)
             
             # 等待間隔
-            wait_start = time.time()
-            while self._running and self.recorder.playing:
-                if time.time() - wait_start >= interval_sec:
-                    break
-                time.sleep(0.1)
+            if not self._idle(interval_sec):
+                break
     
     def _run_condition_trigger(self, trigger):
         """執行條件觸發器"""
@@ -173,11 +248,12 @@ class TriggerManager:
         cooldown_sec = cooldown_ms / 1000.0
         trigger_id = f"condition_{target}"
         
-        while self._running and self.recorder.playing:
-            # 檢查冷卻
+        while self._active():
+            # 檢查冷卻（等待剩餘的冷卻時間）
             last_time = self._last_trigger_time.get(trigger_id, 0)
-            if time.time() - last_time < cooldown_sec:
-                time.sleep(0.1)
+            cooldown_left = cooldown_sec - (time.time() - last_time)
+            if cooldown_left > 0:
+                self._idle(cooldown_left)
                 continue
             
             # 檢查條件（圖片是否存在）
@@ -191,7 +267,7 @@ class TriggerManager:
                                 break
                             self._execute_action_text(action)
             
-            time.sleep(0.2)  # 偵測間隔
+            self._idle(0.2)  # 偵測間隔
     
     def _run_priority_trigger(self, trigger):
         """執行優先觸發器（偵測到目標時中斷當前執行）"""
@@ -199,11 +275,12 @@ class TriggerManager:
         actions = trigger.get('actions', [])
         trigger_id = f"priority_{target}"
         
-        while self._running and self.recorder.playing:
+        while self._active():
             # 檢查冷卻（優先觸發器也需要冷卻避免頻繁觸發）
             last_time = self._last_trigger_time.get(trigger_id, 0)
-            if time.time() - last_time < 2.0:  # 2秒冷卻
-                time.sleep(0.1)
+            cooldown_left = 2.0 - (time.time() - last_time)  # 2秒冷卻
+            if cooldown_left > 0:
+                self._idle(cooldown_left)
                 continue
             
             # 檢查條件
@@ -218,7 +295,7 @@ class TriggerManager:
                                 break
                             self._execute_action_text(action)
             
-            time.sleep(0.3)  # 優先觸發偵測間隔
+            self._idle(0.3)  # 優先觸發偵測間隔
     
     def _execute_action_text(self, action_text):
         scale_x = getattr(self.recorder, 'scale_x', 1.0)
@@ -235,24 +312,20 @@ class TriggerManager:
             # 1. 鍵盤動作
             if action_text.startswith('>按下'):
                 key = action_text[3:].strip()
-                import keyboard
-                keyboard.press(key)
+                self.recorder.input.key_name(key, True)
                 return 'success'
             elif action_text.startswith('>放開'):
                 key = action_text[3:].strip()
-                import keyboard
-                keyboard.release(key)
+                self.recorder.input.key_name(key, False)
                 return 'success'
             elif action_text.startswith('>按'):
                 key_part = action_text[2:].strip()
                 key = key_part.split(',')[0].strip()
-                import keyboard
-                keyboard.press_and_release(key)
+                self.recorder.input.tap(key)
                 return 'success'
             elif action_text.startswith('>輸入文字>'):
                 text_part = action_text[6:].split(',')[0].strip()
-                import keyboard
-                keyboard.write(text_part)
+                self.recorder.input.write(text_part)
                 return 'success'
                 
             # 2. 延遲動作
@@ -263,7 +336,7 @@ class TriggerManager:
                     value = int(match.group(1))
                     unit = match.group(2)
                     delay = value / 1000.0 if unit == 'ms' else value
-                    time.sleep(delay)
+                    self.recorder.control.sleep(delay)
                 return 'success'
             elif action_text.startswith('>隨機延遲'):
                 import re, random
@@ -289,7 +362,7 @@ class TriggerManager:
                     v1 = to_ms(match.group(1))
                     v2 = to_ms(match.group(2))
                     delay = random.randint(min(v1, v2), max(v1, v2)) / 1000.0
-                    time.sleep(delay)
+                    self.recorder.control.sleep(delay)
                 return 'success'
                 
             # 3. 座標或無座標滑鼠動作 (相容 (None,None) 或無座標點擊)
@@ -300,15 +373,15 @@ class TriggerManager:
                 match_rel = re.match(r'>相對移動\((-?\d+),(-?\d+)\)', action_text)
                 if match_rel:
                     dx, dy = int(int(match_rel.group(1)) * scale_x), int(int(match_rel.group(2)) * scale_y)
-                    x, y = win32gui.GetCursorPos()
-                    ctypes.windll.user32.SetCursorPos(x + dx, y + dy)
+                    x, y = self.recorder.input.position()
+                    self.recorder.input.move(x + dx, y + dy)
                     return 'success'
                     
                 # 優先匹配含有數字座標的格式，例如：>左鍵點擊(100,200)
                 match = re.match(r'>(左鍵點擊|右鍵點擊|移動至)\((-?\d+),(-?\d+)\)', action_text)
                 if match:
                     cmd, x, y = match.group(1), int(int(match.group(2)) * scale_x), int(int(match.group(3)) * scale_y)
-                    ctypes.windll.user32.SetCursorPos(x, y)
+                    self.recorder.input.move(x, y)
                     if '點擊' in cmd:
                         self.recorder._mouse_event_enhanced('down', button='left' if '左鍵' in cmd else 'right')
                         time.sleep(0.02)
@@ -613,6 +686,7 @@ class CoreRecorder:
         self.logger = logger or (lambda s: None)
         self._is_new_logger = hasattr(logger, 'info') if logger else False
         
+        self.control = PlaybackControl()  # playing / paused 狀態與可中斷的等待
         self.recording = False
         self.playing = False
         self.paused = False
@@ -620,11 +694,14 @@ class CoreRecorder:
         self._record_thread = None
         self._play_thread = None
         self._record_start_time = None
-        self._mouse_events = []
+        self._record_strings = StringTable()
+        self._mouse_events = EventColumns("mouse", self._record_strings)
         self._keyboard_recording = False
         self._recording_mouse = False
         self._paused_k_events = []
         self._current_play_index = 0
+        self.play_timer = None  # 目前（或上一輪）播放的計時器，提供延遲統計
+        self.batch_tolerance = DEFAULT_BATCH_TOLERANCE  # 截止時間相差在此秒數內的移動 / 按鍵一次注入（0 = 停用）
         self._target_hwnd = None  # 新增：目標視窗 handle
         self.scale_x = 1.0
         self.scale_y = 1.0
@@ -651,8 +728,11 @@ class CoreRecorder:
         else:
             self._log("[優化] mss 不可用，將使用 PIL", "info")
         
+        # 輸入注入後端（set_input_backend() 可換成記錄後端）
+        self.input = default_backend()
+
         # 貝茲曲線滑鼠移動器
-        self._bezier_mover = BezierMouseMover() if BEZIER_AVAILABLE else None
+        self._bezier_mover = self._create_bezier_mover()
         self._use_bezier = False  # 預設關閉（保持向下相容）
         
         #  v2.7.1+ 新增：變數系統和執行狀態
@@ -672,7 +752,8 @@ class CoreRecorder:
         self._trigger_manager = TriggerManager(self, logger)
         self._parallel_executor = ParallelExecutor(self, logger)
         self._state_machine = StateMachine(self, logger)
-        self._pending_jump = None  # 觸發器請求的跳轉目標
+        self._label_table = None  # (事件列表, {'label_name': index})，避免每輪重新掃描
+        self._start_at = None  # 下一次播放的起始事件索引
         
         #  v2.8.2+ 新增：YOLO 物件偵測器
         self._yolo_detector = None
@@ -687,12 +768,32 @@ class CoreRecorder:
         self._random_pos = False   # 座標隨機 (±2~4px)
         
         # 貝茲曲線滑鼠移動器
-        self._bezier_mover = BezierMouseMover() if BEZIER_AVAILABLE else None
+        self._bezier_mover = self._create_bezier_mover()
         self._use_bezier = False  # 預設關閉（保持向下相容）
         
         # v2.9.0: 鍵盤監聽器 (pynput)
         self._keyboard_listener = None
-        self._keyboard_events = []
+        self._keyboard_events = EventColumns("keyboard", self._record_strings)
+        
+        # 滑鼠移動擷取：由 on_move 回呼驅動，依最小距離（像素）/ 最小間隔（秒）取樣；
+        # 監聽器無法啟動時回退為 10ms 輪詢
+        self.move_min_distance = DEFAULT_MIN_DISTANCE
+        self.move_min_interval = DEFAULT_MIN_INTERVAL
+        # 即時軌跡簡化：捨棄的移動點與保留軌跡的最大偏差（像素）；拖曳與點擊位置不受影響。
+        # 啟用時非拖曳的移動不經最小距離 / 間隔取樣，誤差相對於實際收到的原始軌跡
+        self.simplify_trajectory = False
+        self.trajectory_tolerance = DEFAULT_TOLERANCE
+        # 輸入擷取方式：'thread'（同行程監聽）或 'process'（子行程擷取，不受主行程 GIL 延遲影響）
+        self.capture_mode = "thread"
+        self._capture = None
+        # 事件編譯快取：(處理函式, 預先取出的參數)，依事件索引保存
+        self._compiled_events = CompiledEvents(_EVENT_REGISTRY)
+        self._record_stop = threading.Event()
+
+        # 錄製預寫日誌（由 set_journal_path 啟用）
+        self._journal_path = None
+        self._journal = None
+        self._finished_journal = None  # 已停止、等待存檔完成後刪除的日誌
         
         self.ocr_diagnostic_window = None
 
@@ -742,6 +843,16 @@ class CoreRecorder:
             # 舊格式：lambda 函式
             self.logger(msg)
     
+    def _create_bezier_mover(self):
+        if not BEZIER_AVAILABLE:
+            return None
+        return BezierMouseMover(self.input.move, self.input.position)
+
+    def set_input_backend(self, backend):
+        """更換輸入注入後端（例如 RecordingInputBackend 以不注入輸入的方式播放量測）"""
+        self.input = backend
+        self._bezier_mover = self._create_bezier_mover()
+
     def set_bezier_enabled(self, enabled: bool):
         """啟用/停用貝茲曲線滑鼠移動
         
@@ -854,17 +965,54 @@ class CoreRecorder:
         
         return key_map.get(key_name, 0)
 
+    def set_journal_path(self, path):
+        """設定錄製預寫日誌路徑（None 表示停用）"""
+        self._journal_path = path
+
+    def _journal_event(self, event):
+        """將錄製事件加入預寫日誌（未啟用時不做任何事）"""
+        journal = self._journal
+        if journal is not None:
+            journal.append(event)
+
+    def _close_journal(self, journal):
+        """寫入日誌中剩餘的事件並關閉（保留檔案直到腳本存檔完成）"""
+        if journal is not None:
+            try:
+                journal.close()
+            except Exception as e:
+                self.logger(f"[警告] 關閉錄製日誌失敗: {e}")
+
+    def take_finished_journal(self):
+        """取出上一段（已停止）錄製的預寫日誌，由呼叫端在腳本存檔完成後 discard()
+
+        每段錄製的日誌各自取出，背景存檔完成前就開始新錄製時不會刪到新錄製的日誌。
+        """
+        journal, self._finished_journal = self._finished_journal, None
+        return journal
+
     def start_record(self):
         """開始錄製（v2.6.5 - 參考2.5簡化機制）"""
         if self.recording:
             return
         
+        # 啟動預寫日誌（錄製中事件分批寫入磁碟）
+        self._journal = None
+        if self._journal_path and RecordingJournal is not None:
+            try:
+                self._journal = RecordingJournal(session_journal_path(self._journal_path))
+                self._journal.open({"target_hwnd": self._target_hwnd})
+            except Exception as e:
+                self._journal = None
+                self.logger(f"[警告] 無法建立錄製日誌: {e}")
+        
         #  2.5 風格：不需要重置 keyboard 狀態
         # keyboard.add_hotkey 不受 keyboard.start_recording 影響
         
         self.recording = True
         self.paused = False
         self.events = []
+        self._record_stop.clear()
         self._record_start_time = time.time()
         self.logger(f"[{time.ctime()}] 開始錄製")
         self._record_thread = threading.Thread(target=self._record_loop, daemon=True)
@@ -873,6 +1021,10 @@ class CoreRecorder:
 
     def stop_record(self):
         """停止錄製（穩定增強版 - 添加清理鎖與重試機制）"""
+        # 這段錄製的日誌交給存檔流程（錄製執行緒結束時關閉自己的日誌物件）；
+        # 呼叫端可能已先把 recording 設為 False，因此在檢查之前取出
+        if self._journal is not None:
+            self._finished_journal, self._journal = self._journal, None
         if not self.recording:
             return
         
@@ -880,13 +1032,10 @@ class CoreRecorder:
         self.recording = False
         self.paused = False
         self._recording_mouse = False
+        self._record_stop.set()
         
         self.logger(f"[{time.ctime()}] 停止錄製（等待事件處理完成...）")
         
-        #  智能軌跡壓縮：停止錄製時自動簡化滑鼠軌跡
-        if hasattr(self, 'simplify_trajectory') and self.simplify_trajectory:
-            self._compress_mouse_trajectories()
-        
         #  穩定性增強：使用鎖保護 keyboard hook 清理，並添加重試機制
         try:
             # 只有在真正有啟動錄製時才嘗試停止
@@ -962,6 +1111,27 @@ class CoreRecorder:
         except Exception:
             pass
 
+    # playing / paused 存在 PlaybackControl：設定時立即喚醒所有等待中的執行緒
+    @property
+    def playing(self):
+        return self.control.playing
+
+    @playing.setter
+    def playing(self, value):
+        self.control.set_playing(value)
+
+    @property
+    def paused(self):
+        return self.control.paused
+
+    @paused.setter
+    def paused(self, value):
+        self.control.set_paused(value)
+
+    def request_jump(self, label):
+        """請求播放中跳轉至標籤（觸發器等外部執行緒使用，立即中斷播放執行緒的等待）"""
+        self.control.request_jump(label)
+
     def toggle_pause(self):
         """切換暫停狀態（改善版）"""
         self.paused = not self.paused
@@ -980,8 +1150,8 @@ class CoreRecorder:
                         self.logger("[暫停] 鍵盤錄製已暫停")
                     except Exception as e:
                         self.logger(f"[警告] 暫停鍵盤錄製時發生錯誤: {e}")
-            else:
-                # 繼續時重新開始 keyboard 錄製
+            elif self._capture is None:
+                # 繼續時重新開始 keyboard 錄製（子行程擷取時不使用 keyboard 模組）
                 try:
                     keyboard.start_recording()
                     self._keyboard_recording = True
@@ -1016,8 +1186,11 @@ class CoreRecorder:
 
     def _record_loop(self):
         """錄製主迴圈"""
+        journal = self._journal  # stop_record 會清除 self._journal，結束時關閉這段錄製的日誌
         try:
-            self._mouse_events = []
+            # 事件以欄位式緩衝保存（停止時才合併，使用者取用時才轉成 dict）
+            strings = self._record_strings = StringTable()
+            self._mouse_events = EventColumns("mouse", strings)
             self._recording_mouse = True
             self._record_start_time = time.time()
             self._paused_k_events = []
@@ -1025,148 +1198,226 @@ class CoreRecorder:
             # 追蹤滑鼠按鍵狀態（用於判斷是否為拖曳）
             self._mouse_pressed = False
 
+            # 子行程擷取：hook 在子行程執行，這裡定期從環形緩衝取出事件
+            capture = None
+            if self.capture_mode == "process" and CaptureProcess is not None:
+                try:
+                    capture = CaptureProcess()
+                    capture.start()
+                    self.logger("[錄製] 輸入擷取子行程已啟動")
+                except Exception as e:
+                    capture = None
+                    self.logger(f"[警告] 輸入擷取子行程啟動失敗，改用同行程監聽: {e}")
+            self._capture = capture
+
             # 嘗試啟動 keyboard 錄製（可能在打包後失敗）
-            try:
-                keyboard.start_recording()
-                self._keyboard_recording = True
-                self.logger("[錄製] keyboard 模組已啟動")
-            except Exception as e:
+            if capture is not None:
                 self._keyboard_recording = False
-                self.logger(f"[錄製] keyboard 模組啟動失敗（預期行為）: {e}")
+            else:
+                try:
+                    keyboard.start_recording()
+                    self._keyboard_recording = True
+                    self.logger("[錄製] keyboard 模組已啟動")
+                except Exception as e:
+                    self._keyboard_recording = False
+                    self.logger(f"[錄製] keyboard 模組啟動失敗（預期行為）: {e}")
 
             # v2.9.0: 同時啟動 pynput 鍵盤監聽（更穩定）
-            self._keyboard_events = []
+            key_buffer = self._keyboard_events = EventColumns("keyboard", strings)
+
+            def record_key(name, kind, t):
+                key_buffer.append_key(kind, name, t)
+                if self._journal is not None:
+                    self._journal_event({'type': 'keyboard', 'event': kind, 'name': name, 'time': t})
+
+            def add_key(key, kind):
+                name = ""
+                if hasattr(key, 'char') and key.char:
+                    name = key.char
+                else:
+                    name = str(key).replace('Key.', '')
+                record_key(name.lower(), kind, time.time())
+
             def on_press(key):
                 if self.recording and not self.paused:
                     try:
-                        name = ""
-                        if hasattr(key, 'char') and key.char:
-                            name = key.char
-                        else:
-                            name = str(key).replace('Key.', '')
-                        
-                        self._keyboard_events.append({
-                            'type': 'keyboard',
-                            'event': 'down',
-                            'name': name.lower(),
-                            'time': time.time()
-                        })
+                        add_key(key, 'down')
                     except: pass
 
             def on_release(key):
                 if self.recording and not self.paused:
                     try:
-                        name = ""
-                        if hasattr(key, 'char') and key.char:
-                            name = key.char
-                        else:
-                            name = str(key).replace('Key.', '')
-                        
-                        self._keyboard_events.append({
-                            'type': 'keyboard',
-                            'event': 'up',
-                            'name': name.lower(),
-                            'time': time.time()
-                        })
+                        add_key(key, 'up')
                     except: pass
 
-            try:
-                self._keyboard_listener = KeyboardListener(on_press=on_press, on_release=on_release)
-                self._keyboard_listener.start()
-                self.logger("[錄製] pynput.keyboard.Listener 已啟動")
-            except Exception as e:
-                self.logger(f"[警告] pynput.keyboard.Listener 啟動失敗: {e}")
+            if capture is None:
+                try:
+                    self._keyboard_listener = KeyboardListener(on_press=on_press, on_release=on_release)
+                    self._keyboard_listener.start()
+                    self.logger("[錄製] pynput.keyboard.Listener 已啟動")
+                except Exception as e:
+                    self.logger(f"[警告] pynput.keyboard.Listener 啟動失敗: {e}")
 
             mouse_ctrl = MouseController()
             last_pos = mouse_ctrl.position
+            sampler = MoveSampler(self.move_min_distance, self.move_min_interval)
+            simplifier = TrajectorySimplifier(self.trajectory_tolerance) if self.simplify_trajectory else None
+            held_buttons = set()  # 按住中的滑鼠按鈕：拖曳路徑不簡化
+            mouse_buffer = self._mouse_events
+
+            def add_mouse(kind, x, y, t, button=None, delta=0):
+                # 記錄所有滑鼠事件，但標記是否在目標視窗內
+                in_target = self._is_point_in_target_window(x, y)
+                mouse_buffer.append_mouse(kind, x, y, t, in_target, button=button, delta=delta)
+                if self._journal is not None:
+                    event = {'type': 'mouse', 'event': kind}
+                    if kind == 'wheel':
+                        event['delta'] = delta
+                    elif button is not None:
+                        event['button'] = button
+                    event.update({'x': x, 'y': y, 'time': t, 'in_target': in_target})
+                    self._journal_event(event)
+
+            def add_move(x, y, t):
+                if simplifier is None or held_buttons:
+                    add_mouse('move', x, y, t)
+                    return
+                for sample in simplifier.push(x, y, t):
+                    add_mouse('move', *sample)
+
+            def flush_move():
+                # 點擊 / 滾輪 / 停止前補上暫存的最後位置
+                sample = sampler.flush()
+                if sample is not None:
+                    add_move(*sample)
+                if simplifier is not None:
+                    sample = simplifier.flush()
+                    if sample is not None:
+                        add_mouse('move', *sample)
+
+            def handle_move(x, y, t):
+                if simplifier is not None and not held_buttons:
+                    # 簡化時原始移動直接交給簡化器（不經取樣），tolerance 即為相對實際軌跡的誤差上限
+                    add_move(x, y, t)
+                    return
+                sample = sampler.offer(x, y, t)
+                if sample is not None:
+                    add_move(*sample)
+
+            def handle_click(x, y, button_name, pressed, t):
+                flush_move()
+                # 更新滑鼠按鍵狀態（用於拖曳判斷）
+                if button_name == 'left':
+                    self._mouse_pressed = pressed
+                if pressed:
+                    held_buttons.add(button_name)
+                else:
+                    held_buttons.discard(button_name)
+
+                # 記錄所有點擊事件，但標記是否在目標視窗內
+                add_mouse('down' if pressed else 'up', x, y, t, button=button_name)
+                if simplifier is not None:
+                    # 之後的軌跡從點擊位置開始簡化
+                    simplifier.reset(x, y, t)
+
+            def handle_scroll(x, y, dy, t):
+                flush_move()
+                # 記錄所有滾輪事件，但標記是否在目標視窗內
+                add_mouse('wheel', x, y, t, delta=dy)
+
+            def on_move(x, y):
+                if self._recording_mouse and not self.paused:
+                    handle_move(x, y, time.time())
 
             def on_click(x, y, button, pressed):
                 if self._recording_mouse and not self.paused:
-                    # 更新滑鼠按鍵狀態（用於拖曳判斷）
-                    if str(button).replace('Button.', '') == 'left':
-                        self._mouse_pressed = pressed
-                    
-                    # 記錄所有點擊事件，但標記是否在目標視窗內
-                    in_target = self._is_point_in_target_window(x, y)
-                    event = {
-                        'type': 'mouse',
-                        'event': 'down' if pressed else 'up',
-                        'button': str(button).replace('Button.', ''),
-                        'x': x,
-                        'y': y,
-                        'time': time.time(),
-                        'in_target': in_target  # 標記是否在目標視窗內
-                    }
-                    self._mouse_events.append(event)
+                    handle_click(x, y, str(button).replace('Button.', ''), pressed, time.time())
 
             def on_scroll(x, y, dx, dy):
                 if self._recording_mouse and not self.paused:
-                    # 記錄所有滾輪事件，但標記是否在目標視窗內
-                    in_target = self._is_point_in_target_window(x, y)
-                    event = {
-                        'type': 'mouse',
-                        'event': 'wheel',
-                        'delta': dy,
-                        'x': x,
-                        'y': y,
-                        'time': time.time(),
-                        'in_target': in_target  # 標記是否在目標視窗內
-                    }
-                    self._mouse_events.append(event)
+                    handle_scroll(x, y, dy, time.time())
+
+            def drain_capture(records):
+                # 子行程的時間戳記在 hook 回呼當下取得，依原本的時間記錄
+                for t, _source_t, device, code, x, y, arg, name in records:
+                    if self.paused:
+                        continue
+                    if device == CAPTURE_KEYBOARD:
+                        record_key(name, EVENT_NAMES[code], t)
+                    elif code == MOVE:
+                        handle_move(x, y, t)
+                    elif code == WHEEL:
+                        handle_scroll(x, y, arg, t)
+                    else:
+                        handle_click(x, y, name, code == DOWN, t)
 
             # 使用 pynput.mouse.Listener（添加錯誤處理）
             mouse_listener = None
-            try:
-                mouse_listener = pynput.mouse.Listener(
-                    on_click=on_click,
-                    on_scroll=on_scroll
-                )
-                mouse_listener.start()
-                # 儲存 reference，以便外部能停止/join
+            if capture is None:
                 try:
-                    self._mouse_listener = mouse_listener
-                except Exception:
-                    pass
-                self.logger("[錄製] pynput.mouse.Listener 已啟動")
-            except Exception as e:
-                self.logger(f"[警告] pynput.mouse.Listener 啟動失敗（可能需要管理員權限）: {e}")
-                # 如果 listener 失敗，仍然可以記錄移動
+                    mouse_listener = pynput.mouse.Listener(
+                        on_move=on_move,
+                        on_click=on_click,
+                        on_scroll=on_scroll
+                    )
+                    mouse_listener.start()
+                    # 儲存 reference，以便外部能停止/join
+                    try:
+                        self._mouse_listener = mouse_listener
+                    except Exception:
+                        pass
+                    self.logger("[錄製] pynput.mouse.Listener 已啟動")
+                except Exception as e:
+                    self.logger(f"[警告] pynput.mouse.Listener 啟動失敗（可能需要管理員權限）: {e}")
+                    # 如果 listener 失敗，仍然可以記錄移動
 
             # 記錄初始位置
             now = time.time()
-            in_target = self._is_point_in_target_window(last_pos[0], last_pos[1])
-            event = {
-                'type': 'mouse',
-                'event': 'move',
-                'x': last_pos[0],
-                'y': last_pos[1],
-                'time': now,
-                'in_target': in_target
-            }
-            self._mouse_events.append(event)
-
-            # 持續記錄滑鼠移動
-            while self.recording:
+            add_move(last_pos[0], last_pos[1], now)
+            sampler.reset(last_pos[0], last_pos[1], now)
+
+            if capture is not None:
+                # 事件由子行程寫入環形緩衝，這裡定期取出
+                while self.recording and capture.is_alive():
+                    self._record_stop.wait(CAPTURE_DRAIN_INTERVAL)
+                    drain_capture(capture.drain())
+                if self.recording:
+                    self.logger("[警告] 輸入擷取子行程已結束，改為輪詢記錄滑鼠移動")
+                drain_capture(capture.stop())
+                self._capture = None
+                flush_move()
+                self.logger(f"[錄製] 擷取子行程：{capture.format_stats()}")
+
+            if mouse_listener is not None:
+                # 移動由 on_move 回呼記錄，這裡只等待停止
+                while self.recording:
+                    self._record_stop.wait(0.2)
+                # 等監聽執行緒處理完最後一個回呼再補上暫存位置
+                self._recording_mouse = False
+                try:
+                    mouse_listener.stop()
+                    mouse_listener.join(timeout=0.5)
+                except Exception:
+                    pass
+                flush_move()
+                self.logger(f"[錄製] 滑鼠移動 {sampler.received} 次，保留 {sampler.emitted} 筆")
+                if simplifier is not None:
+                    self.logger(f"[錄製] 軌跡簡化（誤差 {simplifier.tolerance:g}px）："
+                                f"{simplifier.received} 筆 → {simplifier.emitted} 筆")
+
+            # 監聽器無法啟動時回退為輪詢記錄滑鼠移動
+            while self.recording and mouse_listener is None:
                 if not self.paused:
                     now = time.time()
                     pos = mouse_ctrl.position
                     if pos != last_pos:
-                        # 記錄所有移動，但標記是否在目標視窗內
-                        in_target = self._is_point_in_target_window(pos[0], pos[1])
-                        event = {
-                            'type': 'mouse',
-                            'event': 'move',
-                            'x': pos[0],
-                            'y': pos[1],
-                            'time': now,
-                            'in_target': in_target  # 標記是否在目標視窗內
-                        }
-                        self._mouse_events.append(event)
+                        add_move(pos[0], pos[1], now)
                         last_pos = pos
                 time.sleep(0.01)  # 10ms sampling
 
             # 停止錄製
             self._recording_mouse = False
+            flush_move()
             if mouse_listener:
                 try:
                     mouse_listener.stop()
@@ -1183,43 +1434,46 @@ class CoreRecorder:
                     self.logger(f"[警告] 停止 keyboard listener 時發生錯誤: {e}")
 
             # 處理鍵盤事件（混合模式：優先使用 pynput 事件，若無則嘗試 keyboard 庫）
-            k_events_data = []
-            if self._keyboard_events:
-                # 已經在監聽器中轉換為 dict 格式
-                k_events_data = self._keyboard_events
-                self.logger(f"[錄製] 使用 pynput 收集到 {len(k_events_data)} 個鍵盤事件")
-            elif self._keyboard_recording:
-                try:
-                    raw_k_events = keyboard.stop_recording()
-                    k_events_data = [{'type': 'keyboard', 'event': e.event_type, 'name': e.name, 'time': e.time} for e in raw_k_events]
-                    self.logger(f"[錄製] 使用 keyboard 庫收集到 {len(k_events_data)} 個鍵盤事件")
-                except Exception as e:
-                    self.logger(f"[警告] 停止 keyboard 錄製時發生錯誤: {e}")
-            
-            # 合併暫停期間的事件（若有）
-            if hasattr(self, "_paused_k_events") and self._paused_k_events:
-                # 這裡需要根據來源轉換格式，假設暫停期間也是 dict
-                k_events_data.extend(self._paused_k_events)
+            if len(key_buffer):
+                self.logger(f"[錄製] 使用 pynput 收集到 {len(key_buffer)} 個鍵盤事件")
+            else:
+                raw_k_events = []
+                if self._keyboard_recording:
+                    try:
+                        raw_k_events = keyboard.stop_recording()
+                        self.logger(f"[錄製] 使用 keyboard 庫收集到 {len(raw_k_events)} 個鍵盤事件")
+                    except Exception as e:
+                        self.logger(f"[警告] 停止 keyboard 錄製時發生錯誤: {e}")
+                # 暫停期間由 keyboard 庫暫存的事件（pynput 有收到事件時已包含，不重複加入）
+                for e in list(getattr(self, "_paused_k_events", None) or []) + list(raw_k_events or []):
+                    if isinstance(e, dict):
+                        kind, name, t = e.get('event'), e.get('name'), e.get('time')
+                    else:
+                        kind, name, t = e.event_type, e.name, e.time
+                    if kind in ('down', 'up') and name is not None:
+                        key_buffer.append_key(kind, name, t)
 
             # 過濾掉快捷鍵事件 (F9, F10, F11, F12)
-            filtered_k_events = [
-                e for e in k_events_data
-                if not (e.get('name') in ('f9', 'f10', 'f11', 'f12') and e.get('event') in ('down', 'up'))
-            ]
-
-            # 合併所有事件並排序
-            self.events = sorted(
-                filtered_k_events + self._mouse_events,
-                key=lambda e: e['time']
+            hotkey_ids = {strings.id_of(n) for n in ('f9', 'f10', 'f11', 'f12')} - {None}
+            key_args = key_buffer.arg
+
+            # 兩個事件流各自依時間排序，線性合併（dict 在取用時才建立）
+            self.events = merge_streams(
+                [key_buffer, mouse_buffer],
+                [(lambda i: key_args[i] not in hotkey_ids) if hotkey_ids else None, None]
             )
+            key_count = len(self.events) - len(mouse_buffer)
+            
+            # 錄製結束：寫入日誌剩餘事件（待 app 存檔完成後才刪除）
+            self._close_journal(journal)
 
             # 統計視窗內外的事件數量（如果有設定目標視窗）
             if self._target_hwnd:
-                mouse_in_target = sum(1 for e in self._mouse_events if e.get('in_target', True))
-                mouse_out_target = len(self._mouse_events) - mouse_in_target
+                mouse_in_target = mouse_buffer.count_flag()
+                mouse_out_target = len(mouse_buffer) - mouse_in_target
                 self.logger(f"錄製完成，共 {len(self.events)} 筆事件。")
-                self.logger(f"  滑鼠事件：{len(self._mouse_events)} 筆（視窗內: {mouse_in_target}, 視窗外: {mouse_out_target}）")
-                self.logger(f"  鍵盤事件：{len(filtered_k_events)} 筆")
+                self.logger(f"  滑鼠事件：{len(mouse_buffer)} 筆（視窗內: {mouse_in_target}, 視窗外: {mouse_out_target}）")
+                self.logger(f"  鍵盤事件：{key_count} 筆")
             else:
                 self.logger(f"錄製完成，共 {len(self.events)} 筆事件。")
             
@@ -1233,11 +1487,123 @@ class CoreRecorder:
                 self.logger("建議：請以管理員身份執行此程式")
 
         except Exception as ex:
+            self._stop_capture()
+            self._close_journal(journal)
             self.logger(f"錄製執行緒發生錯誤: {ex}")
             import traceback
             self.logger(f"詳細錯誤: {traceback.format_exc()}")
 
-    def play(self, speed=1.0, repeat=1, repeat_time_limit=None, repeat_interval=0, on_event=None, jitter_mode=False, random_pos=False):
+    # 需要 OCR 引擎的事件類型（預先載入時初始化引擎）
+    _OCR_EVENT_TYPES = frozenset(('if_text_exists', 'wait_text', 'click_text',
+                                  'ocr_relative_input', 'ocr_auto_input', 'ocr_input'))
+
+    @staticmethod
+    def _referenced_images(event):
+        """列出事件引用的圖片名稱（圖片辨識、多圖辨識、圖片錨點、迴圈條件）"""
+        names = []
+        if not isinstance(event, dict):
+            return names
+        if isinstance(event.get('image'), str):
+            names.append(event['image'])
+        for item in event.get('images') or []:
+            if isinstance(item, dict) and isinstance(item.get('name'), str):
+                names.append(item['name'])
+        if event.get('is_image_anchor') and isinstance(event.get('anchor'), str):
+            names.append(event['anchor'])
+        condition = event.get('condition')
+        if isinstance(condition, dict) and isinstance(condition.get('image'), str):
+            names.append(condition['image'])
+        return [name for name in names if name]
+
+    def prefetch_resources(self, events, cancelled=None):
+        """預先解碼腳本引用的圖片到比對器快取，並初始化需要的 OCR 引擎（可在背景執行緒呼叫）
+
+        Args:
+            cancelled: 回傳 True 時提前結束
+
+        Returns:
+            dict: {'images': 已載入圖片數, 'ocr': 是否初始化 OCR}
+        """
+        result = {'images': 0, 'ocr': False}
+        names = set()
+        needs_ocr = False
+        for event in events:
+            if cancelled and cancelled():
+                return result
+            names.update(self._referenced_images(event))
+            if isinstance(event, dict) and event.get('type') in self._OCR_EVENT_TYPES:
+                needs_ocr = True
+        matcher = self._hybrid_matcher
+        if matcher is not None and names:
+            for name in names:
+                if cancelled and cancelled():
+                    return result
+                path = matcher._resolve_path(name, self._images_dir or "")
+                if path and matcher.load_image(path) is not None:
+                    result['images'] += 1
+        if needs_ocr and not (cancelled and cancelled()):
+            try:
+                from ocr_trigger import get_ocr_trigger
+                result['ocr'] = get_ocr_trigger(ocr_engine="auto").is_available()
+            except Exception as e:
+                self.logger(f"[預先載入] OCR 引擎初始化失敗: {e}")
+        return result
+
+    def set_label_table(self, labels):
+        """設定目前 self.events 的預先編譯標籤表 {'label_name': index}；None 表示播放時自行建立"""
+        self._label_table = (self.events, dict(labels)) if labels is not None else None
+
+    def _get_label_map(self):
+        """取得目前事件的標籤表（事件列表換掉後才重新掃描；延遲載入的腳本直接使用其標籤目錄）"""
+        table = self._label_table
+        if table is not None and table[0] is self.events:
+            return table[1]
+        label_map = getattr(self.events, 'labels', None)
+        if label_map is None:
+            label_map = {}
+            for idx, event in enumerate(self.events):
+                if event.get('type') == 'label':
+                    label_map[event.get('name', '')] = idx
+        self._label_table = (self.events, label_map)
+        return label_map
+
+    def resolve_event_index(self, target):
+        """將事件索引（int，可為負數）或標籤名稱（str）轉為事件索引
+
+        Raises:
+            KeyError: 標籤不存在
+            IndexError: 索引超出範圍
+        """
+        if isinstance(target, str):
+            label_map = self._get_label_map()
+            name = target[1:] if target.startswith('#') and target not in label_map else target
+            if name not in label_map:
+                raise KeyError(f"標籤 '{name}' 不存在")
+            return label_map[name]
+        n = len(self.events)
+        index = int(target)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError(f"事件索引 {target} 超出範圍 (0-{n - 1})")
+        return index
+
+    def seek(self, target):
+        """跳至第 N 筆事件或標籤（播放中立即跳轉，否則作為下一次播放的起點）
+
+        跳轉後以目標事件為新的時間基準：目標事件立即執行，之後的事件維持原本的間隔。
+
+        Returns:
+            目標事件索引
+        """
+        index = self.resolve_event_index(target)
+        if self.playing:
+            self.control.request_seek(index)
+        else:
+            self._start_at = index
+        return index
+
+    def play(self, speed=1.0, repeat=1, repeat_time_limit=None, repeat_interval=0, on_event=None, jitter_mode=False, random_pos=False, start_at=None):
         """開始執行錄製的事件
         
         Args:
@@ -1248,10 +1614,19 @@ class CoreRecorder:
             on_event: 事件回調函數
             jitter_mode: 是否開啟時間抖動
             random_pos: 是否開啟座標隨機
+            start_at: 第一輪的起始事件索引或標籤名稱（None 時使用 seek() 設定的起點）
         """
         if self.playing or not self.events:
             return False
         
+        if start_at is not None:
+            try:
+                self._start_at = self.resolve_event_index(start_at)
+            except (KeyError, IndexError) as e:
+                self.logger(f"[跳轉] 無法設定起點: {e}")
+                return False
+        self.control.clear_requests()
+        
         # 設定防偵測模式
         self._jitter_mode = jitter_mode
         self._random_pos = random_pos
@@ -1283,27 +1658,18 @@ class CoreRecorder:
             
             #  修復：釋放可能卡住的修飾鍵（強化版）
             try:
-                import keyboard
                 # 釋放常見修飾鍵
                 modifiers = ['ctrl', 'shift', 'alt', 'win', 'left ctrl', 'right ctrl', 
                            'left shift', 'right shift', 'left alt', 'right alt']
                 for mod in modifiers:
                     try:
-                        keyboard.release(mod)
+                        self.input.key_name(mod, False)
                     except:
                         pass
                 
-                #  修復：額外確保通過 Windows API 釋放修飾鍵
+                #  修復：額外確保通過 Windows API 釋放修飾鍵（Ctrl、Shift、Alt、左右 Win）
                 try:
-                    import ctypes
-                    VK_CONTROL = 0x11
-                    VK_SHIFT = 0x10
-                    VK_MENU = 0x12  # Alt
-                    VK_LWIN = 0x5B
-                    VK_RWIN = 0x5C
-                    
-                    for vk in [VK_CONTROL, VK_SHIFT, VK_MENU, VK_LWIN, VK_RWIN]:
-                        ctypes.windll.user32.keybd_event(vk, 0, 0x0002, 0)  # KEYEVENTF_KEYUP
+                    self.input.release_modifiers(ALL_MODIFIER_VKS)
                 except:
                     pass
             except:
@@ -1361,16 +1727,11 @@ class CoreRecorder:
                     
                     # 執行間隔等待（同樣要檢查時間限制）
                     if repeat_interval > 0 and self.playing:
-                        interval_start = time.time()
-                        while time.time() - interval_start < repeat_interval:
-                            if not self.playing:
-                                break
-                            # 再次檢查總時間限制
-                            if time.time() - play_start_time >= repeat_time_limit:
-                                self.logger(f"[時間限制] 間隔等待中達到時間限制，停止執行")
-                                self.playing = False
-                                break
-                            time.sleep(0.1)
+                        # 最多等到總時間限制（停止時立即返回）
+                        time_left = repeat_time_limit - (time.time() - play_start_time)
+                        if self.control.sleep(min(repeat_interval, time_left)) and repeat_interval >= time_left:
+                            self.logger(f"[時間限制] 間隔等待中達到時間限制，停止執行")
+                            self.playing = False
             elif repeat == -1:
                 # 無限重複模式（無時間限制）
                 self.logger("[無限重複模式] 將持續執行直到手動停止")
@@ -1384,11 +1745,7 @@ class CoreRecorder:
                     
                     # 執行間隔等待
                     if repeat_interval > 0 and self.playing:
-                        interval_start = time.time()
-                        while time.time() - interval_start < repeat_interval:
-                            if not self.playing:
-                                break
-                            time.sleep(0.1)
+                        self.control.sleep(repeat_interval)
             else:
                 # 次數限制模式
                 self.logger(f"[次數限制模式] 將執行 {repeat} 次")
@@ -1400,11 +1757,7 @@ class CoreRecorder:
                     
                     # 執行間隔等待（最後一次不需要等待）
                     if repeat_interval > 0 and r < repeat - 1 and self.playing:
-                        interval_start = time.time()
-                        while time.time() - interval_start < repeat_interval:
-                            if not self.playing:
-                                break
-                            time.sleep(0.1)
+                        self.control.sleep(repeat_interval)
                     
         except Exception as ex:
             self.logger(f"執行迴圈錯誤: {ex}")
@@ -1414,10 +1767,8 @@ class CoreRecorder:
             #  修復：執行結束後確保所有按鍵都被釋放
             try:
                 self._release_pressed_keys()
-                # 額外發送一次全局修飾鍵釋放
-                import ctypes
-                for vk in [0x10, 0x11, 0x12]: # Shift, Ctrl, Alt
-                    ctypes.windll.user32.keybd_event(vk, 0, 0x0002, 0)
+                # 額外發送一次全局修飾鍵釋放（Shift, Ctrl, Alt）
+                self.input.release_modifiers()
             except:
                 pass
             
@@ -1425,52 +1776,66 @@ class CoreRecorder:
         """執行單次執行迴圈（支援標籤跳轉和重複執行）"""
         self._current_play_index = 0
         base_time = self.events[0]['time']
-        play_start = time.time()
+        control = self.control
+        # 粗略等待改由 PlaybackControl 喚醒（停止 / 暫停 / 跳轉立即生效），不需分段檢查
+        timer = self.play_timer = PlaybackTimer(max_chunk=1.0, sleep=control.wait_interrupted)
+        clock = timer.clock
+        play_start = clock()
+        # 指定起點只套用於第一輪：以起點事件為時間基準
+        if self._start_at:
+            self._current_play_index = self._start_at
+            play_start -= (self.events[self._start_at].get('time', base_time) - base_time) / speed
+            self.logger(f"[跳轉] 從第 {self._start_at} 筆事件開始執行")
+        self._start_at = None
         pause_start_time = None  # 暫停開始時間
         total_pause_time = 0  # 累計暫停時間
         last_pause_state = False  # 上一次的暫停狀態
         
         #  核心修復：在一輪執行開始前，強制釋放所有修飾鍵，防止殘留
         try:
-            import ctypes
-            for vk in [0x10, 0x11, 0x12]: # Shift, Ctrl, Alt
-                ctypes.windll.user32.keybd_event(vk, 0, 0x0002, 0)
+            self.input.release_modifiers()  # Shift, Ctrl, Alt
             time.sleep(0.01)
         except:
             pass
         
-        #  標籤與索引的映射
-        label_map = {}  # {'label_name': index}
-        for idx, event in enumerate(self.events):
-            if event.get('type') == 'label':
-                label_name = event.get('name', '')
-                label_map[label_name] = idx
-                if label_name.startswith("基準解析度>"):
-                    try:
-                        res_str = label_name.split(">")[1].strip()
-                        bw, bh = map(int, res_str.lower().split("x"))
-                        import ctypes
-                        cw = ctypes.windll.user32.GetSystemMetrics(0)
-                        ch = ctypes.windll.user32.GetSystemMetrics(1)
-                        self.scale_x = cw / bw
-                        self.scale_y = ch / bh
-                        self.log_msg(f"[解析度自適應] 基準:{bw}x{bh}, 當前:{cw}x{ch}, 縮放: x={self.scale_x:.3f}, y={self.scale_y:.3f}")
-                    except Exception as e:
-                        self.log_msg(f"[解析度自適應] 解析錯誤: {e}")
+        #  標籤與索引的映射（同一份事件只建立一次，或使用編譯快取提供的標籤表）
+        label_map = self._get_label_map()  # {'label_name': index}
+        for label_name, idx in sorted(label_map.items(), key=lambda item: item[1]):
+            if label_name.startswith("基準解析度>"):
+                try:
+                    res_str = label_name.split(">")[1].strip()
+                    bw, bh = map(int, res_str.lower().split("x"))
+                    import ctypes
+                    cw = ctypes.windll.user32.GetSystemMetrics(0)
+                    ch = ctypes.windll.user32.GetSystemMetrics(1)
+                    self.scale_x = cw / bw
+                    self.scale_y = ch / bh
+                    self.log_msg(f"[解析度自適應] 基準:{bw}x{bh}, 當前:{cw}x{ch}, 縮放: x={self.scale_x:.3f}, y={self.scale_y:.3f}")
+                except Exception as e:
+                    self.log_msg(f"[解析度自適應] 解析錯誤: {e}")
         
         #  標籤重複計數器 {'label_name': {'count': N, 'start_idx': idx}}
         label_repeat_tracker = {}
 
         while self._current_play_index < len(self.events):
             # 檢查是否有來自觸發器的跳轉請求
-            if self._pending_jump:
-                target_label = self._pending_jump
-                self._pending_jump = None
+            target_label = control.take_jump()
+            if target_label:
                 if target_label in label_map:
                     self.logger(f"[觸發器跳轉] 響應跳轉至 #{target_label}")
                     self._current_play_index = label_map[target_label]
                     continue
 
+            # 檢查是否有 seek() 跳轉請求（重新以目標事件為時間基準）
+            seek_idx = control.take_seek()
+            if seek_idx is not None:
+                if 0 <= seek_idx < len(self.events):
+                    self._current_play_index = seek_idx
+                    seek_offset = (self.events[seek_idx].get('time', base_time) - base_time) / speed
+                    play_start = clock() - seek_offset - total_pause_time
+                    self.logger(f"[跳轉] 跳至第 {seek_idx} 筆事件")
+                    continue
+
             # 檢查 playing 狀態（不受外部事件影響）
             if not self.playing:
                 break
@@ -1479,17 +1844,17 @@ class CoreRecorder:
             if self.paused:
                 if not last_pause_state:
                     # 剛進入暫停狀態
-                    pause_start_time = time.time()
+                    pause_start_time = clock()
                     last_pause_state = True
                     self.logger("[暫停] 執行已暫停")
-                time.sleep(0.05)
+                control.wait_resumed()
                 continue
             else:
                 # 從暫停恢復：累計暫停時長
                 if last_pause_state:
                     # 剛從暫停恢復
                     if pause_start_time is not None:
-                        pause_duration = time.time() - pause_start_time
+                        pause_duration = clock() - pause_start_time
                         total_pause_time += pause_duration
                         self.logger(f"[繼續] 執行繼續（暫停了 {pause_duration:.2f} 秒）")
                         pause_start_time = None
@@ -1518,23 +1883,10 @@ class CoreRecorder:
                 # 極速模式：只等待1ms讓出CPU
                 time.sleep(0.001)
             else:
-                # 等待到目標時間 (考慮抖動後的 target_time)
-                while time.time() < target_time:
-                    if not self.playing:
-                        break
-                    if self.paused:
-                        # 進入暫停狀態
-                        if not last_pause_state:
-                            pause_start_time = time.time()
-                            last_pause_state = True
-                            self.logger("[暫停] 執行已暫停")
-                        break
-                    # 使用極短的睡眠時間以保持時間計算精確
-                    sleep_time = min(0.001, target_time - time.time())
-                    if sleep_time > 0:
-                        time.sleep(sleep_time)
-                    else:
-                        break  # 避免 busy-wait
+                # 等待到目標時間 (考慮抖動後的 target_time)；停止、暫停或跳轉請求時提前返回，
+                # 回到迴圈開頭處理
+                if not timer.wait_until(target_time, control.interrupted):
+                    continue
 
             # 如果進入暫停，跳過事件執行
             if self.paused:
@@ -1543,6 +1895,15 @@ class CoreRecorder:
             if not self.playing:
                 break
 
+            # 批次注入：之後截止時間在容許範圍內的連續移動 / 按鍵與此事件一次送出
+            if (self.batch_tolerance > 0 and not self._jitter_mode and not self._current_try_action
+                    and not self._target_hwnd
+                    and not (self._use_bezier and self._bezier_mover)):
+                batch_end = self._inject_batch(self._current_play_index, speed, on_event)
+                if batch_end:
+                    self._current_play_index = batch_end
+                    continue
+
             # 執行事件（使用 try-except 確保單一事件錯誤不影響整體執行）
             try:
                 # 檢查事件是否應該被執行
@@ -1554,7 +1915,7 @@ class CoreRecorder:
                 
                 if should_execute:
                     # 記錄執行前的精確時間
-                    exec_start = time.time()
+                    exec_start = clock()
 
                     # ── Beta: 視覺錨點座標修正 ──────────────────────────
                     # 若外部（RecorderApp）有注入 visual_anchor_hook，
@@ -1577,7 +1938,7 @@ class CoreRecorder:
                     #  v2.8.2+: 處理主動延遲造成的偏移
                     # 如果是主動等待類指令，執行時間應計入暫停偏移，避免後續指令為了「趕進度」而跳過延遲
                     if event.get('type') in ['random_delay', 'delayed_start', 'delayed_end', 'delay']:
-                        exec_duration = time.time() - exec_start
+                        exec_duration = clock() - exec_start
                         total_pause_time += exec_duration
                     
                     #  v2.8.2+: 處理 try_action 成果監測 (保留前次修改)
@@ -1659,6 +2020,78 @@ class CoreRecorder:
             # 更新索引（確保一定會執行）
             self._current_play_index += 1
 
+        if timer.lateness.count or timer.max_drift:
+            self.logger(f"[時間精準度] {timer.format_stats()}")
+
+    def _inject_batch(self, start, speed, on_event):
+        """從 start 起收集可批次注入的事件（有座標的滑鼠移動、有虛擬鍵碼且不是修飾鍵放開的按鍵），
+        事件時間與 start 相差不超過 batch_tolerance（依播放速度換算）時以一次 send_batch 送出。
+        點擊 / 滾輪與修飾鍵放開需要穩定延遲，仍逐筆執行。
+
+        Returns:
+            批次結束後的下一個事件索引；少於 2 筆可批次的事件時回傳 0（照原本逐筆執行）
+        """
+        events = self.events
+        first = events[start]
+        if first.get('type') not in ('mouse', 'keyboard'):
+            return 0
+        limit = first.get('time', 0) + self.batch_tolerance * speed
+        bounds = self.input.screen_bounds()
+        left, top, right, bottom = bounds
+        random_pos = self._random_pos
+        lookup = self._compiled_events.lookup
+        actions = []
+        keys = []  # [(down/up, 按鍵名稱)]
+        index = start
+        count = len(events)
+        while index < count:
+            event = events[index]
+            if event.get('time', 0) > limit:
+                break
+            event_type = event.get('type')
+            if event_type == 'mouse':
+                x = event.get('x')
+                y = event.get('y')
+                if event.get('event') != 'move' or x is None or y is None:
+                    break
+                if random_pos:
+                    actions.append(('move',) + self._resolve_point(x, y, bounds))
+                else:
+                    # 與 _resolve_point 相同：限制在虛擬螢幕範圍內
+                    actions.append(('move', max(left, min(right - 1, int(x))), max(top, min(bottom - 1, int(y)))))
+            elif event_type == 'keyboard':
+                _handler, (kind, name, vk, is_modifier) = lookup(self, events, index, event)
+                if not vk or kind not in ('down', 'up') or (kind == 'up' and is_modifier):
+                    # 沒有虛擬鍵碼（keyboard 模組回退）或修飾鍵放開（需要短暫延遲）
+                    break
+                actions.append(('key', vk, kind == 'down'))
+                keys.append((kind, name))
+            else:
+                break
+            index += 1
+        if len(actions) < 2:
+            return 0
+
+        try:
+            self.input.send_batch(actions)
+        except Exception as e:
+            self.logger(f"批次注入失敗: {e}")
+
+        for kind, name in keys:
+            if kind == 'down':
+                self._pressed_keys.add(name)
+            else:
+                self._pressed_keys.discard(name)
+            #  2.5 風格：即時輸出鍵盤事件
+            self.logger(f"[鍵盤] {kind} {name}")
+        if on_event:
+            for event in events[start:index]:
+                try:
+                    on_event(event)
+                except:
+                    pass  # 忽略回調錯誤
+        return index
+
     def _execute_event_with_mode(self, event):
         """根據後台模式和滑鼠模式執行事件（強化版）
         
@@ -2080,343 +2513,489 @@ class CoreRecorder:
             self._execute_event(event)
 
     def _execute_event(self, event):
-        """執行單一事件（滑鼠模式 - 強化版，添加即時日誌）"""
-        # 處理範圍結束指令
-        if event['type'] == 'region_end':
-            self._current_region = None
-            self.logger("[範圍結束] 已清除辨識範圍限制")
-            return
-        
-        if event['type'] == 'keyboard':
-            # 鍵盤事件執行
-            try:
-                if event['event'] == 'down':
-                    self._keyboard_event_enhanced('down', event['name'])
-                    try:
-                        self._pressed_keys.add(event['name'])
-                    except Exception:
-                        pass
-                    #  2.5 風格：即時輸出鍵盤事件
-                    self.logger(f"[鍵盤] {event['event']} {event['name']}")
-                elif event['event'] == 'up':
-                    self._keyboard_event_enhanced('up', event['name'])
-                    try:
-                        if event['name'] in self._pressed_keys:
-                            self._pressed_keys.discard(event['name'])
-                    except Exception:
-                        pass
-                    #  2.5 風格：即時輸出鍵盤事件
-                    self.logger(f"[鍵盤] {event['event']} {event['name']}")
-                    #  核心修復：修飾鍵放開後加入微小延遲，確保 Windows 訊息隊列處理同步
-                    if event['name'] in ['alt', 'ctrl', 'shift', 'windows', 'left alt', 'right alt', 'left ctrl', 'right ctrl', 'left shift', 'right shift']:
-                        time.sleep(0.005)
-            except Exception as e:
-                self.logger(f"鍵盤事件執行失敗: {e}")
-                
-        elif event['type'] == 'mouse':
-            # 解析座標，處理 None 的情況 (即目前位置點擊)
-            x = event.get('x')
-            y = event.get('y')
-            
-            if x is None or y is None:
-                # 獲取當前游標位置
-                point = ctypes.wintypes.POINT()
-                ctypes.windll.user32.GetCursorPos(ctypes.byref(point))
-                if x is None: x = point.x
-                if y is None: y = point.y
-            
-            x, y = int(x), int(y)
-            
-            # 如果有設定目標視窗，先確保視窗在前景並將座標限制在視窗內
-            if self._target_hwnd:
+        """執行單一事件（滑鼠模式 - 強化版，添加即時日誌）
+
+        事件依類型分派到以 @_EVENT_REGISTRY.handles 登錄的處理函式；
+        目前執行位置的事件第一次執行時編譯為 (處理函式, 參數) 並快取，之後直接呼叫。
+        """
+        handler, args = self._compiled_events.lookup(self, self.events, self._current_play_index, event)
+        return handler(self, *args)
+
+    @_EVENT_REGISTRY.args('keyboard')
+    def _keyboard_args(self, event):
+        """鍵盤事件參數：(down/up, 按鍵名稱, 虛擬鍵碼, 是否為修飾鍵)"""
+        name = event['name']
+        try:
+            vk = self._name_to_vk(name)
+        except Exception:
+            vk = None  # 執行時再轉換（並沿用原本的錯誤處理）
+        return event['event'], name, vk, name in _MODIFIER_KEY_NAMES
+
+    @_EVENT_REGISTRY.handles('keyboard')
+    def _ev_keyboard(self, kind, name, vk, is_modifier):
+        # 鍵盤事件執行
+        try:
+            if kind == 'down':
+                self._keyboard_event_enhanced('down', name, vk)
                 try:
-                    # 取得視窗矩形
-                    left, top, right, bottom = win32gui.GetWindowRect(self._target_hwnd)
-                    # 將座標限制在視窗範圍內
-                    x = max(left, min(right - 1, x))
-                    y = max(top, min(bottom - 1, y))
-                except:
-                    pass  # 視窗可能已關閉，使用原始座標
-            
+                    self._pressed_keys.add(name)
+                except Exception:
+                    pass
+                #  2.5 風格：即時輸出鍵盤事件
+                self.logger(f"[鍵盤] {kind} {name}")
+            elif kind == 'up':
+                self._keyboard_event_enhanced('up', name, vk)
+                try:
+                    if name in self._pressed_keys:
+                        self._pressed_keys.discard(name)
+                except Exception:
+                    pass
+                #  2.5 風格：即時輸出鍵盤事件
+                self.logger(f"[鍵盤] {kind} {name}")
+                #  核心修復：修飾鍵放開後加入微小延遲，確保 Windows 訊息隊列處理同步
+                if is_modifier:
+                    time.sleep(0.005)
+        except Exception as e:
+            self.logger(f"鍵盤事件執行失敗: {e}")
+
+    @_EVENT_REGISTRY.args('mouse')
+    def _mouse_args(self, event):
+        """滑鼠事件參數：(move/down/up/wheel, x, y, 按鈕, 滾輪量, 擬真移動時間)；x / y 為 None 表示目前位置"""
+        x = event.get('x')
+        y = event.get('y')
+        return (event['event'], None if x is None else int(x), None if y is None else int(y),
+                event.get('button', 'left'), event.get('delta', 0), event.get('duration', 0.2))
+
+    def _resolve_point(self, x, y, bounds=None):
+        """播放座標：限制在虛擬螢幕範圍內並套用座標微隨機；bounds 為預先取得的虛擬螢幕範圍"""
+        #  修復：使用虛擬螢幕範圍（支援多螢幕）
+        # GetSystemMetrics(0/1) 只返回主螢幕尺寸，不適用於多螢幕
+        virtual_left, virtual_top, virtual_right, virtual_bottom = bounds or self.input.screen_bounds()
+
+        # 將座標限制在虛擬螢幕範圍內（支援負數座標）
+        x = max(virtual_left, min(virtual_right - 1, int(x)))
+        y = max(virtual_top, min(virtual_bottom - 1, int(y)))
+
+        #  v2.8.3: 導入座標微隨機 (Coordinate Randomization)
+        if self._random_pos:
+            import random
+            # 使用 User 要求的 ±2 ~ ±4 範圍
+            # 使用 random.choice 確保不會落在 ±1 以內，增加反偵測效果
+            off_x = random.choice([-4, -3, -2, 2, 3, 4])
+            off_y = random.choice([-4, -3, -2, 2, 3, 4])
+            x += off_x
+            y += off_y
+        return x, y
+
+    @_EVENT_REGISTRY.handles('mouse')
+    def _ev_mouse(self, kind, x, y, button, delta, duration):
+        # 解析座標，處理 None 的情況 (即目前位置點擊)
+        if x is None or y is None:
+            # 獲取當前游標位置
+            cur_x, cur_y = self.input.position()
+            if x is None: x = cur_x
+            if y is None: y = cur_y
+
+        # 如果有設定目標視窗，先確保視窗在前景並將座標限制在視窗內
+        if self._target_hwnd:
             try:
-                #  修復：使用虛擬螢幕範圍（支援多螢幕）
-                # GetSystemMetrics(0/1) 只返回主螢幕尺寸，不適用於多螢幕
-                # 使用 SM_XVIRTUALSCREEN/SM_YVIRTUALSCREEN 獲取整個虛擬螢幕範圍
-                SM_XVIRTUALSCREEN = 76  # 虛擬螢幕左上角 X 座標
-                SM_YVIRTUALSCREEN = 77  # 虛擬螢幕左上角 Y 座標
-                SM_CXVIRTUALSCREEN = 78  # 虛擬螢幕寬度
-                SM_CYVIRTUALSCREEN = 79  # 虛擬螢幕高度
-                
-                virtual_left = ctypes.windll.user32.GetSystemMetrics(SM_XVIRTUALSCREEN)
-                virtual_top = ctypes.windll.user32.GetSystemMetrics(SM_YVIRTUALSCREEN)
-                virtual_width = ctypes.windll.user32.GetSystemMetrics(SM_CXVIRTUALSCREEN)
-                virtual_height = ctypes.windll.user32.GetSystemMetrics(SM_CYVIRTUALSCREEN)
-                
-                virtual_right = virtual_left + virtual_width
-                virtual_bottom = virtual_top + virtual_height
-                
-                # 將座標限制在虛擬螢幕範圍內（支援負數座標）
-                x = max(virtual_left, min(virtual_right - 1, int(x)))
-                y = max(virtual_top, min(virtual_bottom - 1, int(y)))
-                
-                #  v2.8.3: 導入座標微隨機 (Coordinate Randomization)
-                if self._random_pos and event['event'] in ('move', 'down', 'up', 'wheel'):
-                    import random
-                    # 使用 User 要求的 ±2 ~ ±4 範圍
-                    # 使用 random.choice 確保不會落在 ±1 以內，增加反偵測效果
-                    off_x = random.choice([-4, -3, -2, 2, 3, 4])
-                    off_y = random.choice([-4, -3, -2, 2, 3, 4])
-                    x += off_x
-                    y += off_y
-                
-                if event['event'] == 'move':
-                    # 滑鼠移動
-                    if self._use_bezier and self._bezier_mover:
-                        dur = event.get('duration', 0.2)
-                        self._bezier_mover.move_to(x, y, duration=dur)
-                    else:
-                        ctypes.windll.user32.SetCursorPos(x, y)
-                    # 移動事件太頻繁，不輸出日誌
-                    
-                elif event['event'] in ('down', 'up'):
-                    # 點擊事件：先移動到正確位置
-                    if self._use_bezier and self._bezier_mover:
-                        # 點擊前的移動通常較快，但若有設定 duration 則遵照設定
-                        dur = event.get('duration', 0.2)
-                        self._bezier_mover.move_to(x, y, duration=dur)
-                    else:
-                        ctypes.windll.user32.SetCursorPos(x, y)
-                    
-                    #  增加微小延遲確保系統更新位置狀態
-                    time.sleep(0.01)
-                    
-                    button = event.get('button', 'left')
-                    self._mouse_event_enhanced(event['event'], button=button)
-                    #  2.5 風格：即時輸出滑鼠點擊事件
-                    self.logger(f"[滑鼠] {event['event']} {button} at ({x}, {y})")
-                    
-                elif event['event'] == 'wheel':
-                    # 滾輪事件：先移動到正確位置
-                    ctypes.windll.user32.SetCursorPos(x, y)
-                    time.sleep(0.001)
-                    
-                    delta = event.get('delta', 0)
-                    self._mouse_event_enhanced('wheel', delta=delta)
-                    #  2.5 風格：即時輸出滾輪事件
-                    self.logger(f"[滑鼠] wheel {delta} at ({x}, {y})")
-                    
-            except Exception as e:
-                self.logger(f"滑鼠事件執行失敗: {e}")
-        
-        # 處理圖片辨識相關事件
-        elif event['type'] == 'recognize_image':
-            # 辨識圖片（只是辨識，不做動作）
-            try:
-                image_name = event.get('image', '')
-                confidence = event.get('confidence', 0.6)  #  優化：降低至0.6加快速度
-                show_border = event.get('show_border', False)  # 是否顯示邊框
-                region = event.get('region', None)  # 辨識範圍
-                
-                # 如果事件指定了範圍，更新全域範圍狀態
-                if region is not None:
-                    self._current_region = region
-                # 如果事件沒有指定範圍，使用全域範圍狀態
-                elif self._current_region is not None:
-                    region = self._current_region
-                
-                self.logger(f"[圖片辨識] 開始辨識: {image_name}" + 
-                          (f" (範圍: {region})" if region else ""))
-                
-                pos = self.find_image_on_screen(
-                    image_name, 
-                    threshold=confidence, 
-                    fast_mode=True,
-                    show_border=show_border,
-                    region=region
-                )
-                
-                if pos:
-                    self.logger(f"[圖片辨識]  找到圖片於 ({pos[0]}, {pos[1]})")
+                # 取得視窗矩形
+                left, top, right, bottom = win32gui.GetWindowRect(self._target_hwnd)
+                # 將座標限制在視窗範圍內
+                x = max(left, min(right - 1, x))
+                y = max(top, min(bottom - 1, y))
+            except:
+                pass  # 視窗可能已關閉，使用原始座標
+
+        try:
+            if kind in ('move', 'down', 'up', 'wheel'):
+                x, y = self._resolve_point(x, y)
+
+            if kind == 'move':
+                # 滑鼠移動
+                if self._use_bezier and self._bezier_mover:
+                    self._bezier_mover.move_to(x, y, duration=duration)
                 else:
-                    self.logger(f"[圖片辨識]  未找到圖片")
-            except Exception as e:
-                self.logger(f"圖片辨識執行失敗: {e}")
-        
-        elif event['type'] == 'move_to_image':
-            # 移動到圖片位置
-            try:
-                image_name = event.get('image', '')
-                confidence = event.get('confidence', 0.6)  #  優化：降低至0.6加快速度
-                show_border = event.get('show_border', False)
-                region = event.get('region', None)
-                
-                # 如果事件指定了範圍，更新全域範圍狀態
-                if region is not None:
-                    self._current_region = region
-                # 如果事件沒有指定範圍，使用全域範圍狀態
-                elif self._current_region is not None:
-                    region = self._current_region
-                
-                self.logger(f"[移動至圖片] 開始尋找: {image_name}" +
-                          (f" (範圍: {region})" if region else ""))
-                
-                pos = self.find_image_on_screen(
-                    image_name,
-                    threshold=confidence,
-                    fast_mode=True,
-                    show_border=show_border,
-                    region=region
-                )
-                
-                if pos:
-                    x, y = pos
-                    ctypes.windll.user32.SetCursorPos(x, y)
-                    self.logger(f"[移動至圖片]  已移動至 ({x}, {y})")
+                    self.input.move(x, y)
+                # 移動事件太頻繁，不輸出日誌
+
+            elif kind in ('down', 'up'):
+                # 點擊事件：先移動到正確位置
+                if self._use_bezier and self._bezier_mover:
+                    # 點擊前的移動通常較快，但若有設定 duration 則遵照設定
+                    self._bezier_mover.move_to(x, y, duration=duration)
                 else:
-                    self.logger(f"[移動至圖片]  未找到圖片，無法移動")
-            except Exception as e:
-                self.logger(f"移動至圖片執行失敗: {e}")
-        
-        elif event['type'] == 'click_image':
-            # 點擊圖片位置（ 新增：可選擇返回原位 +  彈性點擊範圍）
-            try:
-                image_name = event.get('image', '')
-                confidence = event.get('confidence', 0.6)  #  優化：降低至0.6加快速度
-                button = event.get('button', 'left')
-                return_to_origin = event.get('return_to_origin', False)  # 預設不返回原位
-                show_border = event.get('show_border', False)
-                region = event.get('region', None)
-                
-                #  新增：彈性點擊範圍參數
-                click_offset_mode = event.get('click_offset_mode', 'center')  #  預設中心模式（極速點擊）
-                click_radius = event.get('click_radius', 0)  # 點擊半徑（0=使用預設45%範圍）
-                
-                #  如果未指定點擊半徑，計算圖片大小的45%作為預設範圍
-                auto_radius = 0
-                if click_radius == 0:
-                    # 稍後在找到圖片後計算（需要圖片尺寸）
-                    auto_radius = None  # 標記需要自動計算
-                
-                # 如果事件指定了範圍，更新全域範圍狀態
-                if region is not None:
-                    self._current_region = region
-                # 如果事件沒有指定範圍，使用全域範圍狀態
-                elif self._current_region is not None:
-                    region = self._current_region
-                
-                self.logger(f"[點擊圖片] 開始尋找: {image_name}" +
-                          (f" (範圍: {region})" if region else ""))
-                
-                #  記錄原始滑鼠位置
-                if return_to_origin:
-                    original_pos = win32api.GetCursorPos()
-                
-                pos = self.find_image_on_screen(
-                    image_name,
-                    threshold=confidence,
-                    fast_mode=True,
-                    show_border=show_border,
-                    region=region
-                )
-                
-                #  強化：必須找到圖片才執行點擊
-                if pos is None:
-                    self.logger(f"[點擊圖片]  未找到圖片 '{image_name}'，跳過點擊")
-                    return  # 直接返回，不執行任何點擊動作
-                
-                if pos:
-                    x, y = pos
-                    
-                    #  自動計算點擊半徑（圖片尺寸的80%）
-                    if click_radius == 0 and auto_radius is None:
-                        # 重新載入圖片取得尺寸（已有快取，速度很快）
-                        template_gray, _ = self._load_image(image_name)
-                        if template_gray is not None:
-                            h, w = template_gray.shape
-                            #  計算圖片尺寸的45%作為半徑（例如128x128→半徑28.8px）
-                            import math
-                            # 使用較短邊的45%作為半徑，更精準的點擊範圍
-                            click_radius = int(min(w, h) * 0.45 / 2)  # 45%範圍 = 短邊的22.5%半徑
-                            self.logger(f"[彈性點擊] 自動計算半徑: {click_radius}px (圖片尺寸{w}x{h}，45%範圍)")
-                    
-                    #  彈性點擊：根據模式計算偏移
-                    if click_radius > 0:
-                        if click_offset_mode == 'random':
-                            # 隨機偏移：在半徑範圍內隨機點擊
-                            import random
+                    self.input.move(x, y)
+
+                #  增加微小延遲確保系統更新位置狀態
+                time.sleep(0.01)
+
+                self._mouse_event_enhanced(kind, button=button)
+                #  2.5 風格：即時輸出滑鼠點擊事件
+                self.logger(f"[滑鼠] {kind} {button} at ({x}, {y})")
+
+            elif kind == 'wheel':
+                # 滾輪事件：先移動到正確位置
+                self.input.move(x, y)
+                time.sleep(0.001)
+
+                self._mouse_event_enhanced('wheel', delta=delta)
+                #  2.5 風格：即時輸出滾輪事件
+                self.logger(f"[滑鼠] wheel {delta} at ({x}, {y})")
+
+        except Exception as e:
+            self.logger(f"滑鼠事件執行失敗: {e}")
+
+    # 處理範圍結束指令
+    @_EVENT_REGISTRY.handles('region_end')
+    def _ev_region_end(self, event):
+        self._current_region = None
+        self.logger("[範圍結束] 已清除辨識範圍限制")
+        return
+
+    # 處理圖片辨識相關事件
+    @_EVENT_REGISTRY.handles('recognize_image')
+    def _ev_recognize_image(self, event):
+        # 辨識圖片（只是辨識，不做動作）
+        try:
+            image_name = event.get('image', '')
+            confidence = event.get('confidence', 0.6)  #  優化：降低至0.6加快速度
+            show_border = event.get('show_border', False)  # 是否顯示邊框
+            region = event.get('region', None)  # 辨識範圍
+
+            # 如果事件指定了範圍，更新全域範圍狀態
+            if region is not None:
+                self._current_region = region
+            # 如果事件沒有指定範圍，使用全域範圍狀態
+            elif self._current_region is not None:
+                region = self._current_region
+
+            self.logger(f"[圖片辨識] 開始辨識: {image_name}" + 
+                      (f" (範圍: {region})" if region else ""))
+
+            pos = self.find_image_on_screen(
+                image_name, 
+                threshold=confidence, 
+                fast_mode=True,
+                show_border=show_border,
+                region=region
+            )
+
+            if pos:
+                self.logger(f"[圖片辨識]  找到圖片於 ({pos[0]}, {pos[1]})")
+            else:
+                self.logger(f"[圖片辨識]  未找到圖片")
+        except Exception as e:
+            self.logger(f"圖片辨識執行失敗: {e}")
+
+    @_EVENT_REGISTRY.handles('move_to_image')
+    def _ev_move_to_image(self, event):
+        # 移動到圖片位置
+        try:
+            image_name = event.get('image', '')
+            confidence = event.get('confidence', 0.6)  #  優化：降低至0.6加快速度
+            show_border = event.get('show_border', False)
+            region = event.get('region', None)
+
+            # 如果事件指定了範圍，更新全域範圍狀態
+            if region is not None:
+                self._current_region = region
+            # 如果事件沒有指定範圍，使用全域範圍狀態
+            elif self._current_region is not None:
+                region = self._current_region
+
+            self.logger(f"[移動至圖片] 開始尋找: {image_name}" +
+                      (f" (範圍: {region})" if region else ""))
+
+            pos = self.find_image_on_screen(
+                image_name,
+                threshold=confidence,
+                fast_mode=True,
+                show_border=show_border,
+                region=region
+            )
+
+            if pos:
+                x, y = pos
+                self.input.move(x, y)
+                self.logger(f"[移動至圖片]  已移動至 ({x}, {y})")
+            else:
+                self.logger(f"[移動至圖片]  未找到圖片，無法移動")
+        except Exception as e:
+            self.logger(f"移動至圖片執行失敗: {e}")
+
+    @_EVENT_REGISTRY.handles('click_image')
+    def _ev_click_image(self, event):
+        # 點擊圖片位置（ 新增：可選擇返回原位 +  彈性點擊範圍）
+        try:
+            image_name = event.get('image', '')
+            confidence = event.get('confidence', 0.6)  #  優化：降低至0.6加快速度
+            button = event.get('button', 'left')
+            return_to_origin = event.get('return_to_origin', False)  # 預設不返回原位
+            show_border = event.get('show_border', False)
+            region = event.get('region', None)
+
+            #  新增：彈性點擊範圍參數
+            click_offset_mode = event.get('click_offset_mode', 'center')  #  預設中心模式（極速點擊）
+            click_radius = event.get('click_radius', 0)  # 點擊半徑（0=使用預設45%範圍）
+
+            #  如果未指定點擊半徑，計算圖片大小的45%作為預設範圍
+            auto_radius = 0
+            if click_radius == 0:
+                # 稍後在找到圖片後計算（需要圖片尺寸）
+                auto_radius = None  # 標記需要自動計算
+
+            # 如果事件指定了範圍，更新全域範圍狀態
+            if region is not None:
+                self._current_region = region
+            # 如果事件沒有指定範圍，使用全域範圍狀態
+            elif self._current_region is not None:
+                region = self._current_region
+
+            self.logger(f"[點擊圖片] 開始尋找: {image_name}" +
+                      (f" (範圍: {region})" if region else ""))
+
+            #  記錄原始滑鼠位置
+            if return_to_origin:
+                original_pos = self.input.position()
+
+            pos = self.find_image_on_screen(
+                image_name,
+                threshold=confidence,
+                fast_mode=True,
+                show_border=show_border,
+                region=region
+            )
+
+            #  強化：必須找到圖片才執行點擊
+            if pos is None:
+                self.logger(f"[點擊圖片]  未找到圖片 '{image_name}'，跳過點擊")
+                return  # 直接返回，不執行任何點擊動作
+
+            if pos:
+                x, y = pos
+
+                #  自動計算點擊半徑（圖片尺寸的80%）
+                if click_radius == 0 and auto_radius is None:
+                    # 重新載入圖片取得尺寸（已有快取，速度很快）
+                    template_gray, _ = self._load_image(image_name)
+                    if template_gray is not None:
+                        h, w = template_gray.shape
+                        #  計算圖片尺寸的45%作為半徑（例如128x128→半徑28.8px）
+                        import math
+                        # 使用較短邊的45%作為半徑，更精準的點擊範圍
+                        click_radius = int(min(w, h) * 0.45 / 2)  # 45%範圍 = 短邊的22.5%半徑
+                        self.logger(f"[彈性點擊] 自動計算半徑: {click_radius}px (圖片尺寸{w}x{h}，45%範圍)")
+
+                #  彈性點擊：根據模式計算偏移
+                if click_radius > 0:
+                    if click_offset_mode == 'random':
+                        # 隨機偏移：在半徑範圍內隨機點擊
+                        import random
+                        import math
+                        angle = random.uniform(0, 2 * math.pi)
+                        distance = random.uniform(0, click_radius)
+                        offset_x = int(distance * math.cos(angle))
+                        offset_y = int(distance * math.sin(angle))
+                        x += offset_x
+                        y += offset_y
+                        self.logger(f"[彈性點擊] 隨機偏移 ({offset_x}, {offset_y})")
+
+                    elif click_offset_mode == 'tracking':
+                        # 追蹤預測偏移：根據移動方向預測點擊位置
+                        if image_name in self._motion_history and len(self._motion_history[image_name]) >= 2:
+                            history = self._motion_history[image_name]
+                            x2, y2, t2 = history[-1]
+                            x1, y1, t1 = history[-2]
+                            # 計算移動向量
+                            vx = x2 - x1
+                            vy = y2 - y1
+                            # 預測下一個位置（限制在半徑範圍內）
                             import math
-                            angle = random.uniform(0, 2 * math.pi)
-                            distance = random.uniform(0, click_radius)
-                            offset_x = int(distance * math.cos(angle))
-                            offset_y = int(distance * math.sin(angle))
-                            x += offset_x
-                            y += offset_y
-                            self.logger(f"[彈性點擊] 隨機偏移 ({offset_x}, {offset_y})")
-                        
-                        elif click_offset_mode == 'tracking':
-                            # 追蹤預測偏移：根據移動方向預測點擊位置
-                            if image_name in self._motion_history and len(self._motion_history[image_name]) >= 2:
-                                history = self._motion_history[image_name]
-                                x2, y2, t2 = history[-1]
-                                x1, y1, t1 = history[-2]
-                                # 計算移動向量
-                                vx = x2 - x1
-                                vy = y2 - y1
-                                # 預測下一個位置（限制在半徑範圍內）
-                                import math
-                                speed = math.sqrt(vx**2 + vy**2)
-                                if speed > 0:
-                                    scale = min(1.0, click_radius / speed)
-                                    offset_x = int(vx * scale)
-                                    offset_y = int(vy * scale)
-                                    x += offset_x
-                                    y += offset_y
-                                    self.logger(f"[彈性點擊] 追蹤預測偏移 ({offset_x}, {offset_y})")
-                        # center 模式不偏移，直接使用中心點
-                    
-                    # 修復點擊：快速模式下跳過貝茲曲線擬真移動，並將定位與按鍵延遲壓縮至極限
-                    is_fast = event.get('fast_mode', True)
-                    if self._use_bezier and self._bezier_mover and not is_fast:
-                        self._bezier_mover.move_to(x, y, duration=0.2)
-                    else:
-                        ctypes.windll.user32.SetCursorPos(x, y)
-                    
-                    # 快速模式下使用 5ms 定位休眠與 10ms 按鍵休眠
-                    time.sleep(0.005 if is_fast else 0.02)
-                    
-                    self._mouse_event_enhanced('down', button=button)
-                    time.sleep(0.01 if is_fast else 0.05) 
-                    self._mouse_event_enhanced('up', button=button)
-                    
-                    self.logger(f"[點擊圖片] 已點擊 {button} 於 ({x}, {y})")
-                    
-                    #  返回原位 (預設關閉,避免游標跳回原點)
-                    if return_to_origin:
-                        ctypes.windll.user32.SetCursorPos(original_pos[0], original_pos[1])
-                        self.logger(f"[點擊圖片]  已返回原位 ({original_pos[0]}, {original_pos[1]})")
-            except Exception as e:
-                self.logger(f"點擊圖片執行失敗: {e}")
-        
-        #  新增：條件判斷 - 如果圖片存在
-        elif event['type'] == 'if_image_exists':
-            try:
-                image_name = event.get('image', '')
-                confidence = event.get('confidence', 0.65)
-                on_success = event.get('on_success')
-                on_failure = event.get('on_failure')
-                show_border = event.get('show_border', False)
-                region = event.get('region', None)
-                
-                # 如果事件指定了範圍，更新全域範圍狀態
-                if region is not None:
-                    self._current_region = region
-                # 如果事件沒有指定範圍，使用全域範圍狀態
-                elif self._current_region is not None:
-                    region = self._current_region
-                
-                self.logger(f"[條件判斷] 檢查圖片是否存在: {image_name}" +
-                          (f" (範圍: {region})" if region else ""))
-                
+                            speed = math.sqrt(vx**2 + vy**2)
+                            if speed > 0:
+                                scale = min(1.0, click_radius / speed)
+                                offset_x = int(vx * scale)
+                                offset_y = int(vy * scale)
+                                x += offset_x
+                                y += offset_y
+                                self.logger(f"[彈性點擊] 追蹤預測偏移 ({offset_x}, {offset_y})")
+                    # center 模式不偏移，直接使用中心點
+
+                # 修復點擊：快速模式下跳過貝茲曲線擬真移動，並將定位與按鍵延遲壓縮至極限
+                is_fast = event.get('fast_mode', True)
+                if self._use_bezier and self._bezier_mover and not is_fast:
+                    self._bezier_mover.move_to(x, y, duration=0.2)
+                else:
+                    self.input.move(x, y)
+
+                # 快速模式下使用 5ms 定位休眠與 10ms 按鍵休眠
+                time.sleep(0.005 if is_fast else 0.02)
+
+                self._mouse_event_enhanced('down', button=button)
+                time.sleep(0.01 if is_fast else 0.05) 
+                self._mouse_event_enhanced('up', button=button)
+
+                self.logger(f"[點擊圖片] 已點擊 {button} 於 ({x}, {y})")
+
+                #  返回原位 (預設關閉,避免游標跳回原點)
+                if return_to_origin:
+                    self.input.move(original_pos[0], original_pos[1])
+                    self.logger(f"[點擊圖片]  已返回原位 ({original_pos[0]}, {original_pos[1]})")
+        except Exception as e:
+            self.logger(f"點擊圖片執行失敗: {e}")
+
+    #  新增：條件判斷 - 如果圖片存在
+    @_EVENT_REGISTRY.handles('if_image_exists')
+    def _ev_if_image_exists(self, event):
+        try:
+            image_name = event.get('image', '')
+            confidence = event.get('confidence', 0.65)
+            on_success = event.get('on_success')
+            on_failure = event.get('on_failure')
+            show_border = event.get('show_border', False)
+            region = event.get('region', None)
+
+            # 如果事件指定了範圍，更新全域範圍狀態
+            if region is not None:
+                self._current_region = region
+            # 如果事件沒有指定範圍，使用全域範圍狀態
+            elif self._current_region is not None:
+                region = self._current_region
+
+            self.logger(f"[條件判斷] 檢查圖片是否存在: {image_name}" +
+                      (f" (範圍: {region})" if region else ""))
+
+            pos = self.find_image_on_screen(
+                image_name,
+                threshold=confidence,
+                fast_mode=True,
+                show_border=show_border,
+                region=region
+            )
+
+            if pos:
+                self.logger(f"[條件判斷] 找到圖片於 ({pos[0]}, {pos[1]})")
+                if on_success:
+                    return self._handle_branch_action(on_success)
+            else:
+                self.logger(f"[條件判斷]  未找到圖片")
+                if on_failure:
+                    return self._handle_branch_action(on_failure)
+        except Exception as e:
+            self.logger(f"條件判斷執行失敗: {e}")
+
+    # ==================== OCR 文字辨識事件 ====================
+    # OCR 條件判斷：if_text_exists
+    @_EVENT_REGISTRY.handles('if_text_exists')
+    def _ev_if_text_exists(self, event):
+        try:
+            from ocr_trigger import get_ocr_trigger
+
+            target_text = event.get('target_text', '')
+            timeout = event.get('timeout', 10.0)
+            match_mode = event.get('match_mode', 'contains')
+            on_success = event.get('on_success')
+            on_failure = event.get('on_failure')
+
+            self.logger(f"[OCR] 檢查文字是否存在: {target_text}（最長 {timeout}s）")
+
+            # 初始化 OCR 引擎
+            ocr = get_ocr_trigger(ocr_engine="auto")
+
+            if not ocr.is_available():
+                self.logger("[OCR] ️ OCR 引擎未啟用，跳過此步驟")
+                if on_failure:
+                    return self._handle_branch_action(on_failure)
+                return ('continue',)
+
+            self.logger(f"[OCR] 使用引擎: {ocr.get_engine_name()}")
+
+            # 等待文字出現
+            found = ocr.wait_for_text(
+                target_text=target_text,
+                capture_func=lambda: self._capture_screen_fast(), # 傳入截圖函數
+                timeout=timeout,
+                match_mode=match_mode,
+                interval=0.5,
+                logger=self.logger
+            )
+
+            if found:
+                self.logger(f"[OCR]  找到文字: {target_text}")
+                if on_success:
+                    return self._handle_branch_action(on_success)
+            else:
+                self.logger(f"[OCR]  未找到文字: {target_text}")
+                if on_failure:
+                    return self._handle_branch_action(on_failure)
+
+        except ImportError:
+            self.logger("[OCR]  ocr_trigger 模組未找到，請確認檔案存在")
+        except Exception as e:
+            self.logger(f"[OCR] 錯誤: {e}")
+            if event.get('on_failure'):
+                return self._handle_branch_action(event.get('on_failure'))
+
+    # OCR 等待文字：wait_text
+    @_EVENT_REGISTRY.handles('wait_text')
+    def _ev_wait_text(self, event):
+        try:
+            from ocr_trigger import get_ocr_trigger
+
+            target_text = event.get('target_text', '')
+            timeout = event.get('timeout', 10.0)
+            match_mode = event.get('match_mode', 'contains')
+
+            self.logger(f"[OCR] 等待文字出現: {target_text}（最長 {timeout}s）")
+
+            ocr = get_ocr_trigger(ocr_engine="auto")
+
+            if not ocr.is_available():
+                self.logger("[OCR] ️ OCR 引擎未啟用")
+                return ('continue',)
+
+            found = ocr.wait_for_text(
+                target_text=target_text,
+                capture_func=lambda: self._capture_screen_fast(),
+                timeout=timeout,
+                match_mode=match_mode,
+                logger=self.logger
+            )
+
+            if found:
+                self.logger(f"[OCR]  文字已出現")
+            else:
+                self.logger(f"[OCR] ️ 等待逾時")
+
+        except Exception as e:
+            self.logger(f"[OCR] 錯誤: {e}")
+
+    # 等待圖片出現：wait_image
+    @_EVENT_REGISTRY.handles('wait_image')
+    def _ev_wait_image(self, event):
+        try:
+            image_name = event.get('image', '')
+            confidence = event.get('confidence', 0.75)
+            timeout = event.get('timeout', 10.0)
+            step = event.get('step', 0.5)
+            show_border = event.get('show_border', False)
+            region = event.get('region', None)
+
+            # 全域範圍設定回退
+            if region is None and self._current_region is not None:
+                region = self._current_region
+
+            self.logger(f"[圖片等待] 開始等待圖片: {image_name} (最長 {timeout}s, 步長 {step}s)")
+
+            start_time = time.time()
+            found = False
+            while time.time() - start_time < timeout:
+                # 隨時檢查播放狀態，如果被停下則立即中斷
+                if not self.playing:
+                    self.logger("[圖片等待] 偵測到播放停止，終止等待。")
+                    break
+
                 pos = self.find_image_on_screen(
                     image_name,
                     threshold=confidence,
@@ -2424,836 +3003,732 @@ class CoreRecorder:
                     show_border=show_border,
                     region=region
                 )
-                
                 if pos:
-                    self.logger(f"[條件判斷] 找到圖片於 ({pos[0]}, {pos[1]})")
-                    if on_success:
-                        return self._handle_branch_action(on_success)
-                else:
-                    self.logger(f"[條件判斷]  未找到圖片")
-                    if on_failure:
-                        return self._handle_branch_action(on_failure)
-            except Exception as e:
-                self.logger(f"條件判斷執行失敗: {e}")
-        
-        # ==================== OCR 文字辨識事件 ====================
-        
-        # OCR 條件判斷：if_text_exists
-        elif event['type'] == 'if_text_exists':
-            try:
-                from ocr_trigger import OCRTrigger
-                
-                target_text = event.get('target_text', '')
-                timeout = event.get('timeout', 10.0)
-                match_mode = event.get('match_mode', 'contains')
-                on_success = event.get('on_success')
-                on_failure = event.get('on_failure')
-                
-                self.logger(f"[OCR] 檢查文字是否存在: {target_text}（最長 {timeout}s）")
-                
-                # 初始化 OCR 引擎
-                ocr = OCRTrigger(ocr_engine="auto")
-                
-                if not ocr.is_available():
-                    self.logger("[OCR] ️ OCR 引擎未啟用，跳過此步驟")
-                    if on_failure:
-                        return self._handle_branch_action(on_failure)
-                    return ('continue',)
-                
-                self.logger(f"[OCR] 使用引擎: {ocr.get_engine_name()}")
-                
-                # 等待文字出現
-                found = ocr.wait_for_text(
-                    target_text=target_text,
-                    capture_func=lambda: self._capture_screen_fast(), # 傳入截圖函數
-                    timeout=timeout,
-                    match_mode=match_mode,
-                    interval=0.5
-                )
-                
-                if found:
-                    self.logger(f"[OCR]  找到文字: {target_text}")
-                    if on_success:
-                        return self._handle_branch_action(on_success)
-                else:
-                    self.logger(f"[OCR]  未找到文字: {target_text}")
-                    if on_failure:
-                        return self._handle_branch_action(on_failure)
-                        
-            except ImportError:
-                self.logger("[OCR]  ocr_trigger 模組未找到，請確認檔案存在")
-            except Exception as e:
-                self.logger(f"[OCR] 錯誤: {e}")
-                if event.get('on_failure'):
-                    return self._handle_branch_action(event.get('on_failure'))
-        
-        # OCR 等待文字：wait_text
-        elif event['type'] == 'wait_text':
-            try:
-                from ocr_trigger import OCRTrigger
-                
-                target_text = event.get('target_text', '')
-                timeout = event.get('timeout', 10.0)
-                match_mode = event.get('match_mode', 'contains')
-                
-                self.logger(f"[OCR] 等待文字出現: {target_text}（最長 {timeout}s）")
-                
-                ocr = OCRTrigger(ocr_engine="auto")
-                
-                if not ocr.is_available():
-                    self.logger("[OCR] ️ OCR 引擎未啟用")
-                    return ('continue',)
-                
-                found = ocr.wait_for_text(
-                    target_text=target_text,
-                    capture_func=lambda: self._capture_screen_fast(),
-                    timeout=timeout,
-                    match_mode=match_mode
-                )
-                
-                if found:
-                    self.logger(f"[OCR]  文字已出現")
-                else:
-                    self.logger(f"[OCR] ️ 等待逾時")
-                    
-            except Exception as e:
-                self.logger(f"[OCR] 錯誤: {e}")
+                    self.logger(f"[圖片等待]  成功找到圖片於 ({pos[0]}, {pos[1]})")
+                    found = True
+                    break
 
-        # 等待圖片出現：wait_image
-        elif event['type'] == 'wait_image':
-            try:
-                image_name = event.get('image', '')
-                confidence = event.get('confidence', 0.75)
-                timeout = event.get('timeout', 10.0)
-                step = event.get('step', 0.5)
-                show_border = event.get('show_border', False)
-                region = event.get('region', None)
-
-                # 全域範圍設定回退
-                if region is None and self._current_region is not None:
-                    region = self._current_region
-
-                self.logger(f"[圖片等待] 開始等待圖片: {image_name} (最長 {timeout}s, 步長 {step}s)")
-                
-                start_time = time.time()
-                found = False
-                while time.time() - start_time < timeout:
-                    # 隨時檢查播放狀態，如果被停下則立即中斷
-                    if not self.playing:
-                        self.logger("[圖片等待] 偵測到播放停止，終止等待。")
-                        break
-                    
-                    pos = self.find_image_on_screen(
-                        image_name,
-                        threshold=confidence,
-                        fast_mode=True,
-                        show_border=show_border,
-                        region=region
-                    )
-                    if pos:
-                        self.logger(f"[圖片等待]  成功找到圖片於 ({pos[0]}, {pos[1]})")
-                        found = True
-                        break
-                    
-                    time.sleep(step)
+                self.control.sleep(min(step, timeout - (time.time() - start_time)))
 
-                if not found and self.playing:
-                    self.logger(f"[圖片等待] ️ 等待圖片 '{image_name}' 逾時")
-            except Exception as e:
-                self.logger(f"[圖片等待] 執行失敗: {e}")
-        
-        # OCR 點擊文字位置：click_text
-        elif event['type'] == 'click_text':
-            try:
-                from ocr_trigger import OCRTrigger
-                import win32api, win32con
-                
-                target_text = event.get('target_text', '')
-                region = event.get('region', None)
-                
-                self.logger(f"[OCR] 尋找並點擊文字: {target_text}")
-                
-                # 初始化 OCR
-                ocr = OCRTrigger(ocr_engine="auto", logger=self.logger)
-                
-                if not ocr.is_available():
-                    self.logger("[OCR] ️ OCR 引擎未啟用")
-                    return 'failure'
-                
-                # 1. 取得截圖
-                snapshot = self._capture_screen_fast(region)
-                if snapshot is None:
-                    self.logger("[OCR] ️ 截圖失敗")
-                    return 'failure'
-                
-                # 2. 尋找文字位置
-                pos = ocr.find_text_position(snapshot, target_text, region=region)
-                if pos:
-                    x, y = pos
-                    # 加上偏移量
-                    x += event.get('offset_x', 0)
-                    y += event.get('offset_y', 0)
-                    
-                    self.logger(f"[OCR]  目標文字座標: {pos}, 最終點擊座標: ({x}, {y})")
-                    win32api.SetCursorPos((x, y))
-                    time.sleep(0.05)
-                    self._mouse_event_enhanced('down', button='left')
-                    time.sleep(0.05)
-                    self._mouse_event_enhanced('up', button='left')
-                    return 'success'
-                else:
-                    self.logger(f"[OCR]  未找到文字: {target_text}")
-                    return 'failure'
-                
-            except Exception as e:
-                self.logger(f"[OCR] 錯誤: {e}")
+            if not found and self.playing:
+                self.logger(f"[圖片等待] ️ 等待圖片 '{image_name}' 逾時")
+        except Exception as e:
+            self.logger(f"[圖片等待] 執行失敗: {e}")
+
+    # OCR 點擊文字位置：click_text
+    @_EVENT_REGISTRY.handles('click_text')
+    def _ev_click_text(self, event):
+        try:
+            from ocr_trigger import get_ocr_trigger
+
+            target_text = event.get('target_text', '')
+            region = event.get('region', None)
+
+            self.logger(f"[OCR] 尋找並點擊文字: {target_text}")
+
+            # 初始化 OCR
+            ocr = get_ocr_trigger(ocr_engine="auto", logger=self.logger)
+
+            if not ocr.is_available():
+                self.logger("[OCR] ️ OCR 引擎未啟用")
                 return 'failure'
 
-        # OCR 相對辨識並輸入：ocr_relative_input (v2.8.6+)
-        elif event['type'] == 'ocr_relative_input':
-            try:
-                from ocr_trigger import OCRTrigger
-                import keyboard
-                import win32api, win32con
-                
-                anchor = event.get('anchor_text', '')
-                is_image_anchor = event.get('is_image_anchor', False)
-                dx, dy, w, h = event.get('offset', (0, 0, 100, 30))
-                
-                anchor_type_name = "圖片" if is_image_anchor else "文字"
-                self.logger(f"[OCR] 以{anchor_type_name}「{anchor}」為基準尋找相對區域並輸入...")
-                
-                anchor_pos = None
-                
-                if is_image_anchor:
-                    # 1a. 使用圖片搜尋尋找錨點
-                    res = self._find_image_on_screen(anchor)
-                    if res:
-                        anchor_pos = (res[0], res[1])
-                else:
-                    # 1b. 使用 OCR 尋找錨點文字
-                    ocr = OCRTrigger(ocr_engine="auto", logger=self.logger)
-                    full_snap = self._capture_screen_fast()
-                    anchor_pos = ocr.find_text_position(full_snap, anchor)
-                
-                if not anchor_pos:
-                    self.logger(f"[OCR]  找不到錨點{anchor_type_name}: {anchor}")
-                    return 'failure'
-                
-                # 2. 計算相對區域
-                ax, ay = anchor_pos
-                region = (ax + dx, ay + dy, ax + dx + w, ay + dy + h)
-                self.logger(f"[OCR]  找到錨點於 {anchor_pos}，計算目標區域: {region}")
-                
-                # 3. 截取目標區域並辨識 (此處仍需 OCR 引擎來讀驗證碼)
-                ocr = OCRTrigger(ocr_engine="auto", logger=self.logger)
-                if not ocr.is_available():
-                    self.logger("[OCR] ️ 錯誤: OCR 引擎未安裝，無法辨識驗證碼文字")
-                    return 'failure'
-                
-                # 重試機制：驗證碼有時會辨識出空值，嘗試最多 3 次
-                captcha_text = ""
-                for attempt in range(3):
-                    target_snap = self._capture_screen_fast(region)
-                    captcha_text = ocr.recognize(target_snap, is_captcha=True).strip()
-                    if captcha_text:
-                        break
-                    self.logger(f"[OCR]  辨識嘗試 {attempt+1} 失敗，正在重試...")
-                    time.sleep(0.5)
-                
+            # 1. 取得截圖
+            snapshot = self._capture_screen_fast(region)
+            if snapshot is None:
+                self.logger("[OCR] ️ 截圖失敗")
+                return 'failure'
+
+            # 2. 尋找文字位置
+            pos = ocr.find_text_position(snapshot, target_text, region=region, logger=self.logger)
+            if pos:
+                x, y = pos
+                # 加上偏移量
+                x += event.get('offset_x', 0)
+                y += event.get('offset_y', 0)
+
+                self.logger(f"[OCR]  目標文字座標: {pos}, 最終點擊座標: ({x}, {y})")
+                self.input.move(x, y)
+                time.sleep(0.05)
+                self._mouse_event_enhanced('down', button='left')
+                time.sleep(0.05)
+                self._mouse_event_enhanced('up', button='left')
+                return 'success'
+            else:
+                self.logger(f"[OCR]  未找到文字: {target_text}")
+                return 'failure'
+
+        except Exception as e:
+            self.logger(f"[OCR] 錯誤: {e}")
+            return 'failure'
+
+    # OCR 相對辨識並輸入：ocr_relative_input (v2.8.6+)
+    @_EVENT_REGISTRY.handles('ocr_relative_input')
+    def _ev_ocr_relative_input(self, event):
+        try:
+            from ocr_trigger import get_ocr_trigger
+
+            anchor = event.get('anchor_text', '')
+            is_image_anchor = event.get('is_image_anchor', False)
+            dx, dy, w, h = event.get('offset', (0, 0, 100, 30))
+
+            anchor_type_name = "圖片" if is_image_anchor else "文字"
+            self.logger(f"[OCR] 以{anchor_type_name}「{anchor}」為基準尋找相對區域並輸入...")
+
+            anchor_pos = None
+
+            if is_image_anchor:
+                # 1a. 使用圖片搜尋尋找錨點
+                res = self._find_image_on_screen(anchor)
+                if res:
+                    anchor_pos = (res[0], res[1])
+            else:
+                # 1b. 使用 OCR 尋找錨點文字
+                ocr = get_ocr_trigger(ocr_engine="auto", logger=self.logger)
+                full_snap = self._capture_screen_fast()
+                anchor_pos = ocr.find_text_position(full_snap, anchor, logger=self.logger)
+
+            if not anchor_pos:
+                self.logger(f"[OCR]  找不到錨點{anchor_type_name}: {anchor}")
+                return 'failure'
+
+            # 2. 計算相對區域
+            ax, ay = anchor_pos
+            region = (ax + dx, ay + dy, ax + dx + w, ay + dy + h)
+            self.logger(f"[OCR]  找到錨點於 {anchor_pos}，計算目標區域: {region}")
+
+            # 3. 截取目標區域並辨識 (此處仍需 OCR 引擎來讀驗證碼)
+            ocr = get_ocr_trigger(ocr_engine="auto", logger=self.logger)
+            if not ocr.is_available():
+                self.logger("[OCR] ️ 錯誤: OCR 引擎未安裝，無法辨識驗證碼文字")
+                return 'failure'
+
+            # 重試機制：驗證碼有時會辨識出空值，嘗試最多 3 次
+            captcha_text = ""
+            for attempt in range(3):
+                target_snap = self._capture_screen_fast(region)
+                captcha_text = ocr.recognize(target_snap, is_captcha=True, logger=self.logger).strip()
                 if captcha_text:
-                    self.logger(f"[OCR]  辨識成功: {captcha_text}")
-                    # 4. 自動點擊輸入框 (假設輸入框在辨識區域內或錨點旁)
-                    # 為了保險，我們先點擊錨點右側的區域確保焦點
-                    win32api.SetCursorPos((ax + dx + 10, ay + dy + 10))
-                    self._mouse_event_enhanced('down', button='left')
-                    time.sleep(0.05)
-                    self._mouse_event_enhanced('up', button='left')
-                    time.sleep(0.1)
-                    
-                    # 5. 輸入文字
-                    keyboard.write(captcha_text)
-                    return 'success'
-                else:
-                    self.logger("[OCR]  辨識失敗 (重試次數耗盡)")
-                    return 'failure'
-                    
-            except Exception as e:
-                self.logger(f"[OCR] 相對辨識錯誤: {e}")
+                    break
+                self.logger(f"[OCR]  辨識嘗試 {attempt+1} 失敗，正在重試...")
+                time.sleep(0.5)
+
+            if captcha_text:
+                self.logger(f"[OCR]  辨識成功: {captcha_text}")
+                # 4. 自動點擊輸入框 (假設輸入框在辨識區域內或錨點旁)
+                # 為了保險，我們先點擊錨點右側的區域確保焦點
+                self.input.move(ax + dx + 10, ay + dy + 10)
+                self._mouse_event_enhanced('down', button='left')
+                time.sleep(0.05)
+                self._mouse_event_enhanced('up', button='left')
+                time.sleep(0.1)
+
+                # 5. 輸入文字
+                self.input.write(captcha_text)
+                return 'success'
+            else:
+                self.logger("[OCR]  辨識失敗 (重試次數耗盡)")
+                return 'failure'
+
+        except Exception as e:
+            self.logger(f"[OCR] 相對辨識錯誤: {e}")
+            return 'failure'
+
+    # 圖片錨點點擊：click_image_anchor
+    @_EVENT_REGISTRY.handles('click_image_anchor')
+    def _ev_click_image_anchor(self, event):
+        try:
+            image_name = event.get('image', '')
+            off_x = event.get('offset_x', 0)
+            off_y = event.get('offset_y', 0)
+
+            self.logger(f"[視覺] 以圖片「{image_name}」為基準進行偏移點擊...")
+
+            res = self._find_image_on_screen(image_name)
+            if res:
+                x, y = res[0] + off_x, res[1] + off_y
+                self.logger(f"[視覺]  找到圖片，點擊座標: ({x}, {y})")
+                self.input.move(x, y)
+                time.sleep(0.05)
+                self._mouse_event_enhanced('down', button='left')
+                time.sleep(0.05)
+                self._mouse_event_enhanced('up', button='left')
+                return 'success'
+            else:
+                self.logger(f"[視覺]  找不到圖片錨點: {image_name}")
+                return 'failure'
+        except Exception as e:
+            self.logger(f"[視覺] 錨點點擊錯誤: {e}")
+            return 'failure'
+
+    # AI 自動辨識並輸入驗證碼：ocr_auto_input (v2.8.7+)
+    @_EVENT_REGISTRY.handles('ocr_auto_input')
+    def _ev_ocr_auto_input(self, event):
+        try:
+            from ocr_trigger import get_ocr_trigger
+
+            self.logger("[AI] 正在全螢幕掃描驗證碼區塊...")
+
+            ocr = get_ocr_trigger(ocr_engine="auto", logger=self.logger)
+            if not ocr.is_available():
+                self.logger("[AI] ️ 錯誤: OCR 引擎未安裝")
+                return 'failure'
+
+            # 1. 獲取全螢幕截圖
+            full_snap = self._capture_screen_fast()
+
+            # 2. 呼叫自動搜尋
+            res = ocr.find_captcha_on_screen(full_snap, logger=self.logger)
+
+            if res:
+                x, y, w, h, text, crop = res
+                self.logger(f"[AI]  發現驗證碼區塊: ({x}, {y}, {w}, {h}), 內容: {text}")
+
+                # [新功能] AI 紅框追蹤效果 (v2.8.9)
+                if hasattr(self.recorder, 'highlight_area'):
+                    self.recorder.highlight_area(x, y, w, h)
+
+                # [懸浮診斷視窗] 顯示辨識結果
+                self.show_ocr_diagnostic(crop, text)
+
+                # 3. 嘗試定位輸入框 (通常在驗證碼左邊或下面)
+                # 根據使用者附圖，輸入框在驗證碼左側約 150-200 像素
+                input_x, input_y = x - 200, y + h // 2
+                self.logger(f"[AI]  嘗試聚焦輸入框: ({input_x}, {input_y})")
+
+                self.input.move(input_x, input_y)
+                time.sleep(0.05)
+                self._mouse_event_enhanced('down', button='left')
+                time.sleep(0.05)
+                self._mouse_event_enhanced('up', button='left')
+                time.sleep(0.2)
+
+                # 4. 輸入文字
+                import pyperclip
+                try:
+                    pyperclip.copy(text)
+                except:
+                    pass
+                self.input.write(text)
+                return 'success'
+            else:
+                self.logger("[AI] ️ 在畫面上找不到明顯的驗證碼區塊")
                 return 'failure'
+        except Exception as e:
+            self.logger(f"[AI] 自動搜尋錯誤: {e}")
+            return 'failure'
 
-        # 圖片錨點點擊：click_image_anchor
-        elif event['type'] == 'click_image_anchor':
-            try:
-                import win32api, win32con
-                image_name = event.get('image', '')
-                off_x = event.get('offset_x', 0)
-                off_y = event.get('offset_y', 0)
-                
-                self.logger(f"[視覺] 以圖片「{image_name}」為基準進行偏移點擊...")
-                
-                res = self._find_image_on_screen(image_name)
-                if res:
-                    x, y = res[0] + off_x, res[1] + off_y
-                    self.logger(f"[視覺]  找到圖片，點擊座標: ({x}, {y})")
-                    win32api.SetCursorPos((x, y))
-                    time.sleep(0.05)
-                    self._mouse_event_enhanced('down', button='left')
-                    time.sleep(0.05)
-                    self._mouse_event_enhanced('up', button='left')
-                    return 'success'
-                else:
-                    self.logger(f"[視覺]  找不到圖片錨點: {image_name}")
-                    return 'failure'
-            except Exception as e:
-                self.logger(f"[視覺] 錨點點擊錯誤: {e}")
-                return 'failure'
+    # OCR 辨識並輸入：ocr_input (CAPTCHA 專用) — v2.7.9 升級：使用 Beta 高精度預處理管道
+    @_EVENT_REGISTRY.handles('ocr_input')
+    def _ev_ocr_input(self, event):
+        try:
+            import cv2
+            import numpy as np
 
-        # AI 自動辨識並輸入驗證碼：ocr_auto_input (v2.8.7+)
-        elif event['type'] == 'ocr_auto_input':
-            try:
-                from ocr_trigger import OCRTrigger
-                import keyboard
-                import win32api, win32con
-                
-                self.logger("[AI] 正在全螢幕掃描驗證碼區塊...")
-                
-                ocr = OCRTrigger(ocr_engine="auto", logger=self.logger)
-                if not ocr.is_available():
-                    self.logger("[AI] ️ 錯誤: OCR 引擎未安裝")
-                    return 'failure'
-                
-                # 1. 獲取全螢幕截圖
-                full_snap = self._capture_screen_fast()
-                
-                # 2. 呼叫自動搜尋
-                res = ocr.find_captcha_on_screen(full_snap)
-                
-                if res:
-                    x, y, w, h, text, crop = res
-                    self.logger(f"[AI]  發現驗證碼區塊: ({x}, {y}, {w}, {h}), 內容: {text}")
-                    
-                    # [新功能] AI 紅框追蹤效果 (v2.8.9)
-                    if hasattr(self.recorder, 'highlight_area'):
-                        self.recorder.highlight_area(x, y, w, h)
-                        
-                    # [懸浮診斷視窗] 顯示辨識結果
-                    self.show_ocr_diagnostic(crop, text)
-                    
-                    # 3. 嘗試定位輸入框 (通常在驗證碼左邊或下面)
-                    # 根據使用者附圖，輸入框在驗證碼左側約 150-200 像素
-                    input_x, input_y = x - 200, y + h // 2
-                    self.logger(f"[AI]  嘗試聚焦輸入框: ({input_x}, {input_y})")
-                    
-                    win32api.SetCursorPos((input_x, input_y))
-                    time.sleep(0.05)
-                    self._mouse_event_enhanced('down', button='left')
-                    time.sleep(0.05)
-                    self._mouse_event_enhanced('up', button='left')
-                    time.sleep(0.2)
-                    
-                    # 4. 輸入文字
-                    import pyperclip
-                    try:
-                        pyperclip.copy(text)
-                    except:
-                        pass
-                    keyboard.write(text)
-                    return 'success'
-                else:
-                    self.logger("[AI] ️ 在畫面上找不到明顯的驗證碼區塊")
-                    return 'failure'
-            except Exception as e:
-                self.logger(f"[AI] 自動搜尋錯誤: {e}")
-                return 'failure'
+            region = event.get('region')
+            if not region:
+                self.logger("[OCR] ️ 錯誤: 未指定 OCR 辨識區域")
+                return None
+
+            self.logger(f"[OCR] 正在辨識區域 {region} 的驗證碼...")
 
-        # OCR 辨識並輸入：ocr_input (CAPTCHA 專用) — v2.7.9 升級：使用 Beta 高精度預處理管道
-        elif event['type'] == 'ocr_input':
+            # 1. 截取目標區域
+            snapshot = self._capture_screen_fast(region)
+            if snapshot is None:
+                self.logger("[OCR] ️ 截圖失敗")
+                return None
+
+            # 2. Beta 高精度去噪預處理管道
+            # A. 雙倍放大（雙立方插值）
+            resized = cv2.resize(snapshot, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+            # B. 已是灰階，直接使用
+            gray = resized
+            # C. 雙邊濾波去噪（保留字體邊緣）
+            denoised = cv2.bilateralFilter(gray, 9, 75, 75)
+            # D. 大津法自適應二值化
+            _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+            # E. 形態學膨脹填補字體空隙
+            kernel = np.ones((2, 2), np.uint8)
+            dilated = cv2.dilate(thresh, kernel, iterations=1)
+            # F. 連通區域分析抹除小噪點（< 15px）
+            num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(dilated)
+            cleaned = np.zeros_like(dilated)
+            for _i in range(1, num_labels):
+                if stats[_i, cv2.CC_STAT_AREA] > 15:
+                    cleaned[labels == _i] = 255
+            # G. 反色→白底黑字（ddddocr/Tesseract 最佳輸入格式）
+            processed = cv2.bitwise_not(cleaned)
+
+            # 3. OCR 辨識
+            captcha_text = ""
             try:
-                import cv2
-                import numpy as np
+                import ddddocr
+                if not hasattr(self, '_ddddocr_instance') or self._ddddocr_instance is None:
+                    self._ddddocr_instance = ddddocr.DdddOcr(show_ad=False)
+                success, encoded = cv2.imencode('.png', processed)
+                if success:
+                    captcha_text = self._ddddocr_instance.classification(encoded.tobytes())
+            except Exception:
+                # 降級：嘗試 OCRTrigger（Tesseract）
+                try:
+                    from ocr_trigger import get_ocr_trigger
+                    ocr = get_ocr_trigger(ocr_engine="tesseract", logger=self.logger)
+                    captcha_text = ocr.recognize(processed, is_captcha=False, logger=self.logger)
+                except Exception as e2:
+                    self.logger(f"[OCR] 所有辨識引擎均失敗: {e2}")
 
-                region = event.get('region')
-                if not region:
-                    self.logger("[OCR] ️ 錯誤: 未指定 OCR 辨識區域")
-                    return None
+            captcha_text = captcha_text.strip() if captcha_text else ""
 
-                self.logger(f"[OCR] 正在辨識區域 {region} 的驗證碼...")
+            if captcha_text:
+                self.logger(f"[OCR] ✅ 辨識成功: {captcha_text}")
 
-                # 1. 截取目標區域
-                snapshot = self._capture_screen_fast(region)
-                if snapshot is None:
-                    self.logger("[OCR] ️ 截圖失敗")
-                    return None
+                # 4. 儲存到共享變數（供後續指令重複使用，如 >取得OCR結果）
+                self._last_ocr_text = captcha_text
+                if hasattr(self, 'variables') and isinstance(self.variables, dict):
+                    self.variables['_ocr_result'] = captcha_text
 
-                # 2. Beta 高精度去噪預處理管道
-                # A. 雙倍放大（雙立方插值）
-                resized = cv2.resize(snapshot, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-                # B. 已是灰階，直接使用
-                gray = resized
-                # C. 雙邊濾波去噪（保留字體邊緣）
-                denoised = cv2.bilateralFilter(gray, 9, 75, 75)
-                # D. 大津法自適應二值化
-                _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-                # E. 形態學膨脹填補字體空隙
-                kernel = np.ones((2, 2), np.uint8)
-                dilated = cv2.dilate(thresh, kernel, iterations=1)
-                # F. 連通區域分析抹除小噪點（< 15px）
-                num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(dilated)
-                cleaned = np.zeros_like(dilated)
-                for _i in range(1, num_labels):
-                    if stats[_i, cv2.CC_STAT_AREA] > 15:
-                        cleaned[labels == _i] = 255
-                # G. 反色→白底黑字（ddddocr/Tesseract 最佳輸入格式）
-                processed = cv2.bitwise_not(cleaned)
-
-                # 3. OCR 辨識
-                captcha_text = ""
+                # 5. 輸入文字：優先用剪貼簿貼上（支援中英數所有字元，避免 keyboard.write 的 IME 問題）
                 try:
-                    import ddddocr
-                    if not hasattr(self, '_ddddocr_instance') or self._ddddocr_instance is None:
-                        self._ddddocr_instance = ddddocr.DdddOcr(show_ad=False)
-                    success, encoded = cv2.imencode('.png', processed)
-                    if success:
-                        captcha_text = self._ddddocr_instance.classification(encoded.tobytes())
+                    import pyperclip
+                    pyperclip.copy(captcha_text)
+                    import time as _time
+                    _time.sleep(0.05)
+                    self.input.tap('ctrl+a')   # 先全選輸入框內現有內容
+                    _time.sleep(0.03)
+                    self.input.tap('ctrl+v')   # 貼上辨識結果
+                    self.logger(f"[OCR] ✅ 已透過剪貼簿貼上: {captcha_text}")
                 except Exception:
-                    # 降級：嘗試 OCRTrigger（Tesseract）
-                    try:
-                        from ocr_trigger import OCRTrigger
-                        ocr = OCRTrigger(ocr_engine="tesseract", logger=self.logger)
-                        captcha_text = ocr.recognize(processed, is_captcha=False)
-                    except Exception as e2:
-                        self.logger(f"[OCR] 所有辨識引擎均失敗: {e2}")
+                    # 降級：直接 keyboard.write
+                    self.input.write(captcha_text, delay=0.03)
+                    self.logger(f"[OCR] ✅ 已直接輸入: {captcha_text}")
 
-                captcha_text = captcha_text.strip() if captcha_text else ""
+                return 'success'
+            else:
+                self.logger("[OCR] ️ 辨識失敗，未獲得文字內容")
+                return 'failure'
 
-                if captcha_text:
-                    self.logger(f"[OCR] ✅ 辨識成功: {captcha_text}")
+        except Exception as e:
+            self.logger(f"[OCR] 執行錯誤: {e}")
+            return 'failure'
 
-                    # 4. 儲存到共享變數（供後續指令重複使用，如 >取得OCR結果）
-                    self._last_ocr_text = captcha_text
-                    if hasattr(self, 'variables') and isinstance(self.variables, dict):
-                        self.variables['_ocr_result'] = captcha_text
+    #  新增：多圖片同時辨識
+    @_EVENT_REGISTRY.handles('recognize_any')
+    def _ev_recognize_any(self, event):
+        try:
+            images = event.get('images', [])  # [{'name': 'pic01', 'action': 'click/move/log'}, ...]
+            confidence = event.get('confidence', 0.7)  #  降低至0.7加快速度
+            timeout = event.get('timeout', 0)  # 0 = 立即返回，>0 = 持續嘗試直到找到或逾時
+            self.logger(f"[多圖辨識] 同時搜尋 {len(images)} 張圖片")
 
-                    # 5. 輸入文字：優先用剪貼簿貼上（支援中英數所有字元，避免 keyboard.write 的 IME 問題）
-                    try:
-                        import pyperclip
-                        pyperclip.copy(captcha_text)
-                        import keyboard as kb
-                        import time as _time
-                        _time.sleep(0.05)
-                        kb.send('ctrl+a')   # 先全選輸入框內現有內容
-                        _time.sleep(0.03)
-                        kb.send('ctrl+v')   # 貼上辨識結果
-                        self.logger(f"[OCR] ✅ 已透過剪貼簿貼上: {captcha_text}")
-                    except Exception:
-                        # 降級：直接 keyboard.write
-                        import keyboard as kb
-                        kb.write(captcha_text, delay=0.03)
-                        self.logger(f"[OCR] ✅ 已直接輸入: {captcha_text}")
+            start_time = time.time()
+            found = False
 
-                    return 'success'
-                else:
-                    self.logger("[OCR] ️ 辨識失敗，未獲得文字內容")
-                    return 'failure'
+            while True:
+                #  一次截圖，多次匹配（效能優化 - 使用 mss）
+                snapshot_gray = self._capture_screen_fast()
+
+                # 準備圖片列表
+                template_list = [{'name': img.get('name', ''), 'threshold': confidence} for img in images]
+
+                #  使用批次辨識方法
+                results = self.find_images_in_snapshot(snapshot_gray, template_list, threshold=confidence, fast_mode=True)
+
+                # 檢查是否有找到任何圖片
+                for img_config in images:
+                    img_name = img_config.get('name', '')
+                    action = img_config.get('action', 'log')
+                    pos = results.get(img_name)
 
-            except Exception as e:
-                self.logger(f"[OCR] 執行錯誤: {e}")
-                return 'failure'
-        
-        #  新增：多圖片同時辨識
-        elif event['type'] == 'recognize_any':
-            try:
-                images = event.get('images', [])  # [{'name': 'pic01', 'action': 'click/move/log'}, ...]
-                confidence = event.get('confidence', 0.7)  #  降低至0.7加快速度
-                timeout = event.get('timeout', 0)  # 0 = 立即返回，>0 = 持續嘗試直到找到或逾時
-                self.logger(f"[多圖辨識] 同時搜尋 {len(images)} 張圖片")
-                
-                start_time = time.time()
-                found = False
-                
-                while True:
-                    #  一次截圖，多次匹配（效能優化 - 使用 mss）
-                    snapshot_gray = self._capture_screen_fast()
-                    
-                    # 準備圖片列表
-                    template_list = [{'name': img.get('name', ''), 'threshold': confidence} for img in images]
-                    
-                    #  使用批次辨識方法
-                    results = self.find_images_in_snapshot(snapshot, template_list, threshold=confidence, fast_mode=True)
-                    
-                    # 檢查是否有找到任何圖片
-                    for img_config in images:
-                        img_name = img_config.get('name', '')
-                        action = img_config.get('action', 'log')
-                        pos = results.get(img_name)
-                        
-                        if pos:
-                            self.logger(f"[多圖辨識]  找到圖片: {img_name} 於 ({pos[0]}, {pos[1]})")
-                            
-                            # 執行對應動作
-                            if action == 'click':
-                                button = img_config.get('button', 'left')
-                                return_to_origin = img_config.get('return_to_origin', False)  # 預設不返回原位,避免游標跳回
-                                original_pos = win32api.GetCursorPos() if return_to_origin else None
-                                
-                                ctypes.windll.user32.SetCursorPos(pos[0], pos[1])
-                                time.sleep(0.01)
-                                self._mouse_event_enhanced('down', button=button)
-                                time.sleep(0.05)
-                                self._mouse_event_enhanced('up', button=button)
-                                self.logger(f"[多圖辨識]  已點擊 {img_name}")
-                                
-                                if return_to_origin and original_pos:
-                                    time.sleep(0.01)
-                                    ctypes.windll.user32.SetCursorPos(original_pos[0], original_pos[1])
-                                    self.logger(f"[多圖辨識]  已返回原位")
-                            
-                            elif action == 'move':
-                                ctypes.windll.user32.SetCursorPos(pos[0], pos[1])
-                                self.logger(f"[多圖辨識]  已移動至 {img_name}")
-                            
-                            found = True
-                            break
-                    
-                    if found:
-                        break
-                    
-                    # 檢查逾時
-                    if timeout > 0 and (time.time() - start_time) >= timeout:
-                        self.logger(f"[多圖辨識]  逾時 ({timeout}秒)，未找到任何圖片")
-                        break
-                    elif timeout == 0:
-                        self.logger(f"[多圖辨識]  未找到任何圖片")
-                        break
-                    
-                    time.sleep(0.1)  # 稍微延遲後再次嘗試
-                    
-            except Exception as e:
-                self.logger(f"多圖辨識執行失敗: {e}")
-        
-        # ==================== v2.7.1+ 新增事件類型 ====================
-        
-        # 變數設定
-        elif event['type'] == 'set_variable':
-            name = event.get('name', '')
-            value = event.get('value', 0)
-            self._set_variable(name, value)
-        
-        # 變數運算
-        elif event['type'] == 'variable_operation':
-            name = event.get('name', '')
-            operation = event.get('operation', 'add')  # add/subtract/multiply/divide
-            value = event.get('value', 1)
-            self._variable_operation(name, operation, value)
-        
-        # 變數條件判斷
-        elif event['type'] == 'if_variable':
-            name = event.get('name', '')
-            operator = event.get('operator', '==')
-            value = event.get('value', 0)
-            on_success = event.get('on_success')
-            on_failure = event.get('on_failure')
-            
-            result = self._check_variable_condition(name, operator, value)
-            self.logger(f"[變數條件] {name} {operator} {value} = {result}")
-            
-            if result and on_success:
-                return self._handle_branch_action(on_success)
-            elif not result and on_failure:
-                return self._handle_branch_action(on_failure)
-        
-        # 多條件判斷（AND）
-        elif event['type'] == 'if_all_images_exist':
-            try:
-                images = event.get('images', [])
-                confidence = event.get('confidence', 0.75)
-                on_success = event.get('on_success')
-                on_failure = event.get('on_failure')
-                
-                self.logger(f"[多條件AND] 檢查 {len(images)} 張圖片是否全部存在")
-                
-                all_found = True
-                for img_name in images:
-                    pos = self.find_image_on_screen(img_name, threshold=confidence, fast_mode=True)
-                    if not pos:
-                        self.logger(f"[多條件AND]  缺少: {img_name}")
-                        all_found = False
-                        break
-                    else:
-                        self.logger(f"[多條件AND]  找到: {img_name}")
-                
-                if all_found:
-                    self.logger(f"[多條件AND]  全部找到")
-                    if on_success:
-                        return self._handle_branch_action(on_success)
-                else:
-                    if on_failure:
-                        return self._handle_branch_action(on_failure)
-                        
-            except Exception as e:
-                self.logger(f"多條件AND判斷失敗: {e}")
-        
-        # 多條件判斷（OR）
-        elif event['type'] == 'if_any_image_exists':
-            try:
-                images = event.get('images', [])
-                confidence = event.get('confidence', 0.75)
-                on_success = event.get('on_success')
-                on_failure = event.get('on_failure')
-                found_image = event.get('found_image_var', '')  # 儲存找到的圖片名稱到變數
-                
-                self.logger(f"[多條件OR] 檢查 {len(images)} 張圖片是否有任一存在")
-                
-                found = None
-                for img_name in images:
-                    pos = self.find_image_on_screen(img_name, threshold=confidence, fast_mode=True)
                     if pos:
-                        self.logger(f"[多條件OR]  找到: {img_name}")
-                        found = img_name
-                        if found_image:
-                            self._set_variable(found_image, img_name)
+                        self.logger(f"[多圖辨識]  找到圖片: {img_name} 於 ({pos[0]}, {pos[1]})")
+
+                        # 執行對應動作
+                        if action == 'click':
+                            button = img_config.get('button', 'left')
+                            return_to_origin = img_config.get('return_to_origin', False)  # 預設不返回原位,避免游標跳回
+                            original_pos = self.input.position() if return_to_origin else None
+
+                            self.input.move(pos[0], pos[1])
+                            time.sleep(0.01)
+                            self._mouse_event_enhanced('down', button=button)
+                            time.sleep(0.05)
+                            self._mouse_event_enhanced('up', button=button)
+                            self.logger(f"[多圖辨識]  已點擊 {img_name}")
+
+                            if return_to_origin and original_pos:
+                                time.sleep(0.01)
+                                self.input.move(original_pos[0], original_pos[1])
+                                self.logger(f"[多圖辨識]  已返回原位")
+
+                        elif action == 'move':
+                            self.input.move(pos[0], pos[1])
+                            self.logger(f"[多圖辨識]  已移動至 {img_name}")
+
+                        found = True
                         break
-                
+
                 if found:
-                    if on_success:
-                        return self._handle_branch_action(on_success)
-                else:
-                    self.logger(f"[多條件OR]  全部未找到")
-                    if on_failure:
-                        return self._handle_branch_action(on_failure)
-                        
-            except Exception as e:
-                self.logger(f"多條件OR判斷失敗: {e}")
-        
-        # 迴圈開始
-        elif event['type'] == 'loop_start':
-            loop_type = event.get('loop_type', 'repeat')  # repeat/while/for
-            max_count = event.get('max_count', 1)
-            condition = event.get('condition', {})  # for while loop
-            
-            self._loop_stack.append({
-                'type': loop_type,
-                'start_index': self._current_play_index,
-                'counter': 0,
-                'max_count': max_count,
-                'condition': condition
-            })
-            self.logger(f"[迴圈開始] 類型={loop_type}, 次數={max_count}")
-        
-        # 迴圈結束
-        elif event['type'] == 'loop_end':
-            if self._loop_stack:
-                loop_info = self._loop_stack[-1]
-                loop_info['counter'] += 1
-                
-                should_continue = False
-                
-                if loop_info['type'] == 'repeat':
-                    should_continue = loop_info['counter'] < loop_info['max_count']
-                elif loop_info['type'] == 'while':
-                    # 檢查條件
-                    condition = loop_info['condition']
-                    if condition.get('type') == 'image_exists':
-                        img_name = condition.get('image', '')
-                        pos = self.find_image_on_screen(img_name, threshold=0.75, fast_mode=True)
-                        should_continue = bool(pos)
-                    elif condition.get('type') == 'image_missing':
-                        img_name = condition.get('image', '')
-                        pos = self.find_image_on_screen(img_name, threshold=0.75, fast_mode=True)
-                        should_continue = not bool(pos)
-                
-                if should_continue:
-                    self.logger(f"[迴圈] 繼續迴圈 ({loop_info['counter']}/{loop_info['max_count']})")
-                    self._current_play_index = loop_info['start_index']
-                    return ('jump_index', loop_info['start_index'])
-                else:
-                    self.logger(f"[迴圈結束] 已完成 {loop_info['counter']} 次")
-                    self._loop_stack.pop()
-        
-        # 隨機延遲
-        elif event['type'] == 'random_delay':
-            import random
-            min_ms = event.get('min_ms', 100)
-            max_ms = event.get('max_ms', 500)
-            # 自動修正 min/max 避免 ValueError: empty range in randrange
-            actual_min = min(min_ms, max_ms)
-            actual_max = max(min_ms, max_ms)
-            delay = random.randint(actual_min, actual_max) / 1000.0
-            self.logger(f"[隨機延遲] {delay:.3f}s")
-            time.sleep(delay)
-        
-        # 隨機分支
-        elif event['type'] == 'random_branch':
-            import random
-            probability = event.get('probability', 50)  # 0-100
+                    break
+
+                # 檢查逾時
+                if timeout > 0 and (time.time() - start_time) >= timeout:
+                    self.logger(f"[多圖辨識]  逾時 ({timeout}秒)，未找到任何圖片")
+                    break
+                elif timeout == 0:
+                    self.logger(f"[多圖辨識]  未找到任何圖片")
+                    break
+
+                # 稍微延遲後再次嘗試；停止播放時立即中斷
+                if not self.control.sleep(0.1):
+                    self.logger("[多圖辨識] 偵測到播放停止，終止等待。")
+                    break
+
+        except Exception as e:
+            self.logger(f"多圖辨識執行失敗: {e}")
+
+    # ==================== v2.7.1+ 新增事件類型 ====================
+    # 變數設定
+    @_EVENT_REGISTRY.handles('set_variable')
+    def _ev_set_variable(self, event):
+        name = event.get('name', '')
+        value = event.get('value', 0)
+        self._set_variable(name, value)
+
+    # 變數運算
+    @_EVENT_REGISTRY.handles('variable_operation')
+    def _ev_variable_operation(self, event):
+        name = event.get('name', '')
+        operation = event.get('operation', 'add')  # add/subtract/multiply/divide
+        value = event.get('value', 1)
+        self._variable_operation(name, operation, value)
+
+    # 變數條件判斷
+    @_EVENT_REGISTRY.handles('if_variable')
+    def _ev_if_variable(self, event):
+        name = event.get('name', '')
+        operator = event.get('operator', '==')
+        value = event.get('value', 0)
+        on_success = event.get('on_success')
+        on_failure = event.get('on_failure')
+
+        result = self._check_variable_condition(name, operator, value)
+        self.logger(f"[變數條件] {name} {operator} {value} = {result}")
+
+        if result and on_success:
+            return self._handle_branch_action(on_success)
+        elif not result and on_failure:
+            return self._handle_branch_action(on_failure)
+
+    # 多條件判斷（AND）
+    @_EVENT_REGISTRY.handles('if_all_images_exist')
+    def _ev_if_all_images_exist(self, event):
+        try:
+            images = event.get('images', [])
+            confidence = event.get('confidence', 0.75)
             on_success = event.get('on_success')
             on_failure = event.get('on_failure')
-            
-            roll = random.randint(1, 100)
-            success = roll <= probability
-            
-            self.logger(f"[隨機分支] 概率={probability}%, 擲骰={roll}, 結果={'成功' if success else '失敗'}")
-            
-            if success and on_success:
-                return self._handle_branch_action(on_success)
-            elif not success and on_failure:
-                return self._handle_branch_action(on_failure)
-        
-        # 隨機跳轉：>隨機跳轉>#A, #B, #C
-        elif event['type'] == 'random_jump':
-            import random
-            labels = event.get('labels', [])
-            if labels:
-                # 從標籤清單中隨機選取一個並返回跳轉元組
-                target_label = random.choice(labels)
-                self.logger(f"[隨機跳轉] 擲骰成功！選中標籤: #{target_label}")
-                return ('jump', target_label, 999999) # 999999 為預設無限跳轉計數
+
+            self.logger(f"[多條件AND] 檢查 {len(images)} 張圖片是否全部存在")
+
+            all_found = True
+            for img_name in images:
+                pos = self.find_image_on_screen(img_name, threshold=confidence, fast_mode=True)
+                if not pos:
+                    self.logger(f"[多條件AND]  缺少: {img_name}")
+                    all_found = False
+                    break
+                else:
+                    self.logger(f"[多條件AND]  找到: {img_name}")
+
+            if all_found:
+                self.logger(f"[多條件AND]  全部找到")
+                if on_success:
+                    return self._handle_branch_action(on_success)
             else:
-                self.logger("[隨機跳轉] 警告：無效的標籤列表")
-        
-        # 嘗試執行（帶重試）
-        elif event['type'] == 'try_action':
-            action_id = event.get('action_id', 'default')
-            max_retries = event.get('max_retries', 3)
-            on_success = event.get('on_success')
-            on_failure = event.get('on_failure')
-            
-            retry_count = self._get_action_retry_count(action_id)
-            self.logger(f"[嘗試執行] {action_id} (第{retry_count + 1}次/最多{max_retries}次)")
-            
-            # 這裡需要配合下一個動作使用，標記為嘗試模式
-            self._current_try_action = action_id
-            self._current_try_max = max_retries
-            self._current_try_success = on_success
-            self._current_try_failure = on_failure
-        
-        # 計數器觸發
-        elif event['type'] == 'counter_trigger':
-            action_id = event.get('action_id', '')
-            count = event.get('count', 3)
-            on_trigger = event.get('on_trigger')
-            reset_on_trigger = event.get('reset_on_trigger', True)
-            
-            current_count = self._increment_action_retry(action_id)
-            self.logger(f"[計數器] {action_id}: {current_count}/{count}")
-            
-            if current_count >= count:
-                self.logger(f"[計數器觸發] {action_id} 達到 {count} 次")
-                if reset_on_trigger:
-                    self._reset_action_retry(action_id)
-                if on_trigger:
-                    return self._handle_branch_action(on_trigger)
-        
-        # 計時器觸發
-        elif event['type'] == 'timer_trigger':
-            action_id = event.get('action_id', '')
-            duration = event.get('duration', 60)  # 秒
-            on_trigger = event.get('on_trigger')
-            reset_on_trigger = event.get('reset_on_trigger', True)
-            
-            # 首次執行時開始計時
-            if action_id not in self._action_start_time:
-                self._start_action_timer(action_id)
-                self.logger(f"[計時器] {action_id} 開始計時")
-            
-            elapsed = self._get_action_elapsed_time(action_id)
-            self.logger(f"[計時器] {action_id}: {elapsed:.1f}s/{duration}s")
-            
-            if elapsed >= duration:
-                self.logger(f"[計時器觸發] {action_id} 達到 {duration} 秒")
-                if reset_on_trigger:
-                    self._reset_action_timer(action_id)
-                if on_trigger:
-                    return self._handle_branch_action(on_trigger)
-        
-        # 重置計數器
-        elif event['type'] == 'reset_counter':
-            action_id = event.get('action_id', '')
-            self._reset_action_retry(action_id)
-            self.logger(f"[重置計數器] {action_id}")
-        
-        # 重置計時器
-        elif event['type'] == 'reset_timer':
-            action_id = event.get('action_id', '')
-            self._reset_action_timer(action_id)
-            self.logger(f"[重置計時器] {action_id}")
-        
-        #  新增：延遲開始
-        elif event['type'] == 'delayed_start':
-            delay_seconds = event.get('delay_seconds', 10)
-            self.logger(f"[開始] 等待 {delay_seconds} 秒後開始...")
-            
-            # 顯示倒數計時
-            for remaining in range(delay_seconds, 0, -1):
-                if not self.playing:  # 檢查是否被停止
-                    self.logger("[開始] 已取消")
-                    return 'stop'
-                self.logger(f"[開始] 倒數 {remaining} 秒")
-                time.sleep(1)
-            
-            self.logger(f"[開始] 延遲完成，開始執行腳本")
-        
-        #  新增：延遲結束
-        elif event['type'] == 'delayed_end':
-            delay_seconds = event.get('delay_seconds', 60)
-            self.logger(f"[結束] 將在 {delay_seconds} 秒後結束腳本")
-            
-            # 顯示倒數計時
-            for remaining in range(delay_seconds, 0, -1):
-                if not self.playing:  # 檢查是否被停止
-                    self.logger("[結束] 已提前停止")
-                    return 'stop'
-                self.logger(f"[結束] 倒數 {remaining} 秒後結束")
-                time.sleep(1)
-            
-            self.logger(f"[結束] 時間到，停止執行")
-            self.playing = False
-        #  新增：觸發器註冊
-        elif event['type'] in ['interval_trigger', 'condition_trigger', 'priority_trigger']:
-            self._trigger_manager.add_trigger(event)
-            if not self._trigger_manager._running:
-                self._trigger_manager.start()
-            self.logger(f"[觸發器] 已註冊類型: {event['type']}")
-            
-        #  新增：並行區塊執行
-        elif event['type'] == 'parallel_block':
-            self.logger("[並行] 開始執行並行區塊")
-            self._parallel_executor.execute_parallel_block(event)
-            
-        #  新增：狀態機執行
-        elif event['type'] == 'state_machine':
-            self.logger(f"[狀態機] 啟動狀態機: {event.get('name', '未命名')}")
-            self._state_machine.load(event)
-            self._state_machine.run()
-            
-        #  新增：YOLO 物件偵測
-        elif event['type'] == 'yolo_detect':
-            class_name = event.get('class_name', '')
-            confidence = event.get('confidence', 0.5)
-            region = event.get('region')
+                if on_failure:
+                    return self._handle_branch_action(on_failure)
+
+        except Exception as e:
+            self.logger(f"多條件AND判斷失敗: {e}")
+
+    # 多條件判斷（OR）
+    @_EVENT_REGISTRY.handles('if_any_image_exists')
+    def _ev_if_any_image_exists(self, event):
+        try:
+            images = event.get('images', [])
+            confidence = event.get('confidence', 0.75)
             on_success = event.get('on_success')
             on_failure = event.get('on_failure')
-            
-            self.logger(f"[YOLO] 偵測目標: {class_name}")
-            pos = self.find_object_yolo(class_name, confidence, region)
-            
-            if pos:
-                self.logger(f"[YOLO]  找到目標於 ({pos[0]}, {pos[1]})")
+            found_image = event.get('found_image_var', '')  # 儲存找到的圖片名稱到變數
+
+            self.logger(f"[多條件OR] 檢查 {len(images)} 張圖片是否有任一存在")
+
+            found = None
+            for img_name in images:
+                pos = self.find_image_on_screen(img_name, threshold=confidence, fast_mode=True)
+                if pos:
+                    self.logger(f"[多條件OR]  找到: {img_name}")
+                    found = img_name
+                    if found_image:
+                        self._set_variable(found_image, img_name)
+                    break
+
+            if found:
                 if on_success:
                     return self._handle_branch_action(on_success)
             else:
-                self.logger(f"[YOLO]  未找到目標: {class_name}")
+                self.logger(f"[多條件OR]  全部未找到")
                 if on_failure:
                     return self._handle_branch_action(on_failure)
 
-        #  新增：設置擬真滑鼠
-        elif event['type'] == 'set_bezier':
-            enabled = event.get('enabled', False)
-            self.set_bezier_enabled(enabled)
-            self.logger(f"[設置] 擬真滑鼠已{'開啟' if enabled else '關閉'}")
-            
-        return 'stop' if event['type'] == 'delayed_end' else None
+        except Exception as e:
+            self.logger(f"多條件OR判斷失敗: {e}")
+
+    # 迴圈開始
+    @_EVENT_REGISTRY.handles('loop_start')
+    def _ev_loop_start(self, event):
+        loop_type = event.get('loop_type', 'repeat')  # repeat/while/for
+        max_count = event.get('max_count', 1)
+        condition = event.get('condition', {})  # for while loop
+
+        self._loop_stack.append({
+            'type': loop_type,
+            'start_index': self._current_play_index,
+            'counter': 0,
+            'max_count': max_count,
+            'condition': condition
+        })
+        self.logger(f"[迴圈開始] 類型={loop_type}, 次數={max_count}")
+
+    # 迴圈結束
+    @_EVENT_REGISTRY.handles('loop_end')
+    def _ev_loop_end(self, event):
+        if self._loop_stack:
+            loop_info = self._loop_stack[-1]
+            loop_info['counter'] += 1
+
+            should_continue = False
+
+            if loop_info['type'] == 'repeat':
+                should_continue = loop_info['counter'] < loop_info['max_count']
+            elif loop_info['type'] == 'while':
+                # 檢查條件
+                condition = loop_info['condition']
+                if condition.get('type') == 'image_exists':
+                    img_name = condition.get('image', '')
+                    pos = self.find_image_on_screen(img_name, threshold=0.75, fast_mode=True)
+                    should_continue = bool(pos)
+                elif condition.get('type') == 'image_missing':
+                    img_name = condition.get('image', '')
+                    pos = self.find_image_on_screen(img_name, threshold=0.75, fast_mode=True)
+                    should_continue = not bool(pos)
+
+            if should_continue:
+                self.logger(f"[迴圈] 繼續迴圈 ({loop_info['counter']}/{loop_info['max_count']})")
+                self._current_play_index = loop_info['start_index']
+                return ('jump_index', loop_info['start_index'])
+            else:
+                self.logger(f"[迴圈結束] 已完成 {loop_info['counter']} 次")
+                self._loop_stack.pop()
+
+    # 隨機延遲
+    @_EVENT_REGISTRY.handles('random_delay')
+    def _ev_random_delay(self, event):
+        import random
+        min_ms = event.get('min_ms', 100)
+        max_ms = event.get('max_ms', 500)
+        # 自動修正 min/max 避免 ValueError: empty range in randrange
+        actual_min = min(min_ms, max_ms)
+        actual_max = max(min_ms, max_ms)
+        delay = random.randint(actual_min, actual_max) / 1000.0
+        self.logger(f"[隨機延遲] {delay:.3f}s")
+        self.control.sleep(delay)
+
+    # 隨機分支
+    @_EVENT_REGISTRY.handles('random_branch')
+    def _ev_random_branch(self, event):
+        import random
+        probability = event.get('probability', 50)  # 0-100
+        on_success = event.get('on_success')
+        on_failure = event.get('on_failure')
+
+        roll = random.randint(1, 100)
+        success = roll <= probability
+
+        self.logger(f"[隨機分支] 概率={probability}%, 擲骰={roll}, 結果={'成功' if success else '失敗'}")
+
+        if success and on_success:
+            return self._handle_branch_action(on_success)
+        elif not success and on_failure:
+            return self._handle_branch_action(on_failure)
+
+    # 隨機跳轉：>隨機跳轉>#A, #B, #C
+    @_EVENT_REGISTRY.handles('random_jump')
+    def _ev_random_jump(self, event):
+        import random
+        labels = event.get('labels', [])
+        if labels:
+            # 從標籤清單中隨機選取一個並返回跳轉元組
+            target_label = random.choice(labels)
+            self.logger(f"[隨機跳轉] 擲骰成功！選中標籤: #{target_label}")
+            return ('jump', target_label, 999999) # 999999 為預設無限跳轉計數
+        else:
+            self.logger("[隨機跳轉] 警告：無效的標籤列表")
+
+    # 嘗試執行（帶重試）
+    @_EVENT_REGISTRY.handles('try_action')
+    def _ev_try_action(self, event):
+        action_id = event.get('action_id', 'default')
+        max_retries = event.get('max_retries', 3)
+        on_success = event.get('on_success')
+        on_failure = event.get('on_failure')
+
+        retry_count = self._get_action_retry_count(action_id)
+        self.logger(f"[嘗試執行] {action_id} (第{retry_count + 1}次/最多{max_retries}次)")
+
+        # 這裡需要配合下一個動作使用，標記為嘗試模式
+        self._current_try_action = action_id
+        self._current_try_max = max_retries
+        self._current_try_success = on_success
+        self._current_try_failure = on_failure
+
+    # 計數器觸發
+    @_EVENT_REGISTRY.handles('counter_trigger')
+    def _ev_counter_trigger(self, event):
+        action_id = event.get('action_id', '')
+        count = event.get('count', 3)
+        on_trigger = event.get('on_trigger')
+        reset_on_trigger = event.get('reset_on_trigger', True)
+
+        current_count = self._increment_action_retry(action_id)
+        self.logger(f"[計數器] {action_id}: {current_count}/{count}")
+
+        if current_count >= count:
+            self.logger(f"[計數器觸發] {action_id} 達到 {count} 次")
+            if reset_on_trigger:
+                self._reset_action_retry(action_id)
+            if on_trigger:
+                return self._handle_branch_action(on_trigger)
+
+    # 計時器觸發
+    @_EVENT_REGISTRY.handles('timer_trigger')
+    def _ev_timer_trigger(self, event):
+        action_id = event.get('action_id', '')
+        duration = event.get('duration', 60)  # 秒
+        on_trigger = event.get('on_trigger')
+        reset_on_trigger = event.get('reset_on_trigger', True)
+
+        # 首次執行時開始計時
+        if action_id not in self._action_start_time:
+            self._start_action_timer(action_id)
+            self.logger(f"[計時器] {action_id} 開始計時")
+
+        elapsed = self._get_action_elapsed_time(action_id)
+        self.logger(f"[計時器] {action_id}: {elapsed:.1f}s/{duration}s")
+
+        if elapsed >= duration:
+            self.logger(f"[計時器觸發] {action_id} 達到 {duration} 秒")
+            if reset_on_trigger:
+                self._reset_action_timer(action_id)
+            if on_trigger:
+                return self._handle_branch_action(on_trigger)
+
+    # 重置計數器
+    @_EVENT_REGISTRY.handles('reset_counter')
+    def _ev_reset_counter(self, event):
+        action_id = event.get('action_id', '')
+        self._reset_action_retry(action_id)
+        self.logger(f"[重置計數器] {action_id}")
+
+    # 重置計時器
+    @_EVENT_REGISTRY.handles('reset_timer')
+    def _ev_reset_timer(self, event):
+        action_id = event.get('action_id', '')
+        self._reset_action_timer(action_id)
+        self.logger(f"[重置計時器] {action_id}")
+
+    #  新增：延遲開始
+    @_EVENT_REGISTRY.handles('delayed_start')
+    def _ev_delayed_start(self, event):
+        delay_seconds = event.get('delay_seconds', 10)
+        self.logger(f"[開始] 等待 {delay_seconds} 秒後開始...")
+
+        # 顯示倒數計時
+        for remaining in range(delay_seconds, 0, -1):
+            if not self.playing:  # 檢查是否被停止
+                self.logger("[開始] 已取消")
+                return 'stop'
+            self.logger(f"[開始] 倒數 {remaining} 秒")
+            self.control.sleep(1)
+
+        self.logger(f"[開始] 延遲完成，開始執行腳本")
+
+    #  新增：延遲結束
+    @_EVENT_REGISTRY.handles('delayed_end')
+    def _ev_delayed_end(self, event):
+        delay_seconds = event.get('delay_seconds', 60)
+        self.logger(f"[結束] 將在 {delay_seconds} 秒後結束腳本")
+
+        # 顯示倒數計時
+        for remaining in range(delay_seconds, 0, -1):
+            if not self.playing:  # 檢查是否被停止
+                self.logger("[結束] 已提前停止")
+                return 'stop'
+            self.logger(f"[結束] 倒數 {remaining} 秒後結束")
+            self.control.sleep(1)
+
+        self.logger(f"[結束] 時間到，停止執行")
+        self.playing = False
+        return 'stop'
+
+    #  新增：觸發器註冊
+    @_EVENT_REGISTRY.handles('interval_trigger', 'condition_trigger', 'priority_trigger')
+    def _ev_trigger(self, event):
+        self._trigger_manager.add_trigger(event)
+        if not self._trigger_manager._running:
+            self._trigger_manager.start()
+        self.logger(f"[觸發器] 已註冊類型: {event['type']}")
+
+    #  新增：並行區塊執行
+    @_EVENT_REGISTRY.handles('parallel_block')
+    def _ev_parallel_block(self, event):
+        self.logger("[並行] 開始執行並行區塊")
+        self._parallel_executor.execute_parallel_block(event)
+
+    #  新增：狀態機執行
+    @_EVENT_REGISTRY.handles('state_machine')
+    def _ev_state_machine(self, event):
+        self.logger(f"[狀態機] 啟動狀態機: {event.get('name', '未命名')}")
+        self._state_machine.load(event)
+        self._state_machine.run()
+
+    #  新增：YOLO 物件偵測
+    @_EVENT_REGISTRY.handles('yolo_detect')
+    def _ev_yolo_detect(self, event):
+        class_name = event.get('class_name', '')
+        confidence = event.get('confidence', 0.5)
+        region = event.get('region')
+        on_success = event.get('on_success')
+        on_failure = event.get('on_failure')
+
+        self.logger(f"[YOLO] 偵測目標: {class_name}")
+        pos = self.find_object_yolo(class_name, confidence, region)
+
+        if pos:
+            self.logger(f"[YOLO]  找到目標於 ({pos[0]}, {pos[1]})")
+            if on_success:
+                return self._handle_branch_action(on_success)
+        else:
+            self.logger(f"[YOLO]  未找到目標: {class_name}")
+            if on_failure:
+                return self._handle_branch_action(on_failure)
+
+    #  新增：設置擬真滑鼠
+    @_EVENT_REGISTRY.handles('set_bezier')
+    def _ev_set_bezier(self, event):
+        enabled = event.get('enabled', False)
+        self.set_bezier_enabled(enabled)
+        self.logger(f"[設置] 擬真滑鼠已{'開啟' if enabled else '關閉'}")
 
     def _handle_branch_action(self, action_config):
         """處理分支動作（繼續/停止/跳轉）
@@ -3388,170 +3863,43 @@ class CoreRecorder:
 
     def _mouse_event_enhanced(self, event, button='left', delta=0):
         """增強版滑鼠事件執行（更精確穩定）"""
-        user32 = ctypes.windll.user32
-        
-        # 100% 規格相容的 Win32 INPUT 結構定義 (防止 64 位元對齊錯誤)
-        class MOUSEINPUT(ctypes.Structure):
-            _fields_ = [
-                ("dx", ctypes.c_long),
-                ("dy", ctypes.c_long),
-                ("mouseData", ctypes.c_ulong),
-                ("dwFlags", ctypes.c_ulong),
-                ("time", ctypes.c_ulong),
-                ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))
-            ]
-            
-        class KEYBDINPUT(ctypes.Structure):
-            _fields_ = [
-                ("wVk", ctypes.c_ushort),
-                ("wScan", ctypes.c_ushort),
-                ("dwFlags", ctypes.c_ulong),
-                ("time", ctypes.c_ulong),
-                ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))
-            ]
-            
-        class HARDWAREINPUT(ctypes.Structure):
-            _fields_ = [
-                ("uMsg", ctypes.c_ulong),
-                ("wParamL", ctypes.c_ushort),
-                ("wParamH", ctypes.c_ushort)
-            ]
-            
-        class INPUT_UNION(ctypes.Union):
-            _fields_ = [
-                ("mi", MOUSEINPUT),
-                ("ki", KEYBDINPUT),
-                ("hi", HARDWAREINPUT)
-            ]
-            
-        class INPUT(ctypes.Structure):
-            _fields_ = [
-                ("type", ctypes.c_ulong),
-                ("u", INPUT_UNION)
-            ]
-        
         try:
             if event == 'down' or event == 'up':
-                # 按鈕事件標誌
-                flags = {
-                    'left': (0x0002, 0x0004),    # MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP
-                    'right': (0x0008, 0x0010),   # MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP
-                    'middle': (0x0020, 0x0040)   # MOUSEEVENTF_MIDDLEDOWN, MOUSEEVENTF_MIDDLEUP
-                }
-                flag = flags.get(button, (0x0002, 0x0004))[0 if event == 'down' else 1]
-                
-                inp = INPUT()
-                inp.type = 0  # INPUT_MOUSE
-                inp.u.mi = MOUSEINPUT(0, 0, 0, flag, 0, None)
-                
-                # 使用 SendInput 發送輸入（硬體級別）
-                result = user32.SendInput(1, ctypes.byref(inp), ctypes.sizeof(inp))
-                
-                if result == 0:
+                if not self.input.button(button, event == 'down'):
                     self.logger(f"SendInput 失敗: {ctypes.get_last_error()}")
                 
             elif event == 'wheel':
                 # 滾輪事件
-                inp = INPUT()
-                inp.type = 0  # INPUT_MOUSE
-                inp.u.mi = MOUSEINPUT(0, 0, int(delta * 120), 0x0800, 0, None)  # MOUSEEVENTF_WHEEL
-                
-                result = user32.SendInput(1, ctypes.byref(inp), ctypes.sizeof(inp))
-                
-                if result == 0:
+                if not self.input.wheel(delta):
                     self.logger(f"SendInput (wheel) 失敗: {ctypes.get_last_error()}")
                     
         except Exception as e:
             self.logger(f"滑鼠事件發送失敗: {e}")
 
-    def _keyboard_event_enhanced(self, event, key_name):
-        """增強版鍵盤事件執行（使用 SendInput）"""
+    def _keyboard_event_enhanced(self, event, key_name, vk=None):
+        """增強版鍵盤事件執行（使用 SendInput）；vk 為預先轉換的虛擬鍵碼"""
         try:
-            vk = self._name_to_vk(key_name)
+            if vk is None:
+                vk = self._name_to_vk(key_name)
             if vk == 0:
                 # 回退到 keyboard 庫
-                import keyboard
-                if event == 'down':
-                    keyboard.press(key_name)
-                else:
-                    keyboard.release(key_name)
+                self.input.key_name(key_name, event == 'down')
                 return
 
-            user32 = ctypes.windll.user32
-            
-            # 100% 規格相容的 Win32 INPUT 結構定義 (防止 64 位元對齊錯誤)
-            class MOUSEINPUT(ctypes.Structure):
-                _fields_ = [
-                    ("dx", ctypes.c_long),
-                    ("dy", ctypes.c_long),
-                    ("mouseData", ctypes.c_ulong),
-                    ("dwFlags", ctypes.c_ulong),
-                    ("time", ctypes.c_ulong),
-                    ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))
-                ]
-                
-            class KEYBDINPUT(ctypes.Structure):
-                _fields_ = [
-                    ("wVk", ctypes.c_ushort),
-                    ("wScan", ctypes.c_ushort),
-                    ("dwFlags", ctypes.c_ulong),
-                    ("time", ctypes.c_ulong),
-                    ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))
-                ]
-                
-            class HARDWAREINPUT(ctypes.Structure):
-                _fields_ = [
-                    ("uMsg", ctypes.c_ulong),
-                    ("wParamL", ctypes.c_ushort),
-                    ("wParamH", ctypes.c_ushort)
-                ]
-                
-            class INPUT_UNION(ctypes.Union):
-                _fields_ = [
-                    ("mi", MOUSEINPUT),
-                    ("ki", KEYBDINPUT),
-                    ("hi", HARDWAREINPUT)
-                ]
-                
-            class INPUT(ctypes.Structure):
-                _fields_ = [
-                    ("type", ctypes.c_ulong),
-                    ("u", INPUT_UNION)
-                ]
-
-            inp = INPUT()
-            inp.type = 1  # INPUT_KEYBOARD
-            
-            # KEYEVENTF_KEYUP = 0x0002
-            flags = 0x0002 if event == 'up' else 0
-            
-            # 智慧型映射虛擬鍵碼至掃描碼，100% 相容 DirectX/DirectInput 遊戲與各類輸入框
-            scan_code = user32.MapVirtualKeyW(vk, 0)
-            if scan_code:
-                flags |= 0x0008  # KEYEVENTF_SCANCODE
-                # 判斷是否為擴展鍵 (如方向鍵、Insert/Delete、Home/End、PageUp/PageDown 等)
-                extended_vks = [0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2C, 0x2D, 0x2E, 0x5B, 0x5C, 0xA3, 0xA5]
-                if vk in extended_vks:
-                    flags |= 0x0001  # KEYEVENTF_EXTENDEDKEY
-
-            inp.u.ki = KEYBDINPUT(vk, scan_code, flags, 0, None)
-            user32.SendInput(1, ctypes.byref(inp), ctypes.sizeof(inp))
+            self.input.key(vk, event == 'down')
             
         except Exception as e:
             # 最後的回退
             try:
-                import keyboard
-                if event == 'down': keyboard.press(key_name)
-                else: keyboard.release(key_name)
+                self.input.key_name(key_name, event == 'down')
             except: pass
 
     def _release_pressed_keys(self):
         """釋放在執行期間可能被 press 但未 release 的按鍵集合"""
         try:
-            import keyboard
             for k in list(getattr(self, '_pressed_keys', [])):
                 try:
-                    keyboard.release(k)
+                    self.input.key_name(k, False)
                 except Exception:
                     pass
             self._pressed_keys.clear()
@@ -3559,9 +3907,20 @@ class CoreRecorder:
         except Exception as ex:
             self.logger(f"[recorder] 釋放遺留按鍵失敗: {ex}")
     
+    def _stop_capture(self):
+        """停止輸入擷取子行程（錄製異常結束時）"""
+        capture, self._capture = self._capture, None
+        if capture is not None:
+            try:
+                capture.stop()
+            except Exception as ex:
+                self.logger(f"[recorder] 停止輸入擷取子行程失敗: {ex}")
+
     def _ensure_recording_stopped(self):
         """ 新增：確保所有錄製相關的監聽器都已完全停止"""
         try:
+            self._stop_capture()
+
             # 停止鍵盤錄製
             if self._keyboard_recording:
                 try:
@@ -4766,7 +5125,7 @@ class CoreRecorder:
             # 移動滑鼠到圖片位置 (啟用快速模式)
             pos = self.find_image_on_screen(target_name, threshold, region, fast_mode=True)
             if pos:
-                mouse.move(pos[0], pos[1])
+                self.input.move(pos[0], pos[1])
                 self.logger(f"[圖片辨識] 已移動滑鼠至 {target_name}")
                 return True
             else:
@@ -4778,7 +5137,7 @@ class CoreRecorder:
             pos = self.find_image_on_screen(target_name, threshold, region, fast_mode=True)
             if pos:
                 # 移動至圖片實體座標並稍微延遲確保系統定位
-                ctypes.windll.user32.SetCursorPos(pos[0], pos[1])
+                self.input.move(pos[0], pos[1])
                 time.sleep(0.005)
                 
                 # 採用硬體級別的 SendInput 發送點擊，防止在遊戲中失效
@@ -4800,7 +5159,10 @@ class CoreRecorder:
                 if pos:
                     self.logger(f"[圖片辨識] 已找到 {target_name}")
                     return True
-                time.sleep(0.1)  # 縮短等待輪詢間隔為 100ms 提高即時性
+                # 縮短等待輪詢間隔為 100ms 提高即時性；停止播放時立即中斷
+                if not self.control.sleep(0.1):
+                    self.logger(f"[圖片辨識] 偵測到播放停止，終止等待：{target_name}")
+                    return False
             
             self.logger(f"[圖片辨識] 等待逾時：{target_name} 未出現")
             return False
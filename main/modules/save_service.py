@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 背景存檔服務 (save_service.py)
+==============================================
+存腳本、自動存檔、群組播放佇列與整體設定原本都在 Tk 主執行緒同步寫檔（含 fsync），
+大型腳本存檔時介面會卡住；短時間內重複觸發（例如連續調整佇列）也會重複寫入同一檔案。
+
+SaveService 以單一背景執行緒處理所有存檔：
+  - 同一路徑在延遲時間內重複提交只保留最後一次（debounce），並設有最長等待上限
+  - 同一輪到期的寫入先全部寫入臨時檔，再集中 fsync，最後逐一原子替換（os.replace）
+  - 完成後以 callback(error) 通知；error 為 None 表示成功
+  - dispatch 可指定 callback 的執行方式（例如 lambda fn: app.after(0, fn) 回到 Tk 執行緒）
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_DELAY = 0.3
+DEFAULT_MAX_WAIT = 2.0
+
+
+class _Job:
+    __slots__ = ("path", "write", "call", "binary", "callbacks", "due", "first")
+
+    def __init__(self, path, write, call, binary, due):
+        self.path = path
+        self.write = write
+        self.call = call
+        self.binary = binary
+        self.callbacks: List[Callable[[Optional[Exception]], None]] = []
+        self.due = due
+        self.first = due
+
+
+class SaveService:
+    """合併同路徑寫入的背景存檔佇列（執行緒安全）"""
+
+    def __init__(self, delay: float = DEFAULT_DELAY, max_wait: float = DEFAULT_MAX_WAIT,
+                 dispatch: Optional[Callable[[Callable[[], None]], Any]] = None):
+        """
+        Args:
+            delay:    同路徑提交的合併延遲（秒）
+            max_wait: 持續重複提交時，自第一次提交起最長等待時間（秒）
+            dispatch: 執行 callback 的方式；None 時直接在背景執行緒呼叫
+        """
+        self.delay = delay
+        self.max_wait = max_wait
+        self.dispatch = dispatch
+        self.writes = 0
+        self.coalesced = 0
+        self._jobs: Dict[str, _Job] = {}
+        self._busy = False
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self._thread.start()
+
+    # ─── 提交 ──────────────────────────────────────────────
+    def submit(self, path: str, write: Callable[[Any], None],
+               callback: Optional[Callable[[Optional[Exception]], None]] = None,
+               delay: Optional[float] = None, binary: bool = False) -> None:
+        """提交寫入：write(f) 將內容寫入已開啟的臨時檔，由服務負責 fsync 與原子替換
+
+        write 會在背景執行緒執行，請事先複製（snapshot）可能被主執行緒修改的資料。
+        """
+        self._enqueue(path, write, None, binary, callback, delay)
+
+    def submit_call(self, path: str, fn: Callable[[], None],
+                    callback: Optional[Callable[[Optional[Exception]], None]] = None,
+                    delay: Optional[float] = None) -> None:
+        """提交自行處理檔案安全機制的存檔函式（例如 script_io.save_script），一樣依路徑合併"""
+        self._enqueue(path, None, fn, False, callback, delay)
+
+    def _enqueue(self, path, write, call, binary, callback, delay) -> None:
+        key = os.path.abspath(path)
+        now = time.monotonic()
+        due = now + (self.delay if delay is None else delay)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("存檔服務已停止")
+            job = self._jobs.get(key)
+            if job is None:
+                job = self._jobs[key] = _Job(path, write, call, binary, due)
+            else:
+                # 覆蓋尚未寫入的舊內容，保留先前的 callback
+                self.coalesced += 1
+                job.write, job.call, job.binary = write, call, binary
+                job.due = min(due, job.first + self.max_wait)
+            if callback:
+                job.callbacks.append(callback)
+            self._cond.notify()
+
+    def is_pending(self, path: str) -> bool:
+        """路徑是否有尚未完成的寫入"""
+        with self._cond:
+            return os.path.abspath(path) in self._jobs
+
+    # ─── 背景執行緒 ────────────────────────────────────────
+    def _worker_loop(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if not self._jobs:
+                        if self._stopped:
+                            return
+                        self._cond.wait()
+                        continue
+                    now = time.monotonic()
+                    next_due = min(job.due for job in self._jobs.values())
+                    if next_due <= now or self._stopped:
+                        break
+                    self._cond.wait(next_due - now)
+                now = time.monotonic()
+                due = [k for k, job in self._jobs.items() if job.due <= now or self._stopped]
+                batch = [self._jobs.pop(k) for k in due]
+                self._busy = True
+            try:
+                self._run_batch(batch)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _run_batch(self, batch: List[_Job]) -> None:
+        results: Dict[int, Optional[Exception]] = {}
+        staged = []
+        # 1. 寫入所有臨時檔
+        for job in batch:
+            if job.call is not None:
+                continue
+            temp_path = job.path + ".tmp"
+            try:
+                directory = os.path.dirname(job.path)
+                if directory and not os.path.exists(directory):
+                    os.makedirs(directory, exist_ok=True)
+                f = open(temp_path, "wb" if job.binary else "w", encoding=None if job.binary else "utf-8")
+                try:
+                    job.write(f)
+                    f.flush()
+                except BaseException:
+                    f.close()
+                    raise
+                staged.append((job, temp_path, f))
+            except Exception as e:
+                results[id(job)] = e
+                self._remove_quietly(temp_path)
+        # 2. 集中 fsync 後原子替換
+        for job, temp_path, f in staged:
+            try:
+                try:
+                    os.fsync(f.fileno())
+                finally:
+                    f.close()
+                os.replace(temp_path, job.path)
+                results[id(job)] = None
+            except Exception as e:
+                results[id(job)] = e
+                self._remove_quietly(temp_path)
+        self._sync_dirs({os.path.dirname(os.path.abspath(job.path)) for job, _t, _f in staged})
+        # 3. 自行處理檔案的存檔函式
+        for job in batch:
+            if job.call is None:
+                continue
+            try:
+                job.call()
+                results[id(job)] = None
+            except Exception as e:
+                results[id(job)] = e
+        for job in batch:
+            error = results.get(id(job))
+            if error is None:
+                self.writes += 1
+            else:
+                print(f"背景存檔失敗 ({os.path.basename(job.path)}): {error}")
+            for callback in job.callbacks:
+                self._notify(callback, error)
+
+    def _notify(self, callback, error) -> None:
+        def _run():
+            try:
+                callback(error)
+            except Exception as e:
+                print(f"存檔完成通知失敗: {e}")
+        if self.dispatch is None:
+            _run()
+            return
+        try:
+            self.dispatch(_run)
+        except Exception:
+            # 主視窗已關閉等情況：直接在背景執行緒執行
+            _run()
+
+    @staticmethod
+    def _sync_dirs(directories) -> None:
+        """POSIX 上 fsync 目錄以確保 rename 寫入磁碟（Windows 不支援開啟目錄）"""
+        if os.name == "nt":
+            return
+        for directory in directories:
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def _remove_quietly(path: str) -> None:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
+
+    # ─── 同步 / 結束 ───────────────────────────────────────
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """立即執行所有待寫入項目並等待完成，回傳是否在時限內完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            now = time.monotonic()
+            for job in self._jobs.values():
+                job.due = now
+            self._cond.notify_all()
+            while self._jobs or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 5.0) -> bool:
+        """寫完所有待寫入項目後停止背景執行緒"""
+        done = self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        return done
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 欄位式二進位腳本格式 (script_binary.py)
+========================================================
+錄製腳本中絕大多數是重複相同鍵名的 mouse / keyboard 事件，
+以縮排 JSON 儲存時體積龐大、載入緩慢。本模組將這類事件拆成固定型別的欄位：
+
+  time (float64) / x (int32) / y (int32) / code (uint8) / button (uint16) / flags (uint8)
+
+其餘罕見事件類型（圖片辨識、標籤、變數…）與 settings 一併放在小型 JSON 附屬區塊。
+轉換為無損：encode_script() -> decode_script() 取回的事件與原始事件完全相同。
+
+檔案結構（little-endian）：
+  MAGIC(4) | version(u16) | reserved(u16) | 欄位事件數(u32) | 附屬區塊長度(u32)
+  | 附屬區塊 JSON (utf-8) | time[] | x[] | y[] | code[] | button[] | flags[]
+"""
+
+import json
+import struct
+import sys
+from array import array
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+
+MAGIC = b"CMSB"
+FORMAT_VERSION = 1
+BINARY_EXT = ".cmsb"
+
+_HEADER = struct.Struct("<4sHHII")
+
+# 事件代碼（code 欄位）
+_CODES = {
+    ("mouse", "move"): 0,
+    ("mouse", "down"): 1,
+    ("mouse", "up"): 2,
+    ("keyboard", "down"): 3,
+    ("keyboard", "up"): 4,
+}
+_CODE_TO_PAIR = {v: k for k, v in _CODES.items()}
+
+# flags 位元
+_F_HAS_IN_TARGET = 0x01
+_F_IN_TARGET = 0x02
+_F_HAS_RELATIVE = 0x04
+_F_RELATIVE = 0x08
+_F_INT_TIME = 0x10
+_F_HAS_BUTTON = 0x20
+
+_MOUSE_KEYS = frozenset(("type", "event", "x", "y", "time", "in_target", "relative_to_window", "button"))
+_KEYBOARD_KEYS = frozenset(("type", "event", "name", "time"))
+_INT32_MIN, _INT32_MAX = -(2 ** 31), 2 ** 31 - 1
+_MAX_STRINGS = 0xFFFF
+
+# 欄位名稱與 array typecode（順序即為寫入順序）
+_COLUMNS = (("time", "d"), ("x", "i"), ("y", "i"), ("code", "B"), ("button", "H"), ("flags", "B"))
+
+
+def is_binary_script(data: Any) -> bool:
+    """判斷 bytes 是否為欄位式二進位腳本"""
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:4]) == MAGIC
+
+
+def _is_plain_int(v: Any) -> bool:
+    return type(v) is int and _INT32_MIN <= v <= _INT32_MAX
+
+
+def _columnar_row(event: Any, strings: Dict[str, int]) -> Optional[Tuple[float, int, int, int, int, int]]:
+    """將事件轉為欄位列；無法無損表示時回傳 None（改放附屬區塊）"""
+    if type(event) is not dict:
+        return None
+    code = _CODES.get((event.get("type"), event.get("event")))
+    if code is None:
+        return None
+
+    t = event.get("time")
+    if type(t) is float:
+        flags = 0
+    elif type(t) is int and abs(t) < 2 ** 53:
+        flags = _F_INT_TIME
+    else:
+        return None
+
+    if code <= 2:
+        if not _MOUSE_KEYS.issuperset(event):
+            return None
+        x, y = event.get("x"), event.get("y")
+        if not (_is_plain_int(x) and _is_plain_int(y)):
+            return None
+        for key, has_bit, val_bit in (("in_target", _F_HAS_IN_TARGET, _F_IN_TARGET),
+                                      ("relative_to_window", _F_HAS_RELATIVE, _F_RELATIVE)):
+            if key in event:
+                v = event[key]
+                if type(v) is not bool:
+                    return None
+                flags |= has_bit | (val_bit if v else 0)
+        label = event.get("button")
+        if "button" in event:
+            if type(label) is not str:
+                return None
+            flags |= _F_HAS_BUTTON
+    else:
+        if not _KEYBOARD_KEYS.issuperset(event) or "name" not in event:
+            return None
+        x = y = 0
+        label = event["name"]
+        if type(label) is not str:
+            return None
+
+    string_idx = 0
+    if label is not None:
+        string_idx = strings.get(label)
+        if string_idx is None:
+            if len(strings) >= _MAX_STRINGS:
+                return None
+            string_idx = strings[label] = len(strings)
+    return (float(t), x, y, code, string_idx, flags)
+
+
+def encode_script(events: List[dict], settings: Dict[str, Any], extra: Optional[Dict[str, Any]] = None) -> bytes:
+    """將事件列表與設定編碼為欄位式二進位格式
+
+    Args:
+        events:   事件列表
+        settings: 腳本設定（寫入 JSON 附屬區塊）
+        extra:    其他需保留的頂層欄位（選用）
+    """
+    columns = {name: array(tc) for name, tc in _COLUMNS}
+    col_time, col_x, col_y = columns["time"].append, columns["x"].append, columns["y"].append
+    col_code, col_button, col_flags = columns["code"].append, columns["button"].append, columns["flags"].append
+    strings: Dict[str, int] = {}
+    rare: List[list] = []
+
+    for idx, event in enumerate(events):
+        row = _columnar_row(event, strings)
+        if row is None:
+            rare.append([idx, event])
+            continue
+        t, x, y, code, button, flags = row
+        col_time(t)
+        col_x(x)
+        col_y(y)
+        col_code(code)
+        col_button(button)
+        col_flags(flags)
+
+    sidecar = {
+        "settings": settings,
+        "strings": list(strings),
+        "rare": rare,
+    }
+    if extra:
+        sidecar["extra"] = extra
+    sidecar_bytes = json.dumps(sidecar, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(columns["time"]), len(sidecar_bytes)), sidecar_bytes]
+    for name, _tc in _COLUMNS:
+        col = columns[name]
+        if sys.byteorder != "little":
+            col.byteswap()
+        parts.append(col.tobytes())
+    return b"".join(parts)
+
+
+def read_header(data) -> Tuple[int, int, int]:
+    """解析檔頭，回傳 (版本, 欄位事件數, 附屬區塊長度)"""
+    if len(data) < _HEADER.size:
+        raise ValueError("二進位腳本檔頭不完整")
+    magic, version, _reserved, count, sidecar_len = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("不是有效的二進位腳本")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"不支援的二進位腳本版本: {version}")
+    return version, count, sidecar_len
+
+
+def decode_columns(data) -> Tuple[Dict[str, Any], Dict[str, array]]:
+    """解碼附屬區塊與各欄位陣列（不建立事件 dict）"""
+    _version, count, sidecar_len = read_header(data)
+    view = memoryview(data)
+    offset = _HEADER.size
+    sidecar = json.loads(bytes(view[offset:offset + sidecar_len]).decode("utf-8"))
+    offset += sidecar_len
+
+    columns = {}
+    for name, tc in _COLUMNS:
+        col = array(tc)
+        nbytes = col.itemsize * count
+        if offset + nbytes > len(view):
+            raise ValueError(f"二進位腳本欄位 '{name}' 資料不完整")
+        col.frombytes(view[offset:offset + nbytes])
+        if sys.byteorder != "little":
+            col.byteswap()
+        columns[name] = col
+        offset += nbytes
+    return sidecar, columns
+
+
+def _row_to_event(t, x, y, code, button, flags, strings):
+    """由單列欄位還原事件 dict（鍵順序與錄製器一致）"""
+    etype, ev = _CODE_TO_PAIR[code]
+    if flags & _F_INT_TIME:
+        t = int(t)
+    if code >= 3:
+        return {"type": etype, "event": ev, "name": strings[button], "time": t}
+    event = {"type": etype, "event": ev}
+    if flags & _F_HAS_BUTTON:
+        event["button"] = strings[button]
+    event["x"] = x
+    event["y"] = y
+    event["time"] = t
+    if flags & _F_HAS_IN_TARGET:
+        event["in_target"] = bool(flags & _F_IN_TARGET)
+    if flags & _F_HAS_RELATIVE:
+        event["relative_to_window"] = bool(flags & _F_RELATIVE)
+    return event
+
+
+def iter_rows_as_events(columns: Dict[str, array], strings: List[str], start: int = 0, stop: Optional[int] = None):
+    """將欄位區段 [start, stop) 還原為事件 dict 的產生器
+
+    相同 (code, button, flags) 組合的事件共用一份樣板 dict，每列只需複製樣板並填入
+    座標與時間，避免逐鍵建構。
+    """
+    sl = slice(start, stop)
+    shapes: Dict[int, Tuple[dict, bool, bool]] = {}
+    for t, x, y, code, button, flags in zip(columns["time"][sl].tolist(), columns["x"][sl].tolist(),
+                                            columns["y"][sl].tolist(), columns["code"][sl],
+                                            columns["button"][sl], columns["flags"][sl]):
+        key = (code << 24) | (button << 8) | flags
+        shape = shapes.get(key)
+        if shape is None:
+            shape = shapes[key] = (_row_to_event(0.0, 0, 0, code, button, flags, strings),
+                                   code <= 2, bool(flags & _F_INT_TIME))
+        tpl, is_mouse, int_time = shape
+        event = tpl.copy()
+        if is_mouse:
+            event["x"] = x
+            event["y"] = y
+        event["time"] = int(t) if int_time else t
+        yield event
+
+
+def merge_rare(columnar_iter, rare: List[list], start: int = 0):
+    """依原始索引將罕見事件插回欄位事件流（start 為第一個輸出事件的全域索引）"""
+    pos = start
+    for idx, event in rare:
+        if idx < start:
+            continue
+        if idx > pos:
+            yield from islice(columnar_iter, idx - pos)
+            pos = idx
+        yield event
+        pos += 1
+    yield from columnar_iter
+
+
+def decode_script(data) -> Dict[str, Any]:
+    """將二進位腳本解碼為 {'events': [...], 'settings': {...}}（附屬區塊 extra 欄位合併至頂層）"""
+    sidecar, columns = decode_columns(data)
+    strings = sidecar.get("strings", [])
+    rare = sidecar.get("rare", [])
+
+    events = iter_rows_as_events(columns, strings)
+    if rare:
+        events = merge_rare(events, rare)
+
+    result = dict(sidecar.get("extra") or {})
+    result["events"] = list(events)
+    result["settings"] = sidecar.get("settings") or {}
+    return result
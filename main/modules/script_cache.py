@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 編譯腳本快取 (script_cache.py)
+==============================================
+同一個腳本在重複執行、群組播放佇列與腳本快捷鍵之間會被反覆 json.load、正規化，
+播放器每一輪還要再掃描一次全部事件建立標籤表。
+
+ScriptCache 將「正規化後的腳本 + 標籤表 + 預先解析的參數」編譯成欄位式二進位格式
+（script_binary），以「來源內容 SHA-1 + 編譯版本」為鍵存放在 scripts/.compiled/：
+  - 來源內容沒變就直接解碼快取（不解析 JSON、不再正規化）
+  - 以 (mtime, 大小) 記住最近的雜湊，未變動的檔案不必重新計算雜湊
+  - 最近使用的編譯結果另外保留在記憶體（只存 bytes，每次解碼出新的事件 dict，避免共用）
+文字指令（編輯器的 _text_to_json）也可透過 compile_text() 以文字內容雜湊快取。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from script_binary import encode_script, decode_script
+    from script_io import load_script
+    from script_delta import PATCH_SUFFIX
+    from script_stream import CACHE_DIRNAME
+except ImportError:
+    from modules.script_binary import encode_script, decode_script
+    from modules.script_io import load_script
+    from modules.script_delta import PATCH_SUFFIX
+    from modules.script_stream import CACHE_DIRNAME
+
+# 編譯格式版本：正規化規則或附加欄位變動時遞增，舊快取自動失效
+COMPILE_VERSION = 1
+
+
+def _time_to_seconds(value: Any) -> float:
+    """將 HH:MM:SS 轉為秒數（格式錯誤時回傳 0）"""
+    try:
+        h, m, s = map(int, str(value).split(":"))
+        return float(h * 3600 + m * 60 + s)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def build_label_table(events) -> Dict[str, int]:
+    """建立 {標籤名稱: 事件索引}（同名標籤以最後一個為準，與播放器相同）"""
+    labels: Dict[str, int] = {}
+    for idx, event in enumerate(events):
+        if isinstance(event, dict) and event.get("type") == "label":
+            labels[event.get("name", "")] = idx
+    return labels
+
+
+def resolve_params(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """預先將 settings 的字串參數解析為數值"""
+    try:
+        speed = int(settings.get("speed", "100")) / 100.0
+    except (ValueError, TypeError):
+        speed = 1.0
+    try:
+        repeat = int(settings.get("repeat", "1"))
+    except (ValueError, TypeError):
+        repeat = 1
+    return {
+        "speed": speed,
+        "repeat": repeat,
+        "repeat_time": _time_to_seconds(settings.get("repeat_time", "00:00:00")),
+        "repeat_interval": _time_to_seconds(settings.get("repeat_interval", "00:00:00")),
+        "random_interval": bool(settings.get("random_interval", False)),
+    }
+
+
+def _compile(data: Dict[str, Any]) -> bytes:
+    events = data.get("events", []) or []
+    settings = data.get("settings", {}) or {}
+    extra = {
+        "compiled": COMPILE_VERSION,
+        "labels": build_label_table(events),
+        "params": resolve_params(settings),
+    }
+    return encode_script(events, settings, extra)
+
+
+class ScriptCache:
+    """以內容雜湊為鍵的編譯腳本快取（執行緒安全）"""
+
+    def __init__(self, cache_dir: str, memory_items: int = 8, max_files: int = 64):
+        """
+        Args:
+            cache_dir:    快取目錄（通常為 scripts/.compiled）
+            memory_items: 記憶體中保留的編譯結果數
+            max_files:    磁碟快取檔案上限（超過時刪除最久未使用者）
+        """
+        self.cache_dir = cache_dir
+        self.memory_items = memory_items
+        self.max_files = max_files
+        self.hits = 0
+        self.misses = 0
+        self._digests: Dict[str, tuple] = {}
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ─── 雜湊 ──────────────────────────────────────────────
+    def _source_digest(self, path: str) -> str:
+        """來源內容雜湊（包含尚未合併的修補日誌）；檔案未變動時沿用上次結果"""
+        st = os.stat(path)
+        try:
+            pst = os.stat(path + PATCH_SUFFIX)
+            patch_key = (pst.st_mtime_ns, pst.st_size)
+        except OSError:
+            patch_key = None
+        key = (st.st_mtime_ns, st.st_size, patch_key)
+        cached = self._digests.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        if patch_key is not None:
+            with open(path + PATCH_SUFFIX, "rb") as f:
+                h.update(f.read())
+        digest = h.hexdigest()
+        self._digests[path] = (key, digest)
+        return digest
+
+    def _cache_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.v{COMPILE_VERSION}.cmsb")
+
+    # ─── 讀寫快取 ──────────────────────────────────────────
+    def _get_compiled(self, digest: str) -> Optional[bytes]:
+        blob = self._memory.get(digest)
+        if blob is not None:
+            self._memory.move_to_end(digest)
+            return blob
+        cache_path = self._cache_path(digest)
+        try:
+            with open(cache_path, "rb") as f:
+                blob = f.read()
+        except OSError:
+            return None
+        try:
+            # 更新存取時間，供清理時判斷最近使用
+            os.utime(cache_path)
+        except OSError:
+            pass
+        self._remember(digest, blob)
+        return blob
+
+    def _remember(self, digest: str, blob: bytes) -> None:
+        self._memory[digest] = blob
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _store(self, digest: str, blob: bytes) -> None:
+        self._remember(digest, blob)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cache_path = self._cache_path(digest)
+            temp_path = cache_path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(blob)
+            os.replace(temp_path, cache_path)
+            self._prune()
+        except OSError as e:
+            # 快取寫入失敗不影響執行
+            print(f"寫入編譯快取失敗: {e}")
+
+    def _prune(self) -> None:
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith(".cmsb")]
+        except OSError:
+            return
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _decode(blob: bytes) -> Dict[str, Any]:
+        data = decode_script(blob)
+        data.pop("compiled", None)
+        data.setdefault("labels", {})
+        data.setdefault("params", {})
+        return data
+
+    # ─── 公開介面 ──────────────────────────────────────────
+    def load(self, path: str) -> Dict[str, Any]:
+        """讀取腳本：回傳 {'events', 'settings', 'labels', 'params'}（群組腳本等原樣回傳 load_script 結果）"""
+        with self._lock:
+            digest = self._source_digest(path)
+            blob = self._get_compiled(digest)
+            if blob is not None:
+                self.hits += 1
+                return self._decode(blob)
+            self.misses += 1
+        data = load_script(path)
+        if data.get("is_group") or not isinstance(data.get("events"), list):
+            # 群組腳本與無法辨識的格式不編譯
+            return data
+        blob = _compile(data)
+        with self._lock:
+            self._store(digest, blob)
+        return self._decode(blob)
+
+    def compile_text(self, text: str, compiler: Callable[[str], Dict[str, Any]],
+                     context: Any = None) -> Dict[str, Any]:
+        """以文字內容雜湊快取文字指令的轉換結果，回傳 {'events', 'settings'}（與 compiler 相同）
+
+        Args:
+            compiler: 文字轉 JSON 的函式（例如編輯器的 _text_to_json）
+            context:  其他會影響轉換結果的資料（設定、圖片清單等），一併納入雜湊
+        """
+        h = hashlib.sha1(b"text\0")
+        h.update(text.encode("utf-8"))
+        h.update(json.dumps(context, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+        digest = h.hexdigest()
+        with self._lock:
+            blob = self._get_compiled(digest)
+            if blob is not None:
+                self.hits += 1
+                return self._decode_text(blob)
+            self.misses += 1
+        data = compiler(text)
+        if not isinstance(data, dict) or not data.get("events"):
+            # 轉換失敗或空結果不快取，交由呼叫端處理
+            return data
+        blob = _compile(data)
+        with self._lock:
+            self._store(digest, blob)
+        return self._decode_text(blob)
+
+    @classmethod
+    def _decode_text(cls, blob: bytes) -> Dict[str, Any]:
+        data = cls._decode(blob)
+        return {"events": data["events"], "settings": data["settings"]}
+
+    def invalidate(self, path: str) -> None:
+        """忘記某個來源檔的雜湊（檔案被外部修改但 mtime 未變時使用）"""
+        with self._lock:
+            self._digests.pop(path, None)
+
+
+def cache_dir_for(script_dir: str) -> str:
+    """回傳 scripts 目錄下的編譯快取目錄"""
+    return os.path.join(script_dir, CACHE_DIRNAME)
+
+
+if __name__ == "__main__":
+    # 簡易效能比較：python script_cache.py <腳本路徑>
+    import sys
+    import tempfile
+    import time
+
+    src = sys.argv[1]
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        load_script(src)
+        t1 = time.perf_counter()
+        cache = ScriptCache(tmp)
+        cache.load(src)
+        t2 = time.perf_counter()
+        ScriptCache(tmp).load(src)
+        t3 = time.perf_counter()
+        cache.load(src)
+        t4 = time.perf_counter()
+        print(f"load_script:          {(t1 - t0) * 1000:.1f} ms")
+        print(f"首次編譯:             {(t2 - t1) * 1000:.1f} ms")
+        print(f"磁碟快取（新行程）:   {(t3 - t2) * 1000:.1f} ms")
+        print(f"記憶體快取:           {(t4 - t3) * 1000:.1f} ms")
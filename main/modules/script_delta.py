@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 差異存檔 (script_delta.py)
+===========================================
+修改快捷鍵、重複次數或只改了幾行指令時，原本都要把整個腳本（數萬筆事件）
+重新序列化並 fsync，大型腳本每次存檔要數百毫秒。本模組提供兩種差異存檔：
+
+1. 設定檔頭（就地更新 settings）
+   JSON 腳本的第一行固定為 settings，並預留空白填充：
+     {"settings": {...}<空白填充>,
+     "events": [ ... ]}
+   仍是合法 JSON，任何 json.load 都能讀取。更新設定時只覆寫第一行的設定區段；
+   先將新內容寫入意圖檔（<腳本>.hdr）並 fsync，再就地寫入，完成後刪除意圖檔。
+   若中途當機，下次讀取時 recover_header_intent() 會重做寫入。
+
+2. 事件修補日誌（<腳本>.patch）
+   編輯器只改動少數事件時，將「以 [start, end) 取代為 events」的拼接操作以
+   JSON Lines 附加到修補日誌；第一行記錄主檔大小與檔尾 CRC，主檔被其他程式覆寫後
+   日誌即失效。背景執行緒在閒置一段時間後將日誌合併回主檔（完整原子存檔）。
+"""
+
+import atexit
+import json
+import os
+import threading
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PATCH_SUFFIX = ".patch"
+INTENT_SUFFIX = ".hdr"
+PATCH_VERSION = 1
+
+HEADER_PREFIX = b'{"settings": '
+HEADER_MIN_PAD = 256
+_MAX_HEADER_BYTES = 1 << 20
+_TAIL_BYTES = 64 * 1024
+
+# 修補日誌合併條件：閒置秒數 / 累積操作數
+COMPACT_DELAY = 2.0
+COMPACT_MAX_OPS = 32
+
+_locks: Dict[str, threading.RLock] = {}
+_locks_guard = threading.Lock()
+
+
+def path_lock(path: str) -> threading.RLock:
+    """取得單一腳本路徑的可重入鎖（存檔、修補、合併共用）"""
+    key = os.path.normcase(os.path.abspath(path))
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = threading.RLock()
+        return lock
+
+
+def _dump_settings(settings: Dict[str, Any]) -> bytes:
+    return json.dumps(settings, ensure_ascii=False, separators=(", ", ": ")).encode("utf-8")
+
+
+# ─── 設定檔頭 ────────────────────────────────────────────
+def write_json_header(f, data: Dict[str, Any]) -> None:
+    """寫入設定檔頭與事件以外的頂層欄位，結尾停在 '"events": ' 之後"""
+    settings_json = _dump_settings(data.get("settings") or {}).decode("utf-8")
+    pad = max(HEADER_MIN_PAD, len(settings_json.encode("utf-8")))
+    f.write(HEADER_PREFIX.decode("ascii") + settings_json + " " * pad + ",\n")
+    for key, value in data.items():
+        if key in ("settings", "events"):
+            continue
+        f.write(json.dumps(key, ensure_ascii=False) + ": " + json.dumps(value, ensure_ascii=False, indent=2) + ",\n")
+    f.write('"events": ')
+
+
+def write_json_script(f, data: Dict[str, Any]) -> None:
+    """以設定檔頭格式將腳本寫入文字檔案物件（settings 在第一行並預留填充）"""
+    write_json_header(f, data)
+    json.dump(data.get("events", []), f, ensure_ascii=False, indent=2)
+    f.write("\n}")
+
+
+def write_json_events_stream(f, events) -> int:
+    """接在 write_json_header 之後逐筆寫入事件（不建立完整列表），排版與 json.dump(indent=2) 相同
+
+    Returns:
+        寫入的事件數
+    """
+    count = 0
+    for event in events:
+        body = json.dumps(event, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        f.write(("[\n  " if count == 0 else ",\n  ") + body)
+        count += 1
+    f.write("\n]\n}" if count else "[]\n}")
+    return count
+
+
+def read_settings_header(f) -> Optional[Tuple[int, int, Dict[str, Any]]]:
+    """解析二進位檔案物件的設定檔頭，回傳 (區段位移, 區段長度, settings)；不是此格式時回傳 None"""
+    f.seek(0)
+    if f.read(len(HEADER_PREFIX)) != HEADER_PREFIX:
+        return None
+    line = f.readline(_MAX_HEADER_BYTES)
+    if not line.endswith(b"\n"):
+        return None
+    body = line.rstrip(b"\r\n")
+    if not body.endswith(b","):
+        return None
+    slot = body[:-1]
+    try:
+        settings = json.loads(slot.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(settings, dict):
+        return None
+    return len(HEADER_PREFIX), len(slot), settings
+
+
+def read_header_settings(path: str) -> Optional[Dict[str, Any]]:
+    """只讀取設定檔頭中的 settings（不解析事件）；不是此格式時回傳 None"""
+    recover_header_intent(path)
+    with open(path, "rb") as f:
+        header = read_settings_header(f)
+    return header[2] if header else None
+
+
+def _intent_path(path: str) -> str:
+    return path + INTENT_SUFFIX
+
+
+def recover_header_intent(path: str) -> None:
+    """若上次就地更新設定時中斷，依意圖檔重做寫入"""
+    intent = _intent_path(path)
+    if not os.path.exists(intent):
+        return
+    with path_lock(path):
+        try:
+            with open(intent, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            data = bytes.fromhex(record["data"])
+            if os.path.getsize(path) == record["size"]:
+                with open(path, "r+b") as f:
+                    f.seek(record["offset"])
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+        except (ValueError, KeyError, TypeError):
+            # 意圖檔本身沒寫完：主檔尚未被動過，直接捨棄
+            pass
+        except OSError as e:
+            print(f"重做設定檔頭寫入失敗: {e}")
+            return
+        try:
+            os.remove(intent)
+        except OSError:
+            pass
+
+
+def update_settings_header(path: str, settings: Dict[str, Any]) -> bool:
+    """就地覆寫設定檔頭；檔案不是此格式或新設定超出預留空間時回傳 False"""
+    with path_lock(path):
+        recover_header_intent(path)
+        new = _dump_settings(settings)
+        with open(path, "r+b") as f:
+            header = read_settings_header(f)
+            if header is None:
+                return False
+            offset, capacity, _old = header
+            if len(new) > capacity:
+                return False
+            new += b" " * (capacity - len(new))
+            size = os.fstat(f.fileno()).st_size
+            intent = _intent_path(path)
+            with open(intent, "w", encoding="utf-8") as jf:
+                json.dump({"offset": offset, "size": size, "data": new.hex()}, jf)
+                jf.flush()
+                os.fsync(jf.fileno())
+            f.seek(offset)
+            f.write(new)
+            f.flush()
+            os.fsync(f.fileno())
+        os.remove(intent)
+        return True
+
+
+# ─── 事件修補日誌 ────────────────────────────────────────
+def patch_path(path: str) -> str:
+    return path + PATCH_SUFFIX
+
+
+def _base_signature(path: str) -> Tuple[int, int]:
+    """主檔識別：(大小, 檔尾 CRC32)；CRC 不涵蓋設定檔頭，就地更新設定不影響識別"""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        header_end = 0
+        if f.read(len(HEADER_PREFIX)) == HEADER_PREFIX:
+            f.readline(_MAX_HEADER_BYTES)
+            header_end = f.tell()
+        f.seek(max(header_end, size - _TAIL_BYTES))
+        return size, zlib.crc32(f.read())
+
+
+def has_patches(path: str) -> bool:
+    return os.path.exists(patch_path(path))
+
+
+def read_patches(path: str) -> List[Dict[str, Any]]:
+    """讀取仍對應目前主檔的修補操作；日誌不存在或已失效時回傳空列表"""
+    ppath = patch_path(path)
+    if not os.path.exists(ppath):
+        return []
+    ops: List[Dict[str, Any]] = []
+    with open(ppath, "r", encoding="utf-8", errors="replace") as f:
+        header_line = f.readline()
+        try:
+            header = json.loads(header_line)
+        except ValueError:
+            return []
+        if header.get("patch") != PATCH_VERSION:
+            return []
+        if list(_base_signature(path)) != header.get("base"):
+            print(f"修補日誌與腳本不符，已忽略: {os.path.basename(ppath)}")
+            return []
+        for line in f:
+            try:
+                op = json.loads(line)
+            except ValueError:
+                # 當機時最後一行可能只寫了一半
+                break
+            if isinstance(op, dict) and "start" in op and "end" in op:
+                ops.append(op)
+    return ops
+
+
+def apply_patches(events: List[dict], ops: List[Dict[str, Any]]) -> List[dict]:
+    """依序套用拼接操作（就地修改並回傳 events）"""
+    for op in ops:
+        events[op["start"]:op["end"]] = op.get("events", [])
+    return events
+
+
+def patch_count_delta(path: str) -> int:
+    """修補日誌對事件數的淨影響（供索引在未合併前回報正確事件數）"""
+    return sum(len(op.get("events", [])) - (op["end"] - op["start"]) for op in read_patches(path))
+
+
+def diff_events(old: List[dict], new: List[dict]) -> Tuple[int, int, List[dict]]:
+    """以共同前綴 / 後綴找出單一變動區段，回傳 (start, old_end, 取代事件)"""
+    n_old, n_new = len(old), len(new)
+    limit = min(n_old, n_new)
+    start = 0
+    while start < limit and old[start] == new[start]:
+        start += 1
+    tail = 0
+    while tail < limit - start and old[n_old - 1 - tail] == new[n_new - 1 - tail]:
+        tail += 1
+    return start, n_old - tail, new[start:n_new - tail]
+
+
+def append_patch(path: str, start: int, end: int, events: List[dict]) -> int:
+    """附加一筆拼接操作並 fsync，回傳日誌中的操作數"""
+    with path_lock(path):
+        ppath = patch_path(path)
+        valid = _patch_header_valid(path)
+        count = len(read_patches(path)) if valid else 0
+        mode = "a" if valid else "w"
+        with open(ppath, mode, encoding="utf-8") as f:
+            if mode == "w":
+                f.write(json.dumps({"patch": PATCH_VERSION, "base": list(_base_signature(path))}) + "\n")
+            f.write(json.dumps({"start": start, "end": end, "events": events},
+                               ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return count + 1
+
+
+def _patch_header_valid(path: str) -> bool:
+    try:
+        with open(patch_path(path), "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+        return header.get("patch") == PATCH_VERSION and header.get("base") == list(_base_signature(path))
+    except (OSError, ValueError):
+        return False
+
+
+def discard_sidecars(path: str) -> None:
+    """完整存檔後移除修補日誌與意圖檔（內容已包含在主檔中）"""
+    for sidecar in (patch_path(path), _intent_path(path)):
+        if os.path.exists(sidecar):
+            try:
+                os.remove(sidecar)
+            except OSError as e:
+                print(f"移除差異存檔附屬檔失敗: {e}")
+
+
+# ─── 背景合併 ────────────────────────────────────────────
+_timers: Dict[str, threading.Timer] = {}
+_pending: Dict[str, Callable[[str], None]] = {}
+_timers_guard = threading.Lock()
+
+
+def schedule_compaction(path: str, compact: Callable[[str], None], ops: int = 0) -> None:
+    """閒置 COMPACT_DELAY 秒後於背景執行 compact(path)；累積過多操作時立即執行"""
+    with _timers_guard:
+        timer = _timers.pop(path, None)
+        if timer:
+            timer.cancel()
+        delay = 0.0 if ops >= COMPACT_MAX_OPS else COMPACT_DELAY
+        timer = threading.Timer(delay, _run_compaction, args=(path,))
+        timer.daemon = True
+        _timers[path] = timer
+        _pending[path] = compact
+        timer.start()
+
+
+def _run_compaction(path: str) -> None:
+    with _timers_guard:
+        _timers.pop(path, None)
+        compact = _pending.pop(path, None)
+    if compact is None:
+        return
+    try:
+        compact(path)
+    except Exception as e:
+        print(f"背景合併修補日誌失敗: {e}")
+
+
+def flush_compactions() -> None:
+    """立即執行所有尚未執行的合併（程式結束時呼叫）"""
+    with _timers_guard:
+        paths = list(_timers)
+        for timer in _timers.values():
+            timer.cancel()
+        _timers.clear()
+    for path in paths:
+        _run_compaction(path)
+
+
+atexit.register(flush_compactions)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 腳本目錄中繼資料索引 (script_index.py)
+======================================================
+重新整理腳本清單、註冊腳本快捷鍵、載入排程時只需要每個腳本的少數設定值，
+不必每次都完整 json.load 多 MB 的錄製檔。
+
+ScriptIndex 以 (檔名, mtime, 大小) 為鍵，將名稱 / 快捷鍵 / 排程 / 容錯率 / 事件數
+持久化到 scripts 目錄下的 .script_index 檔；每次 refresh() 只重新讀取有變動的檔案。
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+try:
+    from script_stream import read_script_summary
+    from script_binary import BINARY_EXT
+    from script_delta import PATCH_SUFFIX, patch_count_delta, recover_header_intent
+except ImportError:
+    from modules.script_stream import read_script_summary
+    from modules.script_binary import BINARY_EXT
+    from modules.script_delta import PATCH_SUFFIX, patch_count_delta, recover_header_intent
+
+INDEX_FILENAME = ".script_index"
+INDEX_VERSION = 2
+SCRIPT_SUFFIXES = (".json", BINARY_EXT)
+
+
+def _extract_meta(path: str) -> Dict[str, Any]:
+    """讀取單一腳本的中繼資料（串流掃描，不保留事件；計入尚未合併的修補日誌）"""
+    recover_header_intent(path)
+    extra, event_count = read_script_summary(path)
+    if os.path.exists(path + PATCH_SUFFIX):
+        event_count += patch_count_delta(path)
+    settings = extra.get("settings") if isinstance(extra.get("settings"), dict) else {}
+    # 嘗試從 settings 讀取，如果沒有則從根讀取（兼容舊格式）
+    hotkey = settings.get("script_hotkey", "") or extra.get("script_hotkey", "") or ""
+    return {
+        "hotkey": hotkey,
+        "schedule_time": settings.get("schedule_time", "") or "",
+        "schedule_policy": settings.get("schedule_policy", "") or "",
+        "schedule_window": settings.get("schedule_window", "") or "",
+        "threshold": settings.get("image_recognition_threshold"),
+        "event_count": event_count,
+        "is_group": bool(extra.get("is_group", False)),
+    }
+
+
+class ScriptIndex:
+    """scripts 目錄的持久化中繼資料索引（執行緒安全）"""
+
+    def __init__(self, script_dir: str, index_path: Optional[str] = None):
+        self.script_dir = script_dir
+        self.index_path = index_path or os.path.join(script_dir, INDEX_FILENAME)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION and isinstance(data.get("entries"), dict):
+                self._entries = data["entries"]
+        except Exception:
+            self._entries = {}
+
+    def _save(self) -> None:
+        temp_path = self.index_path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "entries": self._entries}, f, ensure_ascii=False)
+            os.replace(temp_path, self.index_path)
+        except Exception as e:
+            print(f"儲存腳本索引失敗: {e}")
+
+    def refresh(self) -> List[Dict[str, Any]]:
+        """掃描目錄並只重新讀取新增或變動的腳本，回傳依檔名排序的項目列表"""
+        with self._lock:
+            if not os.path.isdir(self.script_dir):
+                return []
+            seen = {}
+            changed = False
+            with os.scandir(self.script_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(SCRIPT_SUFFIXES) or not entry.is_file():
+                        continue
+                    st = entry.stat()
+                    try:
+                        patch_mtime = os.stat(entry.path + PATCH_SUFFIX).st_mtime_ns
+                    except OSError:
+                        patch_mtime = None
+                    cached = self._entries.get(entry.name)
+                    if (cached and cached.get("mtime_ns") == st.st_mtime_ns and cached.get("size") == st.st_size
+                            and cached.get("patch_mtime_ns") == patch_mtime):
+                        seen[entry.name] = cached
+                        continue
+                    meta = {"file": entry.name, "name": os.path.splitext(entry.name)[0],
+                            "mtime_ns": st.st_mtime_ns, "size": st.st_size, "patch_mtime_ns": patch_mtime}
+                    try:
+                        meta.update(_extract_meta(entry.path))
+                    except Exception as e:
+                        # 損毀檔案也記錄下來，直到檔案變動前不再重讀
+                        meta.update({"hotkey": "", "schedule_time": "", "schedule_policy": "",
+                                     "schedule_window": "", "threshold": None,
+                                     "event_count": 0, "is_group": False, "error": str(e)})
+                    seen[entry.name] = meta
+                    changed = True
+            if changed or len(seen) != len(self._entries):
+                self._entries = seen
+                self._save()
+            return [self._entries[k] for k in sorted(self._entries)]
+
+    def entries(self, suffix: Optional[str] = ".json") -> List[Dict[str, Any]]:
+        """重新整理後回傳項目；suffix 為 None 時包含所有支援的格式"""
+        items = self.refresh()
+        if suffix is None:
+            return items
+        return [e for e in items if e["file"].endswith(suffix)]
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        """取得單一腳本的項目（會先重新整理索引）"""
+        self.refresh()
+        return self._entries.get(filename)
@@ -2,10 +2,38 @@
 import os
 import json
 import datetime
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from script_binary import BINARY_EXT, is_binary_script, encode_script, decode_script
+except ImportError:
+    from modules.script_binary import BINARY_EXT, is_binary_script, encode_script, decode_script
+
+try:
+    from script_stream import open_lazy_events
+except ImportError:
+    from modules.script_stream import open_lazy_events
+
+try:
+    from script_delta import (path_lock, write_json_script, read_header_settings, update_settings_header,
+                              recover_header_intent, has_patches, read_patches, apply_patches,
+                              diff_events, append_patch, discard_sidecars, schedule_compaction)
+except ImportError:
+    from modules.script_delta import (path_lock, write_json_script, read_header_settings, update_settings_header,
+                                      recover_header_intent, has_patches, read_patches, apply_patches,
+                                      diff_events, append_patch, discard_sidecars, schedule_compaction)
+
+# 超過此大小的腳本建議改用 load_script_lazy（逐塊解碼，不一次載入全部事件）
+LAZY_LOAD_BYTES = 32 * 1024 * 1024
 
 def _normalize_loaded(data: Any) -> Dict[str, Any]:
-    """將載入資料轉成 dict 格式: {'events': [...], 'settings': {...}}"""
+    """將載入資料轉成 dict 格式: {'events': [...], 'settings': {...}}
+    
+    支援 JSON 解析結果（dict / list）與欄位式二進位腳本（bytes，自動偵測）
+    """
+    if is_binary_script(data):
+        data = decode_script(data)
+
     if isinstance(data, dict):
         if "is_group" in data and data["is_group"]:
             # 群組腳本格式：保留原始結構
@@ -45,19 +73,61 @@ def _normalize_loaded(data: Any) -> Dict[str, Any]:
         "repeat_interval": "00:00:00", "random_interval": False, "script_hotkey": ""
     }}
 
+def _read_raw(path: str) -> Any:
+    """讀取腳本檔案原始內容：二進位腳本回傳 bytes，其餘回傳 JSON 解析結果"""
+    recover_header_intent(path)
+    with open(path, "rb") as f:
+        raw = f.read()
+    if is_binary_script(raw):
+        return raw
+    return json.loads(raw.decode("utf-8"))
+
+def _read_patched(path: str) -> Any:
+    """讀取腳本並套用尚未合併的事件修補日誌（有修補時二進位腳本會先解碼）"""
+    data = _read_raw(path)
+    ops = read_patches(path)
+    if not ops:
+        return data
+    if is_binary_script(data):
+        data = decode_script(data)
+    if isinstance(data, list):
+        return apply_patches(data, ops)
+    if isinstance(data, dict) and isinstance(data.get("events"), list):
+        apply_patches(data["events"], ops)
+    return data
+
 def load_script(path: str) -> Dict[str, Any]:
-    """讀取腳本檔案並回傳 normalized dict"""
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    """讀取腳本檔案並回傳 normalized dict（自動辨識 JSON / 二進位格式，套用差異存檔）"""
+    return _normalize_loaded(_read_patched(path))
+
+def load_script_lazy(path: str) -> Dict[str, Any]:
+    """以延遲載入方式讀取腳本，events 為 LazyEventList（依需求分塊解碼）
+    
+    群組腳本沒有事件，直接使用 load_script；有未合併的修補日誌時先合併回主檔。
+    """
+    if has_patches(path):
+        compact_script(path)
+    recover_header_intent(path)
+    events = open_lazy_events(path)
+    if events.list_format:
+        return _normalize_loaded(events)
+    if events.extra.get("is_group"):
+        events.close()
+        return load_script(path)
+    data = dict(events.extra)
+    data["events"] = events
     return _normalize_loaded(data)
 
-def save_script(path: str, events: List[dict], settings: Dict[str, Any]) -> None:
+def save_script(path: str, events: List[dict], settings: Dict[str, Any], binary: Optional[bool] = None) -> None:
     """儲存腳本（覆寫），使用 settings 區塊儲存所有參數
     
     安全機制：
     - 使用臨時檔案寫入，避免寫入失敗導致原檔案損毀
     - 加入 flush() 和 fsync() 確保資料寫入磁碟（防止藍屏/斷電時檔案損毀）
     - 重試機制（最多3次）
+    
+    Args:
+        binary: 是否使用欄位式二進位格式；None 時依副檔名（.cmsb）決定
     """
     data = {
         "events": events,
@@ -72,21 +142,22 @@ def save_script(path: str, events: List[dict], settings: Dict[str, Any]) -> None
             "window_info": settings.get("window_info", None)
         }
     }
+    if binary is None:
+        binary = path.lower().endswith(BINARY_EXT)
     
     # 使用臨時檔案寫入，避免寫入失敗導致原檔案損毀
     temp_path = path + ".tmp"
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            with open(temp_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                #  強制寫入磁碟（防止藍屏/斷電時檔案為空）
-                f.flush()
-                os.fsync(f.fileno())
-            # 寫入成功後才替換原檔案
-            if os.path.exists(path):
-                os.remove(path)
-            os.rename(temp_path, path)
+            with path_lock(path):
+                _write_payload(temp_path, data, binary)
+                # 寫入成功後才替換原檔案
+                if os.path.exists(path):
+                    os.remove(path)
+                os.rename(temp_path, path)
+                # 完整存檔已包含所有變更，移除差異存檔附屬檔
+                discard_sidecars(path)
             return
         except Exception as e:
             if attempt == max_retries - 1:
@@ -100,35 +171,124 @@ def save_script(path: str, events: List[dict], settings: Dict[str, Any]) -> None
             import time
             time.sleep(0.1)  # 等待0.1秒後重試
 
-def auto_save_script(script_dir: str, events: List[dict], settings: Dict[str, Any]) -> str:
-    """自動存檔：在 script_dir 建立 timestamp 檔名，回傳檔名"""
-    if not os.path.exists(script_dir):
-        os.makedirs(script_dir, exist_ok=True)
+def _write_payload(temp_path: str, data: Dict[str, Any], binary: bool) -> None:
+    """將腳本資料寫入臨時檔並 fsync（JSON 或欄位式二進位；群組腳本一律使用 JSON）
     
+    一般 JSON 腳本使用設定檔頭格式（settings 置於第一行並預留空間），之後修改設定可就地更新。
+    """
+    if binary and not data.get("is_group"):
+        extra = {k: v for k, v in data.items() if k not in ("events", "settings")}
+        payload = encode_script(data.get("events", []), data.get("settings", {}), extra)
+        with open(temp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        return
+    with open(temp_path, "w", encoding="utf-8") as f:
+        if isinstance(data, dict) and "events" in data and not data.get("is_group"):
+            write_json_script(f, data)
+        else:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        #  強制寫入磁碟（防止藍屏/斷電時檔案為空）
+        f.flush()
+        os.fsync(f.fileno())
+
+def convert_script(src_path: str, dst_path: str, binary: Optional[bool] = None) -> None:
+    """在 JSON 與欄位式二進位格式之間無損轉換腳本
+    
+    Args:
+        binary: 目標是否為二進位格式；None 時依目標副檔名（.cmsb）決定
+    """
+    data = _read_patched(src_path)
+    if is_binary_script(data):
+        data = decode_script(data)
+    elif isinstance(data, list):
+        data = {"events": data, "settings": {}}
+    elif not (isinstance(data, dict) and ("events" in data or data.get("is_group"))):
+        raise ValueError(f"不是有效的腳本格式: {src_path}")
+    if binary is None:
+        binary = dst_path.lower().endswith(BINARY_EXT)
+    temp_path = dst_path + ".tmp"
+    with path_lock(dst_path):
+        _write_payload(temp_path, data, binary)
+        os.replace(temp_path, dst_path)
+        discard_sidecars(dst_path)
+
+def next_auto_save_name(script_dir: str, taken: Optional[Callable[[str], bool]] = None) -> str:
+    """產生不重複的自動存檔檔名（timestamp）
+    
+    Args:
+        taken: 額外判斷路徑是否已被占用（例如背景存檔服務中尚未寫入的檔案）
+    """
     ts = datetime.datetime.now().strftime("%Y_%m%d_%H%M_%S")
     filename = f"{ts}.json"
     path = os.path.join(script_dir, filename)
     
     # 確保檔名唯一（避免高頻存檔時衝突）
     counter = 1
-    while os.path.exists(path):
+    while os.path.exists(path) or (taken is not None and taken(path)):
         filename = f"{ts}_{counter}.json"
         path = os.path.join(script_dir, filename)
         counter += 1
+    return filename
+
+def auto_save_script(script_dir: str, events: List[dict], settings: Dict[str, Any],
+                     filename: Optional[str] = None) -> str:
+    """自動存檔：在 script_dir 建立 timestamp 檔名，回傳檔名
+    
+    Args:
+        filename: 事先以 next_auto_save_name 取得的檔名（None 時自動產生）
+    """
+    if not os.path.exists(script_dir):
+        os.makedirs(script_dir, exist_ok=True)
+    
+    if filename is None:
+        filename = next_auto_save_name(script_dir)
+    path = os.path.join(script_dir, filename)
     
     save_script(path, events, settings)
     return filename
 
+def _merge_settings(current: Dict[str, Any], settings: Dict[str, Any]) -> Dict[str, Any]:
+    """以 settings 覆寫 current 中的腳本參數（未提供的參數保留原值）"""
+    merged = dict(current)
+    merged.update({
+        "speed": settings.get("speed", current.get("speed", "100")),
+        "repeat": settings.get("repeat", current.get("repeat", "1")),
+        "repeat_time": settings.get("repeat_time", current.get("repeat_time", "00:00:00")),
+        "repeat_interval": settings.get("repeat_interval", current.get("repeat_interval", "00:00:00")),
+        "random_interval": settings.get("random_interval", current.get("random_interval", False)),
+        "script_hotkey": settings.get("script_hotkey", current.get("script_hotkey", "")),
+        "script_actions": settings.get("script_actions", current.get("script_actions", [])),
+        "window_info": settings.get("window_info", current.get("window_info", None))
+    })
+    return merged
+
 def save_script_settings(path: str, settings: Dict[str, Any]) -> None:
-    """只更新腳本內的設定欄位（使用 settings 區塊儲存）"""
+    """只更新腳本內的設定欄位（使用 settings 區塊儲存）
+    
+    設定檔頭格式的 JSON 腳本直接就地覆寫第一行（不重新序列化事件）；
+    其他格式或新設定超出預留空間時才完整重寫（並順便轉為設定檔頭格式）。
+    """
     if not os.path.exists(path):
         raise FileNotFoundError(f"腳本檔案不存在: {path}")
     
+    with path_lock(path):
+        try:
+            current = read_header_settings(path)
+            if current is not None and update_settings_header(path, _merge_settings(current, settings)):
+                return
+        except OSError as e:
+            print(f"就地更新腳本設定失敗，改為完整存檔: {e}")
+        _save_script_settings_full(path, settings)
+
+def _save_script_settings_full(path: str, settings: Dict[str, Any]) -> None:
+    """讀取整個腳本、更新設定後完整重寫"""
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            raw = _read_raw(path)
+            data = _read_patched(path) if has_patches(path) else raw
         except Exception as e:
             if attempt == max_retries - 1:
                 raise Exception(f"讀取腳本失敗（重試{max_retries}次後）: {e}")
@@ -137,6 +297,10 @@ def save_script_settings(path: str, settings: Dict[str, Any]) -> None:
             continue
         break
     
+    binary = is_binary_script(raw)
+    if is_binary_script(data):
+        data = decode_script(data)
+    
     # 轉換為新格式（events + settings）
     if not (isinstance(data, dict) and "events" in data):
         data = {"events": data, "settings": {}}
@@ -146,30 +310,18 @@ def save_script_settings(path: str, settings: Dict[str, Any]) -> None:
         data["settings"] = {}
     
     # 更新 settings 區塊中的參數
-    data["settings"].update({
-        "speed": settings.get("speed", data["settings"].get("speed", "100")),
-        "repeat": settings.get("repeat", data["settings"].get("repeat", "1")),
-        "repeat_time": settings.get("repeat_time", data["settings"].get("repeat_time", "00:00:00")),
-        "repeat_interval": settings.get("repeat_interval", data["settings"].get("repeat_interval", "00:00:00")),
-        "random_interval": settings.get("random_interval", data["settings"].get("random_interval", False)),
-        "script_hotkey": settings.get("script_hotkey", data["settings"].get("script_hotkey", "")),
-        "script_actions": settings.get("script_actions", data["settings"].get("script_actions", [])),
-        "window_info": settings.get("window_info", data["settings"].get("window_info", None))
-    })
+    data["settings"] = _merge_settings(data["settings"], settings)
     
     # 使用臨時檔案寫入
     temp_path = path + ".tmp"
     for attempt in range(max_retries):
         try:
-            with open(temp_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                #  強制寫入磁碟（防止藍屏/斷電時檔案為空）
-                f.flush()
-                os.fsync(f.fileno())
+            _write_payload(temp_path, data, binary)
             # 寫入成功後才替換原檔案
             if os.path.exists(path):
                 os.remove(path)
             os.rename(temp_path, path)
+            discard_sidecars(path)
             return
         except Exception as e:
             if attempt == max_retries - 1:
@@ -182,3 +334,57 @@ def save_script_settings(path: str, settings: Dict[str, Any]) -> None:
                 raise Exception(f"更新腳本設定失敗（重試{max_retries}次後）: {e}")
             import time
             time.sleep(0.1)
+
+def save_script_delta(path: str, old_events: List[dict], new_events: List[dict],
+                      settings: Optional[Dict[str, Any]] = None, max_ratio: float = 0.25) -> bool:
+    """差異存檔：只將變動的事件區段附加到修補日誌，並就地更新設定
+    
+    Args:
+        old_events: 目前磁碟上（含已存在修補）的事件列表
+        new_events: 要儲存的事件列表
+        settings:   新設定（None 表示不變；所有欄位覆寫目前設定）
+        max_ratio:  變動事件超過新事件數的此比例時放棄差異存檔
+    
+    Returns:
+        True 表示已完成差異存檔；False 表示不適用，呼叫端應改用 save_script 完整存檔
+    """
+    if not os.path.exists(path):
+        return False
+    start, end, replacement = diff_events(old_events, new_events)
+    if max(len(replacement), end - start) > max(1, len(new_events) * max_ratio):
+        return False
+    with path_lock(path):
+        if settings is not None:
+            current = read_header_settings(path)
+            if current is None:
+                return False
+            # 與編輯器完整存檔相同：寫入整個 settings（不只 _merge_settings 的腳本參數）
+            merged = {**current, **settings}
+            if merged != current and not update_settings_header(path, merged):
+                return False
+        if start == end and not replacement:
+            return True
+        ops = append_patch(path, start, end, replacement)
+    schedule_compaction(path, compact_script, ops)
+    return True
+
+def compact_script(path: str) -> bool:
+    """將修補日誌合併回主檔（完整原子存檔），回傳是否有合併任何修補"""
+    with path_lock(path):
+        if not has_patches(path):
+            return False
+        ops = read_patches(path)
+        if not ops:
+            # 日誌已失效（主檔被其他程式覆寫）
+            discard_sidecars(path)
+            return False
+        data = _read_patched(path)
+        if isinstance(data, list):
+            data = {"events": data, "settings": {}}
+        settings = data.get("settings") if isinstance(data.get("settings"), dict) else {}
+        binary = path.lower().endswith(BINARY_EXT)
+        temp_path = path + ".tmp"
+        _write_payload(temp_path, {**data, "settings": settings}, binary)
+        os.replace(temp_path, path)
+        discard_sidecars(path)
+        return True
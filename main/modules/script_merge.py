@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 串流腳本合併 (script_merge.py)
+==============================================
+合併腳本原本會把每個來源腳本完整載入、複製所有事件到一個大列表後再 json.dump，
+合併數個數 MB 的錄製時記憶體暴增，且整個過程在 Tk 主執行緒進行。
+
+merge_scripts_stream() 逐筆讀取每個來源（iter_script_events），即時重新計算時間後
+直接寫入輸出檔；任何時刻只保留目前這一筆事件，記憶體用量與來源數量、大小無關。
+
+時間重新定位與原本的合併相同：
+  - 每個來源的第一筆事件對齊到目前的時間位移
+  - 下一個來源的位移 = 已寫入的最後一筆事件時間 + 該來源設定的延遲
+輸出採用設定檔頭格式（settings 取自第一個來源），寫入臨時檔後 fsync 並原子替換。
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from script_stream import iter_script_events, read_script_summary
+    from script_delta import (path_lock, read_header_settings, has_patches, discard_sidecars,
+                              write_json_header, write_json_events_stream)
+    from script_io import compact_script
+except ImportError:
+    from modules.script_stream import iter_script_events, read_script_summary
+    from modules.script_delta import (path_lock, read_header_settings, has_patches, discard_sidecars,
+                                      write_json_header, write_json_events_stream)
+    from modules.script_io import compact_script
+
+
+class MergeCancelled(Exception):
+    """合併被使用者取消"""
+
+
+def read_settings(path: str) -> Dict[str, Any]:
+    """只讀取腳本的 settings（設定檔頭格式直接讀第一行，其他格式逐筆掃描但不保留事件）"""
+    try:
+        settings = read_header_settings(path)
+    except OSError:
+        settings = None
+    if settings is None:
+        extra, _count = read_script_summary(path)
+        settings = extra.get("settings") or {}
+    return settings if isinstance(settings, dict) else {}
+
+
+def merge_scripts_stream(sources: List[Tuple[str, float]], dst_path: str,
+                         settings: Optional[Dict[str, Any]] = None,
+                         progress: Optional[Callable[[float, int], None]] = None,
+                         cancelled: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+    """依序串流合併多個腳本並寫入 dst_path
+
+    Args:
+        sources:   [(腳本路徑, 該腳本之後的延遲秒數), ...]；不存在的路徑會略過
+        settings:  輸出腳本的設定；None 時使用第一個來源的設定
+        progress:  progress(整體進度 0~1, 已寫入事件數)，於合併執行緒呼叫
+        cancelled: 回傳 True 時中止合併（拋出 MergeCancelled，不會留下輸出檔）
+
+    Returns:
+        {'events': 事件數, 'duration': 最後一筆事件時間, 'merged': [已合併路徑], 'missing': [找不到的路徑]}
+    """
+    existing = [(path, delay) for path, delay in sources if os.path.exists(path)]
+    missing = [path for path, _delay in sources if not os.path.exists(path)]
+    for path, _delay in existing:
+        # 尚未合併的差異存檔不在主檔中，先寫回
+        if has_patches(path):
+            compact_script(path)
+    if settings is None:
+        settings = read_settings(existing[0][0]) if existing else {}
+
+    total = len(existing) or 1
+    state = {"offset": 0.0, "last": None, "count": 0}
+    merged: List[str] = []
+
+    def _rebased():
+        for i, (path, delay) in enumerate(existing):
+            base = None
+
+            def _on_progress(fraction, i=i):
+                if cancelled and cancelled():
+                    raise MergeCancelled()
+                if progress:
+                    progress((i + fraction) / total, state["count"])
+
+            for event in iter_script_events(path, progress=_on_progress):
+                if not isinstance(event, dict):
+                    continue
+                t = event.get("time", 0)
+                if base is None:
+                    base = t
+                new_event = dict(event)
+                new_event["time"] = (t - base) + state["offset"]
+                state["last"] = new_event["time"]
+                state["count"] += 1
+                yield new_event
+            merged.append(path)
+            if state["last"] is not None:
+                state["offset"] = state["last"] + delay
+            if cancelled and cancelled():
+                raise MergeCancelled()
+            if progress:
+                progress((i + 1) / total, state["count"])
+
+    temp_path = dst_path + ".tmp"
+    with path_lock(dst_path):
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                write_json_header(f, {"settings": settings})
+                write_json_events_stream(f, _rebased())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, dst_path)
+            discard_sidecars(dst_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            raise
+    return {"events": state["count"], "duration": state["last"] or 0.0, "merged": merged, "missing": missing}
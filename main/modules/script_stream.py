@@ -0,0 +1,541 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 串流 / 延遲載入腳本事件 (script_stream.py)
+==========================================================
+大型錄製腳本（數百 MB）若一次 json.load 會把所有事件 dict 放進記憶體。
+本模組提供：
+
+  - iter_script_events(path)  : 逐筆產生事件（JSON 與二進位格式皆可），記憶體用量固定
+  - open_lazy_events(path)    : 回傳 LazyEventList，依需求分塊解碼並快取少量區塊
+
+JSON 掃描以 latin-1 解碼位元組，使字元位移等於檔案位元組位移，便於建立區塊位移表；
+含非 ASCII 字元的元素會再以 UTF-8 重新解析，確保結果與 json.load 相同。
+二進位格式（script_binary）則透過 mmap 直接讀取所需欄位區段。
+
+隨機存取（跳至第 N 筆事件或標籤）：
+  - JSON 掃描時一併記錄標籤目錄，位移表與標籤目錄存成索引檔（scripts/.compiled/<檔名>.idx），
+    腳本未變動（大小與 mtime 相同）時直接讀取索引，不必重新掃描整個檔案
+  - 二進位格式的欄位為固定寬度，任意索引可直接定位；標籤屬於附屬區塊的罕見事件，不需解碼欄位
+"""
+
+import json
+import mmap
+import os
+import re
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Sequence
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    from script_binary import (MAGIC, _COLUMNS, _HEADER, read_header,
+                               iter_rows_as_events, merge_rare)
+except ImportError:
+    from modules.script_binary import (MAGIC, _COLUMNS, _HEADER, read_header,
+                                       iter_rows_as_events, merge_rare)
+
+DEFAULT_CHUNK_SIZE = 4096
+DEFAULT_CACHE_CHUNKS = 4
+
+# 位移表索引（與編譯快取共用 scripts/.compiled 目錄）
+CACHE_DIRNAME = ".compiled"
+INDEX_VERSION = 1
+
+_WS = re.compile(r"[ \t\n\r]*")
+_SEP = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+_BOM = "\xef\xbb\xbf"  # UTF-8 BOM 以 latin-1 解碼後的樣子
+_decoder = json.JSONDecoder()
+
+
+# ─── JSON 增量掃描 ───────────────────────────────────────
+class _JsonScanner:
+    """以固定大小區塊讀檔的 JSON 掃描器（位移即檔案位元組位移）"""
+
+    def __init__(self, f, offset: int = 0, block: int = 1 << 20):
+        f.seek(offset)
+        self._f = f
+        self._block = block
+        self.base = offset
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        if offset == 0:
+            self._fill()
+            if self.buf.startswith(_BOM):
+                self.pos = len(_BOM)
+
+    def _fill(self) -> bool:
+        data = self._f.read(max(self._block, len(self.buf) - self.pos))
+        if not data:
+            self.eof = True
+            return False
+        if self.pos:
+            self.base += self.pos
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += data.decode("latin-1")
+        return True
+
+    def tell(self) -> int:
+        return self.base + self.pos
+
+    def skip_ws(self) -> None:
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self._fill():
+                return
+
+    def next_char(self) -> str:
+        self.skip_ws()
+        if self.pos >= len(self.buf):
+            raise ValueError("JSON 內容意外結束")
+        c = self.buf[self.pos]
+        self.pos += 1
+        return c
+
+    def peek(self) -> str:
+        self.skip_ws()
+        return self.buf[self.pos] if self.pos < len(self.buf) else ""
+
+    def value(self) -> Any:
+        if self.pos >= len(self.buf) or self.buf[self.pos] in " \t\n\r":
+            self.skip_ws()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # 數值等可能剛好被區塊邊界截斷，讀到結尾時需補讀確認
+            if end >= len(self.buf) and not self.eof:
+                self._fill()
+                continue
+            break
+        raw = self.buf[self.pos:end]
+        if not raw.isascii():
+            obj = json.loads(raw.encode("latin-1").decode("utf-8"))
+        self.pos = end
+        return obj
+
+    def iter_array(self):
+        """逐一產生 (元素起始位移, 元素值)"""
+        if self.next_char() != "[":
+            raise ValueError("預期 JSON 陣列")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        self.skip_ws()
+        while True:
+            yield self.base + self.pos, self.value()
+            # 快速路徑：分隔符號與其後空白都在緩衝區內時直接以 regex 跳過
+            m = _SEP.match(self.buf, self.pos)
+            if m and m.end() < len(self.buf):
+                c = m.group(1)
+                self.pos = m.end()
+            else:
+                c = self.next_char()
+                self.skip_ws()
+            if c == "]":
+                return
+            if c != ",":
+                raise ValueError(f"JSON 陣列格式錯誤（位移 {self.tell() - 1}）")
+
+
+def _walk_json(scanner: _JsonScanner, extra: Dict[str, Any]):
+    """走訪腳本 JSON，逐一產生 (位移, 事件)；其他頂層欄位寫入 extra
+
+    支援 {'events': [...], 'settings': {...}} 與純事件陣列兩種格式。
+    """
+    c = scanner.peek()
+    if c == "[":
+        extra["__list_format__"] = True
+        yield from scanner.iter_array()
+        return
+    if c != "{":
+        raise ValueError("不支援的腳本格式")
+    scanner.pos += 1
+    if scanner.peek() == "}":
+        scanner.pos += 1
+        return
+    while True:
+        key = scanner.value()
+        if scanner.next_char() != ":":
+            raise ValueError("JSON 物件格式錯誤")
+        if key == "events" and scanner.peek() == "[":
+            yield from scanner.iter_array()
+        else:
+            extra[key] = scanner.value()
+        c = scanner.next_char()
+        if c == "}":
+            return
+        if c != ",":
+            raise ValueError("JSON 物件格式錯誤")
+
+
+# ─── 後端 ────────────────────────────────────────────────
+def index_path_for(path: str) -> str:
+    """回傳腳本的位移表索引檔路徑"""
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, CACHE_DIRNAME, name + ".idx")
+
+
+def _label_name(event: Any):
+    if type(event) is dict and event.get("type") == "label":
+        return event.get("name", "")
+    return None
+
+
+class _JsonBackend:
+    """JSON 腳本：開啟時串流掃描一次（或讀取索引檔），建立區塊位移表、標籤目錄與頂層欄位"""
+
+    def __init__(self, path: str, chunk_size: int, use_index: bool = True):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.offsets: List[int] = []
+        self.labels: Dict[str, int] = {}
+        self.extra: Dict[str, Any] = {}
+        self.count = 0
+        self._lock = threading.Lock()
+        self._f = open(path, "rb")
+        st = os.fstat(self._f.fileno())
+        self._stamp = [st.st_size, st.st_mtime_ns]
+        if use_index and self._load_index():
+            return
+        labels = self.labels
+        for i, (offset, event) in enumerate(_walk_json(_JsonScanner(self._f), self.extra)):
+            if i % chunk_size == 0:
+                self.offsets.append(offset)
+            name = _label_name(event)
+            if name is not None:
+                labels[name] = i
+            self.count = i + 1
+        self.list_format = self.extra.pop("__list_format__", False)
+        if use_index:
+            self._save_index()
+
+    def _load_index(self) -> bool:
+        try:
+            with open(index_path_for(self.path), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (data.get("version") != INDEX_VERSION or data.get("stamp") != self._stamp
+                or data.get("chunk_size") != self.chunk_size):
+            return False
+        self.offsets = data["offsets"]
+        self.labels = data["labels"]
+        self.extra = data["extra"]
+        self.count = data["count"]
+        self.list_format = data["list_format"]
+        return True
+
+    def _save_index(self) -> None:
+        index_path = index_path_for(self.path)
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            temp_path = index_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "stamp": self._stamp, "chunk_size": self.chunk_size,
+                           "count": self.count, "offsets": self.offsets, "labels": self.labels,
+                           "extra": self.extra, "list_format": self.list_format}, f, ensure_ascii=False)
+            os.replace(temp_path, index_path)
+        except (OSError, TypeError, ValueError) as e:
+            # 索引只是加速用，寫入失敗不影響載入
+            print(f"寫入腳本位移表索引失敗: {e}")
+
+    def read_chunk(self, k: int) -> List[dict]:
+        n = min(self.chunk_size, self.count - k * self.chunk_size)
+        out = []
+        with self._lock:
+            scanner = _JsonScanner(self._f, self.offsets[k], block=1 << 16)
+            for j in range(n):
+                out.append(scanner.value())
+                if j < n - 1 and scanner.next_char() != ",":
+                    raise ValueError("JSON 陣列格式錯誤")
+        return out
+
+    def iter_events(self, start: int = 0) -> Iterator[dict]:
+        if start <= 0:
+            with open(self.path, "rb") as f:
+                for _offset, event in _walk_json(_JsonScanner(f), {}):
+                    yield event
+            return
+        if start >= self.count:
+            return
+        k = start // self.chunk_size
+        yield from self.read_chunk(k)[start - k * self.chunk_size:]
+        for k in range(k + 1, len(self.offsets)):
+            yield from self.read_chunk(k)
+
+    def close(self) -> None:
+        try:
+            self._f.close()
+        except Exception:
+            pass
+
+
+class _BinaryBackend:
+    """欄位式二進位腳本：mmap 後依索引讀取欄位區段"""
+
+    def __init__(self, path: str, chunk_size: int):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.list_format = False
+        self._f = open(path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        _version, self._columnar, sidecar_len = read_header(self._mm)
+        offset = _HEADER.size
+        sidecar = json.loads(self._mm[offset:offset + sidecar_len].decode("utf-8"))
+        offset += sidecar_len
+        self._col_offsets = {}
+        for name, tc in _COLUMNS:
+            itemsize = array(tc).itemsize
+            self._col_offsets[name] = (offset, tc, itemsize)
+            offset += itemsize * self._columnar
+        self.strings = sidecar.get("strings", [])
+        self.rare = sidecar.get("rare", [])
+        self._rare_idx = [idx for idx, _ev in self.rare]
+        # 標籤一定是罕見事件，直接由附屬區塊建立標籤目錄
+        self.labels = {}
+        for idx, event in self.rare:
+            name = _label_name(event)
+            if name is not None:
+                self.labels[name] = idx
+        self.extra = dict(sidecar.get("extra") or {})
+        self.extra["settings"] = sidecar.get("settings") or {}
+        self.count = self._columnar + len(self.rare)
+
+    def _columns(self, c0: int, c1: int) -> Dict[str, array]:
+        cols = {}
+        for name, (offset, tc, itemsize) in self._col_offsets.items():
+            col = array(tc)
+            col.frombytes(self._mm[offset + c0 * itemsize:offset + c1 * itemsize])
+            if sys.byteorder != "little":
+                col.byteswap()
+            cols[name] = col
+        return cols
+
+    def read_range(self, g0: int, g1: int) -> List[dict]:
+        """讀取全域索引 [g0, g1) 的事件"""
+        r0 = bisect_left(self._rare_idx, g0)
+        r1 = bisect_left(self._rare_idx, g1)
+        c0 = g0 - r0
+        c1 = g1 - r1
+        rows = iter_rows_as_events(self._columns(c0, c1), self.strings)
+        return list(islice(merge_rare(rows, self.rare[r0:r1], start=g0), g1 - g0))
+
+    def read_chunk(self, k: int) -> List[dict]:
+        g0 = k * self.chunk_size
+        return self.read_range(g0, min(self.count, g0 + self.chunk_size))
+
+    def iter_events(self, start: int = 0) -> Iterator[dict]:
+        g0 = max(0, start)
+        while g0 < self.count:
+            g1 = min(self.count, g0 + self.chunk_size)
+            yield from self.read_range(g0, g1)
+            g0 = g1
+
+    def close(self) -> None:
+        try:
+            self._mm.close()
+            self._f.close()
+        except Exception:
+            pass
+
+
+def _open_backend(path: str, chunk_size: int, use_index: bool = True):
+    with open(path, "rb") as f:
+        head = f.read(len(MAGIC))
+    if head == MAGIC:
+        return _BinaryBackend(path, chunk_size)
+    return _JsonBackend(path, chunk_size, use_index)
+
+
+# ─── 延遲載入序列 ────────────────────────────────────────
+class LazyEventList(Sequence):
+    """唯讀事件序列：依索引分塊解碼，僅快取最近使用的少數區塊
+
+    支援 len()、索引（含負索引）、切片與迭代；迭代時逐塊串流、不佔用快取。
+    """
+
+    def __init__(self, backend, chunk_size: int = DEFAULT_CHUNK_SIZE, cache_chunks: int = DEFAULT_CACHE_CHUNKS):
+        self._backend = backend
+        self._chunk_size = chunk_size
+        self._cache_chunks = max(1, cache_chunks)
+        self._cache: "OrderedDict[int, List[dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self._backend.path
+
+    @property
+    def extra(self) -> Dict[str, Any]:
+        """事件以外的頂層欄位（例如 settings）"""
+        return self._backend.extra
+
+    @property
+    def list_format(self) -> bool:
+        return self._backend.list_format
+
+    @property
+    def labels(self) -> Dict[str, int]:
+        """標籤目錄 {標籤名稱: 事件索引}（同名標籤以最後一個為準）"""
+        return self._backend.labels
+
+    def index_of_label(self, name: str) -> int:
+        """回傳標籤的事件索引；不存在時拋出 KeyError"""
+        return self._backend.labels[name]
+
+    def iter_from(self, start: int) -> Iterator[dict]:
+        """從第 start 筆事件開始逐筆串流（只解碼所需區塊之後的事件）"""
+        if start < 0:
+            start += len(self)
+        return self._backend.iter_events(start)
+
+    def __len__(self) -> int:
+        return self._backend.count
+
+    def _chunk(self, k: int) -> List[dict]:
+        with self._lock:
+            chunk = self._cache.get(k)
+            if chunk is not None:
+                self._cache.move_to_end(k)
+                return chunk
+        chunk = self._backend.read_chunk(k)
+        with self._lock:
+            self._cache[k] = chunk
+            while len(self._cache) > self._cache_chunks:
+                self._cache.popitem(last=False)
+        return chunk
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("事件索引超出範圍")
+        k, j = divmod(index, self._chunk_size)
+        return self._chunk(k)[j]
+
+    def __iter__(self) -> Iterator[dict]:
+        return self._backend.iter_events()
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def map(self, fn: Callable[[dict], dict]) -> "MappedEventList":
+        """回傳對每個事件套用 fn 的延遲檢視（不複製事件）"""
+        return MappedEventList(self, fn)
+
+    def close(self) -> None:
+        with self._lock:
+            self._cache.clear()
+        self._backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MappedEventList(Sequence):
+    """LazyEventList 的轉換檢視：存取時才對事件套用轉換函式"""
+
+    def __init__(self, base: Sequence, fn: Callable[[dict], dict]):
+        self._base = base
+        self._fn = fn
+
+    def __len__(self) -> int:
+        return len(self._base)
+
+    @property
+    def labels(self) -> Dict[str, int]:
+        return self._base.labels
+
+    def index_of_label(self, name: str) -> int:
+        return self._base.index_of_label(name)
+
+    def iter_from(self, start: int) -> Iterator[dict]:
+        return map(self._fn, self._base.iter_from(start))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._fn(e) for e in self._base[index]]
+        return self._fn(self._base[index])
+
+    def __iter__(self) -> Iterator[dict]:
+        return map(self._fn, self._base)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def map(self, fn: Callable[[dict], dict]) -> "MappedEventList":
+        inner = self._fn
+        return MappedEventList(self._base, lambda e: fn(inner(e)))
+
+
+def open_lazy_events(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     cache_chunks: int = DEFAULT_CACHE_CHUNKS, use_index: bool = True) -> LazyEventList:
+    """開啟腳本為 LazyEventList
+
+    JSON 腳本會先串流掃描一次建立位移表與標籤目錄（use_index 時存成索引檔，下次直接讀取）。
+    """
+    return LazyEventList(_open_backend(path, chunk_size, use_index), chunk_size, cache_chunks)
+
+
+def iter_script_events(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       progress: Optional[Callable[[float], None]] = None) -> Iterator[dict]:
+    """逐筆產生腳本事件，不建立完整列表（JSON / 二進位格式自動辨識）
+
+    Args:
+        progress: 每讀取 chunk_size 筆事件呼叫一次 progress(已讀比例 0~1)
+    """
+    with open(path, "rb") as f:
+        head = f.read(len(MAGIC))
+    if head == MAGIC:
+        backend = _BinaryBackend(path, chunk_size)
+        try:
+            for n, event in enumerate(backend.iter_events(), 1):
+                yield event
+                if progress and n % chunk_size == 0:
+                    progress(n / backend.count)
+        finally:
+            backend.close()
+        return
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size or 1
+        for n, (_offset, event) in enumerate(_walk_json(_JsonScanner(f), {}), 1):
+            yield event
+            if progress and n % chunk_size == 0:
+                progress(min(1.0, f.tell() / size))
+
+
+def read_script_summary(path: str):
+    """讀取腳本的頂層欄位與事件數，不保留任何事件
+
+    Returns:
+        (extra, event_count)：extra 為事件以外的頂層欄位（含 settings）
+    """
+    with open(path, "rb") as f:
+        head = f.read(_HEADER.size)
+        if head[:len(MAGIC)] == MAGIC:
+            _version, count, sidecar_len = read_header(head)
+            sidecar = json.loads(f.read(sidecar_len).decode("utf-8"))
+            extra = dict(sidecar.get("extra") or {})
+            extra["settings"] = sidecar.get("settings") or {}
+            return extra, count + len(sidecar.get("rare", []))
+        extra: Dict[str, Any] = {}
+        count = 0
+        for count, _item in enumerate(_walk_json(_JsonScanner(f), extra), 1):
+            pass
+        extra.pop("__list_format__", None)
+        return extra, count
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 腳本版本快照庫 (snapshot_store.py)
+==================================================
+編輯器存檔前會把整個腳本複製成 <腳本>.backup，只保留上一版。
+同一腳本的各版本通常只差幾行，完整複製既浪費空間也無法回到更早的版本。
+
+SnapshotStore 以內容定址方式保存每個版本：
+  - 事件依「內容決定的邊界」切成區段（某筆事件的 CRC 命中條件即切段），
+    插入或刪除事件只影響附近的區段，其他區段的雜湊不變
+  - 每個區段以 SHA-1 命名、zlib 壓縮後存放一次（objects/），不同版本與不同腳本共用
+  - 每個腳本一個版本清單（manifests/<腳本>.jsonl），一行一個版本：時間、來源、設定、區段列表
+  - restore() 可還原任一版本；prune() / gc() 清除舊版本與不再引用的區段，
+    trim() 在每次記錄版本後只保留最新 DEFAULT_KEEP_VERSIONS 個版本並回收區段
+
+錄製的自動存檔不寫入快照庫：每次錄製都是新的腳本（事件帶絕對時間戳記，與其他錄製沒有共用區段），
+快照只會在完整 JSON 之外再多寫一份。腳本第一次在編輯器存檔時才把磁碟上的內容記錄為第一個版本。
+
+目錄結構（scripts/.snapshots/）：
+  objects/ab/abcdef...   壓縮後的事件區段（每行一筆 JSON 事件）
+  manifests/<檔名>.jsonl  版本清單
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+SNAPSHOT_DIRNAME = ".snapshots"
+SNAPSHOT_VERSION = 1
+
+# 區段大小：平均約 AVG 筆事件切一段，並限制在 [MIN, MAX] 之間
+CHUNK_AVG_EVENTS = 256
+CHUNK_MIN_EVENTS = 32
+CHUNK_MAX_EVENTS = 2048
+
+# 每個腳本保留的版本數（trim 的預設值）
+DEFAULT_KEEP_VERSIONS = 50
+
+# 同一快照庫目錄共用一把鎖：多個 SnapshotStore 實例（主視窗、各編輯器）同時寫入時，
+# gc() 不會刪掉另一個實例剛寫入、尚未記錄到版本清單的區段
+_root_locks: Dict[str, threading.Lock] = {}
+_root_locks_guard = threading.Lock()
+
+
+def _root_lock(root: str) -> threading.Lock:
+    key = os.path.normcase(os.path.abspath(root))
+    with _root_locks_guard:
+        lock = _root_locks.get(key)
+        if lock is None:
+            lock = _root_locks[key] = threading.Lock()
+        return lock
+
+
+def _event_line(event: Any) -> str:
+    """事件的標準序列化（鍵排序，確保相同內容得到相同雜湊）"""
+    return json.dumps(event, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def split_chunks(events: List[Any]) -> List[List[str]]:
+    """將事件切成內容決定邊界的區段，回傳每段的序列化行列表"""
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    for event in events:
+        line = _event_line(event)
+        current.append(line)
+        n = len(current)
+        if n >= CHUNK_MAX_EVENTS or (
+                n >= CHUNK_MIN_EVENTS and zlib.crc32(line.encode("utf-8")) % CHUNK_AVG_EVENTS == 0):
+            chunks.append(current)
+            current = []
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class SnapshotStore:
+    """內容定址的腳本版本庫（執行緒安全）"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.manifests_dir = os.path.join(root, "manifests")
+        self._lock = _root_lock(root)
+
+    # ─── 區段 ──────────────────────────────────────────────
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _put_chunk(self, lines: List[str]) -> Tuple[str, int]:
+        """寫入區段（已存在則略過），回傳 (雜湊, 新寫入的位元組數)"""
+        payload = "\n".join(lines).encode("utf-8")
+        digest = hashlib.sha1(payload).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(payload, 6)
+        # 批次轉換時多個行程可能同時寫入相同區段，臨時檔名需各自獨立
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        return digest, len(data)
+
+    def _get_chunk(self, digest: str) -> List[Any]:
+        with open(self._object_path(digest), "rb") as f:
+            payload = zlib.decompress(f.read()).decode("utf-8")
+        return [json.loads(line) for line in payload.split("\n")] if payload else []
+
+    # ─── 版本清單 ──────────────────────────────────────────
+    def _manifest_path(self, name: str) -> str:
+        return os.path.join(self.manifests_dir, os.path.basename(name) + ".jsonl")
+
+    def versions(self, name: str) -> List[Dict[str, Any]]:
+        """回傳腳本的所有版本（舊到新），每項含 id / time / source / count / chunks / new_bytes"""
+        path = self._manifest_path(name)
+        if not os.path.exists(path):
+            return []
+        result = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 當機時最後一行可能只寫了一半
+                    continue
+                if isinstance(record, dict) and "chunks" in record:
+                    result.append(record)
+        return result
+
+    def snapshot(self, name: str, events: List[Any], settings: Optional[Dict[str, Any]] = None,
+                 source: str = "", extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """保存一個版本；內容與最新版本完全相同時不新增，直接回傳最新版本
+
+        Args:
+            name:     腳本檔名（版本清單依此分組）
+            events:   事件列表（可為延遲載入序列，會逐筆讀取）
+            settings: 腳本設定
+            source:   版本來源說明（例如「編輯器」「自動存檔」）
+            extra:    其他需保留的頂層欄位
+        """
+        chunks = split_chunks(events)
+        with self._lock:
+            digests = []
+            new_bytes = 0
+            for lines in chunks:
+                digest, written = self._put_chunk(lines)
+                digests.append(digest)
+                new_bytes += written
+            history = self.versions(name)
+            latest = history[-1] if history else None
+            if (latest and latest["chunks"] == digests and latest.get("settings") == (settings or {})
+                    and latest.get("extra") == (extra or {})):
+                return latest
+            record = {
+                "v": SNAPSHOT_VERSION,
+                "id": (latest["id"] + 1) if latest else 1,
+                "time": time.time(),
+                "source": source,
+                "count": sum(len(lines) for lines in chunks),
+                "settings": settings or {},
+                "extra": extra or {},
+                "chunks": digests,
+                "new_bytes": new_bytes,
+            }
+            os.makedirs(self.manifests_dir, exist_ok=True)
+            with open(self._manifest_path(name), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            return record
+
+    def restore(self, name: str, version: Optional[int] = None) -> Dict[str, Any]:
+        """還原指定版本（None 為最新版本），回傳 {'events', 'settings', ...}
+
+        Raises:
+            KeyError: 找不到版本
+        """
+        history = self.versions(name)
+        if not history:
+            raise KeyError(f"沒有 {name} 的版本記錄")
+        if version is None:
+            record = history[-1]
+        else:
+            matches = [r for r in history if r["id"] == version]
+            if not matches:
+                raise KeyError(f"找不到 {name} 的版本 {version}")
+            record = matches[0]
+        events: List[Any] = []
+        for digest in record["chunks"]:
+            events.extend(self._get_chunk(digest))
+        data = dict(record.get("extra") or {})
+        data["events"] = events
+        data["settings"] = record.get("settings") or {}
+        return data
+
+    # ─── 清理 ──────────────────────────────────────────────
+    def prune(self, name: str, keep: int = 50) -> int:
+        """只保留最新 keep 個版本，回傳刪除的版本數（區段由 gc() 回收）"""
+        with self._lock:
+            history = self.versions(name)
+            if len(history) <= keep:
+                return 0
+            kept = history[-keep:] if keep > 0 else []
+            path = self._manifest_path(name)
+            temp_path = path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for record in kept:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(temp_path, path)
+            return len(history) - len(kept)
+
+    def gc(self) -> int:
+        """刪除沒有任何版本引用的區段，回傳刪除數"""
+        with self._lock:
+            referenced = set()
+            if os.path.isdir(self.manifests_dir):
+                for entry in os.scandir(self.manifests_dir):
+                    if entry.name.endswith(".jsonl"):
+                        for record in self.versions(entry.name[:-len(".jsonl")]):
+                            referenced.update(record["chunks"])
+            removed = 0
+            if not os.path.isdir(self.objects_dir):
+                return 0
+            for sub in os.scandir(self.objects_dir):
+                if not sub.is_dir():
+                    continue
+                for entry in os.scandir(sub.path):
+                    if entry.name not in referenced:
+                        try:
+                            os.remove(entry.path)
+                            removed += 1
+                        except OSError:
+                            pass
+            return removed
+
+    def trim(self, name: str, keep: int = DEFAULT_KEEP_VERSIONS) -> int:
+        """只保留 name 最新 keep 個版本；有刪除版本時接著回收不再引用的區段，回傳刪除的版本數
+
+        gc() 只防護同一行程內的寫入：多行程同時寫入同一快照庫時（批次轉換），
+        各行程只呼叫 prune()，全部完成後再由主行程 gc()
+        """
+        removed = self.prune(name, keep)
+        if removed:
+            self.gc()
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """快照庫統計：版本數、版本引用的事件總數、區段數與實際佔用位元組"""
+        result = {"versions": 0, "events": 0, "chunks": 0, "bytes": 0}
+        if os.path.isdir(self.manifests_dir):
+            for entry in os.scandir(self.manifests_dir):
+                if entry.name.endswith(".jsonl"):
+                    for record in self.versions(entry.name[:-len(".jsonl")]):
+                        result["versions"] += 1
+                        result["events"] += record.get("count", 0)
+        if os.path.isdir(self.objects_dir):
+            for sub in os.scandir(self.objects_dir):
+                if sub.is_dir():
+                    for entry in os.scandir(sub.path):
+                        result["chunks"] += 1
+                        result["bytes"] += entry.stat().st_size
+        return result
+
+
+def snapshot_dir_for(script_dir: str) -> str:
+    """回傳 scripts 目錄下的版本快照庫目錄"""
+    return os.path.join(script_dir, SNAPSHOT_DIRNAME)
@@ -16,6 +16,7 @@ import os
 import re
 import sys
 import time
+import threading
 from typing import List, Dict, Any, Tuple
 from PIL import Image, ImageGrab, ImageTk
 
@@ -40,6 +41,58 @@ except:
     LINE_SEED_FONT_LOADED = False
 from utils import set_window_icon
 
+# 大型腳本延遲載入（事件依需求分塊解碼）
+try:
+    from script_io import load_script_lazy, LAZY_LOAD_BYTES
+except ImportError:
+    try:
+        from modules.script_io import load_script_lazy, LAZY_LOAD_BYTES
+    except ImportError:
+        load_script_lazy = None
+        LAZY_LOAD_BYTES = 0
+
+# 差異存檔（只寫入變動的事件區段 / 就地更新設定）
+try:
+    from script_io import save_script_delta, compact_script
+    from script_delta import write_json_script, discard_sidecars, path_lock
+except ImportError:
+    try:
+        from modules.script_io import save_script_delta, compact_script
+        from modules.script_delta import write_json_script, discard_sidecars, path_lock
+    except ImportError:
+        save_script_delta = compact_script = None
+        write_json_script = discard_sidecars = path_lock = None
+
+# 編譯快取（相同文字內容不重複轉換）
+try:
+    from script_cache import ScriptCache, cache_dir_for as script_cache_dir
+except ImportError:
+    try:
+        from modules.script_cache import ScriptCache, cache_dir_for as script_cache_dir
+    except ImportError:
+        ScriptCache = None
+        script_cache_dir = None
+
+# 版本快照庫（取代 .backup 完整複本，可還原任一版本）
+try:
+    from snapshot_store import SnapshotStore, snapshot_dir_for
+except ImportError:
+    try:
+        from modules.snapshot_store import SnapshotStore, snapshot_dir_for
+    except ImportError:
+        SnapshotStore = None
+        snapshot_dir_for = None
+
+# 誤差有界的軌跡壓縮（需要 numpy，沒有時使用下方的 filter_mouse_trajectory）
+try:
+    from trajectory_compact import compact_trajectory, NUMPY_AVAILABLE as TRAJECTORY_COMPACT_AVAILABLE
+except ImportError:
+    try:
+        from modules.trajectory_compact import compact_trajectory, NUMPY_AVAILABLE as TRAJECTORY_COMPACT_AVAILABLE
+    except ImportError:
+        compact_trajectory = None
+        TRAJECTORY_COMPACT_AVAILABLE = False
+
 
 #  字體系統（獨立定義，避免迴圈匯入）
 def font_tuple(size, weight=None, monospace=False):
@@ -724,6 +777,13 @@ class TextCommandEditor(EditorParserMixin, EditorFlowchartMixin, tk.Toplevel):
             "window_info": None
         }
         
+        # 磁碟上的事件（差異存檔比對用，None 表示只能完整存檔）
+        self._disk_events = None
+        # 文字指令編譯快取（依腳本目錄建立）
+        self._text_cache = None
+        # 版本快照庫（依腳本目錄建立）
+        self._snapshots = None
+        
         # 圖片辨識相關資料夾
         self.images_dir = self._get_images_dir()
         os.makedirs(self.images_dir, exist_ok=True)
@@ -1072,6 +1132,14 @@ class TextCommandEditor(EditorParserMixin, EditorFlowchartMixin, tk.Toplevel):
         self.text_editor.bind("<Control-a>", self._select_all_text)
         self.text_editor.bind("<Control-A>", self._select_all_text)
         
+        # 綁定 Ctrl+G 跳至標籤 / 行號
+        self.text_editor.bind("<Control-g>", self._goto_prompt)
+        self.text_editor.bind("<Control-G>", self._goto_prompt)
+        
+        # 綁定 Ctrl+H 版本記錄
+        self.text_editor.bind("<Control-h>", self._show_versions)
+        self.text_editor.bind("<Control-H>", self._show_versions)
+        
         # 畫布編輯器（初始隱藏）
         self.canvas_frame = tk.Frame(self.editor_container, bg="#252526")
         self.canvas = tk.Canvas(
@@ -1375,6 +1443,31 @@ class TextCommandEditor(EditorParserMixin, EditorFlowchartMixin, tk.Toplevel):
         self.text_editor.tag_add("sel", "1.0", "end")
         return "break"  # 阻止 ttkbootstrap 的預設處理
     
+    def _goto_prompt(self, event=None):
+        """詢問要跳至的標籤或行號 (Ctrl+G)"""
+        target = simpledialog.askstring("跳至", "輸入標籤名稱（例如 #開始）或行號：", parent=self)
+        if target:
+            self.goto(target)
+        return "break"
+    
+    def goto(self, target: str) -> bool:
+        """將編輯器捲動到標籤（#名稱）或行號並選取該行"""
+        target = target.strip()
+        if target.isdigit():
+            index = f"{int(target)}.0"
+        else:
+            name = target[1:] if target.startswith("#") else target
+            index = self.text_editor.search(f"^#{re.escape(name)}[ \t]*$", "1.0", "end", regexp=True)
+            if not index:
+                self._update_status(f"找不到標籤: #{name}", "warning")
+                return False
+        self.text_editor.tag_remove("sel", "1.0", "end")
+        self.text_editor.tag_add("sel", f"{index} linestart", f"{index} lineend")
+        self.text_editor.mark_set("insert", f"{index} linestart")
+        self.text_editor.see(index)
+        self.text_editor.focus_set()
+        return True
+    
     def _toggle_trajectory_fold(self, summary_line):
         """切換指定軌跡的摺疊狀態"""
         try:
@@ -3303,9 +3396,16 @@ class TextCommandEditor(EditorParserMixin, EditorFlowchartMixin, tk.Toplevel):
                 )
                 should_filter = response
             
-            # 載入 JSON
-            with open(self.script_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # 先合併尚未寫回主檔的差異存檔
+            if compact_script:
+                compact_script(self.script_path)
+            
+            # 載入 JSON（大型腳本改用延遲載入，過濾與轉換時逐塊讀取事件）
+            if load_script_lazy and file_size > LAZY_LOAD_BYTES:
+                data = load_script_lazy(self.script_path)
+            else:
+                with open(self.script_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
                 
             # === 檢查是否為群組播放組合 ===
             if data.get("is_group", False):
@@ -3315,12 +3415,21 @@ class TextCommandEditor(EditorParserMixin, EditorFlowchartMixin, tk.Toplevel):
                 self._apply_syntax_highlighting()
                 return
             
+            # 記錄磁碟上的事件，儲存時用來計算差異（延遲載入的大型腳本不保留）
+            self._disk_events = data["events"] if isinstance(data, dict) and isinstance(data.get("events"), list) else None
+            
             # === 應用軌跡過濾 ===
             if should_filter and isinstance(data, dict) and 'events' in data:
                 original_count = len(data.get('events', []))
                 
-                # 呼叫過濾函數
-                data['events'] = filter_mouse_trajectory(data['events'])
+                # 呼叫過濾函數（可用時改用誤差有界的壓縮）
+                error_note = ""
+                if TRAJECTORY_COMPACT_AVAILABLE:
+                    data['events'], stats = compact_trajectory(data['events'])
+                    error_note = (f"最大誤差: {stats['max_error_px']:.1f} 像素 / "
+                                  f"{stats['max_time_error_ms']:.0f} 毫秒\n")
+                else:
+                    data['events'] = filter_mouse_trajectory(data['events'])
                 
                 filtered_count = len(data['events'])
                 reduction = original_count - filtered_count
@@ -3332,7 +3441,8 @@ class TextCommandEditor(EditorParserMixin, EditorFlowchartMixin, tk.Toplevel):
                     f"已智能過濾滑鼠軌跡\n\n"
                     f"原始事件數: {original_count:,}\n"
                     f"過濾後: {filtered_count:,}\n"
-                    f"減少: {reduction:,} ({reduction_percent:.1f}%)\n\n"
+                    f"減少: {reduction:,} ({reduction_percent:.1f}%)\n"
+                    f"{error_note}\n"
                     f"註：拖曳操作的軌跡已完整保留",
                     "info"
                 )
@@ -3791,6 +3901,98 @@ class TextCommandEditor(EditorParserMixin, EditorFlowchartMixin, tk.Toplevel):
         
         return ""  # 預設值
     
+    def _compile_text(self, text: str) -> Dict[str, Any]:
+        """文字指令轉 JSON；文字、設定與圖片清單都相同時直接取用編譯快取"""
+        if ScriptCache is None or not self.script_path:
+            return self._text_to_json(text)
+        cache_dir = script_cache_dir(os.path.dirname(self.script_path))
+        if self._text_cache is None or self._text_cache.cache_dir != cache_dir:
+            self._text_cache = ScriptCache(cache_dir)
+        try:
+            images = sorted(os.listdir(self.images_dir)) if os.path.isdir(self.images_dir) else []
+            return self._text_cache.compile_text(text, self._text_to_json,
+                                                 {"settings": self.original_settings, "images": images})
+        except Exception as e:
+            print(f"編譯快取失敗，直接轉換: {e}")
+            return self._text_to_json(text)
+    
+    def _get_snapshots(self):
+        """取得目前腳本目錄的版本快照庫（不支援時回傳 None）"""
+        if SnapshotStore is None or not self.script_path:
+            return None
+        root = snapshot_dir_for(os.path.dirname(self.script_path))
+        if self._snapshots is None or self._snapshots.root != root:
+            self._snapshots = SnapshotStore(root)
+        return self._snapshots
+    
+    def _snapshot_versions(self, previous_events, json_data):
+        """於背景將存檔前（若尚未記錄）與存檔後的版本寫入快照庫"""
+        store = self._get_snapshots()
+        if store is None:
+            return
+        name = os.path.basename(self.script_path)
+        previous_settings = dict(self.original_settings)
+        
+        def _run():
+            try:
+                if previous_events is not None:
+                    # 與最新版本相同時不會重複記錄
+                    store.snapshot(name, previous_events, previous_settings, source="存檔前")
+                store.snapshot(name, json_data.get("events", []), json_data.get("settings"), source="編輯器")
+                # 只保留最新的版本，回收舊版本的區段（取代原本固定大小的 .backup）
+                store.trim(name)
+            except Exception as e:
+                print(f"寫入版本快照失敗: {e}")
+        
+        threading.Thread(target=_run, daemon=True).start()
+    
+    def _show_versions(self, event=None):
+        """顯示版本記錄，可將選取的版本還原到編輯器 (Ctrl+H)"""
+        store = self._get_snapshots()
+        if store is None:
+            self._update_status("警告: 版本記錄不可用", "warning")
+            return "break"
+        name = os.path.basename(self.script_path)
+        history = store.versions(name)
+        if not history:
+            self._show_message("版本記錄", f"{name} 尚無版本記錄\n\n儲存腳本後會自動記錄版本。", "info")
+            return "break"
+        
+        dialog = tk.Toplevel(self)
+        set_window_icon(dialog)
+        dialog.title(f"版本記錄 - {name}")
+        dialog.transient(self)
+        
+        listbox = tk.Listbox(dialog, font=font_tuple(10, monospace=True), width=60, height=15)
+        listbox.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        records = list(reversed(history))
+        for record in records:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.get("time", 0)))
+            listbox.insert(tk.END, f"v{record['id']:<4} {stamp}  {record.get('count', 0):>6}筆  "
+                                   f"+{record.get('new_bytes', 0) / 1024:.1f}KB  {record.get('source', '')}")
+        listbox.selection_set(0)
+        
+        def on_restore():
+            selection = listbox.curselection()
+            if not selection:
+                return
+            record = records[selection[0]]
+            try:
+                data = store.restore(name, record["id"])
+                text_commands = self._json_to_text(data)
+            except Exception as e:
+                self._show_message("錯誤", f"還原版本失敗:\n{e}", "error")
+                return
+            dialog.destroy()
+            self.text_editor.delete("1.0", "end")
+            self.text_editor.insert("1.0", text_commands)
+            self._apply_syntax_highlighting()
+            self._update_status(f"已還原 v{record['id']} 至編輯器（尚未儲存）", "success")
+        
+        tk.Button(dialog, text="還原至編輯器", command=on_restore, bg="#4CAF50", fg="white",
+                  font=font_tuple(10), padx=10, pady=2).pack(pady=(0, 10))
+        return "break"
+    
     def _save_script(self):
         """儲存文字指令回JSON格式（支援模組引用展開）"""
         if not self.script_path:
@@ -3821,8 +4023,8 @@ class TextCommandEditor(EditorParserMixin, EditorFlowchartMixin, tk.Toplevel):
                 self._update_status("警告: 無法儲存：腳本無指令", "warning")
                 return
             
-            # 轉換為JSON（使用展開後的內容）
-            json_data = self._text_to_json(expanded_content)
+            # 轉換為JSON（使用展開後的內容；內容未變時取用編譯快取）
+            json_data = self._compile_text(expanded_content)
             
             # 二次檢查：確保轉換後的events不為空
             if not json_data.get("events") or len(json_data.get("events", [])) == 0:
@@ -3853,9 +4055,26 @@ class TextCommandEditor(EditorParserMixin, EditorFlowchartMixin, tk.Toplevel):
                 self._update_status("錯誤: 雙向驗證失敗", "error")
                 return
             
-            # 備份原檔案
+            # 差異存檔：只改動少數事件時附加到修補日誌，不重寫整個檔案
+            if save_script_delta and self._disk_events is not None:
+                try:
+                    if save_script_delta(self.script_path, self._disk_events, json_data["events"],
+                                         json_data.get("settings")):
+                        self._snapshot_versions(self._disk_events, json_data)
+                        self._disk_events = json_data["events"]
+                        self._update_status(
+                            f"已儲存: {os.path.basename(self.script_path)} ({len(json_data['events'])}筆事件，差異存檔)",
+                            "success"
+                        )
+                        return
+                except Exception as delta_error:
+                    print(f"差異存檔失敗，改為完整存檔: {delta_error}")
+            
+            # 備份原檔案（有快照庫時記錄為版本，否則複製為 .backup）
             backup_path = self.script_path + ".backup"
-            if os.path.exists(self.script_path):
+            if self._get_snapshots() and self._disk_events is not None:
+                pass  # 存檔成功後與新版本一併寫入快照庫
+            elif os.path.exists(self.script_path):
                 try:
                     with open(self.script_path, 'r', encoding='utf-8') as f:
                         with open(backup_path, 'w', encoding='utf-8') as bf:
@@ -3866,7 +4085,11 @@ class TextCommandEditor(EditorParserMixin, EditorFlowchartMixin, tk.Toplevel):
             # 使用臨時檔案儲存（防止寫入失敗損毀原檔案）
             temp_path = self.script_path + ".tmp"
             with open(temp_path, 'w', encoding='utf-8') as f:
-                json.dump(json_data, f, indent=2, ensure_ascii=False)
+                if write_json_script:
+                    # 設定檔頭格式：之後修改設定可就地更新
+                    write_json_script(f, json_data)
+                else:
+                    json.dump(json_data, f, indent=2, ensure_ascii=False)
                 f.flush()
                 os.fsync(f.fileno())
             
@@ -3882,9 +4105,18 @@ class TextCommandEditor(EditorParserMixin, EditorFlowchartMixin, tk.Toplevel):
                     raise ValueError("儲存檔案二次驗證失敗")
             
             # 驗證成功後才替換原檔案
-            if os.path.exists(self.script_path):
-                os.remove(self.script_path)
-            os.rename(temp_path, self.script_path)
+            if path_lock:
+                with path_lock(self.script_path):
+                    if os.path.exists(self.script_path):
+                        os.remove(self.script_path)
+                    os.rename(temp_path, self.script_path)
+                    discard_sidecars(self.script_path)
+            else:
+                if os.path.exists(self.script_path):
+                    os.remove(self.script_path)
+                os.rename(temp_path, self.script_path)
+            self._snapshot_versions(self._disk_events, json_data)
+            self._disk_events = json_data["events"]
             
             event_count = len(json_data.get("events", []))
             self._update_status(
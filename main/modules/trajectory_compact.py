@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+ChroLens Mimic — 誤差有界的軌跡壓縮 (trajectory_compact.py)
+=========================================================
+filter_mouse_trajectory 以逐筆迴圈與方向差的經驗規則過濾移動，
+無法保證播放路徑與原始錄製相差多少。
+
+compact_trajectory() 對既有腳本做時間感知的 Douglas-Peucker 簡化：
+  - 只處理連續的滑鼠移動段；點擊、滾輪、鍵盤等事件與拖曳期間（按下到放開）的移動全部保留
+  - 每段移動以 NumPy 一次計算所有中間點到候選線段的距離，
+    超出容許值時在誤差最大的點切開，遞迴處理兩側
+  - 空間誤差：捨棄的點到保留線段的距離（像素）不超過 max_error
+  - 時間誤差：以等速沿線段移動時抵達該點投影位置的時間，與原始時間的差（秒）不超過 max_time_error；
+    停頓、加減速的位置因此會保留
+  - 目標視窗內外（in_target）不同的移動不合併到同一段
+
+回傳壓縮後的事件列表（保留的事件沿用原本的 dict）與統計（前後筆數、誤差最大值 / 平均值、耗時）。
+
+    python modules/trajectory_compact.py <腳本.json> [...] [--max-error 像素] [--max-time-error 秒]
+"""
+
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_MAX_ERROR = 2.0
+DEFAULT_MAX_TIME_ERROR = 0.05
+
+NUMPY_AVAILABLE = np is not None
+
+
+def _move_runs(events: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+    """可簡化的連續移動段 [(起始索引, 結束索引)]（含兩端，至少 3 筆）"""
+    runs: List[Tuple[int, int]] = []
+    held = 0  # 按住中的按鈕數
+    start = None
+    flag = None
+    for i, event in enumerate(events):
+        kind = event.get('event') if event.get('type') == 'mouse' else None
+        if kind == 'move' and not held and 'x' in event and 'y' in event and 'time' in event:
+            in_target = event.get('in_target', True)
+            if start is not None and in_target == flag:
+                continue
+            if start is not None and i - 1 - start >= 2:
+                runs.append((start, i - 1))
+            start, flag = i, in_target
+            continue
+        if start is not None and i - 1 - start >= 2:
+            runs.append((start, i - 1))
+        start = None
+        if kind == 'down':
+            held += 1
+        elif kind == 'up':
+            held = max(0, held - 1)
+    if start is not None and len(events) - 1 - start >= 2:
+        runs.append((start, len(events) - 1))
+    return runs
+
+
+def _reduce_run(x, y, t, max_error: float, max_time_error: float):
+    """對一段移動做時間感知的 Douglas-Peucker，回傳 (保留遮罩, 空間誤差, 時間誤差)"""
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    dist_err = np.zeros(n)
+    time_err = np.zeros(n)
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        px = x[a + 1:b] - x[a]
+        py = y[a + 1:b] - y[a]
+        vx = x[b] - x[a]
+        vy = y[b] - y[a]
+        length_sq = vx * vx + vy * vy
+        if length_sq > 0:
+            f = np.clip((px * vx + py * vy) / length_sq, 0.0, 1.0)
+            dist = np.hypot(px - f * vx, py - f * vy)
+            late = np.abs(t[a + 1:b] - (t[a] + f * (t[b] - t[a])))
+        else:
+            # 起點與終點相同：游標停在原地，只看空間距離
+            dist = np.hypot(px, py)
+            late = np.zeros(b - a - 1)
+        score = np.maximum(dist / max_error, late / max_time_error)
+        k = int(np.argmax(score))
+        if score[k] > 1.0:
+            mid = a + 1 + k
+            keep[mid] = True
+            stack.append((a, mid))
+            stack.append((mid, b))
+        else:
+            dist_err[a + 1:b] = dist
+            time_err[a + 1:b] = late
+    return keep, dist_err, time_err
+
+
+def compact_trajectory(events: List[Dict[str, Any]], max_error: float = DEFAULT_MAX_ERROR,
+                       max_time_error: float = DEFAULT_MAX_TIME_ERROR
+                       ) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """壓縮滑鼠移動軌跡
+
+    Args:
+        max_error:      捨棄的點與保留軌跡的最大距離（像素）
+        max_time_error: 捨棄的點與保留軌跡的最大時間差（秒）
+
+    Returns:
+        (壓縮後的事件列表, 統計)
+    """
+    if np is None:
+        raise RuntimeError("需要 numpy 才能壓縮軌跡")
+    t0 = time.perf_counter()
+    events = list(events)
+    runs = _move_runs(events)
+    drop = np.zeros(len(events), dtype=bool)
+    dist_max = time_max = dist_sum = 0.0
+    dropped = 0
+    for start, end in runs:
+        run = events[start:end + 1]
+        x = np.fromiter((e['x'] for e in run), dtype=np.float64, count=len(run))
+        y = np.fromiter((e['y'] for e in run), dtype=np.float64, count=len(run))
+        t = np.fromiter((e['time'] for e in run), dtype=np.float64, count=len(run))
+        keep, dist_err, time_err = _reduce_run(x, y, t, max_error, max_time_error)
+        removed = ~keep
+        drop[start:end + 1] = removed
+        count = int(removed.sum())
+        if count:
+            dropped += count
+            dist_max = max(dist_max, float(dist_err[removed].max()))
+            time_max = max(time_max, float(time_err[removed].max()))
+            dist_sum += float(dist_err[removed].sum())
+    result = [event for event, d in zip(events, drop.tolist()) if not d]
+    moves_before = sum(1 for e in events if e.get('type') == 'mouse' and e.get('event') == 'move')
+    stats = {
+        'events_before': len(events),
+        'events_after': len(result),
+        'moves_before': moves_before,
+        'moves_after': moves_before - dropped,
+        'runs': len(runs),
+        'max_error_px': dist_max,
+        'mean_error_px': dist_sum / dropped if dropped else 0.0,
+        'max_time_error_ms': time_max * 1000,
+        'seconds': time.perf_counter() - t0,
+    }
+    return result, stats
+
+
+def format_stats(stats: Dict[str, float]) -> str:
+    """統計摘要（單行）"""
+    return (f"移動 {stats['moves_before']:,} -> {stats['moves_after']:,}，"
+            f"事件 {stats['events_before']:,} -> {stats['events_after']:,}，"
+            f"最大誤差 {stats['max_error_px']:.2f}px / {stats['max_time_error_ms']:.1f}ms，"
+            f"平均誤差 {stats['mean_error_px']:.2f}px，耗時 {stats['seconds'] * 1000:.0f}ms")
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    try:
+        from script_io import load_script
+    except ImportError:
+        from modules.script_io import load_script
+
+    parser = argparse.ArgumentParser(description="ChroLens Mimic 軌跡壓縮（只輸出統計，不修改檔案）")
+    parser.add_argument("scripts", nargs="+", help="腳本檔")
+    parser.add_argument("--max-error", type=float, default=DEFAULT_MAX_ERROR, help="最大空間誤差（像素）")
+    parser.add_argument("--max-time-error", type=float, default=DEFAULT_MAX_TIME_ERROR, help="最大時間誤差（秒）")
+    args = parser.parse_args(argv)
+    for path in args.scripts:
+        events = load_script(path).get("events") or []
+        _result, stats = compact_trajectory(events, args.max_error, args.max_time_error)
+        print(f"{path}: {format_stats(stats)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())